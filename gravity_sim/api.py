@@ -13,7 +13,7 @@ import ctypes
 import sys
 import warnings
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Iterable, Iterator, Optional, Tuple
 
 sys.path.append(str(Path(__file__).parent))
 
@@ -22,6 +22,8 @@ import numpy as np
 from . import plotting
 from . import utils
 from .gravitational_system import GravitationalSystem
+from .live_state import LiveStateReader
+from .simulation_context import SimulationContext
 from .simulator import Simulator
 
 
@@ -133,10 +135,15 @@ class GravitySimulatorAPI:
         )
 
         # Ensuring no file name conflicts
-        if self.storing_params["method"] == "flush":
+        if self.storing_params["method"] in [
+            "flush",
+            "flush_binary",
+            "flush_chunked",
+            "memmap",
+        ]:
             if Path(storing_params["flush_path"]).is_file():
+                i = 0
                 while True:
-                    i = 0
                     flush_path = str(storing_params["flush_path"]) + f"_{i}"
                     if not Path(flush_path).is_file():
                         storing_params["flush_path"] = flush_path
@@ -158,7 +165,7 @@ class GravitySimulatorAPI:
             is_exit_ctypes_bool.value = True
             raise KeyboardInterrupt
 
-        if self.storing_params["method"] == "default":
+        if self.storing_params["method"] in ["default", "memmap", "ring"]:
             return (
                 self.simulator.sol_state_,
                 self.simulator.sol_time_,
@@ -172,6 +179,13 @@ class GravitySimulatorAPI:
     ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
         """Resume simulation
 
+        The integrator continues with its internal state from the
+        last simulation (e.g. half-step velocities, step size and
+        predictor values), so running a simulation in chunks gives
+        the same result as running it at once. If the system is
+        modified between the simulations, the integrator is
+        initialized again.
+
         Parameters
         ----------
         tf : float
@@ -186,12 +200,13 @@ class GravitySimulatorAPI:
                 self.settings,
                 tf,
                 is_exit_ctypes_bool,
+                is_resume=True,
             )
         except KeyboardInterrupt:
             is_exit_ctypes_bool.value = True
             raise KeyboardInterrupt
 
-        if self.storing_params["method"] == "default":
+        if self.storing_params["method"] in ["default", "memmap", "ring"]:
             return (
                 self.simulator.sol_state_,
                 self.simulator.sol_time_,
@@ -200,6 +215,67 @@ class GravitySimulatorAPI:
 
         return None
 
+    def create_simulation_context(
+        self,
+        gravitational_system: GravitationalSystem,
+        **kwargs,
+    ) -> SimulationContext:
+        """Create a simulation context for Python-driven loops
+
+        The parameters are checked and parsed once, and the
+        integrator state is kept in the context, which is useful
+        for e.g. rendering frame by frame. Each step() or
+        integrate_to() call still enters the integrator, which
+        allocates its work arrays, so advancing by more steps per
+        call is cheaper.
+
+        Parameters
+        ----------
+        gravitational_system : GravitationalSystem
+            The system is copied to the context and would not be
+            modified. Use SimulationContext.get_state() to read
+            the current state.
+        kwargs : dict
+            Same as launch_simulation(), except that storing
+            parameters are not supported.
+
+        Returns
+        -------
+        SimulationContext
+
+        Raises
+        ------
+        ValueError
+            If storing method other than "disabled" is given
+        """
+        if kwargs.get("storing_method", "disabled") != "disabled":
+            raise ValueError(
+                'Simulation context does not store solutions. Only "disabled" storing method is supported.'
+            )
+        kwargs["storing_method"] = "disabled"
+        if "verbose" not in kwargs:
+            kwargs["verbose"] = 1
+
+        (integrator_params, acceleration_params, storing_params, settings) = (
+            self._create_simulation_input(**kwargs)
+        )
+        self._check_and_fill_in_simulation_input(
+            gravitational_system,
+            integrator_params,
+            acceleration_params,
+            storing_params,
+            settings,
+            None,
+        )
+
+        return SimulationContext(
+            self.c_lib,
+            gravitational_system,
+            integrator_params,
+            acceleration_params,
+            settings,
+        )
+
     def _create_simulation_input(self, **kwargs) -> Tuple[dict, dict, dict, dict]:
         integrator_params = {}
         acceleration_params = {}
@@ -220,6 +296,7 @@ class GravitySimulatorAPI:
             "whfast_kepler_max_iter",
             "whfast_kepler_auto_remove",
             "whfast_kepler_auto_remove_tol",
+            "whfast_coordinate_system",
         ]
         acceleration_params_list = [
             "acceleration_method",
@@ -227,7 +304,24 @@ class GravitySimulatorAPI:
             "order",
             "opening_angle",
         ]
-        storing_params_list = ["storing_method", "storing_freq", "flush_path"]
+        storing_params_list = [
+            "storing_method",
+            "storing_freq",
+            "flush_path",
+            "output_interval",
+            "flush_energy",
+            "ring_capacity",
+            "stored_indices",
+            "stored_fields",
+            "storing_dtype",
+            "compression",
+            "chunk_size",
+            "snapshot_callback",
+            "distance_threshold",
+            "distance_indices",
+            "live_state_name",
+            "live_state_freq",
+        ]
         settings_list = [
             "disable_progress_bar",
             "make_copy_params",
@@ -279,7 +373,7 @@ class GravitySimulatorAPI:
         acceleration_params: dict,
         storing_params: dict,
         settings: dict,
-        tf: float,
+        tf: Optional[float],
     ) -> None:
         """Check and fill in simulation input
 
@@ -290,7 +384,8 @@ class GravitySimulatorAPI:
         acceleration_params : dict
         storing_params : dict
         settings : dict
-        tf : float
+        tf : float, optional
+            Not checked if None
 
         Raises
         ------
@@ -361,22 +456,19 @@ class GravitySimulatorAPI:
                     'integrator_params["dt"] is not used for adaptive-step-size integrators'
                 )
 
-        if integrator_params["integrator"] != "whfast":
+        if integrator_params["integrator"] not in [
+            "whfast",
+            "saba4",
+            "sbab4",
+            "mercurius",
+        ]:
             if "whfast_kepler_tol" in integrator_params:
                 warnings.warn(
-                    'integrator_params["whfast_kepler_tol"] is only used for WHFast integrator'
+                    'integrator_params["whfast_kepler_tol"] is only used for WHFast, SABA, SBAB and MERCURIUS integrator'
                 )
             if "whfast_kepler_max_iter" in integrator_params:
                 warnings.warn(
-                    'integrator_params["whfast_kepler_max_iter"] is only used for WHFast integrator'
-                )
-            if "whfast_kepler_auto_remove" in integrator_params:
-                warnings.warn(
-                    'integrator_params["whfast_kepler_auto_remove"] is only used for WHFast integrator'
-                )
-            if "whfast_kepler_auto_remove_tol" in integrator_params:
-                warnings.warn(
-                    'integrator_params["whfast_kepler_auto_remove_tol"] is only used for WHFast integrator'
+                    'integrator_params["whfast_kepler_max_iter"] is only used for WHFast, SABA, SBAB and MERCURIUS integrator'
                 )
         else:
             if "whfast_kepler_tol" in integrator_params:
@@ -399,6 +491,21 @@ class GravitySimulatorAPI:
                         raise ValueError(
                             'integrator_params["whfast_kepler_max_iter"] must be positive'
                         )
+
+        if integrator_params["integrator"] != "whfast":
+            if "whfast_kepler_auto_remove" in integrator_params:
+                warnings.warn(
+                    'integrator_params["whfast_kepler_auto_remove"] is only used for WHFast integrator'
+                )
+            if "whfast_kepler_auto_remove_tol" in integrator_params:
+                warnings.warn(
+                    'integrator_params["whfast_kepler_auto_remove_tol"] is only used for WHFast integrator'
+                )
+            if "whfast_coordinate_system" in integrator_params:
+                warnings.warn(
+                    'integrator_params["whfast_coordinate_system"] is only used for WHFast integrator'
+                )
+        else:
             if "whfast_kepler_auto_remove" in integrator_params:
                 if not isinstance(integrator_params["whfast_kepler_auto_remove"], bool):
                     raise TypeError(
@@ -416,6 +523,14 @@ class GravitySimulatorAPI:
                         raise ValueError(
                             'integrator_params["whfast_kepler_auto_remove_tol"] must be positive'
                         )
+            if "whfast_coordinate_system" in integrator_params:
+                if (
+                    integrator_params["whfast_coordinate_system"]
+                    not in Simulator.AVAILABLE_WHFAST_COORDINATE_SYSTEMS
+                ):
+                    raise ValueError(
+                        f'integrator_params["whfast_coordinate_system"] must be one of {Simulator.AVAILABLE_WHFAST_COORDINATE_SYSTEMS}'
+                    )
 
         for key in ["dt", "tolerance", "initial_dt"]:
             if key not in integrator_params:
@@ -429,6 +544,8 @@ class GravitySimulatorAPI:
             integrator_params["whfast_kepler_auto_remove"] = False
         if "whfast_kepler_auto_remove_tol" not in integrator_params:
             integrator_params["whfast_kepler_auto_remove_tol"] = 1e-8
+        if "whfast_coordinate_system" not in integrator_params:
+            integrator_params["whfast_coordinate_system"] = "jacobi"
 
         ### acceleration_params ###
         if not isinstance(acceleration_params, dict):
@@ -490,12 +607,17 @@ class GravitySimulatorAPI:
             raise ValueError(
                 f'storing_params["method"] must be one of {Simulator.AVAILABLE_STORING_METHODS}'
             )
-        if storing_params["method"] in ["default", "disabled"]:
+        if storing_params["method"] in ["default", "ring", "disabled"]:
             if "flush_path" in storing_params:
                 warnings.warn(
                     'storing_params["flush_path"] is not used for default storing method'
                 )
-        if storing_params["method"] == "flush":
+        if storing_params["method"] in [
+            "flush",
+            "flush_binary",
+            "flush_chunked",
+            "memmap",
+        ]:
             if "flush_path" not in storing_params:
                 raise ValueError(
                     'storing_params must have key "flush_path" for flush storing method'
@@ -526,6 +648,178 @@ class GravitySimulatorAPI:
             else:
                 storing_params["storing_freq"] = 1
 
+        if "output_interval" in storing_params:
+            if not isinstance(storing_params["output_interval"], (int, float)):
+                raise TypeError(
+                    f"Expected int or float, but got {type(storing_params['output_interval'])}"
+                )
+            if storing_params["output_interval"] < 0.0:
+                raise ValueError(
+                    'storing_params["output_interval"] must be non-negative'
+                )
+            if (
+                storing_params["output_interval"] > 0.0
+                and integrator_params["integrator"]
+                not in Simulator.ADAPTIVE_STEP_SIZE_INTEGRATORS
+            ):
+                warnings.warn(
+                    f'storing_params["output_interval"] is only used for {Simulator.ADAPTIVE_STEP_SIZE_INTEGRATORS} integrators'
+                )
+        else:
+            storing_params["output_interval"] = 0.0
+
+        if "flush_energy" in storing_params:
+            if not isinstance(storing_params["flush_energy"], bool):
+                raise TypeError(
+                    f"Expected bool, but got {type(storing_params['flush_energy'])}"
+                )
+            if storing_params["method"] not in ["flush", "flush_binary", "flush_chunked"]:
+                warnings.warn(
+                    'storing_params["flush_energy"] is only used for flush storing methods'
+                )
+        else:
+            storing_params["flush_energy"] = False
+
+        if storing_params["method"] == "ring":
+            if "ring_capacity" not in storing_params:
+                raise ValueError(
+                    'storing_params must have key "ring_capacity" for ring storing method'
+                )
+            if not isinstance(storing_params["ring_capacity"], int):
+                raise TypeError(
+                    f"Expected int, but got {type(storing_params['ring_capacity'])}"
+                )
+            if storing_params["ring_capacity"] <= 0:
+                raise ValueError('storing_params["ring_capacity"] must be positive')
+        else:
+            if "ring_capacity" in storing_params:
+                warnings.warn(
+                    'storing_params["ring_capacity"] is only used for ring storing method'
+                )
+            storing_params["ring_capacity"] = 0
+
+        for key in ["stored_indices", "distance_indices"]:
+            if storing_params.get(key) is not None:
+                indices = np.asarray(storing_params[key])
+                if indices.dtype == bool:
+                    if indices.shape != (gravitational_system.objects_count,):
+                        raise ValueError(
+                            f'Boolean mask storing_params["{key}"] must have one element per object'
+                        )
+                    indices = np.flatnonzero(indices)
+                elif indices.ndim != 1 or not np.issubdtype(indices.dtype, np.integer):
+                    raise TypeError(
+                        f'storing_params["{key}"] must be a 1D array of indices or a boolean mask'
+                    )
+                if len(indices) == 0:
+                    raise ValueError(f'storing_params["{key}"] must not be empty')
+                if np.any(indices < 0) or np.any(
+                    indices >= gravitational_system.objects_count
+                ):
+                    raise ValueError(f'storing_params["{key}"] out of range')
+                storing_params[key] = indices.astype(np.int32)
+            else:
+                storing_params[key] = None
+
+        if "distance_threshold" in storing_params:
+            if not isinstance(storing_params["distance_threshold"], (int, float)):
+                raise TypeError(
+                    f"Expected int or float, but got {type(storing_params['distance_threshold'])}"
+                )
+            if storing_params["distance_threshold"] < 0.0:
+                raise ValueError(
+                    'storing_params["distance_threshold"] must be non-negative'
+                )
+        else:
+            storing_params["distance_threshold"] = 0.0
+        if (
+            storing_params["distance_indices"] is not None
+            and storing_params["distance_threshold"] == 0.0
+        ):
+            warnings.warn(
+                'storing_params["distance_indices"] is only used if storing_params["distance_threshold"] is positive'
+            )
+
+        if "stored_fields" in storing_params:
+            if storing_params["stored_fields"] not in ["xv", "x"]:
+                raise ValueError('storing_params["stored_fields"] must be "xv" or "x"')
+        else:
+            storing_params["stored_fields"] = "xv"
+
+        if "storing_dtype" in storing_params:
+            if storing_params["storing_dtype"] not in Simulator.AVAILABLE_STORING_DTYPES:
+                raise ValueError(
+                    f'storing_params["storing_dtype"] must be one of {Simulator.AVAILABLE_STORING_DTYPES}'
+                )
+            if (
+                storing_params["storing_dtype"] == "float32"
+                and storing_params["method"] == "flush"
+            ):
+                raise ValueError(
+                    'storing_params["storing_dtype"] = "float32" is not supported by the flush storing method'
+                )
+            if storing_params["storing_dtype"] == "quantized16" and storing_params[
+                "method"
+            ] not in ["flush_binary", "disabled"]:
+                raise ValueError(
+                    'storing_params["storing_dtype"] = "quantized16" is only supported by the flush_binary storing method'
+                )
+        else:
+            storing_params["storing_dtype"] = "float64"
+
+        if storing_params["method"] == "flush_chunked":
+            if "compression" in storing_params:
+                if storing_params["compression"] not in utils.CHUNKED_RESULTS_COMPRESSIONS:
+                    raise ValueError(
+                        f'storing_params["compression"] must be one of {list(utils.CHUNKED_RESULTS_COMPRESSIONS)}'
+                    )
+            else:
+                storing_params["compression"] = "zlib"
+            if "chunk_size" in storing_params:
+                if not isinstance(storing_params["chunk_size"], int):
+                    raise TypeError(
+                        f"Expected int, but got {type(storing_params['chunk_size'])}"
+                    )
+                if storing_params["chunk_size"] <= 0:
+                    raise ValueError('storing_params["chunk_size"] must be positive')
+            else:
+                storing_params["chunk_size"] = 1024
+        else:
+            for key in ["compression", "chunk_size"]:
+                if key in storing_params:
+                    warnings.warn(
+                        f'storing_params["{key}"] is only used for flush_chunked storing method'
+                    )
+
+        if storing_params.get("snapshot_callback") is not None:
+            if not callable(storing_params["snapshot_callback"]):
+                raise TypeError(
+                    f"Expected callable, but got {type(storing_params['snapshot_callback'])}"
+                )
+        else:
+            storing_params["snapshot_callback"] = None
+
+        if storing_params.get("live_state_name") is not None:
+            if not isinstance(storing_params["live_state_name"], str):
+                raise TypeError(
+                    f"Expected str, but got {type(storing_params['live_state_name'])}"
+                )
+        else:
+            storing_params["live_state_name"] = None
+        if "live_state_freq" in storing_params:
+            if not isinstance(storing_params["live_state_freq"], int):
+                raise TypeError(
+                    f"Expected int, but got {type(storing_params['live_state_freq'])}"
+                )
+            if storing_params["live_state_freq"] <= 0:
+                raise ValueError('storing_params["live_state_freq"] must be positive')
+            if storing_params["live_state_name"] is None:
+                warnings.warn(
+                    'storing_params["live_state_freq"] is only used if storing_params["live_state_name"] is given'
+                )
+        else:
+            storing_params["live_state_freq"] = 1
+
         ### settings ###
         if "verbose" not in settings:
             settings["verbose"] = 2
@@ -544,6 +838,9 @@ class GravitySimulatorAPI:
         settings["make_copy_system"] = False
 
         ### tf ###
+        if tf is None:
+            return
+
         if not isinstance(tf, (int, float)):
             raise TypeError(f"Expected int or float, but got {type(tf)}")
 
@@ -577,14 +874,15 @@ class GravitySimulatorAPI:
     def compute_energy(
         self,
         gravitational_system: GravitationalSystem,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
     ) -> np.ndarray:
         """Compute energy of the system
 
         Parameters
         ----------
         gravitational_system : GravitationalSystem
-        sol_state : np.ndarray
+        sol_state : np.ndarray | Iterable
+            Solution state, or blocks of it from iter_results()
 
         Returns
         -------
@@ -607,14 +905,15 @@ class GravitySimulatorAPI:
     def compute_linear_momentum(
         self,
         gravitational_system: GravitationalSystem,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
     ) -> np.ndarray:
         """Compute linear momentum of the system
 
         Parameters
         ----------
         gravitational_system : GravitationalSystem
-        sol_state : np.ndarray
+        sol_state : np.ndarray | Iterable
+            Solution state, or blocks of it from iter_results()
 
         Returns
         -------
@@ -636,14 +935,15 @@ class GravitySimulatorAPI:
     def compute_angular_momentum(
         self,
         gravitational_system: GravitationalSystem,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
     ) -> np.ndarray:
         """Compute angular momentum of the system
 
         Parameters
         ----------
         gravitational_system : GravitationalSystem
-        sol_state : np.ndarray
+        sol_state : np.ndarray | Iterable
+            Solution state, or blocks of it from iter_results()
 
         Returns
         -------
@@ -665,7 +965,7 @@ class GravitySimulatorAPI:
     @staticmethod
     def compute_eccentricity(
         gravitational_system: GravitationalSystem,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
     ) -> np.ndarray:
         """Compute the eccentricity using the sol_state array,
         assuming that the first object is the central object
@@ -673,7 +973,8 @@ class GravitySimulatorAPI:
         Parameters
         ----------
         gravitational_system : GravitationalSystem
-        sol_state : np.ndarray
+        sol_state : np.ndarray | Iterable
+            Solution state, or blocks of it from iter_results()
 
         Returns
         -------
@@ -689,7 +990,7 @@ class GravitySimulatorAPI:
     @staticmethod
     def compute_inclination(
         gravitational_system: GravitationalSystem,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
     ) -> np.ndarray:
         """Compute the inclination using the sol_state array,
         assuming that the first object is the central object
@@ -697,7 +998,8 @@ class GravitySimulatorAPI:
         Parameters
         ----------
         gravitational_system : GravitationalSystem
-        sol_state : np.ndarray
+        sol_state : np.ndarray | Iterable
+            Solution state, or blocks of it from iter_results()
 
         Returns
         -------
@@ -738,12 +1040,23 @@ class GravitySimulatorAPI:
     @staticmethod
     def read_results(
         file_path: str | Path,
+        t_start: Optional[float] = None,
+        t_end: Optional[float] = None,
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
         """Load results from a file
 
+        The format is detected from the file, i.e. csv, binary
+        ("flush_binary" and "memmap") or compressed chunked
+        ("flush_chunked"). For the chunked format, only the chunks
+        within the time window are decompressed.
+
         Parameters
         ----------
         file_path : str or Path
+        t_start : float, optional
+            Start of the time window, by default the beginning
+        t_end : float, optional
+            End of the time window, by default the end
 
         Returns
         -------
@@ -752,7 +1065,26 @@ class GravitySimulatorAPI:
         sol_dt : np.ndarray
         sol_energy : np.ndarray
         """
-        sol_dict = utils.read_results_csv(file_path)
+        with Path(file_path).open("rb") as file:
+            magic = file.read(8)
+
+        if magic == utils.CHUNKED_RESULTS_MAGIC:
+            sol_dict = utils.read_results_chunked(file_path, t_start, t_end)
+        else:
+            if magic == utils.FLUSH_BINARY_MAGIC:
+                sol_dict = utils.read_results_binary(file_path)
+            else:
+                sol_dict = utils.read_results_csv(file_path)
+
+            is_in_window = np.ones(len(sol_dict["time"]), dtype=bool)
+            if t_start is not None:
+                is_in_window &= sol_dict["time"] >= t_start
+            if t_end is not None:
+                is_in_window &= sol_dict["time"] <= t_end
+            if not np.all(is_in_window):
+                for key in ["state", "time", "dt", "energy"]:
+                    sol_dict[key] = sol_dict[key][is_in_window]
+
         return (
             sol_dict["state"],
             sol_dict["time"],
@@ -760,6 +1092,61 @@ class GravitySimulatorAPI:
             sol_dict["energy"],
         )
 
+    @staticmethod
+    def iter_results(
+        file_path: str | Path,
+        chunk_size: int = 10000,
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """Iterate over results in a file in blocks, without loading
+        the whole file into memory
+
+        The format is detected from the file as in read_results(). The
+        blocks can be passed to compute_energy(), compute_eccentricity()
+        and compute_inclination() directly.
+
+        Parameters
+        ----------
+        file_path : str or Path
+        chunk_size : int, optional
+            Number of snapshots in each block, by default 10000.
+            For the chunked format, each block is a stored chunk.
+
+        Yields
+        ------
+        sol_time : np.ndarray
+        sol_dt : np.ndarray
+        sol_energy : np.ndarray
+        sol_state : np.ndarray
+        """
+        with Path(file_path).open("rb") as file:
+            magic = file.read(8)
+
+        if magic == utils.CHUNKED_RESULTS_MAGIC:
+            return utils.iter_results_chunked(file_path)
+        elif magic == utils.FLUSH_BINARY_MAGIC:
+            return utils.iter_results_binary(file_path, chunk_size)
+        else:
+            return utils.iter_results_csv(file_path, chunk_size)
+
+    def open_live_state(self, name: str) -> LiveStateReader:
+        """Attach to the live state published by a running simulation
+
+        The simulation publishes its state if storing_params["live_state_name"]
+        is given. The reader may be opened in any process and never blocks
+        the simulation.
+
+        Parameters
+        ----------
+        name : str
+            Same as storing_params["live_state_name"] of the simulation
+
+        Returns
+        -------
+        LiveStateReader
+            Call read() to take a consistent snapshot of t, dt, x and v
+        """
+        return LiveStateReader(name, self.c_lib)
+
     @staticmethod
     def plot_rel_energy_error(
         sol_energy: np.ndarray,
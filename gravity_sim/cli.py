@@ -341,6 +341,7 @@ class GravitySimulatorCLI:
             "whfast_kepler_max_iter": 500,
             "whfast_kepler_auto_remove": False,
             "whfast_kepler_auto_remove_tol": 1e-8,
+            "whfast_coordinate_system": "jacobi",
         }
         acceleration_params: dict[str, str | int | float] = {
             "method": "pairwise",
@@ -348,8 +349,19 @@ class GravitySimulatorCLI:
             "softening_length": 0.0,
             "order": 0,
         }
-        storing_params: dict[str, str | int] = {
+        storing_params: dict[str, str | int | float] = {
             "method": "default",
+            "output_interval": 0.0,
+            "flush_energy": False,
+            "ring_capacity": 0,
+            "stored_indices": None,
+            "stored_fields": "xv",
+            "storing_dtype": "float64",
+            "snapshot_callback": None,
+            "distance_threshold": 0.0,
+            "distance_indices": None,
+            "live_state_name": None,
+            "live_state_freq": 1,
         }
         settings: dict[str, bool | int] = {
             "make_copy_params": False,
@@ -159,6 +159,10 @@ class GravitationalSystem:
         ],
     }
 
+    # Default files of customized systems in the package directory
+    CUSTOMIZED_SYSTEMS_CATALOG = "customized_systems.bin"
+    CUSTOMIZED_SYSTEMS_CSV = "customized_systems.csv"
+
     # Built-in systems
     BUILT_IN_SYSTEMS = [
         "circular_binary_orbit",
@@ -366,12 +370,14 @@ class GravitationalSystem:
         self,
         file_path: Optional[str | Path] = None,
     ) -> None:
-        """Save system to a CSV file
+        """Save system to a binary systems catalog / CSV file
 
         Parameters
         ----------
         file_path : str, optional
-            File path to save the system, by default None
+            File path to save the system, by default None to save to
+            the default customized systems catalog. If the file path
+            ends with ".csv", the system is appended to the CSV file.
 
         Note
         ----
@@ -379,15 +385,22 @@ class GravitationalSystem:
         - Prints a message f"System \"{self.name}\" successfully saved to \"{file_path}\""
         """
         if file_path is None:
-            file_path = Path(__file__).parent / "customized_systems.csv"
-
-        with open(file_path, "a", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(
-                [self.name, self.G, self.objects_count]
-                + self.m.tolist()
-                + self.x.flatten().tolist()
-                + self.v.flatten().tolist()
+            file_path = Path(__file__).parent / self.CUSTOMIZED_SYSTEMS_CATALOG
+        if isinstance(file_path, str):
+            file_path = Path(file_path)
+
+        if file_path.suffix == ".csv":
+            with open(file_path, "a", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(
+                    [self.name, self.G, self.objects_count]
+                    + self.m.tolist()
+                    + self.x.flatten().tolist()
+                    + self.v.flatten().tolist()
+                )
+        else:
+            utils.save_system_to_catalog(
+                file_path, self.name, self.G, self.x, self.v, self.m
             )
 
         print(f'System "{self.name}" successfully saved to "{file_path}"')
@@ -397,14 +410,16 @@ class GravitationalSystem:
         system_name: str,
         file_path: Optional[str | Path] = None,
     ) -> None:
-        """Load system from a CSV file / built-in system
+        """Load system from a binary systems catalog / CSV file / built-in system
 
         Parameters
         ----------
         system_name : str
             Name of the system to load
         file_path : str, optional
-            File path to load the system from, by default None
+            File path to load the system from, by default None to load
+            from the built-in systems, then the default customized
+            systems catalog and CSV file
 
         Raises
         ------
@@ -614,104 +629,37 @@ class GravitationalSystem:
                     self.center_of_mass_correction()
 
             else:
-                file_path = Path(__file__).parent / "customized_systems.csv"
-                if not file_path.is_file():
+                default_file_paths = [
+                    Path(__file__).parent / self.CUSTOMIZED_SYSTEMS_CATALOG,
+                    Path(__file__).parent / self.CUSTOMIZED_SYSTEMS_CSV,
+                ]
+                default_file_paths = [
+                    path for path in default_file_paths if path.is_file()
+                ]
+                if len(default_file_paths) == 0:
                     err_msg = (
                         f'load: system name "{system_name}" not found in built-in systems, and'
-                        f' default customized systems file not found: "{file_path}"'
+                        f' default customized systems file not found in "{Path(__file__).parent}"'
                     )
                     raise ValueError(err_msg)
 
-                # Load system from default customized systems file
-                else:
-                    loaded_system_flag = False
-                    with open(file_path, "r") as file:
-                        reader = csv.reader(file)
-                        for row in reader:
-                            if row[0] == system_name:
-                                self.name = system_name
-                                self.G = float(row[1])
-                                objects_count = int(row[2])
-                                m = np.zeros(objects_count)
-                                for i in range(objects_count):
-                                    m[i] = float(row[3 + i])
-
-                                x = np.zeros((objects_count, 3))
-                                v = np.zeros((objects_count, 3))
-                                for i in range(objects_count):
-                                    x[i] = np.array(
-                                        row[
-                                            (3 + objects_count + i * 3) : (
-                                                3 + objects_count + i * 3 + 3
-                                            )
-                                        ]
-                                    )
-                                    v[i] = np.array(
-                                        row[
-                                            (
-                                                3
-                                                + objects_count
-                                                + objects_count * 3
-                                                + i * 3
-                                            ) : (
-                                                3
-                                                + objects_count
-                                                + objects_count * 3
-                                                + i * 3
-                                                + 3
-                                            )
-                                        ]
-                                    )
-
-                                self.add(x, v, m)
-                                loaded_system_flag = True
-
-                    if not loaded_system_flag:
-                        err_msg = (
-                            f'load: system name "{system_name}" not recognized in '
-                            f'built-in systems and customized systems file: "{file_path}"'
-                        )
-                        raise ValueError(err_msg)
+                # Load system from default customized systems files
+                if not any(
+                    self._load_from_file(system_name, path)
+                    for path in default_file_paths
+                ):
+                    file_paths_str = ", ".join(
+                        f'"{path}"' for path in default_file_paths
+                    )
+                    err_msg = (
+                        f'load: system name "{system_name}" not recognized in '
+                        f"built-in systems and customized systems files: {file_paths_str}"
+                    )
+                    raise ValueError(err_msg)
 
         # Load system from given file path
         else:
-            loaded_system_flag = False
-            with open(file_path, "r") as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    if row[0] == system_name:
-                        self.name = system_name
-                        self.G = float(row[1])
-                        objects_count = int(row[2])
-                        m = np.zeros(objects_count)
-                        for i in range(objects_count):
-                            m[i] = float(row[3 + i])
-
-                        x = np.zeros((objects_count, 3))
-                        v = np.zeros((objects_count, 3))
-                        for i in range(objects_count):
-                            x[i] = np.array(
-                                row[
-                                    (3 + objects_count + i * 3) : (
-                                        3 + objects_count + i * 3 + 3
-                                    )
-                                ]
-                            )
-                            v[i] = np.array(
-                                row[
-                                    (3 + objects_count + objects_count * 3 + i * 3) : (
-                                        3
-                                        + objects_count
-                                        + objects_count * 3
-                                        + i * 3
-                                        + 3
-                                    )
-                                ]
-                            )
-
-                        self.add(x, v, m)
-                        loaded_system_flag = True
-            if not loaded_system_flag:
+            if not self._load_from_file(system_name, file_path):
                 err_msg = (
                     f'load: system name "{system_name}" not recognized in '
                     f'given file: "{file_path}"'
@@ -720,6 +668,63 @@ class GravitationalSystem:
 
         self.name = system_name
 
+    def _load_from_file(self, system_name: str, file_path: Path) -> bool:
+        """Load system from a binary systems catalog / CSV file
+
+        Parameters
+        ----------
+        system_name : str
+            Name of the system to load
+        file_path : Path
+            File path to load the system from
+
+        Returns
+        -------
+        bool
+            True if the system is found and loaded
+        """
+        if utils.is_systems_catalog(file_path):
+            system = utils.load_system_from_catalog(file_path, system_name)
+        else:
+            system = self._read_system_csv(system_name, file_path)
+        if system is None:
+            return False
+
+        self.G, self.x, self.v, self.m = system
+        self.objects_count = len(self.m)
+        return True
+
+    @staticmethod
+    def _read_system_csv(
+        system_name: str, file_path: Path
+    ) -> Optional[tuple[float, np.ndarray, np.ndarray, np.ndarray]]:
+        """Read the last saved system with the given name from a CSV file
+
+        Returns
+        -------
+        G : float
+        x : np.ndarray
+        v : np.ndarray
+        m : np.ndarray
+        or None if the system is not found
+        """
+        system_row = None
+        with open(file_path, "r") as file:
+            reader = csv.reader(file)
+            for row in reader:
+                if len(row) > 0 and row[0] == system_name:
+                    system_row = row
+        if system_row is None:
+            return None
+
+        objects_count = int(system_row[2])
+        data = np.array(system_row[3 : 3 + objects_count * 7], dtype=np.float64)
+        m = data[:objects_count]
+        x = data[objects_count : objects_count * 4].reshape(objects_count, 3)
+        v = data[objects_count * 4 :].reshape(objects_count, 3)
+
+        return float(system_row[1]), x, v, m
+
     def plot_2d_system(
         self,
         colors: Optional[list[str]] = None,
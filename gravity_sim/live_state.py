@@ -0,0 +1,326 @@
+"""
+Live state of a running simulation in shared memory
+
+The C library publishes the current positions, velocities, time and
+step size of a simulation to a multiprocessing.shared_memory segment
+(see live_state.h for the layout). The segment is protected by a
+seqlock, so that readers in other processes can take consistent
+snapshots without ever blocking the integrator. The snapshots are
+copied by read_live_state() in the C library, which has the memory
+ordering required on weakly ordered CPUs (e.g. arm64).
+
+Author: Ching Yin Ng
+"""
+
+import ctypes
+import os
+import struct
+import sys
+import time
+import timeit
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+from . import utils
+
+LIVE_STATE_MAGIC = b"GSIMLIV\x00"
+LIVE_STATE_HEADER_SIZE = 64
+# magic, sequence, capacity, objects_count, t, dt, process ID of the creator
+LIVE_STATE_HEADER_FORMAT = "=8sQiiddq"
+# Maximum sleep in seconds between the retries of LiveStateReader.read()
+LIVE_STATE_MAX_BACKOFF = 1e-3
+
+# Names of the segments created by this process
+_created_segment_names: set = set()
+
+
+def create_live_state(name: Optional[str], capacity: int) -> shared_memory.SharedMemory:
+    """Create a live state segment
+
+    Parameters
+    ----------
+    name : str, optional
+        Name of the segment, or None for a random name
+    capacity : int
+        Maximum number of objects
+
+    Returns
+    -------
+    shared_memory.SharedMemory
+        The segment, to be closed with close_live_state()
+
+    Raises
+    ------
+    FileExistsError
+        If a segment with the same name is used by another live state
+        or is not a live state segment
+
+    Notes
+    -----
+    A live state segment with the same name left by a terminated process
+    (e.g. a crashed simulation) is reused, or replaced if it is too small.
+    """
+    size = LIVE_STATE_HEADER_SIZE + capacity * 6 * 8
+    try:
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        segment = _attach_stale_live_state(name, size)
+
+    struct.pack_into(
+        LIVE_STATE_HEADER_FORMAT,
+        segment.buf,
+        0,
+        LIVE_STATE_MAGIC,
+        0,
+        capacity,
+        0,
+        0.0,
+        0.0,
+        os.getpid(),
+    )
+    _created_segment_names.add(segment.name)
+
+    return segment
+
+
+def _attach_stale_live_state(name: str, size: int) -> shared_memory.SharedMemory:
+    """Attach to an existing live state segment left by a terminated
+    process, to be initialized again by create_live_state()
+
+    Parameters
+    ----------
+    name : str
+        Name of the segment
+    size : int
+        Required size of the segment in bytes
+
+    Returns
+    -------
+    shared_memory.SharedMemory
+        The segment with at least the required size
+
+    Raises
+    ------
+    FileExistsError
+        If the segment is in use or is not a live state segment
+    """
+    segment = shared_memory.SharedMemory(name=name)
+    magic = bytes(segment.buf[:8]) if segment.size >= LIVE_STATE_HEADER_SIZE else b""
+    if magic != LIVE_STATE_MAGIC:
+        segment.close()
+        raise FileExistsError(
+            f'Shared memory segment "{name}" already exists and is not a live state '
+            + "segment. Use another live_state_name."
+        )
+
+    pid = struct.unpack_from("=q", segment.buf, 40)[0]
+    if segment.name in _created_segment_names or _is_process_alive(pid):
+        segment.close()
+        raise FileExistsError(
+            f'Live state "{name}" is already used by process {pid}. '
+            + "Use another live_state_name."
+        )
+
+    if segment.size < size:
+        segment.close()
+        segment.unlink()
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    return segment
+
+
+def _is_process_alive(pid: int) -> bool:
+    """Check if a process exists. Always True on Windows, where a
+    segment is removed once no process has it open."""
+    if os.name != "posix":
+        return True
+    if pid <= 0:
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def get_live_state_capacity(segment: shared_memory.SharedMemory) -> int:
+    """Maximum number of objects of a live state segment"""
+    return struct.unpack_from("=i", segment.buf, 16)[0]
+
+
+def get_live_state_address(segment: shared_memory.SharedMemory) -> int:
+    """Address of a live state segment to be passed to the C library,
+    valid until the segment is closed"""
+    # Release the buffer export right away, otherwise the segment
+    # cannot be closed
+    buffer = ctypes.c_char.from_buffer(segment.buf)
+    address = ctypes.addressof(buffer)
+    del buffer
+
+    return address
+
+
+def close_live_state(segment: shared_memory.SharedMemory) -> None:
+    """Close and unlink a live state segment created by create_live_state()
+
+    Readers that are still attached keep their mapping until they
+    are closed.
+    """
+    _created_segment_names.discard(segment.name)
+    segment.close()
+    segment.unlink()
+
+
+class LiveStateReader:
+    """Read-only view of the live state published by a simulation
+
+    Examples
+    --------
+    In another process, with storing_params["live_state_name"] = "sim":
+
+    >>> with LiveStateReader("sim") as reader:
+    ...     t, dt, x, v = reader.read()
+
+    Notes
+    -----
+    - read() never blocks the simulation. It retries with exponential
+      backoff (up to LIVE_STATE_MAX_BACKOFF seconds) if the state is
+      being written during the copy.
+    - The segment stays available after the simulation ends until
+      the simulator is freed or launches a simulation with another
+      live state, so the final state can still be read.
+    """
+
+    def __init__(self, name: str, c_lib: Optional[ctypes.CDLL] = None) -> None:
+        """
+        Attach to a live state segment
+
+        Parameters
+        ----------
+        name : str
+            Name of the segment
+        c_lib : ctypes.CDLL, optional
+            Initialized C library to copy the snapshots, by default
+            the C library at the default path
+
+        Raises
+        ------
+        FileNotFoundError
+            If the segment does not exist
+        ValueError
+            If the segment is not a live state segment
+        """
+        self.segment: Optional[shared_memory.SharedMemory] = None
+        if c_lib is None:
+            c_lib = utils.load_c_lib()
+            utils.initialize_c_lib(c_lib)
+        self.c_lib = c_lib
+
+        if sys.version_info >= (3, 13):
+            segment = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            segment = shared_memory.SharedMemory(name=name)
+            # Otherwise, the resource tracker unlinks the segment when
+            # this process exits, even though it is owned by the simulator
+            if os.name == "posix" and segment.name not in _created_segment_names:
+                resource_tracker.unregister(segment._name, "shared_memory")
+        self.segment = segment
+
+        magic, _, capacity, _, _, _, _ = struct.unpack_from(
+            LIVE_STATE_HEADER_FORMAT, segment.buf, 0
+        )
+        if magic != LIVE_STATE_MAGIC:
+            self.close()
+            raise ValueError(f'"{name}" is not a live state segment.')
+        self.capacity = capacity
+
+        buffer = np.frombuffer(segment.buf, dtype=np.uint8)
+        buffer.flags.writeable = False
+        self._sequence = buffer[8:16].view(np.uint64)
+        self._address = get_live_state_address(segment)
+        self._snapshot = np.empty(
+            LIVE_STATE_HEADER_SIZE + capacity * 6 * 8, dtype=np.uint8
+        )
+
+    def __enter__(self) -> "LiveStateReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Detach from the segment"""
+        if self.segment is not None:
+            # Views of the buffer must be released before closing
+            self._sequence = None
+            self.segment.close()
+            self.segment = None
+
+    @property
+    def version(self) -> int:
+        """Number of times the state is published, 0 if not yet published"""
+        return int(self._get_sequence()[0]) // 2
+
+    def read(
+        self, timeout: Optional[float] = 1.0
+    ) -> Tuple[float, float, np.ndarray, np.ndarray]:
+        """Take a consistent snapshot of the live state
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time in seconds to retry, by default 1.0.
+            None to retry until successful.
+
+        Returns
+        -------
+        t : float
+        dt : float
+        x : np.ndarray
+            Copy of the positions with shape (objects_count, 3)
+        v : np.ndarray
+            Copy of the velocities with shape (objects_count, 3)
+
+        Raises
+        ------
+        TimeoutError
+            If no consistent snapshot is taken within the timeout
+        """
+        self._get_sequence()
+        snapshot = self._snapshot
+        snapshot_pointer = snapshot.ctypes.data_as(ctypes.c_void_p)
+        sequence = ctypes.c_uint64()
+        start = timeit.default_timer()
+        backoff = 1e-6
+        while not self.c_lib.read_live_state(
+            ctypes.c_void_p(self._address), snapshot_pointer, ctypes.byref(sequence)
+        ):
+            if timeout is not None and timeit.default_timer() - start > timeout:
+                raise TimeoutError("Failed to read a consistent live state.")
+
+            # The writer may be preempted in the middle of publishing,
+            # so sleep instead of spinning
+            time.sleep(backoff)
+            backoff = min(backoff * 2.0, LIVE_STATE_MAX_BACKOFF)
+
+        objects_count = int(snapshot[20:24].view(np.int32)[0])
+        t, dt = snapshot[24:40].view(np.float64)
+        state = snapshot[LIVE_STATE_HEADER_SIZE:].view(np.float64)
+        x = state[: objects_count * 3].reshape(objects_count, 3).copy()
+        v = state[self.capacity * 3 : (self.capacity + objects_count) * 3]
+        v = v.reshape(objects_count, 3).copy()
+
+        return float(t), float(dt), x, v
+
+    def _get_sequence(self) -> np.ndarray:
+        if self.segment is None:
+            raise RuntimeError("Live state reader is already closed.")
+        return self._sequence
@@ -0,0 +1,234 @@
+"""
+Simulation context for gravity simulator
+
+The simulation context keeps a copy of the system, the parsed
+parameters and the integrator state in the C library, so that
+Python-driven loops (e.g. rendering frame by frame) can advance
+the simulation without parsing the parameters in every call.
+Each call still enters the integrator, which allocates its work
+arrays and initializes the acceleration, so advancing by more
+steps per call is faster.
+
+Author: Ching Yin Ng
+"""
+
+import ctypes
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .gravitational_system import GravitationalSystem
+
+
+class SimulationContext:
+    """Thin wrapper of the simulation context in the C library
+
+    Notes
+    -----
+    - The context does not store any solutions. Call get_state()
+      after stepping to read the current state of the system.
+    - The parameters are not checked here. Use
+      GravitySimulatorAPI.create_simulation_context() to create
+      a context with checked parameters.
+    """
+
+    def __init__(
+        self,
+        c_lib: ctypes.CDLL,
+        gravitational_system: GravitationalSystem,
+        integrator_params: dict,
+        acceleration_params: dict,
+        settings: dict,
+    ) -> None:
+        """
+        Initialize the simulation context
+
+        Parameters
+        ----------
+        c_lib : ctypes.CDLL
+            C dynamic-link library object
+        gravitational_system : GravitationalSystem
+        integrator_params : dict
+        acceleration_params : dict
+        settings : dict
+
+        Raises
+        ------
+        MemoryError
+            If failed to allocate memory for the context
+        RuntimeError
+            If failed to set the parameters, with the error message
+            of the C library
+        """
+        self.c_lib = c_lib
+        self.handle: Optional[ctypes.c_void_p] = None
+
+        x = np.ascontiguousarray(gravitational_system.x, dtype=np.float64)
+        v = np.ascontiguousarray(gravitational_system.v, dtype=np.float64)
+        m = np.ascontiguousarray(gravitational_system.m, dtype=np.float64)
+        handle = self.c_lib.sim_create(
+            x.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            v.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            m.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            ctypes.c_int(gravitational_system.objects_count),
+            ctypes.c_double(gravitational_system.G),
+        )
+        if not handle:
+            raise MemoryError("Failed to allocate memory for simulation context.")
+        self.handle = ctypes.c_void_p(handle)
+
+        self.c_lib.sim_set_verbose(self.handle, ctypes.c_int(settings["verbose"]))
+        self._check_return_code(
+            self.c_lib.sim_set_integrator(
+                self.handle,
+                integrator_params["integrator"].encode("utf-8"),
+                ctypes.c_double(integrator_params["dt"]),
+                ctypes.c_double(integrator_params["tolerance"]),
+                ctypes.c_double(integrator_params["initial_dt"]),
+            )
+        )
+        self._check_return_code(
+            self.c_lib.sim_set_whfast_param(
+                self.handle,
+                ctypes.c_double(integrator_params["whfast_kepler_tol"]),
+                ctypes.c_int(integrator_params["whfast_kepler_max_iter"]),
+                ctypes.c_bool(integrator_params["whfast_kepler_auto_remove"]),
+                ctypes.c_double(integrator_params["whfast_kepler_auto_remove_tol"]),
+                integrator_params["whfast_coordinate_system"].encode("utf-8"),
+            )
+        )
+        self._check_return_code(
+            self.c_lib.sim_set_acceleration(
+                self.handle,
+                acceleration_params["method"].encode("utf-8"),
+                ctypes.c_double(acceleration_params["opening_angle"]),
+                ctypes.c_double(acceleration_params["softening_length"]),
+                ctypes.c_int(acceleration_params["order"]),
+            )
+        )
+
+    def __enter__(self) -> "SimulationContext":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Free the simulation context in the C library"""
+        if self.handle is not None:
+            self.c_lib.sim_destroy(self.handle)
+            self.handle = None
+
+    @property
+    def objects_count(self) -> int:
+        """Number of objects in the system"""
+        return self.c_lib.sim_get_objects_count(self._get_handle())
+
+    @property
+    def t(self) -> float:
+        """Current simulation time"""
+        t_ctypes = ctypes.c_double()
+        self.c_lib.sim_get_state(self._get_handle(), None, None, ctypes.byref(t_ctypes))
+        return t_ctypes.value
+
+    def step(self, n_steps: int = 1) -> None:
+        """Advance the simulation by n_steps time steps
+
+        Only available for fixed step size integrators.
+
+        Parameters
+        ----------
+        n_steps : int, optional
+            Number of time steps, by default 1
+        """
+        self._check_return_code(
+            self.c_lib.sim_step(self._get_handle(), ctypes.c_int64(n_steps))
+        )
+
+    def integrate_to(self, t: float) -> None:
+        """Advance the simulation to time t
+
+        For fixed step size integrators, the simulation stops at the
+        last time step not exceeding t.
+
+        Parameters
+        ----------
+        t : float
+            Target simulation time
+        """
+        self._check_return_code(
+            self.c_lib.sim_integrate_to(self._get_handle(), ctypes.c_double(t))
+        )
+
+    def get_state(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get a copy of the current positions and velocities
+
+        Returns
+        -------
+        x : np.ndarray
+            Positions with shape (objects_count, 3)
+        v : np.ndarray
+            Velocities with shape (objects_count, 3)
+        """
+        handle = self._get_handle()
+        objects_count = self.c_lib.sim_get_objects_count(handle)
+        x = np.empty((objects_count, 3), dtype=np.float64)
+        v = np.empty((objects_count, 3), dtype=np.float64)
+        self.c_lib.sim_get_state(
+            handle,
+            x.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            v.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            None,
+        )
+        return x, v
+
+    def set_state(self, x: np.ndarray, v: np.ndarray) -> None:
+        """Set the current positions and velocities
+
+        The integrator is initialized again at the next step.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            Positions with shape (objects_count, 3)
+        v : np.ndarray
+            Velocities with shape (objects_count, 3)
+
+        Raises
+        ------
+        ValueError
+            If the shapes of x and v do not match the system
+        """
+        handle = self._get_handle()
+        shape = (self.c_lib.sim_get_objects_count(handle), 3)
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        v = np.ascontiguousarray(v, dtype=np.float64)
+        if x.shape != shape or v.shape != shape:
+            raise ValueError(f"Expected x and v with shape {shape}")
+
+        self.c_lib.sim_set_state(
+            handle,
+            x.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            v.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+        )
+
+    def _get_handle(self) -> ctypes.c_void_p:
+        if self.handle is None:
+            raise RuntimeError("Simulation context is already closed.")
+        return self.handle
+
+    def _check_return_code(self, return_code: int) -> None:
+        if return_code == 0:
+            return
+
+        error_msg = self.c_lib.get_error_msg_python(ctypes.c_int(return_code))
+        if error_msg is None:
+            raise RuntimeError(
+                f"Simulation context failed with error code {return_code}."
+            )
+        error_msg = error_msg.decode("utf-8").strip()
+        error_msg = error_msg.removeprefix("C library error: ")
+        raise RuntimeError(f"{error_msg} (Error code: {return_code})")
@@ -7,14 +7,15 @@ Author: Ching Yin Ng
 import copy
 import ctypes
 import threading
-import time
 import timeit
+import weakref
 from pathlib import Path
 from queue import Queue
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional, Tuple
 
 import numpy as np
 
+from . import live_state
 from . import utils
 from .gravitational_system import GravitationalSystem
 
@@ -22,21 +23,62 @@ from .gravitational_system import GravitationalSystem
 class Simulator:
     DAYS_PER_YEAR = 365.242189
     AVAILABLE_ACCELERATION_METHODS = ["pairwise", "massless", "barnes_hut"]
-    AVAILABLE_STORING_METHODS = ["default", "flush", "disabled"]
+    AVAILABLE_STORING_METHODS = [
+        "default",
+        "flush",
+        "flush_binary",
+        "flush_chunked",
+        "memmap",
+        "ring",
+        "disabled",
+    ]
+    AVAILABLE_STORING_DTYPES = ["float64", "float32", "quantized16"]
+    # Bytes of the solution state processed at a time by compute_energy()
+    # and the momentum functions if the state is not C-contiguous float64,
+    # e.g. memmap results
+    COMPUTE_BLOCK_SIZE = 1 << 24
+    # int callback(t, dt, x, v, objects_count), see SnapshotCallback in gravity_sim.h
+    SNAPSHOT_CALLBACK_TYPE = ctypes.CFUNCTYPE(
+        ctypes.c_int,
+        ctypes.c_double,
+        ctypes.c_double,
+        ctypes.POINTER(ctypes.c_double),
+        ctypes.POINTER(ctypes.c_double),
+        ctypes.c_int,
+    )
     AVAILABLE_INTEGRATORS = [
         "euler",
         "euler_cromer",
         "rk4",
         "leapfrog",
+        "yoshida4",
+        "yoshida6",
+        "yoshida8",
         "rkf45",
         "dopri",
         "dverk",
         "rkf78",
         "ias15",
         "whfast",
+        "saba4",
+        "sbab4",
+        "mercurius",
+    ]
+    FIXED_STEP_SIZE_INTEGRATORS = [
+        "euler",
+        "euler_cromer",
+        "rk4",
+        "leapfrog",
+        "yoshida4",
+        "yoshida6",
+        "yoshida8",
+        "whfast",
+        "saba4",
+        "sbab4",
+        "mercurius",
     ]
-    FIXED_STEP_SIZE_INTEGRATORS = ["euler", "euler_cromer", "rk4", "leapfrog", "whfast"]
     ADAPTIVE_STEP_SIZE_INTEGRATORS = ["rkf45", "dopri", "dverk", "rkf78", "ias15"]
+    AVAILABLE_WHFAST_COORDINATE_SYSTEMS = ["jacobi", "democratic_heliocentric"]
     # Recommended settings for built-in systems with IAS15 integrator
     RECOMMENDED_SETTINGS_BUILT_IN_SYSTEMS = {
         # "template": ["tf", "tf unit", "tolerance", "storing_freq"],
@@ -52,6 +94,39 @@ class Simulator:
 
     def __init__(self, c_lib: ctypes.CDLL) -> None:
         self.c_lib = c_lib
+        self.integrator_state_ctypes: Optional[ctypes.c_void_p] = None
+        self.live_state_ = None
+
+    def __del__(self) -> None:
+        self.free_integrator_state()
+        self.close_live_state()
+
+    def free_integrator_state(self) -> None:
+        """Free the integrator state kept for resuming simulation"""
+        if self.integrator_state_ctypes is not None:
+            self.c_lib.free_integrator_state(self.integrator_state_ctypes)
+            self.integrator_state_ctypes = None
+
+    def close_live_state(self) -> None:
+        """Close and unlink the live state segment"""
+        if self.live_state_ is not None:
+            live_state.close_live_state(self.live_state_)
+            self.live_state_ = None
+
+    def _setup_live_state(self, name: Optional[str], objects_count: int) -> None:
+        """Create the live state segment, or keep the segment of the
+        last simulation if it has the same name and enough capacity"""
+        if self.live_state_ is not None:
+            if (
+                self.live_state_.name == name
+                and live_state.get_live_state_capacity(self.live_state_)
+                >= objects_count
+            ):
+                return
+            self.close_live_state()
+
+        if name is not None:
+            self.live_state_ = live_state.create_live_state(name, objects_count)
 
     def launch_simulation(
         self,
@@ -62,6 +137,7 @@ class Simulator:
         settings: dict,
         tf: float,
         is_exit_ctypes_bool: ctypes.c_bool,
+        is_resume: bool = False,
     ) -> None:
         """Launch simulation
 
@@ -75,10 +151,16 @@ class Simulator:
         tf : float
         is_exit_ctypes_bool : ctypes.c_bool
             Flag to indicate if the simulation should be terminated
+        is_resume : bool, optional
+            If True, the integrator continues with the state saved
+            from the last simulation instead of being initialized,
+            by default False
 
         Notes
         -----
         - This function would not check the validity of the input parameters.
+        - The integrator state is only restored if the system is not
+          modified after the last simulation.
         """
         if settings["make_copy_params"]:
             integrator_params = integrator_params.copy()
@@ -95,12 +177,74 @@ class Simulator:
         self.storing_params = storing_params
         self.settings = settings
 
+        # For flush_chunked, the C library writes a flush_binary segment,
+        # which is compressed into chunks after the simulation
+        storing_method = storing_params["method"]
+        if storing_method == "flush_chunked":
+            storing_method = "flush_binary"
         if "flush_path" in storing_params:
             Path(storing_params["flush_path"]).parent.mkdir(parents=True, exist_ok=True)
-            flush_path_ctypes = storing_params["flush_path"].encode("utf-8")
+            flush_path = str(storing_params["flush_path"])
+            if storing_params["method"] == "flush_chunked":
+                flush_path += ".part"
+                Path(flush_path).unlink(missing_ok=True)
+            flush_path_ctypes = flush_path.encode("utf-8")
         else:
             flush_path_ctypes = None
 
+        # Subset of objects and fields to be stored
+        if storing_params["stored_indices"] is not None:
+            stored_indices = np.ascontiguousarray(
+                storing_params["stored_indices"], dtype=np.int32
+            )
+            stored_indices_ctypes = stored_indices.ctypes.data_as(
+                ctypes.POINTER(ctypes.c_int)
+            )
+            stored_objects_count = len(stored_indices)
+        else:
+            stored_indices_ctypes = None
+            stored_objects_count = gravitational_system.objects_count
+        store_velocity = storing_params["stored_fields"] == "xv"
+        state_length = stored_objects_count * (6 if store_velocity else 3)
+
+        # Objects checked by the distance trigger
+        if storing_params["distance_indices"] is not None:
+            distance_indices = np.ascontiguousarray(
+                storing_params["distance_indices"], dtype=np.int32
+            )
+            distance_indices_ctypes = distance_indices.ctypes.data_as(
+                ctypes.POINTER(ctypes.c_int)
+            )
+            distance_objects_count = len(distance_indices)
+        else:
+            distance_indices_ctypes = None
+            distance_objects_count = 0
+
+        # The reference is kept until the simulation ends
+        snapshot_callback_ctypes, snapshot_callback_errors = (
+            self._create_snapshot_callback(storing_params["snapshot_callback"])
+        )
+
+        # The segment is kept after the simulation, so that the readers
+        # can still read the final state
+        self._setup_live_state(
+            storing_params["live_state_name"], gravitational_system.objects_count
+        )
+        if self.live_state_ is not None:
+            live_state_ctypes = ctypes.c_void_p(
+                live_state.get_live_state_address(self.live_state_)
+            )
+        else:
+            live_state_ctypes = None
+
+        if not is_resume:
+            self.free_integrator_state()
+        if self.integrator_state_ctypes is None:
+            integrator_state = self.c_lib.create_integrator_state()
+            if not integrator_state:
+                raise MemoryError("Failed to allocate memory for integrator state.")
+            self.integrator_state_ctypes = ctypes.c_void_p(integrator_state)
+
         sol_state_ctypes = ctypes.POINTER(ctypes.c_double)()
         sol_time_ctypes = ctypes.POINTER(ctypes.c_double)()
         sol_dt_ctypes = ctypes.POINTER(ctypes.c_double)()
@@ -108,6 +252,8 @@ class Simulator:
         t_ctypes = ctypes.c_double()
         simulation_last_dt_ctypes = ctypes.c_double()
         run_time_ctypes = ctypes.c_double()
+        flush_max_queue_depth_ctypes = ctypes.c_int64()
+        flush_stall_count_ctypes = ctypes.c_int64()
 
         if not settings["disable_progress_bar"]:
             progress_bar_thread = threading.Thread(
@@ -137,13 +283,27 @@ class Simulator:
                 ctypes.c_int(integrator_params["whfast_kepler_max_iter"]),
                 ctypes.c_bool(integrator_params["whfast_kepler_auto_remove"]),
                 ctypes.c_double(integrator_params["whfast_kepler_auto_remove_tol"]),
+                integrator_params["whfast_coordinate_system"].encode("utf-8"),
                 acceleration_params["method"].encode("utf-8"),
                 ctypes.c_double(acceleration_params["opening_angle"]),
                 ctypes.c_double(acceleration_params["softening_length"]),
                 ctypes.c_int(acceleration_params["order"]),
-                storing_params["method"].encode("utf-8"),
+                storing_method.encode("utf-8"),
                 flush_path_ctypes,
                 ctypes.c_int(storing_params["storing_freq"]),
+                ctypes.c_double(storing_params["output_interval"]),
+                ctypes.c_bool(storing_params["flush_energy"]),
+                ctypes.c_int64(storing_params["ring_capacity"]),
+                stored_indices_ctypes,
+                ctypes.c_int(stored_objects_count),
+                ctypes.c_bool(store_velocity),
+                storing_params["storing_dtype"].encode("utf-8"),
+                snapshot_callback_ctypes,
+                ctypes.c_double(storing_params["distance_threshold"]),
+                distance_indices_ctypes,
+                ctypes.c_int(distance_objects_count),
+                live_state_ctypes,
+                ctypes.c_int(storing_params["live_state_freq"]),
                 ctypes.byref(sol_state_ctypes),
                 ctypes.byref(sol_time_ctypes),
                 ctypes.byref(sol_dt_ctypes),
@@ -151,12 +311,25 @@ class Simulator:
                 ctypes.byref(t_ctypes),
                 ctypes.byref(simulation_last_dt_ctypes),
                 ctypes.byref(run_time_ctypes),
+                ctypes.byref(flush_max_queue_depth_ctypes),
+                ctypes.byref(flush_stall_count_ctypes),
+                self.integrator_state_ctypes,
                 ctypes.c_int(settings["verbose"]),
                 ctypes.byref(is_exit_ctypes_bool),
                 ctypes.c_double(tf),
             ),
         )
 
+        # Energy is not computed for every snapshot in flush methods by
+        # default, so we keep the initial and final energy for monitoring
+        is_flush_method = storing_params["method"] in [
+            "flush",
+            "flush_binary",
+            "flush_chunked",
+        ]
+        if is_flush_method:
+            self.initial_energy_ = self.compute_energy_step(gravitational_system)
+
         ### Begin simulation ###
         if settings["verbose"] > 1:
             print("Simulation in progress...")
@@ -164,10 +337,10 @@ class Simulator:
         if not settings["disable_progress_bar"]:
             progress_bar_thread.start()
 
+        # Join with timeout so that KeyboardInterrupt can still be caught,
+        # without adding latency when the simulation is short
         while simulation_thread.is_alive():
-            time.sleep(0.05)
-
-        simulation_thread.join()
+            simulation_thread.join(timeout=0.05)
         if not settings["disable_progress_bar"]:
             t_ctypes.value = tf
             progress_bar_thread.join()
@@ -175,37 +348,171 @@ class Simulator:
 
         if return_code != 0:
             raise RuntimeError("Simulation failed.")
+        if len(snapshot_callback_errors) > 0:
+            raise snapshot_callback_errors[0]
 
         ### End simulation ###
         self.run_time_ = run_time_ctypes.value
+        if is_flush_method:
+            self.final_energy_ = self.compute_energy_step(gravitational_system)
+
+            # Metrics of the flush writer. Stalls mean that the simulation
+            # waited for the disk because all flush buffers were full
+            self.flush_max_queue_depth_ = flush_max_queue_depth_ctypes.value
+            self.flush_stall_count_ = flush_stall_count_ctypes.value
+        if storing_params["method"] == "flush_chunked":
+            utils.append_results_binary_to_chunked(
+                flush_path,
+                storing_params["flush_path"],
+                compression=storing_params["compression"],
+                chunk_size=storing_params["chunk_size"],
+            )
+            Path(flush_path).unlink()
         if settings["verbose"] > 1:
             print(f"Simulation completed! Run time: {self.run_time_:.3f} s")
             print()
 
-        if storing_params["method"] == "default":
+        if storing_params["method"] in ["default", "ring"]:
             self.data_size_ = sol_size_ctypes.value
 
-            self.sol_state_ = np.ctypeslib.as_array(
+            # Take ownership of the buffers allocated by the C library
+            # instead of copying them
+            self.sol_state_ = self._as_c_owned_array(
                 sol_state_ctypes,
-                shape=(self.data_size_, self.gravitational_system.objects_count * 6),
-            ).copy()
-            self.sol_time_ = np.ctypeslib.as_array(
+                shape=(self.data_size_, state_length),
+                dtype=np.dtype(storing_params["storing_dtype"]),
+            )
+            self.sol_time_ = self._as_c_owned_array(
                 sol_time_ctypes, shape=(self.data_size_,)
-            ).copy()
-            self.sol_dt_ = np.ctypeslib.as_array(
+            )
+            self.sol_dt_ = self._as_c_owned_array(
                 sol_dt_ctypes, shape=(self.data_size_,)
-            ).copy()
+            )
+
+        elif storing_params["method"] == "memmap":
+            self.data_size_ = sol_size_ctypes.value
+
+            # Views of the file written by the C library, without copying.
+            # The records of previous runs come first if the file is resumed
+            results = utils.memmap_results_binary(storing_params["flush_path"])
+            start = len(results["time"]) - self.data_size_
+            self.sol_state_ = results["state"][start:]
+            self.sol_time_ = results["time"][start:]
+            self.sol_dt_ = results["dt"][start:]
+
+    @staticmethod
+    def _create_snapshot_callback(
+        callback: Optional[Callable],
+    ) -> Tuple[Optional[ctypes.CFUNCTYPE], list]:
+        """Wrap a Python snapshot callback for the C library
+
+        The callback is called as callback(t, dt, x, v) after each
+        stored solution step, where x and v are read-only views of
+        the positions and velocities with shape (objects_count, 3),
+        only valid during the call. A truthy return value stops the
+        simulation at the end of the current step.
+
+        Parameters
+        ----------
+        callback : Callable, optional
+            Python callback, or an instance of SNAPSHOT_CALLBACK_TYPE
+            which is passed to the C library as it is
+
+        Returns
+        -------
+        snapshot_callback_ctypes : ctypes.CFUNCTYPE, optional
+            Callback to be passed to the C library, or None
+        errors : list
+            Exceptions raised by the callback. The simulation is
+            stopped after the first exception.
+        """
+        errors: list = []
+        if callback is None or isinstance(callback, Simulator.SNAPSHOT_CALLBACK_TYPE):
+            return callback, errors
+
+        def snapshot_callback(t, dt, x_ptr, v_ptr, objects_count):
+            try:
+                x = np.ctypeslib.as_array(x_ptr, shape=(objects_count, 3))
+                v = np.ctypeslib.as_array(v_ptr, shape=(objects_count, 3))
+                x.flags.writeable = False
+                v.flags.writeable = False
+                return 1 if callback(t, dt, x, v) else 0
+            except BaseException as error:
+                errors.append(error)
+                return 1
+
+        return Simulator.SNAPSHOT_CALLBACK_TYPE(snapshot_callback), errors
+
+    def _as_c_owned_array(
+        self,
+        c_ptr: ctypes.POINTER(ctypes.c_double),
+        shape: tuple,
+        dtype: np.dtype = np.dtype(np.float64),
+    ) -> np.ndarray:
+        """Wrap a buffer allocated by the C library as a numpy array
+        without copying
+
+        The buffer is freed with free_memory_real() once the array and
+        all views of it are garbage collected.
+
+        Parameters
+        ----------
+        c_ptr : ctypes.POINTER(ctypes.c_double)
+            Pointer to the buffer allocated by the C library
+        shape : tuple
+            Shape of the array
+        dtype : np.dtype, optional
+            Data type of the buffer, by default np.float64
+
+        Returns
+        -------
+        array : np.ndarray
+            Numpy array backed by the buffer
+        """
+        array = np.ctypeslib.as_array(
+            ctypes.cast(c_ptr, ctypes.POINTER(np.ctypeslib.as_ctypes_type(dtype))),
+            shape=shape,
+        )
+
+        # Views of the array keep a reference to it as their base
+        weakref.finalize(array, self.c_lib.free_memory_real, c_ptr)
+
+        return array
+
+    def compute_energy_step(self, gravitational_system: GravitationalSystem) -> float:
+        """Compute the total energy of the system at its current state
+
+        Parameters
+        ----------
+        gravitational_system : GravitationalSystem
 
-            self.c_lib.free_memory_real(sol_state_ctypes)
-            self.c_lib.free_memory_real(sol_time_ctypes)
-            self.c_lib.free_memory_real(sol_dt_ctypes)
+        Returns
+        -------
+        float
+            Total energy of the system
+        """
+        state = np.concatenate(
+            (gravitational_system.x.flatten(), gravitational_system.v.flatten())
+        )
+        energy = np.zeros(1)
+        self.c_lib.compute_energy_python(
+            ctypes.c_int(gravitational_system.objects_count),
+            gravitational_system.m.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            ctypes.c_double(gravitational_system.G),
+            ctypes.c_int(1),
+            ctypes.byref(ctypes.c_int(0)),
+            energy.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            state.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            ctypes.byref(ctypes.c_bool(False)),
+        )
+        return energy[0]
 
     def compute_energy(
         self,
         objects_count: int,
         m: np.ndarray,
         G: float,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
         is_exit_ctypes_bool: Optional[ctypes.c_bool] = None,
     ) -> np.ndarray:
         """Compute energy of the system
@@ -218,8 +525,9 @@ class Simulator:
             Masses of the objects
         G : float
             Gravitational constant
-        sol_state : np.ndarray
-            Solution state of the system
+        sol_state : np.ndarray | Iterable
+            Solution state of the system, or an iterable of blocks of
+            the solution state (see _iter_state_blocks())
         is_exit_ctypes_bool : ctypes.c_bool, optional
             Flag to indicate if the function should be terminated, by default None
         Returns
@@ -231,6 +539,18 @@ class Simulator:
             is_exit_ctypes_bool = ctypes.c_bool(False)
 
         print("Computing energy...")
+        if not self._is_c_contiguous_state(sol_state):
+            return self._compute_by_blocks(
+                self.c_lib.compute_energy_python,
+                (
+                    ctypes.c_int(objects_count),
+                    m.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+                    ctypes.c_double(G),
+                ),
+                sol_state,
+                is_exit_ctypes_bool,
+            )
+
         npts = len(sol_state)
         energy = np.zeros(npts)
 
@@ -271,7 +591,7 @@ class Simulator:
         self,
         objects_count: int,
         m: np.ndarray,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
         is_exit_ctypes_bool: Optional[ctypes.c_bool] = None,
     ) -> np.ndarray:
         """Compute linear momentum of the system
@@ -282,8 +602,9 @@ class Simulator:
             Number of objects in the system
         m : np.ndarray
             Masses of the objects
-        sol_state : np.ndarray
-            Solution state of the system
+        sol_state : np.ndarray | Iterable
+            Solution state of the system, or an iterable of blocks of
+            the solution state (see _iter_state_blocks())
         is_exit_ctypes_bool : ctypes.c_bool, optional
             Flag to indicate if the function should be terminated, by default None
         Returns
@@ -295,6 +616,17 @@ class Simulator:
             is_exit_ctypes_bool = ctypes.c_bool(False)
 
         print("Computing linear momentum...")
+        if not self._is_c_contiguous_state(sol_state):
+            return self._compute_by_blocks(
+                self.c_lib.compute_linear_momentum_python,
+                (
+                    ctypes.c_int(objects_count),
+                    m.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+                ),
+                sol_state,
+                is_exit_ctypes_bool,
+            )
+
         npts = len(sol_state)
         linear_momentum = np.zeros(npts)
 
@@ -334,7 +666,7 @@ class Simulator:
         self,
         objects_count: int,
         m: np.ndarray,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
         is_exit_ctypes_bool: Optional[ctypes.c_bool] = None,
     ) -> np.ndarray:
         """Compute angular momentum of the system
@@ -345,8 +677,9 @@ class Simulator:
             Number of objects in the system
         m : np.ndarray
             Masses of the objects
-        sol_state : np.ndarray
-            Solution state of the system
+        sol_state : np.ndarray | Iterable
+            Solution state of the system, or an iterable of blocks of
+            the solution state (see _iter_state_blocks())
         is_exit_ctypes_bool : ctypes.c_bool, optional
             Flag to indicate if the function should be terminated, by default None
         Returns
@@ -358,6 +691,17 @@ class Simulator:
             is_exit_ctypes_bool = ctypes.c_bool(False)
 
         print("Computing angular momentum...")
+        if not self._is_c_contiguous_state(sol_state):
+            return self._compute_by_blocks(
+                self.c_lib.compute_angular_momentum_python,
+                (
+                    ctypes.c_int(objects_count),
+                    m.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+                ),
+                sol_state,
+                is_exit_ctypes_bool,
+            )
+
         npts = len(sol_state)
         angular_momentum = np.zeros(npts)
 
@@ -398,7 +742,7 @@ class Simulator:
         objects_count: int,
         m: np.ndarray,
         G: float,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
     ) -> np.ndarray:
         """Compute the eccentricity using the sol_state array,
         assuming that the first object is the central object
@@ -411,8 +755,9 @@ class Simulator:
             Masses of the objects
         G : float
             Gravitational constant
-        sol_state : np.ndarray
-            Solution state of the system
+        sol_state : np.ndarray | Iterable
+            Solution state of the system, or an iterable of blocks of
+            the solution state (see _iter_state_blocks())
 
         Returns
         -------
@@ -427,9 +772,37 @@ class Simulator:
           implementing this in C library in the future.
         """
         print("Computing eccentricity (Assuming the first body is the central star)...")
-        eccentricity = np.zeros(len(sol_state))
-
         start = timeit.default_timer()
+        if isinstance(sol_state, np.ndarray):
+            eccentricity = Simulator._compute_eccentricity_block(
+                objects_count, m, G, sol_state
+            )
+        else:
+            eccentricity = Simulator._concatenate_blocks(
+                [
+                    Simulator._compute_eccentricity_block(
+                        objects_count, m, G, state_block
+                    )
+                    for state_block in Simulator._iter_state_blocks(sol_state)
+                ],
+                shape=(0, objects_count - 1),
+            )
+        stop = timeit.default_timer()
+        print(f"Run time: {(stop - start):.3f} s")
+        print("")
+
+        return eccentricity
+
+    @staticmethod
+    def _compute_eccentricity_block(
+        objects_count: int,
+        m: np.ndarray,
+        G: float,
+        sol_state: np.ndarray,
+    ) -> np.ndarray:
+        """Compute the eccentricity of a block of the sol_state array,
+        see compute_eccentricity()
+        """
         x = (
             sol_state[:, 3 : (objects_count * 3)]
             .reshape(-1, (objects_count - 1), 3)
@@ -452,16 +825,12 @@ class Simulator:
         )
         eccentricity = np.linalg.norm(eccentricity, axis=2)
 
-        stop = timeit.default_timer()
-        print(f"Run time: {(stop - start):.3f} s")
-        print("")
-
         return eccentricity
 
     @staticmethod
     def compute_inclination(
         objects_count: int,
-        sol_state: np.ndarray,
+        sol_state: np.ndarray | Iterable,
     ) -> np.ndarray:
         """Compute the inclination using the sol_state array,
         assuming that the first object is the central object
@@ -474,8 +843,9 @@ class Simulator:
             Masses of the objects
         G : float
             Gravitational constant
-        sol_state : np.ndarray
-            Solution state of the system
+        sol_state : np.ndarray | Iterable
+            Solution state of the system, or an iterable of blocks of
+            the solution state (see _iter_state_blocks())
 
         Returns
         -------
@@ -490,9 +860,31 @@ class Simulator:
             implementing this in C library in the future.
         """
         print("Computing inclination (Assuming the first body is the central star)...")
-        inclination = np.zeros(len(sol_state))
-
         start = timeit.default_timer()
+        if isinstance(sol_state, np.ndarray):
+            inclination = Simulator._compute_inclination_block(objects_count, sol_state)
+        else:
+            inclination = Simulator._concatenate_blocks(
+                [
+                    Simulator._compute_inclination_block(objects_count, state_block)
+                    for state_block in Simulator._iter_state_blocks(sol_state)
+                ],
+                shape=(0, objects_count - 1),
+            )
+        stop = timeit.default_timer()
+        print(f"Run time: {(stop - start):.3f} s")
+        print("")
+
+        return inclination
+
+    @staticmethod
+    def _compute_inclination_block(
+        objects_count: int,
+        sol_state: np.ndarray,
+    ) -> np.ndarray:
+        """Compute the inclination of a block of the sol_state array,
+        see compute_inclination()
+        """
         x = (
             sol_state[:, 3 : (objects_count * 3)]
             .reshape(-1, (objects_count - 1), 3)
@@ -516,8 +908,114 @@ class Simulator:
 
         inclination = np.arccos(np.sum(unit_angular_momentum_vector * unit_z, axis=2))
 
+        return inclination
+
+    def _compute_by_blocks(
+        self,
+        c_lib_function: Callable,
+        args: tuple,
+        sol_state: np.ndarray | Iterable,
+        is_exit_ctypes_bool: ctypes.c_bool,
+    ) -> np.ndarray:
+        """Compute a quantity of the system block by block, without
+        copying the whole solution state
+
+        Parameters
+        ----------
+        c_lib_function : Callable
+            Function of the C library, e.g. compute_energy_python
+        args : tuple
+            Arguments of the C function before npts
+        sol_state : np.ndarray | Iterable
+            Solution state of the system that is not C-contiguous float64,
+            or an iterable of blocks of the solution state
+        is_exit_ctypes_bool : ctypes.c_bool
+            Flag to indicate if the function should be terminated
+
+        Returns
+        -------
+        np.ndarray
+            Quantity of the system at each time step
+        """
+        if isinstance(sol_state, np.ndarray):
+            block_rows = max(
+                1,
+                self.COMPUTE_BLOCK_SIZE
+                // max(sol_state[:1].size * np.dtype(np.float64).itemsize, 1),
+            )
+            sol_state_array = sol_state
+            sol_state = (
+                sol_state_array[i : i + block_rows]
+                for i in range(0, len(sol_state_array), block_rows)
+            )
+
+        start = timeit.default_timer()
+        blocks = []
+        for state_block in self._iter_state_blocks(sol_state):
+            if is_exit_ctypes_bool.value:
+                break
+            state_block = np.ascontiguousarray(state_block, dtype=np.float64)
+            block = np.zeros(len(state_block))
+            c_lib_function(
+                *args,
+                ctypes.c_int(len(state_block)),
+                ctypes.byref(ctypes.c_int(0)),
+                block.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+                state_block.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+                ctypes.byref(is_exit_ctypes_bool),
+            )
+            blocks.append(block)
         stop = timeit.default_timer()
         print(f"Run time: {(stop - start):.3f} s")
         print("")
 
-        return inclination
+        return self._concatenate_blocks(blocks)
+
+    @staticmethod
+    def _is_c_contiguous_state(sol_state: np.ndarray | Iterable) -> bool:
+        """Check if the solution state can be passed to the C library
+        without copying"""
+        return (
+            isinstance(sol_state, np.ndarray)
+            and sol_state.dtype == np.float64
+            and sol_state.flags.c_contiguous
+        )
+
+    @staticmethod
+    def _iter_state_blocks(sol_state_blocks: Iterable) -> Iterator[np.ndarray]:
+        """Iterate over blocks of the solution state
+
+        Parameters
+        ----------
+        sol_state_blocks : Iterable
+            Iterable of state arrays, or of (time, dt, energy, state)
+            tuples, e.g. from GravitySimulatorAPI.iter_results()
+
+        Yields
+        ------
+        np.ndarray
+            Block of the solution state
+        """
+        for block in sol_state_blocks:
+            yield block[3] if isinstance(block, tuple) else block
+
+    @staticmethod
+    def _concatenate_blocks(blocks: list, shape: tuple = (0,)) -> np.ndarray:
+        """Concatenate results computed block by block
+
+        Parameters
+        ----------
+        blocks : list
+            Results of each block
+        shape : tuple, optional
+            Shape of the result if there is no block, by default (0,)
+
+        Returns
+        -------
+        np.ndarray
+            Concatenated results
+        """
+        if len(blocks) == 0:
+            return np.zeros(shape)
+
+        return np.concatenate(blocks)
@@ -6,12 +6,17 @@ Author: Ching Yin Ng
 
 import csv
 import ctypes
+import itertools
+import lzma
+import os
 import platform
 import sys
+import tempfile
 import time
 import timeit
+import zlib
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 import numpy as np
 import rich.progress
@@ -171,6 +176,76 @@ def initialize_c_lib(c_lib: ctypes.CDLL) -> None:
             raise ValueError(f"Function {function} not found in the C library.")
 
     c_lib.launch_simulation_python.restype = ctypes.c_int
+    c_lib.create_integrator_state.restype = ctypes.c_void_p
+    c_lib.free_integrator_state.argtypes = [ctypes.c_void_p]
+    c_lib.free_integrator_state.restype = None
+    c_lib.free_memory_real.argtypes = [ctypes.POINTER(ctypes.c_double)]
+    c_lib.free_memory_real.restype = None
+    c_lib.get_error_msg_python.argtypes = [ctypes.c_int]
+    c_lib.get_error_msg_python.restype = ctypes.c_char_p
+    c_lib.read_live_state.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_void_p,
+        ctypes.POINTER(ctypes.c_uint64),
+    ]
+    c_lib.read_live_state.restype = ctypes.c_bool
+
+    c_lib.sim_create.argtypes = [
+        ctypes.POINTER(ctypes.c_double),
+        ctypes.POINTER(ctypes.c_double),
+        ctypes.POINTER(ctypes.c_double),
+        ctypes.c_int,
+        ctypes.c_double,
+    ]
+    c_lib.sim_create.restype = ctypes.c_void_p
+    c_lib.sim_destroy.argtypes = [ctypes.c_void_p]
+    c_lib.sim_destroy.restype = None
+    c_lib.sim_set_integrator.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_char_p,
+        ctypes.c_double,
+        ctypes.c_double,
+        ctypes.c_double,
+    ]
+    c_lib.sim_set_integrator.restype = ctypes.c_int
+    c_lib.sim_set_whfast_param.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_double,
+        ctypes.c_int,
+        ctypes.c_bool,
+        ctypes.c_double,
+        ctypes.c_char_p,
+    ]
+    c_lib.sim_set_whfast_param.restype = ctypes.c_int
+    c_lib.sim_set_acceleration.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_char_p,
+        ctypes.c_double,
+        ctypes.c_double,
+        ctypes.c_int,
+    ]
+    c_lib.sim_set_acceleration.restype = ctypes.c_int
+    c_lib.sim_set_state.argtypes = [
+        ctypes.c_void_p,
+        ctypes.POINTER(ctypes.c_double),
+        ctypes.POINTER(ctypes.c_double),
+    ]
+    c_lib.sim_set_state.restype = None
+    c_lib.sim_set_verbose.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    c_lib.sim_set_verbose.restype = None
+    c_lib.sim_step.argtypes = [ctypes.c_void_p, ctypes.c_int64]
+    c_lib.sim_step.restype = ctypes.c_int
+    c_lib.sim_integrate_to.argtypes = [ctypes.c_void_p, ctypes.c_double]
+    c_lib.sim_integrate_to.restype = ctypes.c_int
+    c_lib.sim_get_objects_count.argtypes = [ctypes.c_void_p]
+    c_lib.sim_get_objects_count.restype = ctypes.c_int
+    c_lib.sim_get_state.argtypes = [
+        ctypes.c_void_p,
+        ctypes.POINTER(ctypes.c_double),
+        ctypes.POINTER(ctypes.c_double),
+        ctypes.POINTER(ctypes.c_double),
+    ]
+    c_lib.sim_get_state.restype = None
 
 
 def trim_data(
@@ -206,6 +281,7 @@ def save_results_csv(
     sol_dt_: np.ndarray,
     sol_energy_: np.ndarray,
     disable_progress_bar: bool = False,
+    chunk_size: int = 1000,
 ) -> None:
     """Save simulation results to a CSV file
 
@@ -214,6 +290,9 @@ def save_results_csv(
     Unit: Solar masses, AU, day
     Format: time, dt, total energy, x1, y1, z1, x2, y2, z2, ... vx1, vy1, vz1, vx2, vy2, vz2, ...
 
+    The rows are assembled and formatted in blocks of chunk_size rows,
+    with the same "%.17g" format as the flush storing method.
+
     Parameters
     ----------
     file_path : str | Path
@@ -228,45 +307,122 @@ def save_results_csv(
         Energy of the system at each time step
     disable_progress_bar : bool, optional
         Disable progress bar, by default False
+    chunk_size : int, optional
+        Number of rows to be written at once, by default 1000
     """
     if not isinstance(file_path, Path):
         file_path = Path(file_path)
 
     data_size = len(sol_state_)
+    columns_count = 3 + sol_state_.shape[1]
+    row_format = ",".join(["%.17g"] * columns_count) + "\n"
+
+    def write_blocks(file, progress_callback=None):
+        block = np.empty((min(chunk_size, data_size), columns_count))
+        for start in range(0, data_size, chunk_size):
+            stop = min(start + chunk_size, data_size)
+            rows_count = stop - start
+            block[:rows_count, 0] = sol_time_[start:stop]
+            block[:rows_count, 1] = sol_dt_[start:stop]
+            block[:rows_count, 2] = sol_energy_[start:stop]
+            block[:rows_count, 3:] = sol_state_[start:stop]
+            file.write((row_format * rows_count) % tuple(block[:rows_count].ravel()))
+            if progress_callback is not None:
+                progress_callback(stop)
+
     if not disable_progress_bar:
         print("Saving results to CSV file...")
         start = timeit.default_timer()
         progress_bar = Progress_bar()
         with progress_bar:
+            task = progress_bar.add_task("", total=data_size)
             with file_path.open("w", newline="") as file:
-                writer = csv.writer(file)
-                for count in progress_bar.track(range(data_size)):
-                    row = np.insert(
-                        sol_state_[count],
-                        0,
-                        sol_energy_[count],
-                    )
-                    row = np.insert(row, 0, sol_dt_[count])
-                    row = np.insert(row, 0, sol_time_[count])
-                    writer.writerow(row.tolist())
+                write_blocks(
+                    file,
+                    lambda completed: progress_bar.update(task, completed=completed),
+                )
         end = timeit.default_timer()
         print(f"Run time: {end - start:.2f} s")
     else:
         with file_path.open("w", newline="") as file:
-            writer = csv.writer(file)
-            for count in range(data_size):
-                row = np.insert(
-                    sol_state_[count],
-                    0,
-                    sol_energy_[count],
-                )
-                row = np.insert(row, 0, sol_dt_[count])
-                row = np.insert(row, 0, sol_time_[count])
-                writer.writerow(row.tolist())
+            write_blocks(file)
+
+
+def iter_results_csv(
+    file_path: str | Path,
+    chunk_size: int = 10000,
+    state_columns: Optional[list[int] | np.ndarray] = None,
+    row_range: Optional[tuple[int, Optional[int]]] = None,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """Iterate over simulation results in a CSV file in blocks of rows
+
+    Each block of chunk_size rows is parsed at once by np.loadtxt, so
+    that the rows are never converted value by value in Python. Rows
+    outside row_range are skipped without being parsed.
+
+    Parameters
+    ----------
+    file_path : str | Path
+        Path to the CSV file
+    chunk_size : int, optional
+        Number of rows in each block, by default 10000
+    state_columns : list[int] | np.ndarray, optional
+        Indices of the state columns to be read, e.g. [0, 1, 2] for
+        x1, y1, z1, by default all columns
+    row_range : tuple[int, Optional[int]], optional
+        Range of rows [start, stop) to be read, where stop = None
+        reads until the end of the file, by default all rows
+
+    Yields
+    ------
+    time, dt, energy, state : tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        Block of the simulation results
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist
+    ValueError
+        If row_range or chunk_size is invalid, or the number of
+        columns changes within the file
+    """
+    if not isinstance(file_path, Path):
+        file_path = Path(file_path)
+
+    if not file_path.exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    start, stop = row_range if row_range is not None else (0, None)
+    if start < 0 or (stop is not None and stop < start):
+        raise ValueError(f"Invalid row_range: {row_range}")
+
+    if state_columns is not None:
+        usecols = np.concatenate(([0, 1, 2], np.asarray(state_columns, dtype=int) + 3))
+    else:
+        usecols = None
+
+    with file_path.open("r") as file:
+        lines = itertools.islice(file, start, stop)
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if len(chunk) == 0:
+                break
+            block = np.loadtxt(chunk, delimiter=",", usecols=usecols, ndmin=2)
+            yield (
+                np.ascontiguousarray(block[:, 0]),
+                np.ascontiguousarray(block[:, 1]),
+                np.ascontiguousarray(block[:, 2]),
+                block[:, 3:],
+            )
 
 
 def read_results_csv(
     file_path: str | Path,
+    state_columns: Optional[list[int] | np.ndarray] = None,
+    row_range: Optional[tuple[int, Optional[int]]] = None,
+    chunk_size: int = 10000,
 ) -> dict[str, np.ndarray]:
     """Read simulation results from a CSV file
 
@@ -275,15 +431,403 @@ def read_results_csv(
     Unit: Solar masses, AU, day
     Format: time, dt, total energy, x1, y1, z1, x2, y2, z2, ... vx1, vy1, vz1, vx2, vy2, vz2, ...
 
+    The file is parsed in blocks by iter_results_csv().
+
     Parameters
     ----------
     file_path : str | Path
         Path to the CSV file
+    state_columns : list[int] | np.ndarray, optional
+        Indices of the state columns to be read, e.g. [0, 1, 2] for
+        x1, y1, z1, by default all columns
+    row_range : tuple[int, Optional[int]], optional
+        Range of rows [start, stop) to be read, where stop = None
+        reads until the end of the file, by default all rows
+    chunk_size : int, optional
+        Number of rows to be parsed at once, by default 10000
 
     Returns
     -------
     results : dict[str, np.ndarray]
         Simulation results, with field names: time, dt, energy, state
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist
+    ValueError
+        If row_range or chunk_size is invalid, or the number of
+        columns changes within the file
+    """
+    blocks = list(iter_results_csv(file_path, chunk_size, state_columns, row_range))
+
+    if len(blocks) > 0:
+        time, dt, energy, state = (np.concatenate(field) for field in zip(*blocks))
+    else:
+        time, dt, energy = np.empty(0), np.empty(0), np.empty(0)
+        state = np.empty((0, 0 if state_columns is None else len(state_columns)))
+
+    results = {
+        "time": time,
+        "dt": dt,
+        "energy": energy,
+        "state": state,
+    }
+
+    return results
+
+
+FLUSH_BINARY_MAGIC = b"GSIMBIN\x00"
+FLUSH_BINARY_LAYOUT_VERSION = 1
+FLUSH_BINARY_LAYOUT_VERSION_WITH_ENERGY = 2
+FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY = 3
+FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY_WITH_ENERGY = 4
+FLUSH_BINARY_LAYOUT_FLOAT32 = 0x100
+FLUSH_BINARY_LAYOUT_QUANTIZED16 = 0x200
+FLUSH_BINARY_LAYOUT_RECORDS_COUNT = 0x400
+FLUSH_BINARY_QUANTIZED16_NAN = 0xFFFF
+
+
+def _get_binary_record_dtype(layout_version: int, objects_count: int) -> np.dtype:
+    """Get the structured dtype of a record in the binary file
+
+    Parameters
+    ----------
+    layout_version : int
+        Layout version in the header, including the storing dtype flag
+    objects_count : int
+        Number of objects in the header
+
+    Returns
+    -------
+    record_dtype : np.dtype
+        Structured dtype with fields time, dt, (energy), and either
+        state, or x_quantization, x, (v_quantization, v) for quantized16
+
+    Raises
+    ------
+    ValueError
+        If the layout version is not supported
+    """
+    base_version = layout_version & 0xFF
+    dtype_flag = layout_version & ~0xFF & ~FLUSH_BINARY_LAYOUT_RECORDS_COUNT
+    if base_version not in [
+        FLUSH_BINARY_LAYOUT_VERSION,
+        FLUSH_BINARY_LAYOUT_VERSION_WITH_ENERGY,
+        FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY,
+        FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY_WITH_ENERGY,
+    ] or dtype_flag not in [
+        0,
+        FLUSH_BINARY_LAYOUT_FLOAT32,
+        FLUSH_BINARY_LAYOUT_QUANTIZED16,
+    ]:
+        raise ValueError(f"Unsupported layout version: {layout_version}")
+
+    fields = [("time", "<f8"), ("dt", "<f8")]
+    if base_version in [
+        FLUSH_BINARY_LAYOUT_VERSION_WITH_ENERGY,
+        FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY_WITH_ENERGY,
+    ]:
+        fields.append(("energy", "<f8"))
+    stored_fields = (
+        ["x", "v"]
+        if base_version
+        in [FLUSH_BINARY_LAYOUT_VERSION, FLUSH_BINARY_LAYOUT_VERSION_WITH_ENERGY]
+        else ["x"]
+    )
+
+    if dtype_flag == FLUSH_BINARY_LAYOUT_QUANTIZED16:
+        for field in stored_fields:
+            fields.append((f"{field}_quantization", "<f8", (2,)))
+            fields.append((field, "<u2", (objects_count * 3,)))
+    else:
+        fields.append(
+            (
+                "state",
+                "<f4" if dtype_flag == FLUSH_BINARY_LAYOUT_FLOAT32 else "<f8",
+                (objects_count * 3 * len(stored_fields),),
+            )
+        )
+
+    return np.dtype(fields)
+
+
+def _get_binary_records_state(records: np.ndarray) -> np.ndarray:
+    """Get the state of records in the binary file, dequantized
+    to float64 for quantized16
+
+    Parameters
+    ----------
+    records : np.ndarray
+        Records with the dtype from _get_binary_record_dtype()
+
+    Returns
+    -------
+    state : np.ndarray
+        State of the records
+    """
+    if "state" in records.dtype.names:
+        return records["state"]
+
+    # value = min + q * scale, where the largest q is reserved for nan
+    return np.hstack(
+        [
+            np.where(
+                records[field] == FLUSH_BINARY_QUANTIZED16_NAN,
+                np.nan,
+                records[f"{field}_quantization"][:, 0:1]
+                + records[field] * records[f"{field}_quantization"][:, 1:2],
+            )
+            for field in ["x", "v"]
+            if field in records.dtype.names
+        ]
+    )
+
+
+def _split_binary_records(
+    records: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Split records in the binary file into time, dt, energy and state
+
+    Parameters
+    ----------
+    records : np.ndarray
+        Records with the dtype from _get_binary_record_dtype()
+
+    Returns
+    -------
+    time, dt, energy, state : tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        Fields of the records. The energy is nan if it is not flushed.
+    """
+    return (
+        records["time"],
+        records["dt"],
+        (
+            records["energy"]
+            if "energy" in records.dtype.names
+            else np.full(len(records), np.nan)
+        ),
+        _get_binary_records_state(records),
+    )
+
+
+def _read_binary_header(
+    buffer: np.ndarray | bytes,
+    file_path: Path,
+    offset: int = 0,
+) -> tuple[np.dtype, float, np.ndarray, int, Optional[int]]:
+    """Read a header in the binary file
+
+    Parameters
+    ----------
+    buffer : np.ndarray | bytes
+        Content of the file as uint8 starting from the header, at
+        least up to the masses
+    file_path : Path
+        Path to the binary file, for error messages
+    offset : int, optional
+        Offset of the header in the buffer, by default 0
+
+    Returns
+    -------
+    record_dtype, G, m, header_size, records_count : tuple
+        Dtype of the records, gravitational constant, masses, size of
+        the header in bytes, and the number of committed records if
+        it is in the header (i.e. memmap), or None
+
+    Raises
+    ------
+    ValueError
+        If the header is invalid
+    """
+    if (
+        bytes(buffer[offset : offset + 8]) != FLUSH_BINARY_MAGIC
+        or len(buffer) < offset + 24
+    ):
+        raise ValueError(f"Invalid header at byte {offset} in {file_path}")
+    layout_version, objects_count = (
+        int(value)
+        for value in np.frombuffer(buffer, dtype="<i4", count=2, offset=offset + 8)
+    )
+    record_dtype = _get_binary_record_dtype(layout_version, objects_count)
+    G = float(np.frombuffer(buffer, dtype="<f8", count=1, offset=offset + 16)[0])
+
+    header_size = 24
+    records_count = None
+    if layout_version & FLUSH_BINARY_LAYOUT_RECORDS_COUNT:
+        records_count = int(
+            np.frombuffer(buffer, dtype="<i8", count=1, offset=offset + 24)[0]
+        )
+        header_size += 8
+    if len(buffer) < offset + header_size + objects_count * 8:
+        raise ValueError(f"Invalid header at byte {offset} in {file_path}")
+    m = np.frombuffer(
+        buffer, dtype="<f8", count=objects_count, offset=offset + header_size
+    )
+    header_size += objects_count * 8
+
+    return record_dtype, G, m, header_size, records_count
+
+
+def _iter_binary_segments(
+    buffer: np.ndarray,
+    file_path: Path,
+) -> Iterator[tuple[np.ndarray, float, np.ndarray]]:
+    """Iterate over the segments in the binary file, each with a header
+    followed by records
+
+    Parameters
+    ----------
+    buffer : np.ndarray
+        Content of the file as uint8, e.g. read by np.fromfile or
+        mapped by np.memmap
+    file_path : Path
+        Path to the binary file, for error messages
+
+    Yields
+    ------
+    m, G, records : tuple[np.ndarray, float, np.ndarray]
+        Masses and gravitational constant in the header, and the records
+        of the segment as a view of the buffer. The number of objects
+        may be different in each segment.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid binary file
+    """
+    magic = np.frombuffer(FLUSH_BINARY_MAGIC, dtype="<u8")[0]
+
+    offset = 0
+    while offset < len(buffer):
+        ### Header ###
+        record_dtype, G, m, header_size, committed_count = _read_binary_header(
+            buffer, file_path, offset
+        )
+        offset += header_size
+        record_size = record_dtype.itemsize
+        max_records_count = (len(buffer) - offset) // record_size
+
+        # A memmap file has one segment, followed by uncommitted records
+        if committed_count is not None:
+            if committed_count > max_records_count:
+                raise ValueError(f"Incomplete record at byte {offset} in {file_path}")
+            yield m, G, np.frombuffer(
+                buffer, dtype=record_dtype, count=committed_count, offset=offset
+            )
+            return
+
+        ### Records until the next header ###
+        first_words = np.ndarray(
+            shape=(max_records_count,),
+            dtype="<u8",
+            buffer=buffer,
+            offset=offset,
+            strides=(record_size,),
+        )
+        next_header = np.flatnonzero(first_words == magic)
+        records_count = next_header[0] if len(next_header) > 0 else max_records_count
+        records = np.frombuffer(
+            buffer,
+            dtype=record_dtype,
+            count=records_count,
+            offset=offset,
+        )
+        yield m, G, records
+        offset += records_count * record_size
+
+        if len(next_header) == 0 and offset != len(buffer):
+            raise ValueError(f"Incomplete record at byte {offset} in {file_path}")
+
+
+def _pad_binary_state(
+    state: np.ndarray,
+    objects_count: int,
+    max_objects_count: int,
+) -> np.ndarray:
+    """Pad the state of a segment in the binary file with nan
+    to max_objects_count objects, separately for x and v
+
+    Parameters
+    ----------
+    state : np.ndarray
+        State of the records in the segment
+    objects_count : int
+        Number of objects in the segment
+    max_objects_count : int
+        Number of objects after padding
+
+    Returns
+    -------
+    state : np.ndarray
+        Padded state, or the state itself if no padding is needed
+    """
+    if objects_count == max_objects_count:
+        return state
+
+    fields_count = state.shape[1] // (objects_count * 3)
+    padded_state = np.full(
+        (len(state), fields_count, max_objects_count * 3), np.nan, dtype=state.dtype
+    )
+    padded_state[:, :, : objects_count * 3] = state.reshape(
+        len(state), fields_count, objects_count * 3
+    )
+
+    return padded_state.reshape(len(state), -1)
+
+
+def read_results_binary(
+    file_path: str | Path,
+) -> dict[str, np.ndarray]:
+    """Read simulation results from a binary file written by
+    the "flush_binary" storing method
+
+    Notes
+    -----
+    Unit: Solar masses, AU, day
+    Header: magic (8 bytes), layout version (int32), objects_count N (int32),
+            G (float64), m (N float64)
+    Record: time, dt, x1, y1, z1, x2, y2, z2, ... vx1, vy1, vz1, vx2, vy2, vz2, ...
+            all in little-endian float64, with total energy after dt
+            for layout version 2 (i.e. flush_energy=True). Layout
+            versions 3 and 4 are the same as 1 and 2 without velocities
+            (i.e. stored_fields="x").
+
+    The storing dtype of the positions and velocities is flagged in the
+    higher bits of the layout version, i.e. 0x100 for float32, or 0x200
+    for quantized16, where the positions and velocities are each preceded
+    by their minimum and scale, and stored as uint16 q, such that
+    value = min + q * scale, or nan if q = 65535. The quantized values
+    are dequantized to float64.
+
+    If only a subset of objects is stored, N and m are of the stored
+    objects.
+
+    A header is written every time the simulation is launched or resumed,
+    so the file may contain several segments of records. If N is not the
+    same in every segment, the positions and velocities are padded with
+    nan to the largest N.
+
+    Parameters
+    ----------
+    file_path : str | Path
+        Path to the binary file
+
+    Returns
+    -------
+    results : dict[str, np.ndarray]
+        Simulation results, with field names: time, dt, energy, state,
+        objects_count, m, G. The energy is nan if it is not flushed.
+        objects_count is N of the segment of each record, and m is of
+        the last segment, padded with nan as the state.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist
+    ValueError
+        If the file is not a valid binary file, or the stored fields
+        change within the file
     """
     if not isinstance(file_path, Path):
         file_path = Path(file_path)
@@ -291,29 +835,923 @@ def read_results_csv(
     if not file_path.exists():
         raise FileNotFoundError(f"File not found: {file_path}")
 
-    time = []
-    dt = []
-    energy = []
-    state = []
+    buffer = np.fromfile(file_path, dtype=np.uint8)
 
-    with file_path.open("r") as file:
-        reader = csv.reader(file)
-        for row in reader:
-            time.append(float(row[0]))
-            dt.append(float(row[1]))
-            energy.append(float(row[2]))
-            state.append(np.array(row[3:], dtype=float))
+    segments = list(_iter_binary_segments(buffer, file_path))
+    if len(segments) == 0:
+        raise ValueError(f"No results found in {file_path}")
+    max_objects_count = max(len(m) for m, _, _ in segments)
+
+    fields = []
+    for m, G, records in segments:
+        time, dt, energy, state = _split_binary_records(records)
+        state = _pad_binary_state(state, len(m), max_objects_count)
+        fields.append(
+            (time, dt, energy, state, np.full(len(records), len(m), dtype=np.int32))
+        )
+    if len(set(field[3].shape[1] for field in fields)) > 1:
+        raise ValueError(f"Stored fields change within {file_path}")
+
+    time, dt, energy, state, objects_count = (
+        np.concatenate(field) for field in zip(*fields)
+    )
+    results = {
+        "time": time,
+        "dt": dt,
+        "energy": energy,
+        "state": state,
+        "objects_count": objects_count,
+        "m": np.concatenate([m, np.full(max_objects_count - len(m), np.nan)]),
+        "G": G,
+    }
+
+    return results
+
+
+def iter_results_binary(
+    file_path: str | Path,
+    chunk_size: int = 10000,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """Iterate over simulation results in a binary file written by the
+    "flush_binary" or "memmap" storing method in blocks of records
+
+    The file is mapped to memory, so only the records in the current
+    block are read. A block does not span two segments, so it may have
+    less than chunk_size records. As in read_results_binary(), the state
+    is padded with nan if N is not the same in every segment.
+
+    Parameters
+    ----------
+    file_path : str | Path
+        Path to the binary file
+    chunk_size : int, optional
+        Number of records in each block, by default 10000
+
+    Yields
+    ------
+    time, dt, energy, state : tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        Block of the simulation results. The energy is nan if it is not
+        flushed.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist
+    ValueError
+        If chunk_size is invalid, or the file is not a valid binary file
+    """
+    if not isinstance(file_path, Path):
+        file_path = Path(file_path)
+
+    if not file_path.exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if file_path.stat().st_size == 0:
+        raise ValueError(f"No results found in {file_path}")
+
+    buffer = np.memmap(file_path, dtype=np.uint8, mode="r")
+
+    # The segments are listed first for the largest N, which only
+    # creates views of the records
+    segments = list(_iter_binary_segments(buffer, file_path))
+    max_objects_count = max((len(m) for m, _, _ in segments), default=0)
+    for m, _, records in segments:
+        for start in range(0, len(records), chunk_size):
+            time, dt, energy, state = _split_binary_records(
+                records[start : start + chunk_size]
+            )
+            yield time, dt, energy, _pad_binary_state(state, len(m), max_objects_count)
+
+
+def memmap_results_binary(
+    file_path: str | Path,
+    mode: str = "r+",
+) -> dict[str, np.ndarray]:
+    """Memory-map simulation results in a binary file written by
+    the "memmap" storing method, without reading the file into memory
+
+    Notes
+    -----
+    The file has the same layout as read_results_binary(), but only one
+    segment without energy (layout version 1 or 3, in float64 or float32)
+    is supported. The header written by the "memmap" storing method also
+    has the number of committed records (int64) after G, and only the
+    committed records are mapped.
+
+    Parameters
+    ----------
+    file_path : str | Path
+        Path to the binary file
+    mode : str, optional
+        Mode of np.memmap, by default "r+"
+
+    Returns
+    -------
+    results : dict[str, np.ndarray]
+        Simulation results, with field names: time, dt, state, m, G.
+        time, dt and state are views of the same np.memmap object.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist
+    ValueError
+        If the file is not a valid binary file with one segment
+    """
+    if not isinstance(file_path, Path):
+        file_path = Path(file_path)
 
+    if not file_path.exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    with file_path.open("rb") as file:
+        header = file.read(32)
+        if len(header) >= 16:
+            objects_count = max(
+                int(np.frombuffer(header, dtype="<i4", count=1, offset=12)[0]), 0
+            )
+            header += file.read(objects_count * 8)
+    record_dtype, G, m, header_size, records_count = _read_binary_header(
+        header, file_path
+    )
+    if "energy" in record_dtype.names or "state" not in record_dtype.names:
+        raise ValueError(f"Unsupported layout: {record_dtype}")
+    m = m.copy()
+
+    # The records after the committed records are ignored
+    records_size = file_path.stat().st_size - header_size
+    if records_count is None:
+        if records_size % record_dtype.itemsize != 0:
+            raise ValueError(f"Incomplete record or multiple segments in {file_path}")
+        records_count = records_size // record_dtype.itemsize
+    elif records_count * record_dtype.itemsize > records_size:
+        raise ValueError(f"Incomplete record in {file_path}")
+
+    records = np.memmap(
+        file_path,
+        dtype=record_dtype,
+        mode=mode,
+        offset=header_size,
+        shape=(records_count,),
+    )
     results = {
-        "time": np.array(time),
-        "dt": np.array(dt),
-        "energy": np.array(energy),
-        "state": np.array(state),
+        "time": records["time"],
+        "dt": records["dt"],
+        "state": records["state"],
+        "m": m,
+        "G": G,
     }
 
     return results
 
 
+CHUNKED_RESULTS_MAGIC = b"GSIMCHK\x00"
+CHUNKED_RESULTS_INDEX_MAGIC = b"GSIMIDX\x00"
+CHUNKED_RESULTS_COMPRESSIONS = {"zlib": 1, "lzma": 2}
+CHUNKED_RESULTS_HEADER_SIZE = 32
+CHUNKED_RESULTS_INDEX_DTYPE = np.dtype(
+    [
+        ("t_start", "<f8"),
+        ("t_end", "<f8"),
+        ("offset", "<i8"),
+        ("size", "<i8"),
+        ("records_count", "<i8"),
+    ]
+)
+CHUNKED_RESULTS_TAIL_DTYPE = np.dtype(
+    [("index_offset", "<i8"), ("chunks_count", "<i8"), ("magic", "S8")]
+)
+
+
+def _encode_chunk(records: np.ndarray, compression: str) -> bytes:
+    """Delta encode and compress a chunk of records
+
+    Each field is reinterpreted as unsigned integers of the same width,
+    differenced along time (keeping the first record) and stored column
+    by column, so that slowly varying values share their leading bytes
+    and compress well. The encoding is lossless.
+
+    Parameters
+    ----------
+    records : np.ndarray
+        Records with the dtype from _get_binary_record_dtype()
+    compression : str
+        "zlib" or "lzma"
+
+    Returns
+    -------
+    payload : bytes
+        Compressed chunk
+    """
+    encoded = []
+    for name in records.dtype.names:
+        field = np.ascontiguousarray(records[name]).reshape(len(records), -1)
+        field = field.view(f"<u{field.dtype.itemsize}")
+        delta = field.copy()
+        delta[1:] -= field[:-1]
+        encoded.append(np.ascontiguousarray(delta.T).tobytes())
+
+    if compression == "lzma":
+        return lzma.compress(b"".join(encoded))
+    return zlib.compress(b"".join(encoded))
+
+
+def _decode_chunk(
+    payload: bytes,
+    record_dtype: np.dtype,
+    records_count: int,
+    compression: str,
+) -> np.ndarray:
+    """Decompress and delta decode a chunk from _encode_chunk()
+
+    Parameters
+    ----------
+    payload : bytes
+        Compressed chunk
+    record_dtype : np.dtype
+        Dtype from _get_binary_record_dtype()
+    records_count : int
+        Number of records in the chunk
+    compression : str
+        "zlib" or "lzma"
+
+    Returns
+    -------
+    records : np.ndarray
+        Records of the chunk
+    """
+    if compression == "lzma":
+        buffer = lzma.decompress(payload)
+    else:
+        buffer = zlib.decompress(payload)
+
+    records = np.empty(records_count, dtype=record_dtype)
+    offset = 0
+    for name in record_dtype.names:
+        field_dtype = record_dtype.fields[name][0]
+        width = int(np.prod(field_dtype.shape, dtype=int))
+        itemsize = field_dtype.base.itemsize
+        delta = np.frombuffer(
+            buffer,
+            dtype=f"<u{itemsize}",
+            count=records_count * width,
+            offset=offset,
+        ).reshape(width, records_count)
+        # Unsigned cumsum wraps around, which reverses the differences exactly
+        field = np.cumsum(delta.T, axis=0, dtype=delta.dtype)
+        records[name] = field.view(field_dtype.base).reshape(
+            (records_count,) + field_dtype.shape
+        )
+        offset += records_count * width * itemsize
+
+    return records
+
+
+def append_results_binary_to_chunked(
+    binary_path: str | Path,
+    chunked_path: str | Path,
+    compression: str = "zlib",
+    chunk_size: int = 1024,
+    time_offset: Optional[float] = None,
+) -> None:
+    """Append the records of a binary file written by the "flush_binary"
+    storing method to a compressed chunked file
+
+    Notes
+    -----
+    Unit: Solar masses, AU, day
+    Header: magic (8 bytes), layout version (int32), objects_count N (int32),
+            G (float64), compression (int32, 1 for zlib and 2 for lzma),
+            reserved (int32), m (N float64)
+    Chunks: records of the binary file (see read_results_binary()),
+            delta encoded along time and compressed (see _encode_chunk())
+    Footer: index with t_start, t_end (float64), offset, size and
+            records_count (int64) of each chunk, followed by the index
+            offset, number of chunks (int64) and magic (8 bytes)
+
+    The appended chunks and a new footer are written after the existing
+    footer, which is never modified, so a file can be extended by several
+    simulations with the same layout. The new footer is only written after
+    the chunks are synced to the disk. If the process is terminated during
+    the append, the file is still readable up to the previous footer (see
+    _read_chunked_index()), and the incomplete chunks are discarded by the
+    next append. Each append leaves the previous index in the file, which
+    takes 40 bytes per chunk.
+
+    The time of the records must not decrease across appends. Since a
+    resumed simulation restarts at t = 0, the time of the appended records
+    is shifted by the end time of the chunked file by default.
+
+    Parameters
+    ----------
+    binary_path : str | Path
+        Path to the binary file with one segment, not quantized
+    chunked_path : str | Path
+        Path to the chunked file, created if it does not exist
+    compression : str, optional
+        "zlib" or "lzma", by default "zlib". Ignored if the chunked
+        file already exists.
+    chunk_size : int, optional
+        Number of records per chunk, by default 1024
+    time_offset : float, optional
+        Offset added to the time of the appended records. By default,
+        the end time of the chunked file if the records start before
+        it, otherwise 0.0.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the binary file does not exist
+    ValueError
+        If the binary file is not supported, the layout does not
+        match the existing chunked file, or the time of the records
+        would decrease
+    """
+    if not isinstance(binary_path, Path):
+        binary_path = Path(binary_path)
+    if not isinstance(chunked_path, Path):
+        chunked_path = Path(chunked_path)
+
+    if not binary_path.exists():
+        raise FileNotFoundError(f"File not found: {binary_path}")
+    if compression not in CHUNKED_RESULTS_COMPRESSIONS:
+        raise ValueError(
+            f"compression must be one of {list(CHUNKED_RESULTS_COMPRESSIONS)}"
+        )
+
+    with binary_path.open("rb") as file:
+        header = file.read(24)
+        if len(header) < 24 or header[:8] != FLUSH_BINARY_MAGIC:
+            raise ValueError(f"Invalid header in {binary_path}")
+        layout_version, objects_count = np.frombuffer(
+            header, dtype="<i4", count=2, offset=8
+        )
+        record_dtype = _get_binary_record_dtype(layout_version, objects_count)
+        if "state" not in record_dtype.names:
+            raise ValueError(f"Unsupported layout version: {layout_version}")
+        m_bytes = file.read(objects_count * 8)
+
+    header_size = 24 + objects_count * 8
+    records_size = binary_path.stat().st_size - header_size
+    if records_size % record_dtype.itemsize != 0:
+        raise ValueError(f"Incomplete record or multiple segments in {binary_path}")
+    records_count = records_size // record_dtype.itemsize
+    records = (
+        np.memmap(
+            binary_path,
+            dtype=record_dtype,
+            mode="r",
+            offset=header_size,
+            shape=(records_count,),
+        )
+        if records_count > 0
+        else np.empty(0, dtype=record_dtype)
+    )
+
+    if chunked_path.is_file():
+        with chunked_path.open("rb") as file:
+            chunked_header = file.read(CHUNKED_RESULTS_HEADER_SIZE)
+        if (
+            chunked_header[:8] != CHUNKED_RESULTS_MAGIC
+            or chunked_header[8:16] != header[8:16]
+        ):
+            raise ValueError(f"Layout of {binary_path} does not match {chunked_path}")
+        compression_id = int(
+            np.frombuffer(chunked_header, dtype="<i4", count=1, offset=24)[0]
+        )
+        index, footer_end = _read_chunked_index(chunked_path)
+        index = list(index)
+    else:
+        compression_id = CHUNKED_RESULTS_COMPRESSIONS[compression]
+        with chunked_path.open("wb") as file:
+            file.write(CHUNKED_RESULTS_MAGIC + header[8:])
+            file.write(np.array([compression_id, 0], dtype="<i4").tobytes())
+            file.write(m_bytes)
+        index = []
+        footer_end = CHUNKED_RESULTS_HEADER_SIZE + objects_count * 8
+    compression = next(
+        name
+        for name, value in CHUNKED_RESULTS_COMPRESSIONS.items()
+        if value == compression_id
+    )
+
+    t_end = float(index[-1]["t_end"]) if len(index) > 0 else -np.inf
+    if time_offset is None:
+        time_offset = 0.0
+        if records_count > 0 and records["time"][0] < t_end:
+            time_offset = t_end
+    if records_count > 0 and records["time"][0] + time_offset < t_end:
+        raise ValueError(
+            f"Time of the records in {binary_path} decreases "
+            + f"after time offset {time_offset}"
+        )
+
+    with chunked_path.open("r+b") as file:
+        # Discard the incomplete chunks of a terminated append, if any
+        file.truncate(footer_end)
+        file.seek(footer_end)
+        offset = footer_end
+        for start in range(0, records_count, chunk_size):
+            chunk = records[start : start + chunk_size]
+            if time_offset != 0.0:
+                chunk = chunk.copy()
+                chunk["time"] += time_offset
+            payload = _encode_chunk(chunk, compression)
+            file.write(payload)
+            index.append(
+                (chunk["time"][0], chunk["time"][-1], offset, len(payload), len(chunk))
+            )
+            offset += len(payload)
+
+        # Publish the new footer only after the chunks are on the disk
+        file.flush()
+        os.fsync(file.fileno())
+        file.write(np.array(index, dtype=CHUNKED_RESULTS_INDEX_DTYPE).tobytes())
+        file.write(
+            np.array(
+                [(offset, len(index), CHUNKED_RESULTS_INDEX_MAGIC)],
+                dtype=CHUNKED_RESULTS_TAIL_DTYPE,
+            ).tobytes()
+        )
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _read_chunked_index(file_path: Path) -> tuple[np.ndarray, int]:
+    """Read the index in the last complete footer of a chunked file
+
+    The footer is normally at the end of the file. If an append was
+    terminated, the file ends with incomplete chunks or an incomplete
+    footer, and the previous footer is found by searching backwards
+    for its magic.
+
+    Parameters
+    ----------
+    file_path : Path
+        Path to the chunked file
+
+    Returns
+    -------
+    index : np.ndarray
+        Index with dtype CHUNKED_RESULTS_INDEX_DTYPE
+    footer_end : int
+        Offset of the end of the footer in bytes, i.e. where the
+        next chunks are appended
+
+    Raises
+    ------
+    ValueError
+        If no complete footer is found
+    """
+    tail_size = CHUNKED_RESULTS_TAIL_DTYPE.itemsize
+    index_itemsize = CHUNKED_RESULTS_INDEX_DTYPE.itemsize
+    magic = CHUNKED_RESULTS_INDEX_MAGIC
+    block_size = 1 << 20
+    with file_path.open("rb") as file:
+        file.seek(0, 2)
+        file_size = file.tell()
+
+        # Search backwards block by block, with overlap for the tail
+        search_end = file_size
+        while search_end >= CHUNKED_RESULTS_HEADER_SIZE + tail_size:
+            search_start = max(search_end - block_size, CHUNKED_RESULTS_HEADER_SIZE)
+            file.seek(search_start)
+            block = file.read(search_end - search_start)
+            position = len(block)
+            while True:
+                position = block.rfind(magic, 0, position)
+                if position < 0:
+                    break
+                footer_end = search_start + position + len(magic)
+                if footer_end - tail_size < CHUNKED_RESULTS_HEADER_SIZE:
+                    break
+                file.seek(footer_end - tail_size)
+                tail = np.frombuffer(
+                    file.read(tail_size), dtype=CHUNKED_RESULTS_TAIL_DTYPE
+                )[0]
+                index_offset = int(tail["index_offset"])
+                chunks_count = int(tail["chunks_count"])
+                if (
+                    CHUNKED_RESULTS_HEADER_SIZE <= index_offset
+                    and chunks_count >= 0
+                    and index_offset + chunks_count * index_itemsize
+                    == footer_end - tail_size
+                ):
+                    file.seek(index_offset)
+                    index = np.frombuffer(
+                        file.read(chunks_count * index_itemsize),
+                        dtype=CHUNKED_RESULTS_INDEX_DTYPE,
+                    )
+                    return index, footer_end
+            if search_start == CHUNKED_RESULTS_HEADER_SIZE:
+                break
+            search_end = search_start + len(magic) - 1
+
+    raise ValueError(f"Invalid footer in {file_path}")
+
+
+def _read_chunked_header(
+    file_path: Path,
+) -> tuple[np.dtype, str, np.ndarray, float]:
+    """Read the header of a chunked file
+
+    Parameters
+    ----------
+    file_path : Path
+        Path to the chunked file
+
+    Returns
+    -------
+    record_dtype : np.dtype
+        Dtype of the records from _get_binary_record_dtype()
+    compression : str
+        "zlib" or "lzma"
+    m : np.ndarray
+        Masses of the stored objects
+    G : float
+        Gravitational constant
+
+    Raises
+    ------
+    ValueError
+        If the header is invalid
+    """
+    with file_path.open("rb") as file:
+        header = file.read(CHUNKED_RESULTS_HEADER_SIZE)
+        if (
+            len(header) < CHUNKED_RESULTS_HEADER_SIZE
+            or header[:8] != CHUNKED_RESULTS_MAGIC
+        ):
+            raise ValueError(f"Invalid header in {file_path}")
+        layout_version, objects_count = np.frombuffer(
+            header, dtype="<i4", count=2, offset=8
+        )
+        record_dtype = _get_binary_record_dtype(layout_version, objects_count)
+        G = float(np.frombuffer(header, dtype="<f8", count=1, offset=16)[0])
+        compression_id = int(np.frombuffer(header, dtype="<i4", count=1, offset=24)[0])
+        if compression_id not in CHUNKED_RESULTS_COMPRESSIONS.values():
+            raise ValueError(f"Unsupported compression: {compression_id}")
+        compression = next(
+            name
+            for name, value in CHUNKED_RESULTS_COMPRESSIONS.items()
+            if value == compression_id
+        )
+        m = np.frombuffer(file.read(objects_count * 8), dtype="<f8").copy()
+
+    return record_dtype, compression, m, G
+
+
+def iter_results_chunked(
+    file_path: str | Path,
+    t_start: Optional[float] = None,
+    t_end: Optional[float] = None,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """Iterate over simulation results in a compressed chunked file
+    written by the "flush_chunked" storing method, one chunk at a time
+
+    Only the chunks overlapping [t_start, t_end] are read and decompressed,
+    according to the index in the footer (see
+    append_results_binary_to_chunked() for the layout).
+
+    Parameters
+    ----------
+    file_path : str | Path
+        Path to the chunked file
+    t_start : float, optional
+        Start of the time window, by default the beginning
+    t_end : float, optional
+        End of the time window, by default the end
+
+    Yields
+    ------
+    time, dt, energy, state : tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        Records of a chunk within the time window. The energy is nan
+        if it is not flushed.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist
+    ValueError
+        If the file is not a valid chunked file
+    """
+    if not isinstance(file_path, Path):
+        file_path = Path(file_path)
+
+    if not file_path.exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    record_dtype, compression, _, _ = _read_chunked_header(file_path)
+    index, _ = _read_chunked_index(file_path)
+    is_selected = np.ones(len(index), dtype=bool)
+    if t_start is not None:
+        is_selected &= index["t_end"] >= t_start
+    if t_end is not None:
+        is_selected &= index["t_start"] <= t_end
+
+    with file_path.open("rb") as file:
+        for chunk_index in index[is_selected]:
+            file.seek(int(chunk_index["offset"]))
+            records = _decode_chunk(
+                file.read(int(chunk_index["size"])),
+                record_dtype,
+                int(chunk_index["records_count"]),
+                compression,
+            )
+
+            is_in_window = np.ones(len(records), dtype=bool)
+            if t_start is not None:
+                is_in_window &= records["time"] >= t_start
+            if t_end is not None:
+                is_in_window &= records["time"] <= t_end
+            if not np.all(is_in_window):
+                records = records[is_in_window]
+
+            yield _split_binary_records(records)
+
+
+def read_results_chunked(
+    file_path: str | Path,
+    t_start: Optional[float] = None,
+    t_end: Optional[float] = None,
+) -> dict[str, np.ndarray]:
+    """Read simulation results from a compressed chunked file written by
+    the "flush_chunked" storing method
+
+    Only the chunks overlapping [t_start, t_end] are read and decompressed
+    (see iter_results_chunked()).
+
+    Parameters
+    ----------
+    file_path : str | Path
+        Path to the chunked file
+    t_start : float, optional
+        Start of the time window, by default the beginning
+    t_end : float, optional
+        End of the time window, by default the end
+
+    Returns
+    -------
+    results : dict[str, np.ndarray]
+        Simulation results within the time window, with field names:
+        time, dt, energy, state, m, G. The energy is nan if it is not
+        flushed.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist
+    ValueError
+        If the file is not a valid chunked file
+    """
+    blocks = list(iter_results_chunked(file_path, t_start, t_end))
+    record_dtype, _, m, G = _read_chunked_header(Path(file_path))
+
+    if len(blocks) > 0:
+        time, dt, energy, state = (np.concatenate(field) for field in zip(*blocks))
+    else:
+        time, dt, energy, state = _split_binary_records(np.empty(0, dtype=record_dtype))
+
+    results = {
+        "time": time,
+        "dt": dt,
+        "energy": energy,
+        "state": state,
+        "m": m,
+        "G": G,
+    }
+
+    return results
+
+
+SYSTEMS_CATALOG_MAGIC = b"GSIMSYS\x00"
+SYSTEMS_CATALOG_INDEX_MAGIC = b"GSIMCIX\x00"
+SYSTEMS_CATALOG_NAME_SIZE = 256
+SYSTEMS_CATALOG_INDEX_DTYPE = np.dtype(
+    [
+        ("name", f"S{SYSTEMS_CATALOG_NAME_SIZE}"),
+        ("G", "<f8"),
+        ("objects_count", "<i8"),
+        ("offset", "<i8"),
+    ]
+)
+SYSTEMS_CATALOG_TAIL_DTYPE = np.dtype(
+    [("index_offset", "<i8"), ("systems_count", "<i8"), ("magic", "S8")]
+)
+
+
+def is_systems_catalog(file_path: str | Path) -> bool:
+    """Check if a file is a systems catalog by its magic"""
+    with Path(file_path).open("rb") as file:
+        return file.read(8) == SYSTEMS_CATALOG_MAGIC
+
+
+def _read_systems_catalog_index(file_path: Path) -> tuple[np.ndarray, int]:
+    """Read the index in the footer of a systems catalog
+
+    Parameters
+    ----------
+    file_path : Path
+        Path to the systems catalog
+
+    Returns
+    -------
+    index : np.ndarray
+        Index with dtype SYSTEMS_CATALOG_INDEX_DTYPE
+    index_offset : int
+        Offset of the index in bytes, i.e. the end of the systems
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid systems catalog
+    """
+    tail_size = SYSTEMS_CATALOG_TAIL_DTYPE.itemsize
+    with file_path.open("rb") as file:
+        magic = file.read(8)
+        file.seek(0, 2)
+        file_size = file.tell()
+        if magic != SYSTEMS_CATALOG_MAGIC or file_size < 8 + tail_size:
+            raise ValueError(f"Invalid systems catalog: {file_path}")
+        file.seek(file_size - tail_size)
+        tail = np.frombuffer(file.read(tail_size), dtype=SYSTEMS_CATALOG_TAIL_DTYPE)[0]
+        index_offset = int(tail["index_offset"])
+        systems_count = int(tail["systems_count"])
+        if (
+            tail["magic"] != SYSTEMS_CATALOG_INDEX_MAGIC.rstrip(b"\x00")
+            or index_offset + systems_count * SYSTEMS_CATALOG_INDEX_DTYPE.itemsize
+            != file_size - tail_size
+        ):
+            raise ValueError(f"Invalid footer in {file_path}")
+        file.seek(index_offset)
+        index = np.frombuffer(
+            file.read(systems_count * SYSTEMS_CATALOG_INDEX_DTYPE.itemsize),
+            dtype=SYSTEMS_CATALOG_INDEX_DTYPE,
+        )
+
+    return index, index_offset
+
+
+def save_system_to_catalog(
+    file_path: str | Path,
+    name: str,
+    G: float,
+    x: np.ndarray,
+    v: np.ndarray,
+    m: np.ndarray,
+) -> None:
+    """Save a system to a binary systems catalog
+
+    Notes
+    -----
+    Unit: Solar masses, AU, day
+    Header: magic (8 bytes)
+    Systems: m (N float64), x (3N float64) and v (3N float64) of each system
+    Footer: index with name (256 bytes, utf-8), G (float64), objects_count
+            and offset (int64) of each system, followed by the index
+            offset, number of systems (int64) and magic (8 bytes)
+
+    Loading a system only reads the footer and the system itself. To
+    save a system, the catalog is written to a temporary file in the
+    same directory with the existing systems, except the one with the
+    same name, followed by the new system and the footer. The temporary
+    file then replaces the catalog, so the catalog is always complete
+    even if the process is terminated, and replaced systems do not take
+    any space. Saving takes time proportional to the size of the catalog.
+
+    Parameters
+    ----------
+    file_path : str | Path
+        Path to the systems catalog, created if it does not exist
+    name : str
+        Name of the system
+    G : float
+        Gravitational constant
+    x : np.ndarray
+        Positions with shape (N, 3)
+    v : np.ndarray
+        Velocities with shape (N, 3)
+    m : np.ndarray
+        Masses with shape (N,)
+
+    Raises
+    ------
+    ValueError
+        If the name is too long, or the file is not a valid systems catalog
+    """
+    if not isinstance(file_path, Path):
+        file_path = Path(file_path)
+
+    encoded_name = name.encode("utf-8")
+    if len(encoded_name) > SYSTEMS_CATALOG_NAME_SIZE:
+        raise ValueError(
+            f"System name must be at most {SYSTEMS_CATALOG_NAME_SIZE} bytes in utf-8"
+        )
+
+    if file_path.is_file() and file_path.stat().st_size > 0:
+        old_index, _ = _read_systems_catalog_index(file_path)
+        old_index = old_index[old_index["name"] != encoded_name]
+    else:
+        old_index = np.empty(0, dtype=SYSTEMS_CATALOG_INDEX_DTYPE)
+
+    temp_fd, temp_path = tempfile.mkstemp(
+        prefix=f".{file_path.name}.", suffix=".tmp", dir=file_path.parent
+    )
+    try:
+        with os.fdopen(temp_fd, "wb") as file:
+            file.write(SYSTEMS_CATALOG_MAGIC)
+            index = old_index.copy()
+            if len(old_index) > 0:
+                # Copy the other systems one by one
+                with file_path.open("rb") as old_file:
+                    for i, old_entry in enumerate(old_index):
+                        old_file.seek(int(old_entry["offset"]))
+                        index["offset"][i] = file.tell()
+                        file.write(
+                            old_file.read(int(old_entry["objects_count"]) * 7 * 8)
+                        )
+
+            entry = np.array(
+                [(encoded_name, G, len(m), file.tell())],
+                dtype=SYSTEMS_CATALOG_INDEX_DTYPE,
+            )
+            index = np.concatenate((index, entry))
+            for array in (m, x, v):
+                file.write(np.ascontiguousarray(array, dtype="<f8").tobytes())
+            index_offset = file.tell()
+            file.write(index.tobytes())
+            file.write(
+                np.array(
+                    [(index_offset, len(index), SYSTEMS_CATALOG_INDEX_MAGIC)],
+                    dtype=SYSTEMS_CATALOG_TAIL_DTYPE,
+                ).tobytes()
+            )
+            file.flush()
+            os.fsync(file.fileno())
+        # mkstemp() creates the file only readable by the owner
+        os.chmod(
+            temp_path,
+            file_path.stat().st_mode & 0o777 if file_path.is_file() else 0o644,
+        )
+        os.replace(temp_path, file_path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def load_system_from_catalog(
+    file_path: str | Path, name: str
+) -> Optional[tuple[float, np.ndarray, np.ndarray, np.ndarray]]:
+    """Load a system from a binary systems catalog
+
+    The system is found in the index of the footer, and m, x and v
+    are read with a single read (see save_system_to_catalog()).
+
+    Parameters
+    ----------
+    file_path : str | Path
+        Path to the systems catalog
+    name : str
+        Name of the system
+
+    Returns
+    -------
+    G : float
+    x : np.ndarray
+    v : np.ndarray
+    m : np.ndarray
+    or None if the system is not found
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid systems catalog
+    """
+    if not isinstance(file_path, Path):
+        file_path = Path(file_path)
+
+    index, _ = _read_systems_catalog_index(file_path)
+    matches = np.flatnonzero(index["name"] == name.encode("utf-8"))
+    if len(matches) == 0:
+        return None
+
+    entry = index[matches[-1]]
+    objects_count = int(entry["objects_count"])
+    data = np.fromfile(
+        file_path, dtype="<f8", count=objects_count * 7, offset=int(entry["offset"])
+    )
+    if len(data) != objects_count * 7:
+        raise ValueError(f"Invalid systems catalog: {file_path}")
+
+    m = data[:objects_count]
+    x = data[objects_count : objects_count * 4].reshape(objects_count, 3)
+    v = data[objects_count * 4 :].reshape(objects_count, 3)
+
+    return float(entry["G"]), x, v, m
+
+
 def keplerian_to_cartesian(
     semi_major_axis: float,
     eccentricity: float,
@@ -19,6 +19,16 @@ WIN32DLL_API void print_error_msg(const int error_code)
     }
 }
 
+WIN32DLL_API const char *get_error_msg_python(const int error_code)
+{
+    char *error_msg = NULL;
+    if (get_error_msg(error_code, &error_msg) != SUCCESS)
+    {
+        return NULL;
+    }
+    return error_msg;
+}
+
 IN_FILE int get_error_msg(const int error_code, char **error_msg)
 {
     switch (error_code)
@@ -51,6 +61,32 @@ IN_FILE int get_error_msg(const int error_code, char **error_msg)
             *error_msg = "C library error: Initial time step is negative in _launch_simulation().\n";
             return SUCCESS;
 
+        /* Simulation context */
+        case ERROR_SIM_CONTEXT_NULL:
+            *error_msg = "C library error: Simulation context is NULL.\n";
+            return SUCCESS;
+        case ERROR_SIM_CONTEXT_MEMORY_ALLOC:
+            *error_msg = "C library error: Memory allocation failed in sim_create().\n";
+            return SUCCESS;
+        case ERROR_SIM_CONTEXT_NAME_TOO_LONG:
+            *error_msg = "C library error: Method name is too long for the simulation context.\n";
+            return SUCCESS;
+        case ERROR_SIM_CONTEXT_INTEGRATOR_NOT_SET:
+            *error_msg = "C library error: Integrator is not set. Call sim_set_integrator() first.\n";
+            return SUCCESS;
+        case ERROR_SIM_CONTEXT_DT_NON_POSITIVE:
+            *error_msg = "C library error: Time step must be positive for fixed step size integrators.\n";
+            return SUCCESS;
+        case ERROR_SIM_STEP_ADAPTIVE_STEP_SIZE_INTEGRATOR:
+            *error_msg = "C library error: sim_step() is only available for fixed step size integrators. Use sim_integrate_to() instead.\n";
+            return SUCCESS;
+        case ERROR_SIM_STEP_NEGATIVE_N_STEPS:
+            *error_msg = "C library error: Number of steps is negative in sim_step().\n";
+            return SUCCESS;
+        case ERROR_SIM_INTEGRATE_TO_PAST:
+            *error_msg = "C library error: Target time is earlier than the current time in sim_integrate_to().\n";
+            return SUCCESS;
+
         /* Acceleration */
         case ERROR_UNKNOWN_ACCELERATION_METHOD:
             *error_msg = "C library error: Acceleration method not recognized in get_acceleration_method_flag().\n";
@@ -134,6 +170,36 @@ IN_FILE int get_error_msg(const int error_code, char **error_msg)
         case ERROR_SOL_OUTPUT_EXTEND_MEMORY_REALLOC:
             *error_msg = "C library error: Memory reallocation failed in extend_solutions_memory().\n";
             return SUCCESS;
+        case ERROR_RING_CAPACITY_NON_POSITIVE:
+            *error_msg = "C library error: Ring capacity must be positive for the ring storing method.\n";
+            return SUCCESS;
+        case ERROR_STORED_INDEX_OUT_OF_RANGE:
+            *error_msg = "C library error: Stored object index out of range.\n";
+            return SUCCESS;
+        case ERROR_UNKNOWN_STORING_DTYPE:
+            *error_msg = "C library error: Unknown storing dtype.\n";
+            return SUCCESS;
+        case ERROR_STORING_DTYPE_NOT_SUPPORTED:
+            *error_msg = "C library error: Storing dtype is not supported by the storing method.\n";
+            return SUCCESS;
+        case ERROR_DISTANCE_INDEX_OUT_OF_RANGE:
+            *error_msg = "C library error: Distance trigger object index out of range.\n";
+            return SUCCESS;
+        case ERROR_DISTANCE_TRIGGER_MEMORY_ALLOC:
+            *error_msg = "C library error: Failed to allocate memory for the distance trigger.\n";
+            return SUCCESS;
+        case ERROR_LIVE_STATE_INVALID_HEADER:
+            *error_msg = "C library error: Invalid header of the live state segment.\n";
+            return SUCCESS;
+        case ERROR_LIVE_STATE_CAPACITY_EXCEEDED:
+            *error_msg = "C library error: Number of objects exceeds the capacity of the live state segment.\n";
+            return SUCCESS;
+        case ERROR_OBJECT_SLOTS_MEMORY_ALLOC:
+            *error_msg = "C library error: Failed to allocate memory for the slots of the stored objects.\n";
+            return SUCCESS;
+        case ERROR_STORING_BIG_ENDIAN_NOT_SUPPORTED:
+            *error_msg = "C library error: Binary storing methods are not supported on big-endian platforms.\n";
+            return SUCCESS;
         
         // Flush error
         case ERROR_FLUSH_FILE_OPEN:
@@ -148,11 +214,43 @@ IN_FILE int get_error_msg(const int error_code, char **error_msg)
         case ERROR_FLUSH_FILE_CLOSE_NOT_FLUSH_METHOD:
             *error_msg = "C library error: close_flush_file() is called but storing method is not flush.\n";
             return SUCCESS;
+        case ERROR_FLUSH_WRITER_MEMORY_ALLOC:
+            *error_msg = "C library error: Failed to allocate memory for flush writer.\n";
+            return SUCCESS;
+        case ERROR_FLUSH_WRITER_THREAD_CREATE:
+            *error_msg = "C library error: Failed to create flush writer thread.\n";
+            return SUCCESS;
+        case ERROR_FLUSH_WRITER_WRITE:
+            *error_msg = "C library error: Flush writer failed to write to flush file.\n";
+            return SUCCESS;
+
+        /* Memory-mapped file */
+        case ERROR_MMAP_NOT_SUPPORTED:
+            *error_msg = "C library error: The C library is compiled without memory-mapped file support (USE_MMAP).\n";
+            return SUCCESS;
+        case ERROR_MMAP_FILE_OPEN:
+            *error_msg = "C library error: Failed to open file in open_mmap_solutions().\n";
+            return SUCCESS;
+        case ERROR_MMAP_FILE_RESIZE:
+            *error_msg = "C library error: Failed to resize memory-mapped file.\n";
+            return SUCCESS;
+        case ERROR_MMAP_MAP:
+            *error_msg = "C library error: Failed to map file to memory.\n";
+            return SUCCESS;
+        case ERROR_MMAP_FILE_CLOSE:
+            *error_msg = "C library error: Failed to close file in close_mmap_solutions().\n";
+            return SUCCESS;
+        case ERROR_MMAP_FILE_INCOMPATIBLE:
+            *error_msg = "C library error: Existing file at flush_path is not a memmap file with the same layout.\n";
+            return SUCCESS;
 
         /* Integrator */
         case ERROR_UNKNOWN_INTEGRATOR_METHOD:
             *error_msg = "C library error: Integrator method not recognized.\n";
             return SUCCESS;
+        case ERROR_INTEGRATOR_STATE_MEMORY_ALLOC:
+            *error_msg = "C library error: Failed to allocate memory for integrator state.\n";
+            return SUCCESS;
 
         // Euler integrator
         case ERROR_EULER_MEMORY_ALLOC:
@@ -227,6 +325,39 @@ IN_FILE int get_error_msg(const int error_code, char **error_msg)
         case ERROR_WHFAST_STUMPFF_Z_NAN:
             *error_msg = "C library error: NaN value detected in whfast stumpff function.\n";
             return SUCCESS;
+        case ERROR_WHFAST_UNKNOWN_COORDINATE_SYSTEM:
+            *error_msg = "C library error: Coordinate system not recognized in whfast.\n";
+            return SUCCESS;
+        case ERROR_WHFAST_ACC_DEMOCRATIC_HELIOCENTRIC_MEMORY_ALLOC:
+            *error_msg = "C library error: Memory allocation failed in whfast for democratic heliocentric acceleration.\n";
+            return SUCCESS;
+
+        // MERCURIUS integrator
+        case ERROR_MERCURIUS_UNKNOWN_ACCELERATION_METHOD:
+            *error_msg = "C library error: Acceleration method not recognized in mercurius.\n";
+            return SUCCESS;
+        case ERROR_MERCURIUS_MEMORY_ALLOC:
+            *error_msg = "C library error: Memory allocation failed in mercurius().\n";
+            return SUCCESS;
+
+        // Yoshida integrator
+        case ERROR_UNKNOWN_YOSHIDA_METHOD:
+            *error_msg = "C library error: Yoshida method not recognized in get_yoshida_weights().\n";
+            return SUCCESS;
+        case ERROR_YOSHIDA_MEMORY_ALLOC:
+            *error_msg = "C library error: Memory allocation failed in yoshida().\n";
+            return SUCCESS;
+
+        // SABA integrator
+        case ERROR_UNKNOWN_SABA_METHOD:
+            *error_msg = "C library error: SABA method not recognized in get_saba_coefficients().\n";
+            return SUCCESS;
+        case ERROR_SABA_UNKNOWN_ACCELERATION_METHOD:
+            *error_msg = "C library error: Acceleration method not recognized in saba().\n";
+            return SUCCESS;
+        case ERROR_SABA_MEMORY_ALLOC:
+            *error_msg = "C library error: Memory allocation failed in saba().\n";
+            return SUCCESS;
 
         default:
             return ERROR_UNKNOWN_ERROR_CODE;
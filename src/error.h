@@ -34,6 +34,16 @@
 // 300 - 399: Adaptive step size integrator error (general)
 #define ERROR_INITIAL_DT_NEGATIVE 300
 
+// 400 - 499: Simulation context error
+#define ERROR_SIM_CONTEXT_NULL 400
+#define ERROR_SIM_CONTEXT_MEMORY_ALLOC 401
+#define ERROR_SIM_CONTEXT_NAME_TOO_LONG 402
+#define ERROR_SIM_CONTEXT_INTEGRATOR_NOT_SET 403
+#define ERROR_SIM_CONTEXT_DT_NON_POSITIVE 404
+#define ERROR_SIM_STEP_ADAPTIVE_STEP_SIZE_INTEGRATOR 405
+#define ERROR_SIM_STEP_NEGATIVE_N_STEPS 406
+#define ERROR_SIM_INTEGRATE_TO_PAST 407
+
 
 /* Acceleration */
 // 500 - 1999: Reserved for acceleration error
@@ -76,6 +86,16 @@
 // #define ERROR_STORE_SOLUTION_STEP_METHOD_DISABLED 2003
 #define ERROR_STORE_SOLUTION_STEP_UNKNOWN_METHOD 2004
 #define ERROR_SOL_OUTPUT_EXTEND_MEMORY_REALLOC 2005
+#define ERROR_RING_CAPACITY_NON_POSITIVE 2006
+#define ERROR_STORED_INDEX_OUT_OF_RANGE 2007
+#define ERROR_UNKNOWN_STORING_DTYPE 2008
+#define ERROR_STORING_DTYPE_NOT_SUPPORTED 2009
+#define ERROR_DISTANCE_INDEX_OUT_OF_RANGE 2010
+#define ERROR_DISTANCE_TRIGGER_MEMORY_ALLOC 2011
+#define ERROR_LIVE_STATE_INVALID_HEADER 2012
+#define ERROR_LIVE_STATE_CAPACITY_EXCEEDED 2013
+#define ERROR_OBJECT_SLOTS_MEMORY_ALLOC 2014
+#define ERROR_STORING_BIG_ENDIAN_NOT_SUPPORTED 2015
 
 
 // 2100 - 2199: Flush error
@@ -83,12 +103,24 @@
 #define ERROR_FLUSH_FILE_CLOSE 2101
 #define ERROR_FLUSH_FILE_CLOSE_IS_NULL 2102
 #define ERROR_FLUSH_FILE_CLOSE_NOT_FLUSH_METHOD 2103
+#define ERROR_FLUSH_WRITER_MEMORY_ALLOC 2104
+#define ERROR_FLUSH_WRITER_THREAD_CREATE 2105
+#define ERROR_FLUSH_WRITER_WRITE 2106
+
+// 2200 - 2299: Memory-mapped file error
+#define ERROR_MMAP_NOT_SUPPORTED 2200
+#define ERROR_MMAP_FILE_OPEN 2201
+#define ERROR_MMAP_FILE_RESIZE 2202
+#define ERROR_MMAP_MAP 2203
+#define ERROR_MMAP_FILE_CLOSE 2204
+#define ERROR_MMAP_FILE_INCOMPATIBLE 2205
 
 // 2500 - 2999: Settings error
 
 /* Integrator */
 // 3000 - 3099: Integrator error (general)
 #define ERROR_UNKNOWN_INTEGRATOR_METHOD 3000
+#define ERROR_INTEGRATOR_STATE_MEMORY_ALLOC 3001
 
 // 3100 - 3124: Euler integrator error
 #define ERROR_EULER_MEMORY_ALLOC 3100
@@ -123,6 +155,21 @@
 #define ERROR_WHFAST_ACC_MASSLESS_MEMORY_ALLOC 3403
 #define ERROR_WHFAST_STUMPFF_Z_INFINITE 3404
 #define ERROR_WHFAST_STUMPFF_Z_NAN 3405
+#define ERROR_WHFAST_UNKNOWN_COORDINATE_SYSTEM 3406
+#define ERROR_WHFAST_ACC_DEMOCRATIC_HELIOCENTRIC_MEMORY_ALLOC 3407
+
+// 3500 - 3599: MERCURIUS integrator error
+#define ERROR_MERCURIUS_UNKNOWN_ACCELERATION_METHOD 3500
+#define ERROR_MERCURIUS_MEMORY_ALLOC 3501
+
+// 3600 - 3649: Yoshida integrator error
+#define ERROR_UNKNOWN_YOSHIDA_METHOD 3600
+#define ERROR_YOSHIDA_MEMORY_ALLOC 3601
+
+// 3650 - 3699: SABA integrator error
+#define ERROR_UNKNOWN_SABA_METHOD 3650
+#define ERROR_SABA_UNKNOWN_ACCELERATION_METHOD 3651
+#define ERROR_SABA_MEMORY_ALLOC 3652
 
 /* Functions prototypes */
 /**
@@ -134,4 +181,15 @@
  */
 void print_error_msg(const int error_code);
 
+/**
+ * \brief Get the error message of the error code, e.g. for raising
+ *        exceptions in Python
+ * 
+ * \param error_code Error code
+ * 
+ * \return Pointer to the error message with static storage duration,
+ *         or NULL if the error code is not recognized
+ */
+const char *get_error_msg_python(const int error_code);
+
 #endif
\ No newline at end of file
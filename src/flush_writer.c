@@ -0,0 +1,348 @@
+/**
+ * \file flush_writer.c
+ * \author Ching Yin Ng
+ * \brief Function definitions for the buffered flush writer
+ *
+ * The buffers are used in a ring. Buffers queue_head to
+ * queue_head + queue_count - 1 are full and waiting to be written
+ * (or being written), and the integrator thread fills in the next
+ * one. Only the hand-over of a buffer is protected by the mutex,
+ * so copying data to the current buffer is lock-free.
+ */
+
+#ifdef USE_PTHREAD
+#include <pthread.h>
+#endif
+#include <stdbool.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+#include "error.h"
+#include "flush_writer.h"
+#include "gravity_sim.h"
+
+struct FlushWriter
+{
+    FILE *file;
+    char *buffers[FLUSH_WRITER_BUFFERS_COUNT];
+    size_t buffer_sizes[FLUSH_WRITER_BUFFERS_COUNT];
+    int current_buffer;
+    int queue_head;
+    int queue_count;
+    bool is_closing;
+    bool is_write_failed;
+    int64 max_queue_depth;
+    int64 stall_count;
+    time_t last_submit_time;
+#ifdef USE_PTHREAD
+    pthread_t thread;
+    pthread_mutex_t mutex;
+    pthread_cond_t buffer_queued;
+    pthread_cond_t buffer_freed;
+#endif
+};
+
+/**
+ * \brief Queue the current buffer to be written and move on to the
+ *        next buffer, waiting for it to be free if necessary
+ *
+ * \param flush_writer Pointer to the flush writer
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_FLUSH_WRITER_WRITE If the writer failed to write to the file
+ */
+IN_FILE int submit_current_buffer(FlushWriter *restrict flush_writer);
+
+/**
+ * \brief Write a buffer to the file
+ *
+ * \param flush_writer Pointer to the flush writer
+ * \param buffer_index Index of the buffer
+ *
+ * \return true if successful, false otherwise
+ */
+IN_FILE bool write_buffer(FlushWriter *flush_writer, int buffer_index);
+
+#ifdef USE_PTHREAD
+/**
+ * \brief Main loop of the writer thread, which drains the queued buffers
+ *
+ * \param arg Pointer to the flush writer
+ *
+ * \return NULL
+ */
+IN_FILE void *writer_thread_main(void *arg);
+#endif
+
+/**
+ * \brief Free the flush writer and its buffers
+ *
+ * \param flush_writer Pointer to the flush writer
+ */
+IN_FILE void free_flush_writer(FlushWriter *flush_writer);
+
+WIN32DLL_API int flush_writer_create(FlushWriter **flush_writer, FILE *file)
+{
+    *flush_writer = NULL;
+
+    FlushWriter *writer = calloc(1, sizeof(FlushWriter));
+    if (!writer)
+    {
+        return ERROR_FLUSH_WRITER_MEMORY_ALLOC;
+    }
+    writer->file = file;
+    writer->last_submit_time = time(NULL);
+    for (int i = 0; i < FLUSH_WRITER_BUFFERS_COUNT; i++)
+    {
+        writer->buffers[i] = malloc(FLUSH_WRITER_BUFFER_SIZE);
+        if (!writer->buffers[i])
+        {
+            free_flush_writer(writer);
+            return ERROR_FLUSH_WRITER_MEMORY_ALLOC;
+        }
+    }
+
+#ifdef USE_PTHREAD
+    pthread_mutex_init(&writer->mutex, NULL);
+    pthread_cond_init(&writer->buffer_queued, NULL);
+    pthread_cond_init(&writer->buffer_freed, NULL);
+    if (pthread_create(&writer->thread, NULL, writer_thread_main, writer) != 0)
+    {
+        pthread_mutex_destroy(&writer->mutex);
+        pthread_cond_destroy(&writer->buffer_queued);
+        pthread_cond_destroy(&writer->buffer_freed);
+        free_flush_writer(writer);
+        return ERROR_FLUSH_WRITER_THREAD_CREATE;
+    }
+#endif
+
+    *flush_writer = writer;
+    return SUCCESS;
+}
+
+WIN32DLL_API int flush_writer_write(
+    FlushWriter *restrict flush_writer,
+    const void *restrict data,
+    size_t size
+)
+{
+    const char *bytes = data;
+    while (size > 0)
+    {
+        const int current_buffer = flush_writer->current_buffer;
+        size_t space = FLUSH_WRITER_BUFFER_SIZE - flush_writer->buffer_sizes[current_buffer];
+        if (space == 0)
+        {
+            int return_code = submit_current_buffer(flush_writer);
+            if (return_code != SUCCESS)
+            {
+                return return_code;
+            }
+            continue;
+        }
+
+        size_t copy_size = (size < space) ? size : space;
+        memcpy(
+            &flush_writer->buffers[current_buffer][flush_writer->buffer_sizes[current_buffer]],
+            bytes,
+            copy_size
+        );
+        flush_writer->buffer_sizes[current_buffer] += copy_size;
+        bytes += copy_size;
+        size -= copy_size;
+    }
+
+    return SUCCESS;
+}
+
+WIN32DLL_API int flush_writer_get_space(
+    FlushWriter *restrict flush_writer,
+    size_t size,
+    char **restrict space
+)
+{
+    int current_buffer = flush_writer->current_buffer;
+    if (FLUSH_WRITER_BUFFER_SIZE - flush_writer->buffer_sizes[current_buffer] < size)
+    {
+        int return_code = submit_current_buffer(flush_writer);
+        if (return_code != SUCCESS)
+        {
+            return return_code;
+        }
+        current_buffer = flush_writer->current_buffer;
+    }
+
+    *space = &flush_writer->buffers[current_buffer][flush_writer->buffer_sizes[current_buffer]];
+    return SUCCESS;
+}
+
+WIN32DLL_API void flush_writer_commit(FlushWriter *restrict flush_writer, size_t size)
+{
+    flush_writer->buffer_sizes[flush_writer->current_buffer] += size;
+}
+
+WIN32DLL_API int flush_writer_flush_if_due(FlushWriter *restrict flush_writer)
+{
+    if (flush_writer->buffer_sizes[flush_writer->current_buffer] == 0)
+    {
+        return SUCCESS;
+    }
+    if (difftime(time(NULL), flush_writer->last_submit_time) < FLUSH_WRITER_FLUSH_INTERVAL)
+    {
+        return SUCCESS;
+    }
+
+    return submit_current_buffer(flush_writer);
+}
+
+WIN32DLL_API int flush_writer_close(
+    FlushWriter *flush_writer,
+    int64 *restrict max_queue_depth,
+    int64 *restrict stall_count
+)
+{
+    int return_code = SUCCESS;
+
+    if (flush_writer->buffer_sizes[flush_writer->current_buffer] > 0)
+    {
+        return_code = submit_current_buffer(flush_writer);
+    }
+
+#ifdef USE_PTHREAD
+    pthread_mutex_lock(&flush_writer->mutex);
+    flush_writer->is_closing = true;
+    pthread_cond_signal(&flush_writer->buffer_queued);
+    pthread_mutex_unlock(&flush_writer->mutex);
+    pthread_join(flush_writer->thread, NULL);
+
+    pthread_mutex_destroy(&flush_writer->mutex);
+    pthread_cond_destroy(&flush_writer->buffer_queued);
+    pthread_cond_destroy(&flush_writer->buffer_freed);
+#endif
+
+    if (flush_writer->is_write_failed)
+    {
+        return_code = ERROR_FLUSH_WRITER_WRITE;
+    }
+    if (max_queue_depth)
+    {
+        *max_queue_depth = flush_writer->max_queue_depth;
+    }
+    if (stall_count)
+    {
+        *stall_count = flush_writer->stall_count;
+    }
+
+    free_flush_writer(flush_writer);
+
+    return return_code;
+}
+
+IN_FILE int submit_current_buffer(FlushWriter *restrict flush_writer)
+{
+    flush_writer->last_submit_time = time(NULL);
+
+#ifdef USE_PTHREAD
+    pthread_mutex_lock(&flush_writer->mutex);
+
+    flush_writer->queue_count++;
+    if (flush_writer->queue_count > flush_writer->max_queue_depth)
+    {
+        flush_writer->max_queue_depth = flush_writer->queue_count;
+    }
+    pthread_cond_signal(&flush_writer->buffer_queued);
+
+    // Back-pressure: wait for the writer thread if all buffers are full
+    if (flush_writer->queue_count == FLUSH_WRITER_BUFFERS_COUNT)
+    {
+        flush_writer->stall_count++;
+        while (flush_writer->queue_count == FLUSH_WRITER_BUFFERS_COUNT)
+        {
+            pthread_cond_wait(&flush_writer->buffer_freed, &flush_writer->mutex);
+        }
+    }
+    flush_writer->current_buffer = (
+        (flush_writer->queue_head + flush_writer->queue_count)
+        % FLUSH_WRITER_BUFFERS_COUNT
+    );
+    const bool is_write_failed = flush_writer->is_write_failed;
+
+    pthread_mutex_unlock(&flush_writer->mutex);
+#else
+    flush_writer->max_queue_depth = 1;
+    if (!write_buffer(flush_writer, flush_writer->current_buffer))
+    {
+        flush_writer->is_write_failed = true;
+    }
+    const bool is_write_failed = flush_writer->is_write_failed;
+    flush_writer->current_buffer = (flush_writer->current_buffer + 1) % FLUSH_WRITER_BUFFERS_COUNT;
+#endif
+
+    if (is_write_failed)
+    {
+        return ERROR_FLUSH_WRITER_WRITE;
+    }
+
+    return SUCCESS;
+}
+
+IN_FILE bool write_buffer(FlushWriter *flush_writer, int buffer_index)
+{
+    const size_t size = flush_writer->buffer_sizes[buffer_index];
+    const bool is_success = (
+        fwrite(flush_writer->buffers[buffer_index], 1, size, flush_writer->file) == size
+        && fflush(flush_writer->file) == 0
+    );
+    flush_writer->buffer_sizes[buffer_index] = 0;
+
+    return is_success;
+}
+
+#ifdef USE_PTHREAD
+IN_FILE void *writer_thread_main(void *arg)
+{
+    FlushWriter *flush_writer = arg;
+
+    pthread_mutex_lock(&flush_writer->mutex);
+    while (true)
+    {
+        while (flush_writer->queue_count == 0 && !flush_writer->is_closing)
+        {
+            pthread_cond_wait(&flush_writer->buffer_queued, &flush_writer->mutex);
+        }
+        if (flush_writer->queue_count == 0)
+        {
+            break;
+        }
+
+        // The buffer stays in the queue until it is written
+        const int buffer_index = flush_writer->queue_head;
+        pthread_mutex_unlock(&flush_writer->mutex);
+
+        const bool is_success = write_buffer(flush_writer, buffer_index);
+
+        pthread_mutex_lock(&flush_writer->mutex);
+        if (!is_success)
+        {
+            flush_writer->is_write_failed = true;
+        }
+        flush_writer->queue_head = (flush_writer->queue_head + 1) % FLUSH_WRITER_BUFFERS_COUNT;
+        flush_writer->queue_count--;
+        pthread_cond_signal(&flush_writer->buffer_freed);
+    }
+    pthread_mutex_unlock(&flush_writer->mutex);
+
+    return NULL;
+}
+#endif
+
+IN_FILE void free_flush_writer(FlushWriter *flush_writer)
+{
+    for (int i = 0; i < FLUSH_WRITER_BUFFERS_COUNT; i++)
+    {
+        free(flush_writer->buffers[i]);
+    }
+    free(flush_writer);
+}
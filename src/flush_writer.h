@@ -0,0 +1,118 @@
+/**
+ * \file flush_writer.h
+ * \author Ching Yin Ng
+ * \brief Function prototypes for the buffered flush writer
+ *
+ * The flush writer keeps a ring of FLUSH_WRITER_BUFFERS_COUNT buffers.
+ * The integrator thread copies the snapshots into the current buffer,
+ * and a dedicated writer thread drains the full buffers to the disk,
+ * so that the integrator does not stall on disk I/O. If the writer
+ * thread falls behind and all buffers are full, the integrator waits
+ * until a buffer is free (back-pressure).
+ *
+ * A partially filled buffer is also queued by flush_writer_flush_if_due()
+ * once FLUSH_WRITER_FLUSH_INTERVAL seconds have passed since the last
+ * buffer was queued, so that slow simulations still reach the file
+ * regularly. The file is flushed to the operating system after each
+ * buffer, but not synced to the disk.
+ *
+ * The writer thread requires pthread (compiled with USE_PTHREAD).
+ * Otherwise, the full buffers are written synchronously.
+ */
+
+#ifndef FLUSH_WRITER_H
+#define FLUSH_WRITER_H
+
+#include "gravity_sim.h"
+
+#define FLUSH_WRITER_BUFFERS_COUNT 4
+#define FLUSH_WRITER_BUFFER_SIZE (1 << 20)
+#define FLUSH_WRITER_FLUSH_INTERVAL 1.0    // Seconds
+
+/**
+ * \brief Create a flush writer for the file
+ *
+ * \param flush_writer Pointer of pointer to the flush writer to be created
+ * \param file Pointer to the opened file
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_FLUSH_WRITER_MEMORY_ALLOC If memory allocation failed
+ * \retval ERROR_FLUSH_WRITER_THREAD_CREATE If failed to create the writer thread
+ */
+int flush_writer_create(FlushWriter **flush_writer, FILE *file);
+
+/**
+ * \brief Copy data to the flush writer
+ *
+ * \param flush_writer Pointer to the flush writer
+ * \param data Pointer to the data
+ * \param size Size of the data in bytes
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_FLUSH_WRITER_WRITE If the writer failed to write to the file
+ */
+int flush_writer_write(
+    FlushWriter *restrict flush_writer,
+    const void *restrict data,
+    size_t size
+);
+
+/**
+ * \brief Get contiguous space in the current buffer to be filled in
+ *        directly, e.g. by snprintf(). Call flush_writer_commit()
+ *        with the number of bytes used afterwards.
+ *
+ * \param flush_writer Pointer to the flush writer
+ * \param size Size of the space in bytes, at most FLUSH_WRITER_BUFFER_SIZE
+ * \param space Pointer of pointer to the space
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_FLUSH_WRITER_WRITE If the writer failed to write to the file
+ */
+int flush_writer_get_space(
+    FlushWriter *restrict flush_writer,
+    size_t size,
+    char **restrict space
+);
+
+/**
+ * \brief Commit bytes filled in the space from flush_writer_get_space()
+ *
+ * \param flush_writer Pointer to the flush writer
+ * \param size Number of bytes filled in
+ */
+void flush_writer_commit(FlushWriter *restrict flush_writer, size_t size);
+
+/**
+ * \brief Queue the current buffer to be written if it is not empty and
+ *        FLUSH_WRITER_FLUSH_INTERVAL seconds have passed since the last
+ *        buffer was queued. Call it after each complete snapshot, so
+ *        that the file only has complete snapshots in between.
+ *
+ * \param flush_writer Pointer to the flush writer
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_FLUSH_WRITER_WRITE If the writer failed to write to the file
+ */
+int flush_writer_flush_if_due(FlushWriter *restrict flush_writer);
+
+/**
+ * \brief Write all remaining data, stop the writer thread and free
+ *        the flush writer. The file is not closed.
+ *
+ * \param flush_writer Pointer to the flush writer
+ * \param max_queue_depth Pointer to the maximum number of full buffers
+ *                        waiting to be written, can be NULL
+ * \param stall_count Pointer to the number of times the integrator
+ *                    waited for a free buffer, can be NULL
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_FLUSH_WRITER_WRITE If the writer failed to write to the file
+ */
+int flush_writer_close(
+    FlushWriter *flush_writer,
+    int64 *restrict max_queue_depth,
+    int64 *restrict stall_count
+);
+
+#endif
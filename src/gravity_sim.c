@@ -7,12 +7,51 @@
 #include "error.h"
 #include "gravity_sim.h"
 #include "integrator.h"
+#include "integrator_state.h"
+#include "live_state.h"
 #include "storing.h"
+#include "storing_mmap.h"
 
 // IN_FILE int initialize_system(
 //     System *restrict system
 // );
 
+#define SIM_CONTEXT_NAME_SIZE 32
+
+struct SimulationContext
+{
+    System system;
+    IntegratorParam integrator_param;
+    AccelerationParam acceleration_param;
+    IntegratorState *integrator_state;
+    int (*integrator)(
+        System *system,
+        IntegratorParam *integrator_param,
+        AccelerationParam *acceleration_param,
+        StoringParam *storing_param,
+        Solutions *solutions,
+        SimulationStatus *simulation_status,
+        Settings *settings,
+        SimulationParam *simulation_param
+    );
+    bool is_fixed_step_size_integrator;
+    real t;
+    int verbose;
+    bool is_exit;
+
+    // Parameters passed to the integrator in every run, set up once
+    // in sim_create(). The simulation context does not store solutions
+    StoringParam storing_param;
+    Solutions solutions;
+    int64 sol_size;
+    Settings settings;
+
+    // Copies of the names, as the parameters only keep the pointers
+    char integrator_name[SIM_CONTEXT_NAME_SIZE];
+    char whfast_coordinate_system[SIM_CONTEXT_NAME_SIZE];
+    char acceleration_method[SIM_CONTEXT_NAME_SIZE];
+};
+
 /**
  * \brief Check if the integrator is a fixed step size integrator
  * 
@@ -29,6 +68,29 @@ IN_FILE int check_is_fixed_step_size_integrator(
     bool *restrict is_fixed_step_size_integrator
 );
 
+/**
+ * \brief Get the integrator function
+ * 
+ * \param integrator Name of the integrator
+ * \param integrator_function Pointer to the integrator function to be updated
+ * 
+ * \retval SUCCESS If the integrator is recognized
+ * \retval ERROR_UNKNOWN_INTEGRATOR_METHOD If the integrator is not recognized
+ */
+IN_FILE int get_integrator_function(
+    const char *restrict integrator,
+    int (**integrator_function)(
+        System *system,
+        IntegratorParam *integrator_param,
+        AccelerationParam *acceleration_param,
+        StoringParam *storing_param,
+        Solutions *solutions,
+        SimulationStatus *simulation_status,
+        Settings *settings,
+        SimulationParam *simulation_param
+    )
+);
+
 /**
  * \brief Launch simulation helper function
  * 
@@ -55,6 +117,20 @@ IN_FILE int _launch_simulation(
     SimulationParam *simulation_param
 );
 
+/**
+ * \brief Run the integrator of the simulation context
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * \param simulation_param Pointer to the simulation parameters
+ * 
+ * \retval SUCCESS If the simulation is successful
+ * \retval error code If there is any error
+ */
+IN_FILE int sim_run(
+    SimulationContext *simulation_context,
+    SimulationParam *simulation_param
+);
+
 WIN32DLL_API int launch_simulation_python(
     real *x,
     real *v,
@@ -69,6 +145,7 @@ WIN32DLL_API int launch_simulation_python(
     int whfast_kepler_max_iter,
     bool whfast_kepler_auto_remove,
     real whfast_kepler_auto_remove_tol,
+    const char *whfast_coordinate_system,
     const char *acceleration_method,
     real opening_angle,
     real softening_length,
@@ -76,6 +153,19 @@ WIN32DLL_API int launch_simulation_python(
     const char *storing_method,
     const char *flush_path,
     int storing_freq,
+    real output_interval,
+    bool flush_energy,
+    int64 ring_capacity,
+    const int *stored_indices,
+    int stored_objects_count,
+    bool store_velocity,
+    const char *storing_dtype,
+    SnapshotCallback snapshot_callback,
+    real distance_threshold,
+    const int *distance_indices,
+    int distance_objects_count,
+    void *live_state,
+    int live_state_freq,
     double **sol_state,
     double **sol_time,
     double **sol_dt,
@@ -83,6 +173,9 @@ WIN32DLL_API int launch_simulation_python(
     real *t,
     real *simulation_status_last_dt,
     real *run_time_,
+    int64 *flush_max_queue_depth_,
+    int64 *flush_stall_count_,
+    IntegratorState *integrator_state,
     int verbose,
     bool *is_exit,
     real tf
@@ -103,7 +196,8 @@ WIN32DLL_API int launch_simulation_python(
         .whfast_kepler_tol = whfast_kepler_tol,
         .whfast_kepler_max_iter = whfast_kepler_max_iter,
         .whfast_kepler_auto_remove = whfast_kepler_auto_remove,
-        .whfast_kepler_auto_remove_tol = whfast_kepler_auto_remove_tol
+        .whfast_kepler_auto_remove_tol = whfast_kepler_auto_remove_tol,
+        .whfast_coordinate_system = whfast_coordinate_system
     };
     AccelerationParam *acceleration_param = &(AccelerationParam) {
         .method = acceleration_method,
@@ -116,9 +210,40 @@ WIN32DLL_API int launch_simulation_python(
         .method = storing_method,
         .flush_path = flush_path,
         .storing_freq = storing_freq,
+        .output_interval = output_interval,
+        .flush_energy = flush_energy,
+        .ring_capacity = ring_capacity,
+        .stored_indices = stored_indices,
+        .stored_objects_count = stored_objects_count,
+        .store_velocity = store_velocity,
+        .storing_dtype = storing_dtype,
+        .snapshot_callback = snapshot_callback,
+        .distance_threshold = distance_threshold,
+        .distance_indices = distance_indices,
+        .distance_objects_count = distance_objects_count,
+        .live_state = live_state,
+        .live_state_freq = live_state_freq,
         .storing_method_flag_ = 0,
+        .storing_dtype_flag_ = 0,
         .flush_file_ = NULL,
-        .max_sol_size_ = 0
+        .flush_writer_ = NULL,
+        .flush_objects_count_ = 0,
+        .flush_max_queue_depth_ = 0,
+        .flush_stall_count_ = 0,
+        .mmap_fd_ = -1,
+        .mmap_data_ = NULL,
+        .mmap_header_size_ = 0,
+        .mmap_records_offset_ = 0,
+        .state_length_ = 0,
+        .state_size_ = 0,
+        .max_sol_size_ = 0,
+        .is_callback_stop_ = false,
+        .last_stored_x_ = NULL,
+        .is_last_stored_x_set_ = false,
+        .is_last_step_skipped_ = false,
+        .live_state_count_ = 0,
+        .initial_objects_count_ = 0,
+        .object_slots_ = NULL
     };
     Solutions *solutions = &(Solutions) {
         .sol_state = *sol_state,
@@ -129,7 +254,8 @@ WIN32DLL_API int launch_simulation_python(
     SimulationStatus *simulation_status = &(SimulationStatus) {
         .t = t,
         .dt = 0.0,
-        .run_time_ = 0.0
+        .run_time_ = 0.0,
+        .integrator_state = integrator_state
     };
     Settings *settings = &(Settings) {
         .verbose = verbose,
@@ -155,6 +281,8 @@ WIN32DLL_API int launch_simulation_python(
     *sol_dt = solutions->sol_dt;
     *simulation_status_last_dt = simulation_status->dt;
     *run_time_ = simulation_status->run_time_;
+    *flush_max_queue_depth_ = storing_param->flush_max_queue_depth_;
+    *flush_stall_count_ = storing_param->flush_stall_count_;
 
     return return_code;
 }
@@ -232,7 +360,13 @@ IN_FILE int check_is_fixed_step_size_integrator(
         || strcmp(integrator, "euler_cromer") == 0
         || strcmp(integrator, "rk4") == 0
         || strcmp(integrator, "leapfrog") == 0
+        || strcmp(integrator, "yoshida4") == 0
+        || strcmp(integrator, "yoshida6") == 0
+        || strcmp(integrator, "yoshida8") == 0
         || strcmp(integrator, "whfast") == 0
+        || strcmp(integrator, "saba4") == 0
+        || strcmp(integrator, "sbab4") == 0
+        || strcmp(integrator, "mercurius") == 0
     )
     {
         *is_fixed_step_size_integrator = true;
@@ -255,6 +389,80 @@ IN_FILE int check_is_fixed_step_size_integrator(
     }
 }
 
+IN_FILE int get_integrator_function(
+    const char *restrict integrator,
+    int (**integrator_function)(
+        System *system,
+        IntegratorParam *integrator_param,
+        AccelerationParam *acceleration_param,
+        StoringParam *storing_param,
+        Solutions *solutions,
+        SimulationStatus *simulation_status,
+        Settings *settings,
+        SimulationParam *simulation_param
+    )
+)
+{
+    if (strcmp(integrator, "euler") == 0)
+    {
+        *integrator_function = euler;
+    }
+    else if (strcmp(integrator, "euler_cromer") == 0)
+    {
+        *integrator_function = euler_cromer;
+    }
+    else if (strcmp(integrator, "rk4") == 0)
+    {
+        *integrator_function = rk4;
+    }
+    else if (strcmp(integrator, "leapfrog") == 0)
+    {
+        *integrator_function = leapfrog;
+    }
+    else if (
+        strcmp(integrator, "yoshida4") == 0
+        || strcmp(integrator, "yoshida6") == 0
+        || strcmp(integrator, "yoshida8") == 0
+    )
+    {
+        *integrator_function = yoshida;
+    }
+    else if (
+        strcmp(integrator, "rkf45") == 0
+        || strcmp(integrator, "dopri") == 0
+        || strcmp(integrator, "dverk") == 0
+        || strcmp(integrator, "rkf78") == 0
+    )
+    {
+        *integrator_function = rk_embedded;
+    }
+    else if (strcmp(integrator, "ias15") == 0)
+    {
+        *integrator_function = ias15;
+    }
+    else if (strcmp(integrator, "whfast") == 0)
+    {
+        *integrator_function = whfast;
+    }
+    else if (
+        strcmp(integrator, "saba4") == 0
+        || strcmp(integrator, "sbab4") == 0
+    )
+    {
+        *integrator_function = saba;
+    }
+    else if (strcmp(integrator, "mercurius") == 0)
+    {
+        *integrator_function = mercurius;
+    }
+    else
+    {
+        return ERROR_UNKNOWN_INTEGRATOR_METHOD;
+    }
+
+    return SUCCESS;
+}
+
 IN_FILE int _launch_simulation(
     System *system,
     IntegratorParam *integrator_param,
@@ -290,8 +498,18 @@ IN_FILE int _launch_simulation(
     }
     else
     {
-        // Initial buffer size
-        storing_param->max_sol_size_ = ADAPTIVE_STEP_SIZE_SOL_BUFFER_SIZE;
+        // Initial buffer size, which is known for dense output
+        if (storing_param->output_interval > 0.0)
+        {
+            storing_param->max_sol_size_ = (int64) (
+                simulation_param->tf / storing_param->output_interval + 1e-9
+            );
+            storing_param->max_sol_size_ += 1;    // +1 for initial state
+        }
+        else
+        {
+            storing_param->max_sol_size_ = ADAPTIVE_STEP_SIZE_SOL_BUFFER_SIZE;
+        }
 
         if (integrator_param->initial_dt < 0.0)
         {
@@ -307,18 +525,50 @@ IN_FILE int _launch_simulation(
     /* Output storage */
     *(solutions->sol_size_) = 0;
     *(simulation_status->t) = 0.0;
-    if (storing_param->storing_method_flag_ == STORING_METHOD_DEFAULT)
+    return_code = setup_stored_state(storing_param, system);
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+    return_code = setup_distance_trigger(storing_param, system);
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+    return_code = setup_live_state(storing_param, system);
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+    if (storing_param->storing_method_flag_ == STORING_METHOD_RING)
+    {
+        if (storing_param->ring_capacity <= 0)
+        {
+            return_code = ERROR_RING_CAPACITY_NON_POSITIVE;
+            goto error;
+        }
+    }
+    if (
+        storing_param->storing_method_flag_ == STORING_METHOD_DEFAULT
+        || storing_param->storing_method_flag_ == STORING_METHOD_RING
+    )
     {
         return_code = allocate_solutions_memory(
             solutions,
-            storing_param,
-            system->objects_count
+            storing_param
         );
     }
-    else if (storing_param->storing_method_flag_ == STORING_METHOD_FLUSH)
+    else if (
+        storing_param->storing_method_flag_ == STORING_METHOD_FLUSH
+        || storing_param->storing_method_flag_ == STORING_METHOD_FLUSH_BINARY
+    )
     {
         return_code = open_flush_file(storing_param);
     }
+    else if (storing_param->storing_method_flag_ == STORING_METHOD_MEMMAP)
+    {
+        return_code = open_mmap_solutions(storing_param, system);
+    }
     if (return_code != SUCCESS)
     {
         goto error;
@@ -347,43 +597,12 @@ IN_FILE int _launch_simulation(
         Settings *settings,
         SimulationParam *simulation_param
     );
-
-    if (strcmp(integrator_param->integrator, "euler") == 0)
-    {
-        integrator = euler;
-    }
-    else if (strcmp(integrator_param->integrator, "euler_cromer") == 0)
-    {
-        integrator = euler_cromer;
-    }
-    else if (strcmp(integrator_param->integrator, "rk4") == 0)
-    {
-        integrator = rk4;
-    }
-    else if (strcmp(integrator_param->integrator, "leapfrog") == 0)
-    {
-        integrator = leapfrog;
-    }
-    else if (
-        strcmp(integrator_param->integrator, "rkf45") == 0
-        || strcmp(integrator_param->integrator, "dopri") == 0
-        || strcmp(integrator_param->integrator, "dverk") == 0
-        || strcmp(integrator_param->integrator, "rkf78") == 0
-    )
-    {
-        integrator = rk_embedded;
-    }
-    else if (strcmp(integrator_param->integrator, "ias15") == 0)
-    {
-        integrator = ias15;
-    }
-    else if (strcmp(integrator_param->integrator, "whfast") == 0)
-    {
-        integrator = whfast;
-    }
-    else
+    return_code = get_integrator_function(
+        integrator_param->integrator,
+        &integrator
+    );
+    if (return_code != SUCCESS)
     {
-        return_code = ERROR_UNKNOWN_INTEGRATOR_METHOD;
         goto error;
     }
 
@@ -407,8 +626,36 @@ IN_FILE int _launch_simulation(
     end_time = clock();
     simulation_status->run_time_ = (real) (end_time - start_time) / CLOCKS_PER_SEC;
 
+    return_code = store_final_solution_step(
+        storing_param,
+        system,
+        simulation_status,
+        solutions,
+        simulation_param->tf
+    );
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+
+    // Publish the final state, which may be skipped by live_state_freq
+    if (storing_param->live_state)
+    {
+        publish_live_state(storing_param, system, simulation_status);
+    }
+
+    /* Release the unused solution buffer */
+    if (storing_param->storing_method_flag_ == STORING_METHOD_RING)
+    {
+        finalize_ring_solutions(solutions, storing_param);
+    }
+    shrink_sol_memory_buffer(solutions, storing_param);
+
     /* Close flush file */
-    if (storing_param->storing_method_flag_ == STORING_METHOD_FLUSH)
+    if (
+        storing_param->storing_method_flag_ == STORING_METHOD_FLUSH
+        || storing_param->storing_method_flag_ == STORING_METHOD_FLUSH_BINARY
+    )
     {
         return_code = close_flush_file(storing_param);
         if (return_code != SUCCESS)
@@ -416,13 +663,540 @@ IN_FILE int _launch_simulation(
             goto error;
         }
     }
+    else if (storing_param->storing_method_flag_ == STORING_METHOD_MEMMAP)
+    {
+        return_code = close_mmap_solutions(storing_param, *(solutions->sol_size_));
+        if (return_code != SUCCESS)
+        {
+            goto error;
+        }
+    }
+    free_distance_trigger(storing_param);
+    free_object_slots(storing_param);
+
+    return SUCCESS;
+
+error:
+    free_distance_trigger(storing_param);
+    free_object_slots(storing_param);
+    // Stop the flush writer thread
+    if (storing_param->flush_file_)
+    {
+        close_flush_file(storing_param);
+    }
+    // Keep the stored solutions in the memory-mapped file
+    if (storing_param->mmap_fd_ >= 0)
+    {
+        close_mmap_solutions(storing_param, *(solutions->sol_size_));
+    }
+    return return_code;
+}
+
+WIN32DLL_API SimulationContext *sim_create(
+    const real *x,
+    const real *v,
+    const real *m,
+    int objects_count,
+    real G
+)
+{
+    SimulationContext *simulation_context = calloc(1, sizeof(SimulationContext));
+    if (!simulation_context)
+    {
+        return NULL;
+    }
+
+    System *system = &(simulation_context->system);
+    system->x = malloc(objects_count * 3 * sizeof(real));
+    system->v = malloc(objects_count * 3 * sizeof(real));
+    system->m = malloc(objects_count * sizeof(real));
+    simulation_context->integrator_state = create_integrator_state();
+    if (!system->x || !system->v || !system->m || !simulation_context->integrator_state)
+    {
+        sim_destroy(simulation_context);
+        return NULL;
+    }
+    memcpy(system->x, x, objects_count * 3 * sizeof(real));
+    memcpy(system->v, v, objects_count * 3 * sizeof(real));
+    memcpy(system->m, m, objects_count * sizeof(real));
+    system->objects_count = objects_count;
+    system->G = G;
+
+    /* Default parameters */
+    strcpy(simulation_context->whfast_coordinate_system, "jacobi");
+    strcpy(simulation_context->acceleration_method, "pairwise");
+    simulation_context->integrator_param = (IntegratorParam) {
+        .integrator = simulation_context->integrator_name,
+        .dt = 0.0,
+        .tolerance = 0.0,
+        .initial_dt = 0.0,
+        .whfast_kepler_tol = 1e-12,
+        .whfast_kepler_max_iter = 500,
+        .whfast_kepler_auto_remove = false,
+        .whfast_kepler_auto_remove_tol = 1e-8,
+        .whfast_coordinate_system = simulation_context->whfast_coordinate_system
+    };
+    simulation_context->acceleration_param = (AccelerationParam) {
+        .method = simulation_context->acceleration_method,
+        .opening_angle = 0.5,
+        .softening_length = 0.0,
+        .order = 0,
+        .acceleration_method_flag_ = ACCELERATION_METHOD_PAIRWISE
+    };
+    simulation_context->integrator = NULL;
+    simulation_context->t = 0.0;
+    simulation_context->verbose = 1;
+    simulation_context->is_exit = false;
+    simulation_context->sol_size = 0;
+    simulation_context->storing_param = (StoringParam) {
+        .method = "disabled",
+        .flush_path = NULL,
+        .storing_freq = 1,
+        .output_interval = 0.0,
+        .flush_energy = false,
+        .ring_capacity = 0,
+        .stored_indices = NULL,
+        .stored_objects_count = 0,
+        .store_velocity = true,
+        .storing_dtype = "float64",
+        .snapshot_callback = NULL,
+        .distance_threshold = 0.0,
+        .distance_indices = NULL,
+        .distance_objects_count = 0,
+        .live_state = NULL,
+        .live_state_freq = 1,
+        .storing_method_flag_ = STORING_METHOD_DISABLED,
+        .storing_dtype_flag_ = STORING_DTYPE_FLOAT64,
+        .flush_file_ = NULL,
+        .flush_writer_ = NULL,
+        .flush_objects_count_ = 0,
+        .flush_max_queue_depth_ = 0,
+        .flush_stall_count_ = 0,
+        .mmap_fd_ = -1,
+        .mmap_data_ = NULL,
+        .mmap_header_size_ = 0,
+        .mmap_records_offset_ = 0,
+        .state_length_ = 0,
+        .state_size_ = 0,
+        .max_sol_size_ = 1,
+        .is_callback_stop_ = false,
+        .last_stored_x_ = NULL,
+        .is_last_stored_x_set_ = false,
+        .is_last_step_skipped_ = false,
+        .live_state_count_ = 0,
+        .initial_objects_count_ = simulation_context->system.objects_count,
+        .object_slots_ = NULL
+    };
+    simulation_context->solutions = (Solutions) {
+        .sol_state = NULL,
+        .sol_time = NULL,
+        .sol_dt = NULL,
+        .sol_size_ = &(simulation_context->sol_size)
+    };
+    simulation_context->settings = (Settings) {
+        .verbose = simulation_context->verbose,
+        .is_exit = &(simulation_context->is_exit)
+    };
+
+    return simulation_context;
+}
+
+WIN32DLL_API void sim_destroy(SimulationContext *simulation_context)
+{
+    if (!simulation_context)
+    {
+        return;
+    }
+    free(simulation_context->system.x);
+    free(simulation_context->system.v);
+    free(simulation_context->system.m);
+    free_integrator_state(simulation_context->integrator_state);
+    free(simulation_context);
+}
+
+WIN32DLL_API int sim_set_integrator(
+    SimulationContext *simulation_context,
+    const char *integrator,
+    real dt,
+    real tolerance,
+    real initial_dt
+)
+{
+    int return_code;
+
+    if (!simulation_context)
+    {
+        return_code = ERROR_SIM_CONTEXT_NULL;
+        goto error;
+    }
+    if (strlen(integrator) >= SIM_CONTEXT_NAME_SIZE)
+    {
+        return_code = ERROR_SIM_CONTEXT_NAME_TOO_LONG;
+        goto error;
+    }
+
+    bool is_fixed_step_size_integrator;
+    return_code = check_is_fixed_step_size_integrator(
+        integrator,
+        &is_fixed_step_size_integrator
+    );
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+    if (is_fixed_step_size_integrator && dt <= 0.0)
+    {
+        return_code = ERROR_SIM_CONTEXT_DT_NON_POSITIVE;
+        goto error;
+    }
+    if (initial_dt < 0.0)
+    {
+        return_code = ERROR_INITIAL_DT_NEGATIVE;
+        goto error;
+    }
+
+    return_code = get_integrator_function(
+        integrator,
+        &(simulation_context->integrator)
+    );
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+
+    strcpy(simulation_context->integrator_name, integrator);
+    simulation_context->is_fixed_step_size_integrator = is_fixed_step_size_integrator;
+    simulation_context->integrator_param.dt = dt;
+    simulation_context->integrator_param.tolerance = tolerance;
+    simulation_context->integrator_param.initial_dt = initial_dt;
+    simulation_context->integrator_state->is_saved_ = false;
+
+    return SUCCESS;
+
+error:
+    if (simulation_context && simulation_context->verbose > 0)
+    {
+        print_error_msg(return_code);
+    }
+    return return_code;
+}
+
+WIN32DLL_API int sim_set_whfast_param(
+    SimulationContext *simulation_context,
+    real whfast_kepler_tol,
+    int whfast_kepler_max_iter,
+    bool whfast_kepler_auto_remove,
+    real whfast_kepler_auto_remove_tol,
+    const char *whfast_coordinate_system
+)
+{
+    int return_code;
+
+    if (!simulation_context)
+    {
+        return_code = ERROR_SIM_CONTEXT_NULL;
+        goto error;
+    }
+    if (strlen(whfast_coordinate_system) >= SIM_CONTEXT_NAME_SIZE)
+    {
+        return_code = ERROR_SIM_CONTEXT_NAME_TOO_LONG;
+        goto error;
+    }
+
+    strcpy(simulation_context->whfast_coordinate_system, whfast_coordinate_system);
+    simulation_context->integrator_param.whfast_kepler_tol = whfast_kepler_tol;
+    simulation_context->integrator_param.whfast_kepler_max_iter = whfast_kepler_max_iter;
+    simulation_context->integrator_param.whfast_kepler_auto_remove = whfast_kepler_auto_remove;
+    simulation_context->integrator_param.whfast_kepler_auto_remove_tol = whfast_kepler_auto_remove_tol;
+    simulation_context->integrator_state->is_saved_ = false;
+
+    return SUCCESS;
+
+error:
+    if (simulation_context && simulation_context->verbose > 0)
+    {
+        print_error_msg(return_code);
+    }
+    return return_code;
+}
+
+WIN32DLL_API int sim_set_acceleration(
+    SimulationContext *simulation_context,
+    const char *acceleration_method,
+    real opening_angle,
+    real softening_length,
+    int order
+)
+{
+    int return_code;
+
+    if (!simulation_context)
+    {
+        return_code = ERROR_SIM_CONTEXT_NULL;
+        goto error;
+    }
+    if (strlen(acceleration_method) >= SIM_CONTEXT_NAME_SIZE)
+    {
+        return_code = ERROR_SIM_CONTEXT_NAME_TOO_LONG;
+        goto error;
+    }
+
+    uint acceleration_method_flag;
+    return_code = get_acceleration_method_flag(
+        acceleration_method,
+        &acceleration_method_flag
+    );
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+
+    strcpy(simulation_context->acceleration_method, acceleration_method);
+    simulation_context->acceleration_param.opening_angle = opening_angle;
+    simulation_context->acceleration_param.softening_length = softening_length;
+    simulation_context->acceleration_param.order = order;
+    simulation_context->acceleration_param.acceleration_method_flag_ = acceleration_method_flag;
+    simulation_context->integrator_state->is_saved_ = false;
+
+    return SUCCESS;
+
+error:
+    if (simulation_context && simulation_context->verbose > 0)
+    {
+        print_error_msg(return_code);
+    }
+    return return_code;
+}
+
+WIN32DLL_API void sim_set_state(
+    SimulationContext *simulation_context,
+    const real *x,
+    const real *v
+)
+{
+    if (!simulation_context)
+    {
+        return;
+    }
+    const int objects_count = simulation_context->system.objects_count;
+    memcpy(simulation_context->system.x, x, objects_count * 3 * sizeof(real));
+    memcpy(simulation_context->system.v, v, objects_count * 3 * sizeof(real));
+    simulation_context->integrator_state->is_saved_ = false;
+}
+
+WIN32DLL_API void sim_set_verbose(
+    SimulationContext *simulation_context,
+    int verbose
+)
+{
+    if (!simulation_context)
+    {
+        return;
+    }
+    simulation_context->verbose = verbose;
+}
+
+WIN32DLL_API int sim_step(
+    SimulationContext *simulation_context,
+    int64 n_steps
+)
+{
+    int return_code;
+
+    if (!simulation_context)
+    {
+        return_code = ERROR_SIM_CONTEXT_NULL;
+        goto error;
+    }
+    if (!simulation_context->integrator)
+    {
+        return_code = ERROR_SIM_CONTEXT_INTEGRATOR_NOT_SET;
+        goto error;
+    }
+    if (!simulation_context->is_fixed_step_size_integrator)
+    {
+        return_code = ERROR_SIM_STEP_ADAPTIVE_STEP_SIZE_INTEGRATOR;
+        goto error;
+    }
+    if (n_steps < 0)
+    {
+        return_code = ERROR_SIM_STEP_NEGATIVE_N_STEPS;
+        goto error;
+    }
+    if (n_steps == 0)
+    {
+        return SUCCESS;
+    }
+
+    SimulationParam simulation_param = {
+        .tf = n_steps * simulation_context->integrator_param.dt,
+        .n_steps_ = n_steps
+    };
+    return_code = sim_run(simulation_context, &simulation_param);
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+
+    return SUCCESS;
+
+error:
+    if (simulation_context && simulation_context->verbose > 0)
+    {
+        print_error_msg(return_code);
+    }
+    return return_code;
+}
+
+WIN32DLL_API int sim_integrate_to(
+    SimulationContext *simulation_context,
+    real t
+)
+{
+    int return_code;
+
+    if (!simulation_context)
+    {
+        return_code = ERROR_SIM_CONTEXT_NULL;
+        goto error;
+    }
+    if (!simulation_context->integrator)
+    {
+        return_code = ERROR_SIM_CONTEXT_INTEGRATOR_NOT_SET;
+        goto error;
+    }
+    if (t < simulation_context->t)
+    {
+        return_code = ERROR_SIM_INTEGRATE_TO_PAST;
+        goto error;
+    }
+
+    SimulationParam simulation_param = {
+        .tf = t - simulation_context->t,
+        .n_steps_ = 0
+    };
+    if (simulation_context->is_fixed_step_size_integrator)
+    {
+        simulation_param.n_steps_ = simulation_param.tf / simulation_context->integrator_param.dt;
+        simulation_param.tf = simulation_param.n_steps_ * simulation_context->integrator_param.dt;
+        if (simulation_param.n_steps_ == 0)
+        {
+            return SUCCESS;
+        }
+    }
+    else if (simulation_param.tf <= 0.0)
+    {
+        return SUCCESS;
+    }
+
+    return_code = sim_run(simulation_context, &simulation_param);
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+
+    // Avoid round-off error in the simulation time
+    if (!simulation_context->is_fixed_step_size_integrator)
+    {
+        simulation_context->t = t;
+    }
 
     return SUCCESS;
 
 error:
+    if (simulation_context && simulation_context->verbose > 0)
+    {
+        print_error_msg(return_code);
+    }
     return return_code;
 }
 
+WIN32DLL_API int sim_get_objects_count(const SimulationContext *simulation_context)
+{
+    if (!simulation_context)
+    {
+        return -1;
+    }
+    return simulation_context->system.objects_count;
+}
+
+WIN32DLL_API void sim_get_state(
+    const SimulationContext *simulation_context,
+    real *x,
+    real *v,
+    real *t
+)
+{
+    if (!simulation_context)
+    {
+        return;
+    }
+    const int objects_count = simulation_context->system.objects_count;
+    if (x)
+    {
+        memcpy(x, simulation_context->system.x, objects_count * 3 * sizeof(real));
+    }
+    if (v)
+    {
+        memcpy(v, simulation_context->system.v, objects_count * 3 * sizeof(real));
+    }
+    if (t)
+    {
+        *t = simulation_context->t;
+    }
+}
+
+IN_FILE int sim_run(
+    SimulationContext *simulation_context,
+    SimulationParam *simulation_param
+)
+{
+    // Time within this run, starting from zero as in launch_simulation()
+    real t = 0.0;
+    SimulationStatus simulation_status = {
+        .t = &t,
+        .dt = simulation_context->integrator_param.dt,
+        .run_time_ = 0.0,
+        .integrator_state = simulation_context->integrator_state
+    };
+    simulation_context->is_exit = false;
+    simulation_context->settings.verbose = simulation_context->verbose;
+
+    // Reset the states of the storing parameters from the last run
+    StoringParam *storing_param = &(simulation_context->storing_param);
+    storing_param->initial_objects_count_ = simulation_context->system.objects_count;
+    storing_param->is_last_stored_x_set_ = false;
+    storing_param->is_last_step_skipped_ = false;
+    storing_param->is_callback_stop_ = false;
+    storing_param->live_state_count_ = 0;
+    simulation_context->sol_size = 0;
+
+    IntegratorParam integrator_param = simulation_context->integrator_param;
+    if (integrator_param.initial_dt > simulation_param->tf)
+    {
+        integrator_param.initial_dt = simulation_param->tf;
+    }
+
+    int return_code = simulation_context->integrator(
+        &(simulation_context->system),
+        &integrator_param,
+        &(simulation_context->acceleration_param),
+        storing_param,
+        &(simulation_context->solutions),
+        &simulation_status,
+        &(simulation_context->settings),
+        simulation_param
+    );
+    free_object_slots(storing_param);
+    if (return_code != SUCCESS)
+    {
+        return return_code;
+    }
+
+    simulation_context->t += simulation_param->tf;
+    return SUCCESS;
+}
+
 /* Commented as initialize_system() is not used */
 // IN_FILE int initialize_system(
 //     System *restrict system
@@ -21,6 +21,9 @@
 
 #define IN_FILE static
 #define ADAPTIVE_STEP_SIZE_SOL_BUFFER_SIZE 50000
+#define SOL_BUFFER_MIN_GROWTH_FACTOR 1.25
+#define SOL_BUFFER_ESTIMATE_MARGIN 1.1
+#define SOL_BUFFER_MAX_EXTEND_SIZE ((int64) 1 << 30)    // Bytes
 
 typedef unsigned int uint;
 typedef int64_t int64;
@@ -45,6 +48,7 @@ typedef struct IntegratorParam
     int whfast_kepler_max_iter;
     bool whfast_kepler_auto_remove;
     real whfast_kepler_auto_remove_tol;
+    const char *whfast_coordinate_system;
 } IntegratorParam;
 
 typedef struct AccelerationParam
@@ -56,14 +60,63 @@ typedef struct AccelerationParam
     uint acceleration_method_flag_;
 } AccelerationParam;
 
+// Opaque handle of the buffered flush writer, see flush_writer.h
+typedef struct FlushWriter FlushWriter;
+
+/**
+ * Callback invoked after each solution step is stored, with the
+ * time, step size, and the positions and velocities of all objects.
+ * x and v point to the arrays of the system without copying, and are
+ * only valid during the call. Return 0 to continue the simulation,
+ * or non-zero to stop it at the end of the current step.
+ */
+typedef int (*SnapshotCallback)(
+    real t,
+    real dt,
+    const real *x,
+    const real *v,
+    int objects_count
+);
+
 typedef struct StoringParam
 {
     const char *method;
     const char *flush_path;
     int storing_freq;
+    real output_interval;
+    bool flush_energy;
+    int64 ring_capacity;
+    const int *stored_indices;
+    int stored_objects_count;
+    bool store_velocity;
+    const char *storing_dtype;
+    SnapshotCallback snapshot_callback;
+    real distance_threshold;
+    const int *distance_indices;
+    int distance_objects_count;
+    void *live_state;
+    int live_state_freq;
     uint storing_method_flag_;
+    uint storing_dtype_flag_;
     FILE *flush_file_;
+    FlushWriter *flush_writer_;
+    int flush_objects_count_;
+    int64 flush_max_queue_depth_;
+    int64 flush_stall_count_;
+    int mmap_fd_;
+    void *mmap_data_;
+    int64 mmap_header_size_;
+    int64 mmap_records_offset_;
+    int64 state_length_;
+    int64 state_size_;
     int64 max_sol_size_;
+    bool is_callback_stop_;
+    real *last_stored_x_;
+    bool is_last_stored_x_set_;
+    bool is_last_step_skipped_;
+    int64 live_state_count_;
+    int initial_objects_count_;
+    int *object_slots_;
 } StoringParam;
 
 typedef struct Solutions 
@@ -74,12 +127,39 @@ typedef struct Solutions
     int64 *sol_size_;
 } Solutions;
 
+/**
+ * State of the integrator kept between simulation runs, 
+ * so that a resumed simulation continues from where the
+ * last run stopped without re-initializing the integrator
+ * 
+ * x_, v_ and m_ are copies of the system when the state is
+ * saved. The state is only restored if the system is not
+ * modified since then.
+ */
+typedef struct IntegratorState
+{
+    bool is_saved_;
+    char integrator_[32];
+    int objects_count_;
+    real *x_;
+    real *v_;
+    real *m_;
+    real dt_;
+    real *a_;
+    bool is_acc_updated_;
+    real *x_err_comp_sum_;
+    real *v_err_comp_sum_;
+    real *aux_;
+    int64 aux_size_;
+} IntegratorState;
+
 // Current status of the simulation
 typedef struct SimulationStatus
 {
     real *t;
     real dt;
     real run_time_;
+    IntegratorState *integrator_state;
 } SimulationStatus;
 
 typedef struct Settings
@@ -94,6 +174,15 @@ typedef struct SimulationParam
     int64 n_steps_;
 } SimulationParam;
 
+/**
+ * Opaque handle of a simulation context, which keeps the system, 
+ * parameters and integrator state between calls. The parameters are
+ * parsed once when they are set, and the storing parameters are set
+ * up once in sim_create(). Each sim_step() or sim_integrate_to() call
+ * still enters the integrator, which allocates its work arrays.
+ */
+typedef struct SimulationContext SimulationContext;
+
 /**
  * \brief Launch simulation from Python
  * 
@@ -105,6 +194,7 @@ typedef struct SimulationParam
  * \param integrator Name of the integrator
  * \param dt Time step size
  * \param tolerance Tolerance for adaptive step size integrators
+ * \param whfast_coordinate_system Name of the coordinate system for WHFast integrator
  * \param acceleration_method Name of the acceleration method
  * \param opening_angle Opening angle for the acceleration calculation
  * \param softening_length Softening length for the force calculation
@@ -112,6 +202,29 @@ typedef struct SimulationParam
  * \param storing_method Name of the storing method
  * \param flush_path Path to the file to store the solution
  * \param storing_freq Storing frequency
+ * \param output_interval Time interval between outputs for dense output, 
+ *                        or 0.0 to store every storing_freq steps
+ * \param flush_energy Flag to indicate whether to compute the total energy
+ *                     for each flushed snapshot
+ * \param ring_capacity Number of latest solutions to keep for the ring storing method
+ * \param stored_indices Indices of the objects to be stored, or NULL to store all objects
+ * \param stored_objects_count Number of indices in stored_indices
+ * \param store_velocity Flag to indicate whether to store the velocities
+ * \param storing_dtype Data type of the stored x and v, i.e. "float64",
+ *                      "float32" or "quantized16" (flush_binary only)
+ * \param snapshot_callback Callback invoked after each solution step
+ *                          is stored, or NULL
+ * \param distance_threshold Store a solution step only if an object has
+ *                           moved more than distance_threshold relative to
+ *                           its distance from the origin since the last
+ *                           stored step, or 0.0 to store every step
+ * \param distance_indices Indices of the objects checked by the distance
+ *                         threshold, or NULL to check all objects
+ * \param distance_objects_count Number of indices in distance_indices
+ * \param live_state Shared memory segment to publish the live state to
+ *                   (see live_state.h), or NULL
+ * \param live_state_freq Publish the live state every live_state_freq
+ *                        candidate solution steps
  * \param sol_state Pointer of pointer to the solution state array to be updated
  * \param sol_time Pointer of pointer to the solution time array to be updated
  * \param sol_dt Pointer of pointer to the solution step size array to be updated
@@ -119,6 +232,13 @@ typedef struct SimulationParam
  * \param t Pointer to the current simulation time to be updated
  * \param simulation_status_last_dt Pointer to the last time step size of the simulation
  * \param run_time_ Pointer to the run time of the simulation to be updated
+ * \param flush_max_queue_depth_ Pointer to the maximum number of flush buffers
+ *                               waiting to be written, to be updated
+ * \param flush_stall_count_ Pointer to the number of times the simulation
+ *                           waited for the flush writer, to be updated
+ * \param integrator_state Pointer to the integrator state kept between
+ *                         simulation runs, or NULL to always initialize
+ *                         the integrator
  * \param verbose Verbosity level
  * \param is_exit Pointer to the exit flag
  * \param tf Simulation time
@@ -137,6 +257,7 @@ int launch_simulation_python(
     int whfast_kepler_max_iter,
     bool whfast_kepler_auto_remove,
     real whfast_kepler_auto_remove_tol,
+    const char *whfast_coordinate_system,
     const char *acceleration_method,
     real opening_angle,
     real softening_length,
@@ -144,6 +265,19 @@ int launch_simulation_python(
     const char *storing_method,
     const char *flush_path,
     int storing_freq,
+    real output_interval,
+    bool flush_energy,
+    int64 ring_capacity,
+    const int *stored_indices,
+    int stored_objects_count,
+    bool store_velocity,
+    const char *storing_dtype,
+    SnapshotCallback snapshot_callback,
+    real distance_threshold,
+    const int *distance_indices,
+    int distance_objects_count,
+    void *live_state,
+    int live_state_freq,
     double **sol_state,
     double **sol_time,
     double **sol_dt,
@@ -151,6 +285,9 @@ int launch_simulation_python(
     real *t,
     real *simulation_status_last_dt,
     real *run_time_,
+    int64 *flush_max_queue_depth_,
+    int64 *flush_stall_count_,
+    IntegratorState *integrator_state,
     int verbose,
     bool *is_exit,
     real tf
@@ -184,4 +321,181 @@ int launch_simulation(
     SimulationParam *simulation_param
 );
 
+/**
+ * \brief Create a simulation context
+ * 
+ * The system is copied into the context. The integrator must be set
+ * with sim_set_integrator() before integrating. By default, the
+ * acceleration method is "pairwise" and no solution is stored.
+ * 
+ * \param x Pointer to the position array
+ * \param v Pointer to the velocity array
+ * \param m Pointer to the mass array
+ * \param objects_count Number of objects in the system
+ * \param G Gravitational constant
+ * 
+ * \return Pointer to the simulation context, or NULL if memory allocation failed
+ */
+SimulationContext *sim_create(
+    const real *x,
+    const real *v,
+    const real *m,
+    int objects_count,
+    real G
+);
+
+/**
+ * \brief Free the simulation context
+ * 
+ * \param simulation_context Pointer to the simulation context
+ */
+void sim_destroy(SimulationContext *simulation_context);
+
+/**
+ * \brief Set the integrator of the simulation context
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * \param integrator Name of the integrator
+ * \param dt Time step size for fixed step size integrators
+ * \param tolerance Tolerance for adaptive step size integrators
+ * \param initial_dt Initial time step size for adaptive step size integrators,
+ *                   or 0.0 to estimate it automatically
+ * 
+ * \retval SUCCESS If successful
+ * \retval error code If the integrator is not recognized or dt is invalid
+ */
+int sim_set_integrator(
+    SimulationContext *simulation_context,
+    const char *integrator,
+    real dt,
+    real tolerance,
+    real initial_dt
+);
+
+/**
+ * \brief Set the parameters for WHFast, SABA, SBAB and MERCURIUS
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * \param whfast_kepler_tol Tolerance for solving Kepler's equation
+ * \param whfast_kepler_max_iter Maximum number of iterations for solving Kepler's equation
+ * \param whfast_kepler_auto_remove Flag to remove objects that failed to converge
+ * \param whfast_kepler_auto_remove_tol Tolerance for removing objects
+ * \param whfast_coordinate_system Name of the coordinate system for WHFast
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_SIM_CONTEXT_NAME_TOO_LONG If the coordinate system name is too long
+ */
+int sim_set_whfast_param(
+    SimulationContext *simulation_context,
+    real whfast_kepler_tol,
+    int whfast_kepler_max_iter,
+    bool whfast_kepler_auto_remove,
+    real whfast_kepler_auto_remove_tol,
+    const char *whfast_coordinate_system
+);
+
+/**
+ * \brief Set the acceleration method of the simulation context
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * \param acceleration_method Name of the acceleration method
+ * \param opening_angle Opening angle for the Barnes-Hut algorithm
+ * \param softening_length Softening length for the force calculation
+ * \param order Order of the acceleration approximation
+ * 
+ * \retval SUCCESS If successful
+ * \retval error code If the acceleration method is not recognized
+ */
+int sim_set_acceleration(
+    SimulationContext *simulation_context,
+    const char *acceleration_method,
+    real opening_angle,
+    real softening_length,
+    int order
+);
+
+/**
+ * \brief Set the positions and velocities of the system
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * \param x Pointer to the position array
+ * \param v Pointer to the velocity array
+ */
+void sim_set_state(
+    SimulationContext *simulation_context,
+    const real *x,
+    const real *v
+);
+
+/**
+ * \brief Set the verbosity level of the simulation context
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * \param verbose Verbosity level. Error messages are printed if verbose > 0
+ */
+void sim_set_verbose(
+    SimulationContext *simulation_context,
+    int verbose
+);
+
+/**
+ * \brief Advance the simulation by n_steps steps
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * \param n_steps Number of steps
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_SIM_STEP_ADAPTIVE_STEP_SIZE_INTEGRATOR If the integrator is
+ *         an adaptive step size integrator
+ * \retval error code If there is any other error
+ */
+int sim_step(
+    SimulationContext *simulation_context,
+    int64 n_steps
+);
+
+/**
+ * \brief Advance the simulation to time t
+ * 
+ * For fixed step size integrators, the simulation is advanced by
+ * whole steps only, so the time after the call may be less than t
+ * by at most dt. The remaining time is carried to the next call.
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * \param t Target simulation time
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_SIM_INTEGRATE_TO_PAST If t is earlier than the current time
+ * \retval error code If there is any other error
+ */
+int sim_integrate_to(
+    SimulationContext *simulation_context,
+    real t
+);
+
+/**
+ * \brief Get the number of objects in the simulation context
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * 
+ * \return Number of objects, which may decrease if whfast_kepler_auto_remove is enabled,
+ *         or -1 if simulation_context is NULL
+ */
+int sim_get_objects_count(const SimulationContext *simulation_context);
+
+/**
+ * \brief Get the current state of the simulation
+ * 
+ * \param simulation_context Pointer to the simulation context
+ * \param x Pointer to the position array to be updated, can be NULL
+ * \param v Pointer to the velocity array to be updated, can be NULL
+ * \param t Pointer to the simulation time to be updated, can be NULL
+ */
+void sim_get_state(
+    const SimulationContext *simulation_context,
+    real *x,
+    real *v,
+    real *t
+);
+
 #endif
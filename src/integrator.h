@@ -113,6 +113,35 @@ int leapfrog(
     SimulationParam *simulation_param
 );
 
+/**
+ * \brief Yoshida symplectic composition integrators (4th, 6th and 8th order)
+ * 
+ * \details The order is selected by integrator_param->integrator,
+ *          which must be one of "yoshida4", "yoshida6" and "yoshida8".
+ * 
+ * \param system Pointer to the gravitational system
+ * \param integrator_param Pointer to the integrator parameters
+ * \param acceleration_param Pointer to the acceleration parameters
+ * \param storing_param Pointer to the storing parameters
+ * \param solutions Pointer to the solutions
+ * \param simulation_status Pointer to the simulation status
+ * \param settings Pointer to the settings
+ * \param simulation_param Pointer to the simulation parameters
+ * 
+ * \retval SUCCESS If the simulation is successful
+ * \retval error code If there is any error
+ */
+int yoshida(
+    System *system,
+    IntegratorParam *integrator_param,
+    AccelerationParam *acceleration_param,
+    StoringParam *storing_param,
+    Solutions *solutions,
+    SimulationStatus *simulation_status,
+    Settings *settings,
+    SimulationParam *simulation_param
+);
+
 /**
  * \brief RK Embedded integrator
  * 
@@ -191,4 +220,93 @@ int whfast(
     SimulationParam *simulation_param
 );
 
+/**
+ * \brief MERCURIUS hybrid integrator
+ * 
+ * \details WHFast integrator in democratic heliocentric coordinates,
+ *          with close encounters integrated by IAS15. The interaction
+ *          between objects is split by a smooth changeover function.
+ * 
+ * \param system Pointer to the gravitational system
+ * \param integrator_param Pointer to the integrator parameters
+ * \param acceleration_param Pointer to the acceleration parameters
+ * \param storing_param Pointer to the storing parameters
+ * \param solutions Pointer to the solutions
+ * \param simulation_status Pointer to the simulation status
+ * \param settings Pointer to the settings
+ * \param simulation_param Pointer to the simulation parameters
+ * 
+ * \retval SUCCESS If the simulation is successful
+ * \retval error code If there is any error
+ */
+int mercurius(
+    System *system,
+    IntegratorParam *integrator_param,
+    AccelerationParam *acceleration_param,
+    StoringParam *storing_param,
+    Solutions *solutions,
+    SimulationStatus *simulation_status,
+    Settings *settings,
+    SimulationParam *simulation_param
+);
+
+/**
+ * \brief SABA / SBAB symplectic integrators with the WHFast splitting
+ * 
+ * \details The Kepler drift and the interaction kick in Jacobi coordinates
+ *          are composed with the coefficients of SABA4 or SBAB4, selected
+ *          by integrator_param->integrator ("saba4" or "sbab4").
+ * 
+ * \param system Pointer to the gravitational system
+ * \param integrator_param Pointer to the integrator parameters
+ * \param acceleration_param Pointer to the acceleration parameters
+ * \param storing_param Pointer to the storing parameters
+ * \param solutions Pointer to the solutions
+ * \param simulation_status Pointer to the simulation status
+ * \param settings Pointer to the settings
+ * \param simulation_param Pointer to the simulation parameters
+ * 
+ * \retval SUCCESS If the simulation is successful
+ * \retval error code If there is any error
+ */
+int saba(
+    System *system,
+    IntegratorParam *integrator_param,
+    AccelerationParam *acceleration_param,
+    StoringParam *storing_param,
+    Solutions *solutions,
+    SimulationStatus *simulation_status,
+    Settings *settings,
+    SimulationParam *simulation_param
+);
+
+/**
+ * \brief Integrate a system over a time interval with IAS15, 
+ *        using a custom acceleration function
+ * 
+ * \details This is used by other integrators to integrate 
+ *          part of the system, e.g. close encounters in MERCURIUS.
+ *          No solution is stored.
+ * 
+ * \param system Pointer to the system to be integrated
+ * \param acceleration_function Pointer to the acceleration function
+ * \param acceleration_data Pointer to the data passed to the acceleration function
+ * \param interval Time interval to be integrated
+ * \param tolerance Tolerance of the integrator
+ * 
+ * \retval SUCCESS If exit successfully
+ * \retval error code If there is any error
+ */
+int ias15_integrate_interval(
+    System *system,
+    int (*acceleration_function)(
+        real *restrict a,
+        const System *restrict system,
+        void *acceleration_data
+    ),
+    void *acceleration_data,
+    const real interval,
+    const real tolerance
+);
+
 #endif
\ No newline at end of file
@@ -19,6 +19,8 @@
 #include "acceleration.h"
 #include "error.h"
 #include "gravity_sim.h"
+#include "integrator.h"
+#include "integrator_state.h"
 #include "math_functions.h"
 #include "storing.h"
 
@@ -289,6 +291,10 @@ WIN32DLL_API int ias15(
     real *restrict a_1 = calloc(objects_count * 3, sizeof(real));
     real *restrict delta_b7 = calloc(objects_count * 3, sizeof(real));
 
+    // Arrays for dense output
+    real *restrict output_x = calloc(objects_count * 3, sizeof(real));
+    real *restrict output_v = calloc(objects_count * 3, sizeof(real));
+
     // Array for compute aux_g
     real *restrict F = calloc(8 * objects_count * 3, sizeof(real));
 
@@ -308,6 +314,8 @@ WIN32DLL_API int ias15(
         !v_1 ||
         !a_1 ||
         !delta_b7 ||
+        !output_x ||
+        !output_v ||
         !F ||
         !delta_aux_b ||
         !x_err_comp_sum ||
@@ -328,44 +336,90 @@ WIN32DLL_API int ias15(
         .G = system->G
     };
 
-    return_code = acceleration(
-        a,
-        system,
-        acceleration_param
-    );
-    if (return_code != SUCCESS)
-    {
-        goto err_acc_error;
-    }
+    real *t = simulation_status->t;
+    real tf = simulation_param->tf;
 
     /* Get initial dt */
     real dt;
     real dt_new;
-    if (integrator_param->initial_dt > 0.0)
+    const int64 aux_b_size = dim_nodes_minus_1 * objects_count * 3;
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
     {
-        dt = integrator_param->initial_dt;
+        // Continue with the step size and predictor values of the last run
+        dt = fmin(integrator_state->dt_, tf);
+        memcpy(a, integrator_state->a_, objects_count * 3 * sizeof(real));
+        memcpy(aux_b0, integrator_state->aux_, aux_b_size * sizeof(real));
+        memcpy(aux_b, &integrator_state->aux_[aux_b_size], aux_b_size * sizeof(real));
+        memcpy(aux_e, &integrator_state->aux_[2 * aux_b_size], aux_b_size * sizeof(real));
+        memcpy(x_err_comp_sum, integrator_state->x_err_comp_sum_, objects_count * 3 * sizeof(real));
+        memcpy(v_err_comp_sum, integrator_state->v_err_comp_sum_, objects_count * 3 * sizeof(real));
+        refine_flag = true;
     }
     else
     {
-        return_code = _initial_dt(
-            &dt,
-            15,
+        return_code = acceleration(
+            a,
             system,
-            acceleration_param,
-            a
+            acceleration_param
         );
         if (return_code != SUCCESS)
         {
-            goto err_initial_dt;
+            goto err_acc_error;
+        }
+
+        if (integrator_param->initial_dt > 0.0)
+        {
+            dt = integrator_param->initial_dt;
+        }
+        else
+        {
+            return_code = _initial_dt(
+                &dt,
+                15,
+                system,
+                acceleration_param,
+                a
+            );
+            if (return_code != SUCCESS)
+            {
+                goto err_initial_dt;
+            }
         }
     }
     simulation_status->dt = dt;
 
-    real *t = simulation_status->t;
-    real tf = simulation_param->tf;
     int64 count = 1; // Count for storing solutions, 1 for t_0
     int storing_freq = storing_param->storing_freq;
 
+    /* Dense output */
+    // If output_interval > 0, solutions are stored at multiples
+    // of output_interval instead of every storing_freq steps
+    const real output_interval = storing_param->output_interval;
+    const bool is_dense_output = (output_interval > 0.0);
+    int64 output_count = 1;
+    int64 n_outputs = 0;
+    if (is_dense_output)
+    {
+        n_outputs = (int64) (tf / output_interval + 1e-9);
+    }
+    real output_t;
+    SimulationStatus output_status = {
+        .t = &output_t,
+        .dt = 0.0,
+        .run_time_ = 0.0
+    };
+    System output_system = {
+        .objects_count = objects_count,
+        .x = output_x,
+        .v = output_v,
+        .m = system->m,
+        .G = system->G
+    };
+
+    // Step size before correcting overshooting at the end of the simulation
+    real dt_before_overshoot = 0.0;
+
     /* Main Loop */
     while (*t < tf)
     {
@@ -439,6 +493,52 @@ WIN32DLL_API int ias15(
         if (error <= 1.0 || dt == tf * 1e-12)
         {
             accept_step_flag = true;
+
+            /**
+             * Dense output within (t, t + dt]
+             * 
+             * The step polynomial is evaluated with aux_b before 
+             * it is modified by _refine_aux_b(), so no additional
+             * force evaluation is needed
+             */
+            while (
+                is_dense_output 
+                && output_count <= n_outputs
+                && (output_count * output_interval <= *t + dt || *t + dt >= tf)
+            )
+            {
+                output_t = fmin(output_count * output_interval, tf);
+                _approx_pos_pc(objects_count, output_x, x, v, a, (output_t - *t) / dt, aux_b, dt, x_err_comp_sum);
+                _approx_vel_pc(objects_count, output_v, v, a, (output_t - *t) / dt, aux_b, dt, v_err_comp_sum);
+
+                if ((*solutions->sol_size_ + 1) > storing_param->max_sol_size_)
+                {
+                    return_code = extend_sol_memory_buffer(
+                        solutions,
+                        storing_param,
+                        *t,
+                        tf
+                    );
+                    if (return_code != SUCCESS)
+                    {
+                        goto err_store_solution;
+                    }
+                }
+
+                output_status.dt = dt;
+                return_code = store_solution_step(
+                    storing_param,
+                    &output_system,
+                    &output_status,
+                    solutions
+                );
+                if (return_code != SUCCESS)
+                {
+                    goto err_store_solution;
+                }
+                output_count++;
+            }
+
             *t += dt;
 
             _refine_aux_b(objects_count, dim_nodes_minus_1, aux_b, aux_e, delta_aux_b, dt, dt_new, refine_flag);
@@ -456,14 +556,15 @@ WIN32DLL_API int ias15(
             memcpy(a, a_1, objects_count * 3 * sizeof(real));    
         
             /* Store solution */
-            if (count % storing_freq == 0)
+            if (!is_dense_output && count % storing_freq == 0)
             {
                 if ((*solutions->sol_size_ + 1) > storing_param->max_sol_size_)
                 {
                     return_code = extend_sol_memory_buffer(
                         solutions,
                         storing_param,
-                        objects_count
+                        *t,
+                        tf
                     );
                     if (return_code != SUCCESS)
                     {
@@ -507,6 +608,7 @@ WIN32DLL_API int ias15(
         // Correct overshooting
         if (((*t) < tf) && ((*t) + dt > tf))
         {
+            dt_before_overshoot = dt;
             dt = tf - (*t);
         }
         simulation_status->dt = dt;
@@ -517,6 +619,37 @@ WIN32DLL_API int ias15(
             return_code = ERROR_USER_INTERRUPT;
             goto err_user_interrupt;
         }
+
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
+        {
+            break;
+        }
+    }
+
+    /* Save integrator state */
+    if (integrator_state)
+    {
+        return_code = save_integrator_state(
+            integrator_state,
+            integrator_param->integrator,
+            system,
+            3 * aux_b_size
+        );
+        if (return_code != SUCCESS)
+        {
+            goto err_save_integrator_state;
+        }
+
+        // The step size of the last step may be shortened to reach tf
+        integrator_state->dt_ = fmax(dt, dt_before_overshoot);
+        memcpy(integrator_state->a_, a, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->aux_, aux_b0, aux_b_size * sizeof(real));
+        memcpy(&integrator_state->aux_[aux_b_size], aux_b, aux_b_size * sizeof(real));
+        memcpy(&integrator_state->aux_[2 * aux_b_size], aux_e, aux_b_size * sizeof(real));
+        memcpy(integrator_state->x_err_comp_sum_, x_err_comp_sum, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->v_err_comp_sum_, v_err_comp_sum, objects_count * 3 * sizeof(real));
+        integrator_state->is_acc_updated_ = true;
     }
 
     /* Free memory */
@@ -533,6 +666,8 @@ WIN32DLL_API int ias15(
     free(v_1);
     free(a_1);
     free(delta_b7);
+    free(output_x);
+    free(output_v);
     free(F);
     free(delta_aux_b);
     free(x_err_comp_sum);
@@ -542,10 +677,276 @@ WIN32DLL_API int ias15(
 
     return SUCCESS;
 
+err_save_integrator_state:
 err_user_interrupt:
 err_store_solution:
 err_acc_error:
 err_initial_dt:
+err_memory:
+    free(x_err_comp_sum);
+    free(v_err_comp_sum);
+    free(temp_x_err_comp_sum);
+    free(temp_v_err_comp_sum);
+    free(delta_aux_b);
+    free(F);
+    free(output_v);
+    free(output_x);
+    free(delta_b7);
+    free(a_1);
+    free(v_1);
+    free(x_1);
+    free(aux_a);
+    free(a);
+err_aux_memory:
+    free(aux_e);
+    free(aux_g);
+    free(aux_b);
+    free(aux_b0);
+    free(aux_r);
+    free(aux_c);
+    free(nodes);
+    return return_code;
+}
+
+WIN32DLL_API int ias15_integrate_interval(
+    System *system,
+    int (*acceleration_function)(
+        real *restrict a,
+        const System *restrict system,
+        void *acceleration_data
+    ),
+    void *acceleration_data,
+    const real interval,
+    const real tolerance
+)
+{
+    int return_code;
+
+    /* Initialization */
+    const int objects_count = system->objects_count;
+    real *restrict x = system->x;
+    real *restrict v = system->v;
+
+    // Safety factors for step-size control
+    real safety_fac = 0.25;
+
+    real exponent = 1.0 / 7.0;
+
+    // Tolerance of predictor-corrector algorithm
+    real tolerance_pc = 1e-16;
+
+    // Auxiliary variables
+    real error;
+    real error_b7;
+    bool refine_flag = false;
+    const int dim_nodes = 8;
+    const int dim_nodes_minus_1 = 7;
+    const int dim_nodes_minus_2 = 6;
+    real *restrict nodes = malloc(dim_nodes * sizeof(real));
+    real *restrict aux_c = calloc(7 * 7, sizeof(real));
+    real *restrict aux_r = calloc(8 * 8, sizeof(real));
+    real *restrict aux_b0 = calloc((dim_nodes - 1) * objects_count * 3, sizeof(real));
+    real *restrict aux_b = calloc((dim_nodes - 1) * objects_count * 3, sizeof(real));
+    real *restrict aux_g = calloc((dim_nodes - 1) * objects_count * 3, sizeof(real));
+    real *restrict aux_e = calloc((dim_nodes - 1) * objects_count * 3, sizeof(real));
+    if (!nodes || !aux_c || !aux_r || !aux_b0 || !aux_b || !aux_g || !aux_e)
+    {
+        return_code = ERROR_IAS15_AUX_MEMORY_ALLOC;
+        goto err_aux_memory;
+    }
+    _initialize_radau_spacing(nodes);
+    _initialize_aux_c(aux_c);
+    _initialize_aux_r(aux_r);
+
+    // Arrays
+    real *restrict a = malloc(objects_count * 3 * sizeof(real));
+    real *restrict aux_a = calloc(dim_nodes * objects_count * 3, sizeof(real));
+    real *restrict x_1 = calloc(objects_count * 3, sizeof(real));
+    real *restrict v_1 = calloc(objects_count * 3, sizeof(real));
+    real *restrict a_1 = calloc(objects_count * 3, sizeof(real));
+    real *restrict delta_b7 = calloc(objects_count * 3, sizeof(real));
+
+    // Array for compute aux_g
+    real *restrict F = calloc(8 * objects_count * 3, sizeof(real));
+
+    // Array for refine aux_b
+    real *restrict delta_aux_b = calloc(dim_nodes_minus_1 * objects_count * 3, sizeof(real));
+
+    // Arrays for compensated summation
+    real *restrict x_err_comp_sum = calloc(objects_count * 3, sizeof(real));
+    real *restrict v_err_comp_sum = calloc(objects_count * 3, sizeof(real));
+    real *restrict temp_x_err_comp_sum = calloc(objects_count * 3, sizeof(real));
+    real *restrict temp_v_err_comp_sum = calloc(objects_count * 3, sizeof(real));
+
+    if (
+        !a || 
+        !aux_a || 
+        !x_1 ||
+        !v_1 ||
+        !a_1 ||
+        !delta_b7 ||
+        !F ||
+        !delta_aux_b ||
+        !x_err_comp_sum ||
+        !v_err_comp_sum ||
+        !temp_x_err_comp_sum ||
+        !temp_v_err_comp_sum
+    )
+    {
+        return_code = ERROR_IAS15_MEMORY_ALLOC;
+        goto err_memory;
+    }
+
+    System temp_system = {
+        .objects_count = objects_count,
+        .x = x_1,
+        .v = v_1,
+        .m = system->m,
+        .G = system->G
+    };
+
+    return_code = acceleration_function(a, system, acceleration_data);
+    if (return_code != SUCCESS)
+    {
+        goto err_acc_error;
+    }
+
+    // The first trial step covers the whole interval
+    real dt = interval;
+    real dt_new;
+    real t = 0.0;
+
+    /* Main Loop */
+    while (t < interval)
+    {
+        /* Loop for predictor-corrector algorithm */
+        for (int temp = 0; temp < IAS15_PREDICTOR_CORRECTOR_MAX_ITER; temp++)
+        {
+            for (int i = 0; i < dim_nodes; i++)
+            {
+                // Estimate position and velocity with current aux_b and nodes
+                _approx_pos_pc(objects_count, x_1, x, v, a, nodes[i], aux_b, dt, x_err_comp_sum);
+                _approx_vel_pc(objects_count, v_1, v, a, nodes[i], aux_b, dt, v_err_comp_sum);
+
+                // Evaluate force function and store result
+                return_code = acceleration_function(
+                    &aux_a[i * objects_count * 3],
+                    &temp_system,
+                    acceleration_data
+                );
+                if (return_code != SUCCESS)
+                {
+                    goto err_acc_error;
+                }
+
+                _compute_aux_g(objects_count, dim_nodes, aux_g, aux_r, aux_a, i, F);
+                _compute_aux_b(objects_count, dim_nodes_minus_1, aux_b, aux_g, aux_c, i);
+            }
+
+            // Estimate convergence
+            for (int i = 0; i < objects_count; i++)
+            {
+                for (int j = 0; j < 3; j++)
+                {
+                    delta_b7[i * 3 + j] = aux_b[dim_nodes_minus_2 * objects_count * 3 + i * 3 + j] - aux_b0[dim_nodes_minus_2 * objects_count * 3 + i * 3 + j];
+                }
+            }
+            memcpy(aux_b0, aux_b, dim_nodes_minus_1 * objects_count * 3 * sizeof(real));
+            if ((abs_max_vec(delta_b7, objects_count * 3) / abs_max_vec(&aux_a[dim_nodes_minus_1 * objects_count * 3], objects_count * 3)) < tolerance_pc)
+            {
+                break;
+            }
+        }
+        
+        /* Advance step */
+        memcpy(temp_x_err_comp_sum, x_err_comp_sum, objects_count * 3 * sizeof(real));
+        memcpy(temp_v_err_comp_sum, v_err_comp_sum, objects_count * 3 * sizeof(real));
+
+        _approx_pos_step(objects_count, x_1, x, v, a, aux_b, dt, temp_x_err_comp_sum);
+        _approx_vel_step(objects_count, v_1, v, a, aux_b, dt, temp_v_err_comp_sum);
+        return_code = acceleration_function(a_1, &temp_system, acceleration_data);
+        if (return_code != SUCCESS)
+        {
+            goto err_acc_error;
+        }
+
+        /* Estimate relative error */
+        error_b7 = abs_max_vec(&aux_b[dim_nodes_minus_2 * objects_count * 3], objects_count * 3) / abs_max_vec(a_1, objects_count * 3);
+        error = pow((error_b7 / tolerance), exponent);
+
+        // Prevent error from being too small
+        if (error < 1e-10)
+        {
+            error = 1e-10;
+        }
+        dt_new = dt / error;
+
+        /* Check error to accept the step */
+        if (error <= 1.0 || dt == interval * 1e-12)
+        {
+            t += dt;
+
+            _refine_aux_b(objects_count, dim_nodes_minus_1, aux_b, aux_e, delta_aux_b, dt, dt_new, refine_flag);
+            refine_flag = true;
+
+            memcpy(x_err_comp_sum, temp_x_err_comp_sum, objects_count * 3 * sizeof(real));
+            memcpy(v_err_comp_sum, temp_v_err_comp_sum, objects_count * 3 * sizeof(real));
+
+            memcpy(x, x_1, objects_count * 3 * sizeof(real));
+            memcpy(v, v_1, objects_count * 3 * sizeof(real));
+            memcpy(a, a_1, objects_count * 3 * sizeof(real));    
+        }
+
+        /* Actual step size for the next step */
+        if (dt_new > (dt / safety_fac))
+        {
+            dt /= safety_fac;
+        }
+        else if (dt_new < dt * safety_fac)
+        {
+            dt *= safety_fac;
+        }
+        else
+        {
+            dt = dt_new;
+        }
+
+        if (dt_new < interval * 1e-12)
+        {
+            dt = interval * 1e-12;
+        }
+
+        // Correct overshooting
+        if ((t < interval) && (t + dt > interval))
+        {
+            dt = interval - t;
+        }
+    }
+
+    /* Free memory */
+    free(nodes);
+    free(aux_c);
+    free(aux_r);
+    free(aux_b0);
+    free(aux_b);
+    free(aux_g);
+    free(aux_e);
+    free(a);
+    free(aux_a);
+    free(x_1);
+    free(v_1);
+    free(a_1);
+    free(delta_b7);
+    free(F);
+    free(delta_aux_b);
+    free(x_err_comp_sum);
+    free(v_err_comp_sum);
+    free(temp_x_err_comp_sum);
+    free(temp_v_err_comp_sum);
+
+    return SUCCESS;
+
+err_acc_error:
 err_memory:
     free(x_err_comp_sum);
     free(v_err_comp_sum);
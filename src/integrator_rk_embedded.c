@@ -19,6 +19,7 @@
 #include "acceleration.h"
 #include "error.h"
 #include "gravity_sim.h"
+#include "integrator_state.h"
 #include "storing.h"
 
 /**
@@ -511,6 +512,77 @@ error_memory:
     return return_code;
 }
 
+/**
+ * \brief Evaluate the quintic Hermite interpolant of a step
+ * 
+ * \details The interpolant matches the position, velocity and
+ *          acceleration at both ends of the step. It is used
+ *          for dense output at arbitrary times within a step.
+ * 
+ * \param objects_count Number of objects in the system
+ * \param theta Fraction of the step, between 0 and 1
+ * \param dt Step size
+ * \param x_0 Array of position vectors at the start of the step
+ * \param v_0 Array of velocity vectors at the start of the step
+ * \param a_0 Array of acceleration vectors at the start of the step
+ * \param x_1 Array of position vectors at the end of the step
+ * \param v_1 Array of velocity vectors at the end of the step
+ * \param a_1 Array of acceleration vectors at the end of the step
+ * \param x_out Array of interpolated position vectors to be stored
+ * \param v_out Array of interpolated velocity vectors to be stored
+ */
+IN_FILE void rk_embedded_dense_output(
+    const int objects_count,
+    const real theta,
+    const real dt,
+    const real *restrict x_0,
+    const real *restrict v_0,
+    const real *restrict a_0,
+    const real *restrict x_1,
+    const real *restrict v_1,
+    const real *restrict a_1,
+    real *restrict x_out,
+    real *restrict v_out
+)
+{
+    const real theta_2 = theta * theta;
+    const real theta_3 = theta_2 * theta;
+    const real theta_4 = theta_3 * theta;
+    const real theta_5 = theta_4 * theta;
+
+    /* Quintic Hermite basis functions and their derivatives */
+    const real h_x_1 = 10.0 * theta_3 - 15.0 * theta_4 + 6.0 * theta_5;
+    const real h_v_0 = theta - 6.0 * theta_3 + 8.0 * theta_4 - 3.0 * theta_5;
+    const real h_v_1 = -4.0 * theta_3 + 7.0 * theta_4 - 3.0 * theta_5;
+    const real h_a_0 = 0.5 * (theta_2 - 3.0 * theta_3 + 3.0 * theta_4 - theta_5);
+    const real h_a_1 = 0.5 * (theta_3 - 2.0 * theta_4 + theta_5);
+
+    const real dh_x_1 = 30.0 * theta_2 - 60.0 * theta_3 + 30.0 * theta_4;
+    const real dh_v_0 = 1.0 - 18.0 * theta_2 + 32.0 * theta_3 - 15.0 * theta_4;
+    const real dh_v_1 = -12.0 * theta_2 + 28.0 * theta_3 - 15.0 * theta_4;
+    const real dh_a_0 = 0.5 * (2.0 * theta - 9.0 * theta_2 + 12.0 * theta_3 - 5.0 * theta_4);
+    const real dh_a_1 = 0.5 * (3.0 * theta_2 - 8.0 * theta_3 + 5.0 * theta_4);
+
+    for (int i = 0; i < objects_count; i++)
+    {
+        for (int j = 0; j < 3; j++)
+        {
+            const real delta_x = x_1[i * 3 + j] - x_0[i * 3 + j];
+            x_out[i * 3 + j] = (
+                x_0[i * 3 + j]
+                + h_x_1 * delta_x
+                + dt * (h_v_0 * v_0[i * 3 + j] + h_v_1 * v_1[i * 3 + j])
+                + dt * dt * (h_a_0 * a_0[i * 3 + j] + h_a_1 * a_1[i * 3 + j])
+            );
+            v_out[i * 3 + j] = (
+                dh_x_1 * delta_x / dt
+                + dh_v_0 * v_0[i * 3 + j] + dh_v_1 * v_1[i * 3 + j]
+                + dt * (dh_a_0 * a_0[i * 3 + j] + dh_a_1 * a_1[i * 3 + j])
+            );
+        }
+    }
+}
+
 WIN32DLL_API int rk_embedded(
     System *system,
     IntegratorParam *integrator_param,
@@ -571,6 +643,20 @@ WIN32DLL_API int rk_embedded(
         error_estimation_delta_weights[stage] = weights[stage] - weights_test[stage];
     }
 
+    /**
+     * First same as last (FSAL): if the last stage is evaluated at the
+     * solution of the step (e.g. DOPRI), it is also the first stage 
+     * of the next step
+     */
+    bool is_fsal = (weights[stages - 1] == 0.0);
+    for (int stage = 0; stage < stages - 1; stage++)
+    {
+        if (coeff[(stages - 2) * (stages - 1) + stage] != weights[stage])
+        {
+            is_fsal = false;
+        }
+    }
+
     /* tolerance */
     real abs_tolerance = integrator_param->tolerance;
     real rel_tolerance = integrator_param->tolerance;
@@ -605,6 +691,7 @@ WIN32DLL_API int rk_embedded(
 
     real *restrict v_1 = malloc(objects_count * 3 * sizeof(real));
     real *restrict x_1 = malloc(objects_count * 3 * sizeof(real));
+    real *restrict a_1 = malloc(objects_count * 3 * sizeof(real));
     real *restrict vk = malloc(stages * objects_count * 3 * sizeof(real));
     real *restrict xk = malloc(stages * objects_count * 3 * sizeof(real));    
     real *restrict temp_v = malloc(objects_count * 3 * sizeof(real));
@@ -623,6 +710,7 @@ WIN32DLL_API int rk_embedded(
     if (
         !v_1 || 
         !x_1 || 
+        !a_1 || 
         !vk || 
         !xk ||  
         !temp_v || 
@@ -641,8 +729,24 @@ WIN32DLL_API int rk_embedded(
         goto error_memory;
     }
 
+    // Flag to indicate whether the first stage is up to date with x and v
+    bool is_first_stage_updated = false;
+
     /* Get initial dt */
-    if (integrator_param->initial_dt > 0.0)
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
+    {
+        // Continue with the step size and first stage of the last run
+        dt = fmin(integrator_state->dt_, tf);
+        memcpy(x_err_comp_sum, integrator_state->x_err_comp_sum_, objects_count * 3 * sizeof(real));
+        memcpy(v_err_comp_sum, integrator_state->v_err_comp_sum_, objects_count * 3 * sizeof(real));
+        if (integrator_state->is_acc_updated_)
+        {
+            memcpy(vk, integrator_state->a_, objects_count * 3 * sizeof(real));
+            is_first_stage_updated = true;
+        }
+    }
+    else if (integrator_param->initial_dt > 0.0)
     {
         dt = integrator_param->initial_dt;
     }
@@ -666,17 +770,44 @@ WIN32DLL_API int rk_embedded(
     int64 count = 1; // Count for storing solutions, 1 for t_0
     int storing_freq = storing_param->storing_freq;
 
+    /* Dense output */
+    // If output_interval > 0, solutions are stored at multiples
+    // of output_interval instead of every storing_freq steps
+    const real output_interval = storing_param->output_interval;
+    const bool is_dense_output = (output_interval > 0.0);
+    int64 output_count = 1;
+    int64 n_outputs = 0;
+    if (is_dense_output)
+    {
+        n_outputs = (int64) (tf / output_interval + 1e-9);
+    }
+    real output_t;
+    SimulationStatus output_status = {
+        .t = &output_t,
+        .dt = 0.0,
+        .run_time_ = 0.0
+    };
+
+    // Step size before correcting overshooting at the end of the simulation
+    real dt_before_overshoot = 0.0;
+
     while (*t < tf)
     {
         /* Compute xk and vk */
-        return_code = acceleration(
-            vk,
-            system,
-            acceleration_param
-        );
-        if (return_code != SUCCESS)
+        // The first stage is reused after a rejected step, or
+        // after an accepted step if the integrator is FSAL
+        if (!is_first_stage_updated)
         {
-            goto acc_error;
+            return_code = acceleration(
+                vk,
+                system,
+                acceleration_param
+            );
+            if (return_code != SUCCESS)
+            {
+                goto acc_error;
+            }
+            is_first_stage_updated = true;
         }
         memcpy(xk, v, objects_count * 3 * sizeof(real));
         for (int stage = 1; stage < stages; stage++)
@@ -806,6 +937,84 @@ WIN32DLL_API int rk_embedded(
         /* Advance step */
         if (error <= 1 || dt <= tf * 1e-12)
         {
+            /* Acceleration at the end of the step */
+            bool is_a_1_updated = false;
+            if (is_fsal)
+            {
+                memcpy(a_1, &vk[(stages - 1) * objects_count * 3], objects_count * 3 * sizeof(real));
+                is_a_1_updated = true;
+            }
+
+            /* Dense output within (t, t + dt] */
+            while (
+                is_dense_output 
+                && output_count <= n_outputs
+                && (output_count * output_interval <= *t + dt || *t + dt >= tf)
+            )
+            {
+                // a_1 is only computed if needed, and it 
+                // is reused as the first stage of the next step
+                if (!is_a_1_updated)
+                {
+                    temp_system.x = x_1;
+                    temp_system.v = v_1;
+                    return_code = acceleration(
+                        a_1,
+                        &temp_system,
+                        acceleration_param
+                    );
+                    if (return_code != SUCCESS)
+                    {
+                        goto acc_error;
+                    }
+                    is_a_1_updated = true;
+                }
+
+                output_t = fmin(output_count * output_interval, tf);
+                rk_embedded_dense_output(
+                    objects_count,
+                    (output_t - *t) / dt,
+                    dt,
+                    x,
+                    v,
+                    vk,
+                    x_1,
+                    v_1,
+                    a_1,
+                    temp_x,
+                    temp_v
+                );
+
+                if ((*solutions->sol_size_ + 1) > storing_param->max_sol_size_)
+                {
+                    return_code = extend_sol_memory_buffer(
+                        solutions,
+                        storing_param,
+                        *t,
+                        tf
+                    );
+                    if (return_code != SUCCESS)
+                    {
+                        goto err_store_solution;
+                    }
+                }
+
+                temp_system.x = temp_x;
+                temp_system.v = temp_v;
+                output_status.dt = dt;
+                return_code = store_solution_step(
+                    storing_param,
+                    &temp_system,
+                    &output_status,
+                    solutions
+                );
+                if (return_code != SUCCESS)
+                {
+                    goto err_store_solution;
+                }
+                output_count++;
+            }
+
             *t += dt; 
             memcpy(x, x_1, objects_count * 3 * sizeof(real));
             memcpy(v, v_1, objects_count * 3 * sizeof(real));
@@ -813,15 +1022,22 @@ WIN32DLL_API int rk_embedded(
             memcpy(x_err_comp_sum, temp_x_err_comp_sum, objects_count * 3 * sizeof(real));
             memcpy(v_err_comp_sum, temp_v_err_comp_sum, objects_count * 3 * sizeof(real));
 
+            if (is_a_1_updated)
+            {
+                memcpy(vk, a_1, objects_count * 3 * sizeof(real));
+            }
+            is_first_stage_updated = is_a_1_updated;
+
             /* Store solution */
-            if (count % storing_freq == 0)
+            if (!is_dense_output && count % storing_freq == 0)
             {
                 if ((*solutions->sol_size_ + 1) > storing_param->max_sol_size_)
                 {
                     return_code = extend_sol_memory_buffer(
                         solutions,
                         storing_param,
-                        objects_count
+                        *t,
+                        tf
                     );
                     if (return_code != SUCCESS)
                     {
@@ -840,6 +1056,7 @@ WIN32DLL_API int rk_embedded(
                     goto err_store_solution;
                 }
             }
+            count++;
         }
 
         /* Calculate dt for next step */
@@ -869,6 +1086,7 @@ WIN32DLL_API int rk_embedded(
         // Correct overshooting
         if (((*t) < tf) && (((*t) + dt) > tf))
         {
+            dt_before_overshoot = dt;
             dt = tf - (*t);
         }
         simulation_status->dt = dt;
@@ -879,11 +1097,38 @@ WIN32DLL_API int rk_embedded(
             return_code = ERROR_USER_INTERRUPT;
             goto err_user_interrupt;
         }
+
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
+        {
+            break;
+        }
+    }
+
+    /* Save integrator state */
+    if (integrator_state)
+    {
+        return_code = save_integrator_state(integrator_state, integrator_param->integrator, system, 0);
+        if (return_code != SUCCESS)
+        {
+            goto err_save_integrator_state;
+        }
+
+        // The step size of the last step may be shortened to reach tf
+        integrator_state->dt_ = fmax(dt, dt_before_overshoot);
+        memcpy(integrator_state->x_err_comp_sum_, x_err_comp_sum, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->v_err_comp_sum_, v_err_comp_sum, objects_count * 3 * sizeof(real));
+        if (is_first_stage_updated)
+        {
+            memcpy(integrator_state->a_, vk, objects_count * 3 * sizeof(real));
+            integrator_state->is_acc_updated_ = true;
+        }
     }
 
     /* free memory */
     free(v_1);
     free(x_1);
+    free(a_1);
     free(vk);
     free(xk);
     free(temp_v);
@@ -903,6 +1148,7 @@ WIN32DLL_API int rk_embedded(
 
     return SUCCESS;
 
+err_save_integrator_state:
 err_user_interrupt:
 err_store_solution:
 acc_error:
@@ -910,6 +1156,7 @@ error_initial_dt:
 error_memory:
     free(v_1);
     free(x_1);
+    free(a_1);
     free(vk);
     free(xk);
     free(temp_v);
@@ -927,4 +1174,4 @@ error_error_estimation_delta_weights_memory_alloc:
 error_butcher_tableaus:
 error_order:
     return return_code;
-}
\ No newline at end of file
+}
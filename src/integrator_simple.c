@@ -5,7 +5,11 @@
  * 
  * This file contains the function definitions for simple integrators,
  * including Euler, Euler-Cromer, Runge-Kutta 4th order (RK4),
- * and Leapfrog.
+ * Leapfrog and the Yoshida composition integrators.
+ * 
+ * The coefficients of the Yoshida integrators are from:
+ *   H. Yoshida, Construction of higher order symplectic integrators,
+ *   Physics Letters A 150, 262-268, 1990
  */
 
 #include <math.h>
@@ -17,8 +21,48 @@
 #include "acceleration.h"
 #include "error.h"
 #include "gravity_sim.h"
+#include "integrator_state.h"
 #include "storing.h"
 
+/**
+ * \brief Get the weights of the Yoshida composition integrator
+ * 
+ * The integrator is a symmetric composition of leapfrog
+ * sub-steps with weights w_k, ..., w_1, w_0, w_1, ..., w_k,
+ * where w_0 = 1 - 2 * (w_1 + ... + w_k).
+ * 
+ * \param integrator Name of the integrator
+ * \param half_stages Pointer to the number of weights k, excluding w_0
+ * \param half_weights Pointer to the array of weights w_1, ..., w_k
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_UNKNOWN_YOSHIDA_METHOD If integrator is not recognized
+ */
+IN_FILE int get_yoshida_weights(
+    const char *integrator,
+    int *restrict half_stages,
+    const real **half_weights
+);
+
+/**
+ * \brief Update y with y += dydt * dt using compensated summation
+ * 
+ * \param objects_count Number of objects in the system
+ * \param y Array to be updated
+ * \param dydt Array of derivatives of y
+ * \param dt Time step
+ * \param y_err_comp_sum Array of compensated summation errors of y
+ * \param temp_y Array for temporary storage of y
+ */
+IN_FILE void yoshida_compensated_update(
+    const int objects_count,
+    real *restrict y,
+    const real *restrict dydt,
+    const real dt,
+    real *restrict y_err_comp_sum,
+    real *restrict temp_y
+);
+
 WIN32DLL_API int euler(
     System *system,
     IntegratorParam *integrator_param,
@@ -58,6 +102,14 @@ WIN32DLL_API int euler(
         goto err_memory;
     }
 
+    /* Restore integrator state */
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
+    {
+        memcpy(x_err_comp_sum, integrator_state->x_err_comp_sum_, objects_count * 3 * sizeof(real));
+        memcpy(v_err_comp_sum, integrator_state->v_err_comp_sum_, objects_count * 3 * sizeof(real));
+    }
+
     /* Main Loop */
     for (int64 count = 1; count <= n_steps; count++)
     {   
@@ -113,10 +165,29 @@ WIN32DLL_API int euler(
             return_code = ERROR_USER_INTERRUPT;
             goto err_user_interrupt;
         }
+
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
+        {
+            break;
+        }
+    }
+
+    /* Save integrator state */
+    if (integrator_state)
+    {
+        return_code = save_integrator_state(integrator_state, integrator_param->integrator, system, 0);
+        if (return_code != SUCCESS)
+        {
+            goto err_save_integrator_state;
+        }
+        memcpy(integrator_state->x_err_comp_sum_, x_err_comp_sum, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->v_err_comp_sum_, v_err_comp_sum, objects_count * 3 * sizeof(real));
     }
 
-    return SUCCESS;
+    return_code = SUCCESS;
 
+err_save_integrator_state:
 err_user_interrupt:
 err_store_solution:
 err_acceleration:
@@ -168,6 +239,14 @@ WIN32DLL_API int euler_cromer(
         goto err_memory;
     }
 
+    /* Restore integrator state */
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
+    {
+        memcpy(x_err_comp_sum, integrator_state->x_err_comp_sum_, objects_count * 3 * sizeof(real));
+        memcpy(v_err_comp_sum, integrator_state->v_err_comp_sum_, objects_count * 3 * sizeof(real));
+    }
+
     /* Main Loop */
     for (int64 count = 1; count <= n_steps; count++)
     {   
@@ -222,10 +301,29 @@ WIN32DLL_API int euler_cromer(
             return_code = ERROR_USER_INTERRUPT;
             goto err_user_interrupt;
         }
+
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
+        {
+            break;
+        }
+    }
+
+    /* Save integrator state */
+    if (integrator_state)
+    {
+        return_code = save_integrator_state(integrator_state, integrator_param->integrator, system, 0);
+        if (return_code != SUCCESS)
+        {
+            goto err_save_integrator_state;
+        }
+        memcpy(integrator_state->x_err_comp_sum_, x_err_comp_sum, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->v_err_comp_sum_, v_err_comp_sum, objects_count * 3 * sizeof(real));
     }
 
-    return SUCCESS;
+    return_code = SUCCESS;
 
+err_save_integrator_state:
 err_user_interrupt:
 err_store_solution:
 err_acceleration:
@@ -296,6 +394,14 @@ WIN32DLL_API int rk4(
         goto err_memory;
     }
 
+    /* Restore integrator state */
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
+    {
+        memcpy(x_err_comp_sum, integrator_state->x_err_comp_sum_, objects_count * 3 * sizeof(real));
+        memcpy(v_err_comp_sum, integrator_state->v_err_comp_sum_, objects_count * 3 * sizeof(real));
+    }
+
     /* Main Loop */
     for (int64 count = 1; count <= n_steps; count++)
     {
@@ -407,10 +513,29 @@ WIN32DLL_API int rk4(
             return_code = ERROR_USER_INTERRUPT;
             goto err_user_interrupt;
         }
+
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
+        {
+            break;
+        }
+    }
+
+    /* Save integrator state */
+    if (integrator_state)
+    {
+        return_code = save_integrator_state(integrator_state, integrator_param->integrator, system, 0);
+        if (return_code != SUCCESS)
+        {
+            goto err_save_integrator_state;
+        }
+        memcpy(integrator_state->x_err_comp_sum_, x_err_comp_sum, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->v_err_comp_sum_, v_err_comp_sum, objects_count * 3 * sizeof(real));
     }
 
-    return SUCCESS;
+    return_code = SUCCESS;
 
+err_save_integrator_state:
 err_user_interrupt:
 err_store_solution:
 err_acceleration:
@@ -475,25 +600,37 @@ WIN32DLL_API int leapfrog(
         goto err_memory;
     }
 
-    // Compute initial acceleration and v_1/2
-    return_code = acceleration(
-        a,
-        system,
-        acceleration_param
-    );
-    if (return_code != SUCCESS)
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
     {
-        goto err_acceleration;
+        // Restore v_1/2 instead of kicking v again
+        memcpy(v, integrator_state->aux_, objects_count * 3 * sizeof(real));
+        memcpy(a, integrator_state->a_, objects_count * 3 * sizeof(real));
+        memcpy(x_err_comp_sum, integrator_state->x_err_comp_sum_, objects_count * 3 * sizeof(real));
+        memcpy(v_err_comp_sum, integrator_state->v_err_comp_sum_, objects_count * 3 * sizeof(real));
     }
-
-    memcpy(temp_v, v, objects_count * 3 * sizeof(real));
-    for (int i = 0; i < objects_count; i++)
+    else
     {
-        for (int j = 0; j < 3; j++)
+        // Compute initial acceleration and v_1/2
+        return_code = acceleration(
+            a,
+            system,
+            acceleration_param
+        );
+        if (return_code != SUCCESS)
+        {
+            goto err_acceleration;
+        }
+
+        memcpy(temp_v, v, objects_count * 3 * sizeof(real));
+        for (int i = 0; i < objects_count; i++)
         {
-            v_err_comp_sum[i * 3 + j] += 0.5 * a[i * 3 + j] * dt;
-            v[i * 3 + j] = temp_v[i * 3 + j] + v_err_comp_sum[i * 3 + j];
-            v_err_comp_sum[i * 3 + j] += temp_v[i * 3 + j] - v[i * 3 + j];
+            for (int j = 0; j < 3; j++)
+            {
+                v_err_comp_sum[i * 3 + j] += 0.5 * a[i * 3 + j] * dt;
+                v[i * 3 + j] = temp_v[i * 3 + j] + v_err_comp_sum[i * 3 + j];
+                v_err_comp_sum[i * 3 + j] += temp_v[i * 3 + j] - v[i * 3 + j];
+            }
         }
     }
 
@@ -565,10 +702,47 @@ WIN32DLL_API int leapfrog(
             return_code = ERROR_USER_INTERRUPT;
             goto err_user_interrupt;
         }
+
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
+        {
+            break;
+        }
+    }
+
+    /* Get v_1 from v_1+1/2 */
+    memcpy(temp_v, v, objects_count * 3 * sizeof(real));
+    for (int i = 0; i < objects_count; i++)
+    {
+        for (int j = 0; j < 3; j++)
+        {
+            v[i * 3 + j] -= 0.5 * a[i * 3 + j] * dt;
+        }
     }
 
-    return SUCCESS;
+    /* Save integrator state */
+    if (integrator_state)
+    {
+        return_code = save_integrator_state(
+            integrator_state,
+            integrator_param->integrator,
+            system,
+            objects_count * 3
+        );
+        if (return_code != SUCCESS)
+        {
+            goto err_save_integrator_state;
+        }
+        memcpy(integrator_state->aux_, temp_v, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->a_, a, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->x_err_comp_sum_, x_err_comp_sum, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->v_err_comp_sum_, v_err_comp_sum, objects_count * 3 * sizeof(real));
+        integrator_state->is_acc_updated_ = true;
+    }
+
+    return_code = SUCCESS;
 
+err_save_integrator_state:
 err_user_interrupt:
 err_store_solution:
 err_acceleration:
@@ -580,3 +754,275 @@ err_memory:
     free(v_err_comp_sum);
     return return_code;
 }
+
+WIN32DLL_API int yoshida(
+    System *system,
+    IntegratorParam *integrator_param,
+    AccelerationParam *acceleration_param,
+    StoringParam *storing_param,
+    Solutions *solutions,
+    SimulationStatus *simulation_status,
+    Settings *settings,
+    SimulationParam *simulation_param
+)
+{
+    /* Declare variables */
+    int return_code;
+
+    real *restrict x = system->x;
+    real *restrict v = system->v;
+    const int objects_count = system->objects_count;
+
+    const real dt = integrator_param->dt;
+    const int64 n_steps = simulation_param->n_steps_;
+
+    const int storing_freq = storing_param->storing_freq;
+
+    int half_stages;
+    const real *half_weights;
+    return_code = get_yoshida_weights(
+        integrator_param->integrator,
+        &half_stages,
+        &half_weights
+    );
+    if (return_code != SUCCESS)
+    {
+        goto err_unknown_method;
+    }
+    const int stages = 2 * half_stages + 1;
+
+    /* Allocate memory */
+    real *restrict temp_x = malloc(objects_count * 3 * sizeof(real));
+    real *restrict temp_v = malloc(objects_count * 3 * sizeof(real));
+    real *restrict a = malloc(objects_count * 3 * sizeof(real));
+    real *restrict drift_coeffs = malloc(stages * sizeof(real));
+    real *restrict kick_coeffs = malloc((stages + 1) * sizeof(real));
+
+    // Compensated summation
+    real *restrict x_err_comp_sum = calloc(objects_count * 3, sizeof(real));
+    real *restrict v_err_comp_sum = calloc(objects_count * 3, sizeof(real));
+
+    // Check if memory allocation is successful
+    if (
+        !temp_x
+        || !temp_v
+        || !a
+        || !drift_coeffs
+        || !kick_coeffs
+        || !x_err_comp_sum
+        || !v_err_comp_sum
+    )
+    {
+        return_code = ERROR_YOSHIDA_MEMORY_ALLOC;
+        goto err_memory;
+    }
+
+    /**
+     * Each leapfrog sub-step with weight w is kick(w / 2), drift(w), kick(w / 2).
+     * The adjacent half kicks of two sub-steps are merged into one kick.
+     */
+    real w_0 = 1.0;
+    for (int k = 0; k < half_stages; k++)
+    {
+        drift_coeffs[k] = half_weights[half_stages - 1 - k];
+        drift_coeffs[stages - 1 - k] = half_weights[half_stages - 1 - k];
+        w_0 -= 2.0 * half_weights[k];
+    }
+    drift_coeffs[half_stages] = w_0;
+
+    kick_coeffs[0] = 0.5 * drift_coeffs[0];
+    for (int k = 1; k < stages; k++)
+    {
+        kick_coeffs[k] = 0.5 * (drift_coeffs[k - 1] + drift_coeffs[k]);
+    }
+    kick_coeffs[stages] = 0.5 * drift_coeffs[stages - 1];
+
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
+    {
+        memcpy(a, integrator_state->a_, objects_count * 3 * sizeof(real));
+        memcpy(x_err_comp_sum, integrator_state->x_err_comp_sum_, objects_count * 3 * sizeof(real));
+        memcpy(v_err_comp_sum, integrator_state->v_err_comp_sum_, objects_count * 3 * sizeof(real));
+    }
+    else
+    {
+        // Compute initial acceleration
+        return_code = acceleration(
+            a,
+            system,
+            acceleration_param
+        );
+        if (return_code != SUCCESS)
+        {
+            goto err_acceleration;
+        }
+    }
+
+    /* Main Loop */
+    for (int64 count = 1; count <= n_steps; count++)
+    {
+        /**
+         * The first kick reuses the acceleration from the 
+         * last kick of the previous step, so each step 
+         * requires only "stages" acceleration evaluations
+         */
+        for (int k = 0; k < stages; k++)
+        {
+            yoshida_compensated_update(
+                objects_count, v, a, kick_coeffs[k] * dt, v_err_comp_sum, temp_v
+            );
+            yoshida_compensated_update(
+                objects_count, x, v, drift_coeffs[k] * dt, x_err_comp_sum, temp_x
+            );
+
+            return_code = acceleration(
+                a,
+                system,
+                acceleration_param
+            );
+            if (return_code != SUCCESS)
+            {
+                goto err_acceleration;
+            }
+        }
+        yoshida_compensated_update(
+            objects_count, v, a, kick_coeffs[stages] * dt, v_err_comp_sum, temp_v
+        );
+
+        /* Update time */
+        *(simulation_status->t) = count * dt;
+
+        /* Store solution */
+        if (count % storing_freq == 0)
+        {
+            return_code = store_solution_step(
+                storing_param,
+                system,
+                simulation_status,
+                solutions
+            );
+            if (return_code != SUCCESS)
+            {
+                goto err_store_solution;
+            }
+        }
+
+        /* Check user interrupt */
+        if (*(settings->is_exit))
+        {
+            return_code = ERROR_USER_INTERRUPT;
+            goto err_user_interrupt;
+        }
+
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
+        {
+            break;
+        }
+    }
+
+    /* Save integrator state */
+    if (integrator_state)
+    {
+        return_code = save_integrator_state(integrator_state, integrator_param->integrator, system, 0);
+        if (return_code != SUCCESS)
+        {
+            goto err_save_integrator_state;
+        }
+        memcpy(integrator_state->a_, a, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->x_err_comp_sum_, x_err_comp_sum, objects_count * 3 * sizeof(real));
+        memcpy(integrator_state->v_err_comp_sum_, v_err_comp_sum, objects_count * 3 * sizeof(real));
+        integrator_state->is_acc_updated_ = true;
+    }
+
+    return_code = SUCCESS;
+
+err_save_integrator_state:
+err_user_interrupt:
+err_store_solution:
+err_acceleration:
+err_memory:
+    free(temp_x);
+    free(temp_v);
+    free(a);
+    free(drift_coeffs);
+    free(kick_coeffs);
+    free(x_err_comp_sum);
+    free(v_err_comp_sum);
+err_unknown_method:
+    return return_code;
+}
+
+IN_FILE int get_yoshida_weights(
+    const char *integrator,
+    int *restrict half_stages,
+    const real **half_weights
+)
+{
+    // 4th order, w_1 = 1 / (2 - 2^(1/3))
+    static const real yoshida4_weights[1] = {
+        1.351207191959657634047687808971460826921999376217144828328L
+    };
+
+    // 6th order, solution A
+    static const real yoshida6_weights[3] = {
+        -1.17767998417887L,
+        0.235573213359357L,
+        0.784513610477560L
+    };
+
+    // 8th order, solution D
+    static const real yoshida8_weights[7] = {
+        0.102799849391985L,
+        -1.96061023297549L,
+        1.93813913762276L,
+        -0.158240635368243L,
+        -1.44485223686048L,
+        0.253693336566229L,
+        0.914844246229740L
+    };
+
+    if (strcmp(integrator, "yoshida4") == 0)
+    {
+        *half_stages = 1;
+        *half_weights = yoshida4_weights;
+        return SUCCESS;
+    }
+    else if (strcmp(integrator, "yoshida6") == 0)
+    {
+        *half_stages = 3;
+        *half_weights = yoshida6_weights;
+        return SUCCESS;
+    }
+    else if (strcmp(integrator, "yoshida8") == 0)
+    {
+        *half_stages = 7;
+        *half_weights = yoshida8_weights;
+        return SUCCESS;
+    }
+    else
+    {
+        return ERROR_UNKNOWN_YOSHIDA_METHOD;
+    }
+}
+
+IN_FILE void yoshida_compensated_update(
+    const int objects_count,
+    real *restrict y,
+    const real *restrict dydt,
+    const real dt,
+    real *restrict y_err_comp_sum,
+    real *restrict temp_y
+)
+{
+    memcpy(temp_y, y, objects_count * 3 * sizeof(real));
+    for (int i = 0; i < objects_count; i++)
+    {
+        for (int j = 0; j < 3; j++)
+        {
+            y_err_comp_sum[i * 3 + j] += dydt[i * 3 + j] * dt;
+            y[i * 3 + j] = temp_y[i * 3 + j] + y_err_comp_sum[i * 3 + j];
+            y_err_comp_sum[i * 3 + j] += temp_y[i * 3 + j] - y[i * 3 + j];
+        }
+    }
+}
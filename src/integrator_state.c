@@ -0,0 +1,155 @@
+/**
+ * \file integrator_state.c
+ * \author Ching Yin Ng
+ * \brief Function definitions for the integrator state kept between
+ *        simulation runs
+ *
+ * When a simulation is resumed, the integrators restore their internal
+ * state (e.g. half-step velocities, predictor values, step size and
+ * compensated summation errors) from the integrator state instead of
+ * re-initializing, so that running a simulation in chunks gives the
+ * same result as running it at once.
+ */
+
+#include <stdbool.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "error.h"
+#include "gravity_sim.h"
+#include "integrator_state.h"
+
+/**
+ * \brief Free the arrays of the integrator state
+ *
+ * \param integrator_state Pointer to the integrator state
+ */
+IN_FILE void free_integrator_state_arrays(IntegratorState *integrator_state);
+
+WIN32DLL_API IntegratorState *create_integrator_state(void)
+{
+    return calloc(1, sizeof(IntegratorState));
+}
+
+WIN32DLL_API void free_integrator_state(IntegratorState *integrator_state)
+{
+    if (!integrator_state)
+    {
+        return;
+    }
+    free_integrator_state_arrays(integrator_state);
+    free(integrator_state);
+}
+
+WIN32DLL_API bool is_integrator_state_resumable(
+    const IntegratorState *integrator_state,
+    const char *integrator,
+    const System *system
+)
+{
+    if (!integrator_state || !integrator_state->is_saved_)
+    {
+        return false;
+    }
+
+    const int objects_count = system->objects_count;
+    if (
+        integrator_state->objects_count_ != objects_count
+        || strcmp(integrator_state->integrator_, integrator) != 0
+    )
+    {
+        return false;
+    }
+
+    return (
+        memcmp(integrator_state->x_, system->x, objects_count * 3 * sizeof(real)) == 0
+        && memcmp(integrator_state->v_, system->v, objects_count * 3 * sizeof(real)) == 0
+        && memcmp(integrator_state->m_, system->m, objects_count * sizeof(real)) == 0
+    );
+}
+
+WIN32DLL_API int save_integrator_state(
+    IntegratorState *integrator_state,
+    const char *integrator,
+    const System *system,
+    const int64 aux_size
+)
+{
+    const int objects_count = system->objects_count;
+    integrator_state->is_saved_ = false;
+
+    if (
+        !integrator_state->x_
+        || integrator_state->objects_count_ != objects_count
+        || integrator_state->aux_size_ != aux_size
+    )
+    {
+        free_integrator_state_arrays(integrator_state);
+        integrator_state->x_ = malloc(objects_count * 3 * sizeof(real));
+        integrator_state->v_ = malloc(objects_count * 3 * sizeof(real));
+        integrator_state->m_ = malloc(objects_count * sizeof(real));
+        integrator_state->a_ = malloc(objects_count * 3 * sizeof(real));
+        integrator_state->x_err_comp_sum_ = malloc(objects_count * 3 * sizeof(real));
+        integrator_state->v_err_comp_sum_ = malloc(objects_count * 3 * sizeof(real));
+        if (aux_size > 0)
+        {
+            integrator_state->aux_ = malloc(aux_size * sizeof(real));
+        }
+        if (
+            !integrator_state->x_
+            || !integrator_state->v_
+            || !integrator_state->m_
+            || !integrator_state->a_
+            || !integrator_state->x_err_comp_sum_
+            || !integrator_state->v_err_comp_sum_
+            || (aux_size > 0 && !integrator_state->aux_)
+        )
+        {
+            free_integrator_state_arrays(integrator_state);
+            return ERROR_INTEGRATOR_STATE_MEMORY_ALLOC;
+        }
+        integrator_state->objects_count_ = objects_count;
+        integrator_state->aux_size_ = aux_size;
+    }
+
+    // The state would never be restored if the name does not fit
+    if (strlen(integrator) >= sizeof(integrator_state->integrator_))
+    {
+        return SUCCESS;
+    }
+    strcpy(integrator_state->integrator_, integrator);
+
+    memcpy(integrator_state->x_, system->x, objects_count * 3 * sizeof(real));
+    memcpy(integrator_state->v_, system->v, objects_count * 3 * sizeof(real));
+    memcpy(integrator_state->m_, system->m, objects_count * sizeof(real));
+
+    integrator_state->dt_ = 0.0;
+    integrator_state->is_acc_updated_ = false;
+    memset(integrator_state->x_err_comp_sum_, 0, objects_count * 3 * sizeof(real));
+    memset(integrator_state->v_err_comp_sum_, 0, objects_count * 3 * sizeof(real));
+
+    integrator_state->is_saved_ = true;
+
+    return SUCCESS;
+}
+
+IN_FILE void free_integrator_state_arrays(IntegratorState *integrator_state)
+{
+    free(integrator_state->x_);
+    free(integrator_state->v_);
+    free(integrator_state->m_);
+    free(integrator_state->a_);
+    free(integrator_state->x_err_comp_sum_);
+    free(integrator_state->v_err_comp_sum_);
+    free(integrator_state->aux_);
+
+    integrator_state->x_ = NULL;
+    integrator_state->v_ = NULL;
+    integrator_state->m_ = NULL;
+    integrator_state->a_ = NULL;
+    integrator_state->x_err_comp_sum_ = NULL;
+    integrator_state->v_err_comp_sum_ = NULL;
+    integrator_state->aux_ = NULL;
+    integrator_state->objects_count_ = 0;
+    integrator_state->aux_size_ = 0;
+}
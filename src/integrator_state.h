@@ -0,0 +1,68 @@
+/**
+ * \file integrator_state.h
+ * \author Ching Yin Ng
+ * \brief Function prototypes for the integrator state kept between
+ *        simulation runs
+ */
+
+#ifndef INTEGRATOR_STATE_H
+#define INTEGRATOR_STATE_H
+
+#include "gravity_sim.h"
+
+/**
+ * \brief Create an empty integrator state
+ *
+ * \return Pointer to the integrator state, or NULL if memory allocation failed
+ */
+IntegratorState *create_integrator_state(void);
+
+/**
+ * \brief Free the integrator state and all its arrays
+ *
+ * \param integrator_state Pointer to the integrator state
+ */
+void free_integrator_state(IntegratorState *integrator_state);
+
+/**
+ * \brief Check whether the integrator state can be restored
+ *
+ * The state can be restored only if it is saved by the same
+ * integrator and the system is not modified since then.
+ *
+ * \param integrator_state Pointer to the integrator state, can be NULL
+ * \param integrator Name of the integrator
+ * \param system Pointer to the gravitational system
+ *
+ * \return true if the integrator state can be restored
+ */
+bool is_integrator_state_resumable(
+    const IntegratorState *integrator_state,
+    const char *integrator,
+    const System *system
+);
+
+/**
+ * \brief Save a copy of the system to the integrator state
+ *
+ * The arrays of the integrator state are allocated for the current
+ * objects_count and aux_size, and are left for the integrator to
+ * fill in. Hence, this function should be called after the system
+ * is updated for the last time.
+ *
+ * \param integrator_state Pointer to the integrator state
+ * \param integrator Name of the integrator
+ * \param system Pointer to the gravitational system
+ * \param aux_size Size of the integrator-specific auxiliary array
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_INTEGRATOR_STATE_MEMORY_ALLOC If memory allocation failed
+ */
+int save_integrator_state(
+    IntegratorState *integrator_state,
+    const char *integrator,
+    const System *system,
+    const int64 aux_size
+);
+
+#endif
@@ -8,6 +8,15 @@
  *   J. Roa, et al. Moving Planets Around: An Introduction to
  *   N-Body Simulations Applied to Exoplanetary Systems*, MIT
  *   Press, 2020
+ * 
+ * The MERCURIUS hybrid integrator is based on:
+ *   H. Rein, et al. Hybrid symplectic integrators for planetary
+ *   dynamics, MNRAS 485, 5490-5497, 2019
+ * 
+ * The SABA and SBAB integrators are based on:
+ *   J. Laskar and P. Robutel, High order symplectic integrators
+ *   for perturbed Hamiltonian systems, Celestial Mechanics and
+ *   Dynamical Astronomy 80, 39-62, 2001
  */
 
 #include <math.h>
@@ -19,9 +28,15 @@
 #include "acceleration.h"
 #include "error.h"
 #include "gravity_sim.h"
+#include "integrator.h"
+#include "integrator_state.h"
 #include "math_functions.h"
 #include "storing.h"
 
+#define MERCURIUS_HILL_RADIUS_FACTOR 3.0
+#define MERCURIUS_IAS15_TOLERANCE 1e-9
+#define SABA_MAX_STAGES 5
+
 /**
  * \brief Compute the velocity kick
  * 
@@ -41,12 +56,14 @@ IN_FILE void whfast_kick(
  * \brief Compute the position drift
  * 
  * \param system Pointer to the gravitational system
- * \param jacobi_x Array of Jacobi position vectors
- * \param jacobi_v Array of Jacobi velocity vectors
- * \param eta Array of cumulative masses
+ * \param jacobi_x Array of Jacobi (or democratic heliocentric) position vectors
+ * \param jacobi_v Array of Jacobi (or democratic heliocentric) velocity vectors
+ * \param kepler_gm Array of gravitational parameters of the Kepler problem of each object
  * \param dt Time step of the system
  * \param kepler_tol Tolerance for solving Kepler's equation
  * \param kepler_max_iter Maximum number of iterations in solving Kepler's equation
+ * \param kepler_s Array of universal anomalies from the previous step,
+ *                 used as the initial guess in solving Kepler's equation
  * \param kepler_auto_remove Flag to indicate whether to remove objects
  *                           that failed to converge in Kepler's equation
  * \param kepler_failed_bool_array Array of flags to indicate whether 
@@ -59,10 +76,11 @@ IN_FILE int whfast_drift(
     System *restrict system,
     real *restrict jacobi_x,
     real *restrict jacobi_v,
-    const real *restrict eta,
+    const real *restrict kepler_gm,
     const real dt,
     const real kepler_tol,
     const int kepler_max_iter,
+    real *restrict kepler_s,
     const bool kepler_auto_remove,
     const real kepler_auto_remove_tol,
     bool *restrict kepler_failed_bool_array,
@@ -70,6 +88,23 @@ IN_FILE int whfast_drift(
     const int verbose
 );
 
+/**
+ * \brief Compute the gravitational parameters of the Kepler problem
+ *        of each object in the drift step
+ * 
+ * \param system Pointer to the gravitational system
+ * \param eta Array of cumulative masses
+ * \param kepler_gm Array of gravitational parameters to be stored
+ * \param is_democratic_heliocentric Flag to indicate whether democratic
+ *                                   heliocentric coordinates are used
+ */
+IN_FILE void whfast_compute_gm(
+    const System *restrict system,
+    const real *restrict eta,
+    real *restrict kepler_gm,
+    const bool is_democratic_heliocentric
+);
+
 /**
  * \brief Transform Cartesian coordinates to Jacobi coordinates
  * 
@@ -100,6 +135,52 @@ IN_FILE void jacobi_to_cartesian(
     const real *restrict eta
 );
 
+/**
+ * \brief Transform Cartesian coordinates to democratic heliocentric coordinates
+ * 
+ * \details Positions are stored relative to the central object and velocities
+ *          are stored relative to the center of mass. The first entry stores
+ *          the position and velocity of the center of mass.
+ * 
+ * \param system Pointer to the gravitational system
+ * \param dh_x Array of democratic heliocentric position vectors to be stored
+ * \param dh_v Array of democratic heliocentric velocity vectors to be stored
+ */
+IN_FILE void cartesian_to_democratic_heliocentric(
+    System *restrict system,
+    real *restrict dh_x,
+    real *restrict dh_v
+);
+
+/**
+ * \brief Transform democratic heliocentric coordinates to Cartesian coordinates
+ * 
+ * \param system Pointer to the gravitational system
+ * \param dh_x Array of democratic heliocentric position vectors
+ * \param dh_v Array of democratic heliocentric velocity vectors
+ */
+IN_FILE void democratic_heliocentric_to_cartesian(
+    System *restrict system,
+    const real *restrict dh_x,
+    const real *restrict dh_v
+);
+
+/**
+ * \brief Compute the position jump in democratic heliocentric coordinates,
+ *        together with the drift of the center of mass
+ * 
+ * \param system Pointer to the gravitational system
+ * \param dh_x Array of democratic heliocentric position vectors
+ * \param dh_v Array of democratic heliocentric velocity vectors
+ * \param dt Time step of the system
+ */
+IN_FILE void whfast_democratic_heliocentric_jump(
+    const System *restrict system,
+    real *restrict dh_x,
+    const real *restrict dh_v,
+    const real dt
+);
+
 /**
  * \brief Compute the Stumpff functions c0, c1, c2, and c3 for a given argument z
  * 
@@ -171,6 +252,176 @@ IN_FILE int whfast_acceleration_massless(
     const AccelerationParam *acceleration_param
 );
 
+/**
+ * \brief Acceleration function for WHFast integrator
+ *        in democratic heliocentric coordinates
+ * 
+ * \details Only the interaction between non-central objects is computed.
+ *          Massless objects are not included as sources, so the
+ *          calculation is O(m^2 + mn), where m and n are the number of
+ *          massive and massless objects, respectively. The positions
+ *          are read directly from the heliocentric coordinates,
+ *          so no coordinate transformation is needed.
+ * 
+ * \param a Array of acceleration vectors to be stored
+ * \param system Pointer to the gravitational system
+ * \param dh_x Array of democratic heliocentric position vectors
+ * \param eta Array of cumulative masses (not used)
+ * \param acceleration_param Pointer to acceleration parameters
+ * 
+ * \retval SUCCESS If exit successfully
+ * \retval ERROR_WHFAST_ACC_DEMOCRATIC_HELIOCENTRIC_MEMORY_ALLOC If memory allocation failed
+ */
+IN_FILE int whfast_acceleration_democratic_heliocentric(
+    real *restrict a,
+    const System *system,
+    real *restrict dh_x,
+    const real *restrict eta,
+    const AccelerationParam *acceleration_param
+);
+
+/**
+ * \brief Data for the acceleration function of close encounters in MERCURIUS
+ */
+typedef struct MercuriusEncounterData
+{
+    real central_gm;
+    const real *dcrit;
+    real softening_length;
+} MercuriusEncounterData;
+
+/**
+ * \brief Changeover function for MERCURIUS integrator
+ * 
+ * \details Smooth polynomial going from 0 at r <= 0.1 dcrit 
+ *          to 1 at r >= dcrit.
+ * 
+ * \param r Distance between the two objects
+ * \param dcrit Critical radius of the two objects
+ * 
+ * \return Value of the changeover function
+ */
+IN_FILE real mercurius_changeover(const real r, const real dcrit);
+
+/**
+ * \brief Compute the critical radius of each object for MERCURIUS integrator
+ * 
+ * \param system Pointer to the gravitational system
+ * \param dh_x Array of democratic heliocentric position vectors
+ * \param dh_v Array of democratic heliocentric velocity vectors
+ * \param dt Time step of the system
+ * \param dcrit Array of critical radius to be stored
+ */
+IN_FILE void mercurius_compute_dcrit(
+    const System *restrict system,
+    const real *restrict dh_x,
+    const real *restrict dh_v,
+    const real dt,
+    real *restrict dcrit
+);
+
+/**
+ * \brief Interaction acceleration function for MERCURIUS integrator
+ * 
+ * \details Same as the democratic heliocentric acceleration function
+ *          of WHFast, but the interaction of each pair is multiplied
+ *          by the changeover function.
+ * 
+ * \param a Array of acceleration vectors to be stored
+ * \param system Pointer to the gravitational system
+ * \param dh_x Array of democratic heliocentric position vectors
+ * \param dcrit Array of critical radius
+ * \param massive_indices Array of indices of massive objects, excluding the central object
+ * \param massive_objects_count Number of massive objects, excluding the central object
+ * \param massless_indices Array of indices of massless objects
+ * \param massless_objects_count Number of massless objects
+ * \param acceleration_param Pointer to acceleration parameters
+ */
+IN_FILE void mercurius_acceleration_interaction(
+    real *restrict a,
+    const System *system,
+    const real *restrict dh_x,
+    const real *restrict dcrit,
+    const int *restrict massive_indices,
+    const int massive_objects_count,
+    const int *restrict massless_indices,
+    const int massless_objects_count,
+    const AccelerationParam *acceleration_param
+);
+
+/**
+ * \brief Flag objects in close encounters during a drift step
+ * 
+ * \details The minimum distance of each pair is estimated by
+ *          linear interpolation between the positions at
+ *          the start and the end of the drift step.
+ * 
+ * \param x_0 Array of position vectors at the start of the drift step
+ * \param x_1 Array of position vectors at the end of the drift step
+ * \param dcrit Array of critical radius
+ * \param massive_indices Array of indices of massive objects, excluding the central object
+ * \param massive_objects_count Number of massive objects, excluding the central object
+ * \param massless_indices Array of indices of massless objects
+ * \param massless_objects_count Number of massless objects
+ * \param encounter_flags Array of flags to indicate whether an object is in close encounter
+ * 
+ * \return Whether any close encounter is found
+ */
+IN_FILE bool mercurius_find_encounters(
+    const real *restrict x_0,
+    const real *restrict x_1,
+    const real *restrict dcrit,
+    const int *restrict massive_indices,
+    const int massive_objects_count,
+    const int *restrict massless_indices,
+    const int massless_objects_count,
+    bool *restrict encounter_flags
+);
+
+/**
+ * \brief Acceleration function for objects in close encounters
+ *        for MERCURIUS integrator
+ * 
+ * \details Include the gravity from the central object, and the
+ *          part of the interaction that is not included in the
+ *          interaction step, i.e. multiplied by (1 - changeover)
+ * 
+ * \param a Array of acceleration vectors to be stored
+ * \param system Pointer to the system of objects in close encounters
+ * \param acceleration_data Pointer to MercuriusEncounterData
+ * 
+ * \retval SUCCESS If exit successfully
+ */
+IN_FILE int mercurius_acceleration_encounter(
+    real *restrict a,
+    const System *restrict system,
+    void *acceleration_data
+);
+
+/**
+ * \brief Get the coefficients of the SABA / SBAB integrator
+ * 
+ * \details A step is written as kick(d_0), drift(c_0), kick(d_1), ...,
+ *          drift(c_{n - 1}), kick(d_n), where n is the number of drifts.
+ *          Kicks with zero coefficient are skipped.
+ * 
+ * \param integrator Name of the integrator
+ * \param stages Pointer to the number of drifts n
+ * \param drift_coeffs Array of drift coefficients c_i to be stored,
+ *                     with length of at least SABA_MAX_STAGES
+ * \param kick_coeffs Array of kick coefficients d_i to be stored,
+ *                    with length of at least SABA_MAX_STAGES + 1
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_UNKNOWN_SABA_METHOD If integrator is not recognized
+ */
+IN_FILE int get_saba_coefficients(
+    const char *integrator,
+    int *restrict stages,
+    real *restrict drift_coeffs,
+    real *restrict kick_coeffs
+);
+
 WIN32DLL_API int whfast(
     System *system,
     IntegratorParam *integrator_param,
@@ -184,6 +435,26 @@ WIN32DLL_API int whfast(
 {
     int return_code;
 
+    /**
+     * jacobi_x and jacobi_v store either Jacobi coordinates or 
+     * democratic heliocentric coordinates, depending on the 
+     * coordinate system chosen
+     */
+    bool is_democratic_heliocentric;
+    if (strcmp(integrator_param->whfast_coordinate_system, "jacobi") == 0)
+    {
+        is_democratic_heliocentric = false;
+    }
+    else if (strcmp(integrator_param->whfast_coordinate_system, "democratic_heliocentric") == 0)
+    {
+        is_democratic_heliocentric = true;
+    }
+    else
+    {
+        return_code = ERROR_WHFAST_UNKNOWN_COORDINATE_SYSTEM;
+        goto err_unknown_coordinate_system;
+    }
+
     IN_FILE int (*whfast_acceleration)(
         real *restrict a,
         const System *system,
@@ -206,6 +477,12 @@ WIN32DLL_API int whfast(
         goto err_unknown_acc_method;
     }
 
+    // Massless objects are always separated in democratic heliocentric coordinates
+    if (is_democratic_heliocentric)
+    {
+        whfast_acceleration = whfast_acceleration_democratic_heliocentric;
+    }
+
     int objects_count = system->objects_count;
     real *restrict m = system->m;
 
@@ -222,8 +499,10 @@ WIN32DLL_API int whfast(
     real *restrict jacobi_x = calloc(objects_count * 3, sizeof(real));
     real *restrict jacobi_v = malloc(objects_count * 3 * sizeof(real));
     real *restrict temp_jacobi_v = malloc(objects_count * 3 * sizeof(real));
-    real *restrict a = malloc(objects_count * 3 * sizeof(real));
+    real *restrict a = calloc(objects_count * 3, sizeof(real));
     real *restrict eta = malloc(objects_count * sizeof(real));
+    real *restrict kepler_gm = malloc(objects_count * sizeof(real));
+    real *restrict kepler_s = calloc(objects_count, sizeof(real));
 
     if (
         !jacobi_x
@@ -231,6 +510,8 @@ WIN32DLL_API int whfast(
         || !temp_jacobi_v
         || !a
         || !eta
+        || !kepler_gm
+        || !kepler_s
     )
     {
         return_code = ERROR_WHFAST_MEMORY_ALLOC;
@@ -257,25 +538,52 @@ WIN32DLL_API int whfast(
     {
         eta[i] = eta[i - 1] + m[i];
     }
-    cartesian_to_jacobi(system, jacobi_x, jacobi_v, eta);
-    return_code = whfast_acceleration(a, system, jacobi_x, eta, acceleration_param);
-    if (return_code != SUCCESS)
+    whfast_compute_gm(system, eta, kepler_gm, is_democratic_heliocentric);
+
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
     {
-        goto err_acc;
+        // Restore v_1/2 instead of converting the coordinates and kicking again
+        memcpy(jacobi_x, integrator_state->aux_, objects_count * 3 * sizeof(real));
+        memcpy(jacobi_v, &integrator_state->aux_[objects_count * 3], objects_count * 3 * sizeof(real));
+        memcpy(kepler_s, &integrator_state->aux_[objects_count * 6], objects_count * sizeof(real));
+        memcpy(a, integrator_state->a_, objects_count * 3 * sizeof(real));
+    }
+    else
+    {
+        if (is_democratic_heliocentric)
+        {
+            cartesian_to_democratic_heliocentric(system, jacobi_x, jacobi_v);
+        }
+        else
+        {
+            cartesian_to_jacobi(system, jacobi_x, jacobi_v, eta);
+        }
+        return_code = whfast_acceleration(a, system, jacobi_x, eta, acceleration_param);
+        if (return_code != SUCCESS)
+        {
+            goto err_acc;
+        }
+        whfast_kick(objects_count, jacobi_v, a, 0.5 * dt);
     }
-    whfast_kick(objects_count, jacobi_v, a, 0.5 * dt);
     
     /* Main Loop */
     for (int64 count = 1; count <= n_steps; count++)
     {   
+        if (is_democratic_heliocentric)
+        {
+            whfast_democratic_heliocentric_jump(system, jacobi_x, jacobi_v, 0.5 * dt);
+        }
+
         return_code = whfast_drift(
             system,
             jacobi_x,
             jacobi_v,
-            eta,
+            kepler_gm,
             dt,
             kepler_tol,
             kepler_max_iter,
+            kepler_s,
             kepler_auto_remove,
             kepler_auto_remove_tol,
             kepler_failed_bool_array,
@@ -299,6 +607,23 @@ WIN32DLL_API int whfast(
         {
             kepler_failed_flag = false;
 
+            /**
+             * The center of mass and the barycentric velocities in democratic
+             * heliocentric coordinates depend on all masses, so they are
+             * computed again from the Cartesian coordinates after removal
+             */
+            if (is_democratic_heliocentric)
+            {
+                democratic_heliocentric_to_cartesian(system, jacobi_x, jacobi_v);
+            }
+
+            // The stored objects are looked up by their initial index
+            return_code = update_object_slots(storing_param, kepler_failed_bool_array);
+            if (return_code != SUCCESS)
+            {
+                goto err_remove_object;
+            }
+
             /* Remove object */
             int kepler_remove_count = 0;
 
@@ -319,7 +644,10 @@ WIN32DLL_API int whfast(
                 {
                     memcpy(&jacobi_x[(i - kepler_remove_count) * 3], &jacobi_x[i * 3], 3 * sizeof(real));
                     memcpy(&jacobi_v[(i - kepler_remove_count) * 3], &jacobi_v[i * 3], 3 * sizeof(real));
+                    memcpy(&(system->x[(i - kepler_remove_count) * 3]), &(system->x[i * 3]), 3 * sizeof(real));
+                    memcpy(&(system->v[(i - kepler_remove_count) * 3]), &(system->v[i * 3]), 3 * sizeof(real));
                     m[i - kepler_remove_count] = m[i];
+                    kepler_s[i - kepler_remove_count] = kepler_s[i];
                 }
             }
 
@@ -329,6 +657,11 @@ WIN32DLL_API int whfast(
                 eta[i] = eta[i - 1] + m[i];
             }
             system->objects_count = objects_count;
+            if (is_democratic_heliocentric)
+            {
+                cartesian_to_democratic_heliocentric(system, jacobi_x, jacobi_v);
+            }
+            whfast_compute_gm(system, eta, kepler_gm, is_democratic_heliocentric);
             if (settings->verbose > 0)
             {
                 fprintf(stderr, "kepler_auto_remove: %d objects removed in total. \
@@ -336,7 +669,15 @@ WIN32DLL_API int whfast(
                                  objects_count);
             }
         }
-        jacobi_to_cartesian(system, jacobi_x, jacobi_v, eta);
+
+        if (is_democratic_heliocentric)
+        {
+            whfast_democratic_heliocentric_jump(system, jacobi_x, jacobi_v, 0.5 * dt);
+        }
+        else
+        {
+            jacobi_to_cartesian(system, jacobi_x, jacobi_v, eta);
+        }
         return_code = whfast_acceleration(a, system, jacobi_x, eta, acceleration_param);
         if (return_code != SUCCESS)
         {
@@ -352,7 +693,14 @@ WIN32DLL_API int whfast(
             // Get v_1 from v_1+1/2
             memcpy(temp_jacobi_v, jacobi_v, objects_count * 3 * sizeof(real));
             whfast_kick(objects_count, temp_jacobi_v, a, -0.5 * dt);
-            jacobi_to_cartesian(system, jacobi_x, temp_jacobi_v, eta);
+            if (is_democratic_heliocentric)
+            {
+                democratic_heliocentric_to_cartesian(system, jacobi_x, temp_jacobi_v);
+            }
+            else
+            {
+                jacobi_to_cartesian(system, jacobi_x, temp_jacobi_v, eta);
+            }
             return_code = store_solution_step(
                 storing_param,
                 system,
@@ -371,6 +719,48 @@ WIN32DLL_API int whfast(
             return_code = ERROR_USER_INTERRUPT;
             goto err_user_interrupt;
         }
+
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
+        {
+            break;
+        }
+    }
+
+    /**
+     * The velocities in the main loop are at half steps, and the 
+     * Cartesian coordinates are not updated for democratic
+     * heliocentric coordinates, so we update the system here
+     */
+    memcpy(temp_jacobi_v, jacobi_v, objects_count * 3 * sizeof(real));
+    whfast_kick(objects_count, temp_jacobi_v, a, -0.5 * dt);
+    if (is_democratic_heliocentric)
+    {
+        democratic_heliocentric_to_cartesian(system, jacobi_x, temp_jacobi_v);
+    }
+    else
+    {
+        jacobi_to_cartesian(system, jacobi_x, temp_jacobi_v, eta);
+    }
+
+    /* Save integrator state */
+    if (integrator_state)
+    {
+        return_code = save_integrator_state(
+            integrator_state,
+            integrator_param->integrator,
+            system,
+            objects_count * 7
+        );
+        if (return_code != SUCCESS)
+        {
+            goto err_save_integrator_state;
+        }
+        memcpy(integrator_state->aux_, jacobi_x, objects_count * 3 * sizeof(real));
+        memcpy(&integrator_state->aux_[objects_count * 3], jacobi_v, objects_count * 3 * sizeof(real));
+        memcpy(&integrator_state->aux_[objects_count * 6], kepler_s, objects_count * sizeof(real));
+        memcpy(integrator_state->a_, a, objects_count * 3 * sizeof(real));
+        integrator_state->is_acc_updated_ = true;
     }
 
     /* Free memory */
@@ -379,289 +769,1114 @@ WIN32DLL_API int whfast(
     free(temp_jacobi_v);
     free(a);
     free(eta);
+    free(kepler_gm);
+    free(kepler_s);
     free(kepler_failed_bool_array);
 
     return SUCCESS;
 
+err_save_integrator_state:
 err_user_interrupt:
 err_store_solution:
 err_acc:
+err_remove_object:
 err_drift:
 err_kepler_auto_remove_memory:
     free(kepler_failed_bool_array);
 err_memory_alloc:
+    free(kepler_s);
+    free(kepler_gm);
     free(eta);
     free(a);
     free(temp_jacobi_v);
     free(jacobi_v);
     free(jacobi_x);
 err_unknown_acc_method:
+err_unknown_coordinate_system:
     return return_code;
 }
 
-IN_FILE void whfast_kick(
-    const int objects_count,
-    real *restrict jacobi_v,
-    const real *restrict a,
-    const real dt
+WIN32DLL_API int mercurius(
+    System *system,
+    IntegratorParam *integrator_param,
+    AccelerationParam *acceleration_param,
+    StoringParam *storing_param,
+    Solutions *solutions,
+    SimulationStatus *simulation_status,
+    Settings *settings,
+    SimulationParam *simulation_param
 )
 {
-    for (int i = 0; i < objects_count; i++)
+    int return_code;
+
+    // Massless objects are always separated, so both methods are equivalent
+    if (
+        strcmp(acceleration_param->method, "pairwise") != 0
+        && strcmp(acceleration_param->method, "massless") != 0
+    )
     {
-        jacobi_v[i * 3 + 0] += a[i * 3 + 0] * dt;
-        jacobi_v[i * 3 + 1] += a[i * 3 + 1] * dt;
-        jacobi_v[i * 3 + 2] += a[i * 3 + 2] * dt;
+        return_code = ERROR_MERCURIUS_UNKNOWN_ACCELERATION_METHOD;
+        goto err_unknown_acc_method;
     }
-}
-
-IN_FILE int whfast_drift(
-    System *restrict system,
-    real *restrict jacobi_x,
-    real *restrict jacobi_v,
-    const real *restrict eta,
-    const real dt,
-    const real kepler_tol,
-    const int kepler_max_iter,
-    const bool kepler_auto_remove,
-    const real kepler_auto_remove_tol,
-    bool *restrict kepler_failed_bool_array,
-    bool *restrict kepler_failed_flag,
-    const int verbose
-)
-{
-    int return_code;
 
     const int objects_count = system->objects_count;
     const real *restrict m = system->m;
-    const real G = system->G;
-    for (int i = 1; i < objects_count; i++)
-    {
-        real gm = G * m[0] * eta[i] / eta[i - 1];
-        real x[3];
-        real v[3];
-        memcpy(x, &jacobi_x[i * 3], 3 * sizeof(real));
-        memcpy(v, &jacobi_v[i * 3], 3 * sizeof(real));
-
-        real x_norm = vec_norm_3d(x);
-        real v_norm = vec_norm_3d(v);
 
-        // Radial velocity
-        real radial_v = vec_dot_3d(x, v) / x_norm; 
+    const real dt = integrator_param->dt;
+    const int64 n_steps = simulation_param->n_steps_;
+    const int storing_freq = storing_param->storing_freq;
 
-        real alpha = 2.0 * gm / x_norm - (v_norm * v_norm);
+    const real kepler_tol = integrator_param->whfast_kepler_tol;
+    const int kepler_max_iter = integrator_param->whfast_kepler_max_iter;
 
-        /* Solve Kepler's equation with Newton-Raphson method */
-        
-        // Initial guess
-        real s = dt / x_norm;
+    /* Allocate memory for calculation */
+    real *restrict dh_x = calloc(objects_count * 3, sizeof(real));
+    real *restrict dh_v = malloc(objects_count * 3 * sizeof(real));
+    real *restrict temp_dh_v = malloc(objects_count * 3 * sizeof(real));
+    real *restrict a = calloc(objects_count * 3, sizeof(real));
+    real *restrict kepler_gm = malloc(objects_count * sizeof(real));
+    real *restrict kepler_s = calloc(objects_count, sizeof(real));
+    real *restrict dcrit = malloc(objects_count * sizeof(real));
+    int *restrict massive_indices = calloc(objects_count, sizeof(int));
+    int *restrict massless_indices = calloc(objects_count, sizeof(int));
+
+    // Drift step and close encounters
+    real *restrict drift_x_0 = malloc(objects_count * 3 * sizeof(real));
+    real *restrict drift_v_0 = malloc(objects_count * 3 * sizeof(real));
+    bool *restrict encounter_flags = calloc(objects_count, sizeof(bool));
+    int *restrict encounter_indices = malloc(objects_count * sizeof(int));
+    real *restrict encounter_x = malloc(objects_count * 3 * sizeof(real));
+    real *restrict encounter_v = malloc(objects_count * 3 * sizeof(real));
+    real *restrict encounter_m = malloc(objects_count * sizeof(real));
+    real *restrict encounter_dcrit = malloc(objects_count * sizeof(real));
 
-        // Solve Kepler's equation
-        real c0 = 0.0;
-        real c1 = 0.0;
-        real c2 = 0.0;
-        real c3 = 0.0;
-        bool is_converged = false;
+    if (
+        !dh_x
+        || !dh_v
+        || !temp_dh_v
+        || !a
+        || !kepler_gm
+        || !kepler_s
+        || !dcrit
+        || !massive_indices
+        || !massless_indices
+        || !drift_x_0
+        || !drift_v_0
+        || !encounter_flags
+        || !encounter_indices
+        || !encounter_x
+        || !encounter_v
+        || !encounter_m
+        || !encounter_dcrit
+    )
+    {
+        return_code = ERROR_MERCURIUS_MEMORY_ALLOC;
+        goto err_memory_alloc;
+    }
 
-        for (int j = 0; j < kepler_max_iter; j++)
+    /* Find the indices of massive and massless objects */
+    // The central object is not included
+    int massive_objects_count = 0;
+    int massless_objects_count = 0;
+    for (int i = 1; i < objects_count; i++)
+    {
+        if (m[i] != 0.0)
         {
-            // Compute Stumpff functions
-            return_code = stumpff_functions(alpha * (s * s), &c0, &c1, &c2, &c3);
-            if (return_code != SUCCESS)
-            {
-                goto err_stumpff;
-            }
+            massive_indices[massive_objects_count] = i;
+            massive_objects_count++;
+        }
+        else
+        {
+            massless_indices[massless_objects_count] = i;
+            massless_objects_count++;
+        }
+    }
 
-            // Evaluate Kepler's equation and its derivative
-            real F = (
-                x_norm * s * c1
-                + x_norm * radial_v * (s * s) * c2
-                + gm * (s * s * s) * c3
-                - dt
-            );
-            real dF = (
-                x_norm * c0
-                + x_norm * radial_v * s * c1
-                + gm * (s * s) * c2
-            );
+    MercuriusEncounterData encounter_data = {
+        .central_gm = system->G * m[0],
+        .dcrit = encounter_dcrit,
+        .softening_length = acceleration_param->softening_length
+    };
 
-            // Advance step
-            real ds = -F / dF;
-            s += ds;
+    /* Initialization */
+    whfast_compute_gm(system, NULL, kepler_gm, true);
 
-            // Check convergence
-            if (fabs(ds) < kepler_tol)
-            {
-                is_converged = true;
-                break;
-            }
-        }
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
+    {
+        // Restore v_1/2 and the critical radius of the last run
+        memcpy(dh_x, integrator_state->aux_, objects_count * 3 * sizeof(real));
+        memcpy(dh_v, &integrator_state->aux_[objects_count * 3], objects_count * 3 * sizeof(real));
+        memcpy(kepler_s, &integrator_state->aux_[objects_count * 6], objects_count * sizeof(real));
+        memcpy(dcrit, &integrator_state->aux_[objects_count * 7], objects_count * sizeof(real));
+        memcpy(a, integrator_state->a_, objects_count * 3 * sizeof(real));
+    }
+    else
+    {
+        cartesian_to_democratic_heliocentric(system, dh_x, dh_v);
 
-        // The raidal distance is equal to the derivative of F
-        // real r = dF
-        real r = x_norm * c0 + x_norm * radial_v * s * c1 + gm * (s * s) * c2;
+        // The critical radius is fixed throughout the simulation
+        mercurius_compute_dcrit(system, dh_x, dh_v, dt, dcrit);
 
-        if (!is_converged)
+        mercurius_acceleration_interaction(
+            a,
+            system,
+            dh_x,
+            dcrit,
+            massive_indices,
+            massive_objects_count,
+            massless_indices,
+            massless_objects_count,
+            acceleration_param
+        );
+        whfast_kick(objects_count, dh_v, a, 0.5 * dt);
+    }
+    
+    /* Main Loop */
+    for (int64 count = 1; count <= n_steps; count++)
+    {   
+        whfast_democratic_heliocentric_jump(system, dh_x, dh_v, 0.5 * dt);
+
+        memcpy(drift_x_0, dh_x, objects_count * 3 * sizeof(real));
+        memcpy(drift_v_0, dh_v, objects_count * 3 * sizeof(real));
+
+        return_code = whfast_drift(
+            system,
+            dh_x,
+            dh_v,
+            kepler_gm,
+            dt,
+            kepler_tol,
+            kepler_max_iter,
+            kepler_s,
+            false,
+            0.0,
+            NULL,
+            NULL,
+            settings->verbose
+        );
+        if (return_code != SUCCESS)
         {
-            real error = (
-                x_norm * s * c1
-                + x_norm * radial_v * (s * s) * c2
-                + gm * (s * s * s) * c3
-                - dt
-            ) / r;
-            
-            if (verbose >= 2)
+            goto err_drift;
+        }
+
+        /* Integrate objects in close encounters with IAS15 */
+        bool is_encounter = mercurius_find_encounters(
+            drift_x_0,
+            dh_x,
+            dcrit,
+            massive_indices,
+            massive_objects_count,
+            massless_indices,
+            massless_objects_count,
+            encounter_flags
+        );
+        if (is_encounter)
+        {
+            int encounter_objects_count = 0;
+            for (int i = 1; i < objects_count; i++)
             {
-                fprintf(stderr, "Warning: Kepler's equation did not converge. "\
-                                "Object index: %d, error = %23.15g\n", i, error);
+                if (!encounter_flags[i])
+                {
+                    continue;
+                }
+                encounter_flags[i] = false;
+
+                // Start from the beginning of the drift step
+                const int k = encounter_objects_count;
+                encounter_indices[k] = i;
+                memcpy(&encounter_x[k * 3], &drift_x_0[i * 3], 3 * sizeof(real));
+                memcpy(&encounter_v[k * 3], &drift_v_0[i * 3], 3 * sizeof(real));
+                encounter_m[k] = m[i];
+                encounter_dcrit[k] = dcrit[i];
+                encounter_objects_count++;
             }
 
-            if (kepler_auto_remove && ((fabs(error) > kepler_auto_remove_tol) || isnan(error)))
+            System encounter_system = {
+                .x = encounter_x,
+                .v = encounter_v,
+                .m = encounter_m,
+                .objects_count = encounter_objects_count,
+                .G = system->G
+            };
+            return_code = ias15_integrate_interval(
+                &encounter_system,
+                mercurius_acceleration_encounter,
+                &encounter_data,
+                dt,
+                MERCURIUS_IAS15_TOLERANCE
+            );
+            if (return_code != SUCCESS)
             {
-                kepler_failed_bool_array[i] = true;
-                *kepler_failed_flag = true;
+                goto err_encounter;
             }
-        }
-
-        /* Evaluate f and g functions, together with their derivatives */
-        real f = 1.0 - gm * (s * s) * c2 / x_norm;
-        real g = dt - gm * (s * s * s) * c3;
 
-        real df = -gm * s * c1 / (r * x_norm);
-        real dg = 1.0 - gm * (s * s) * c2 / r; 
+            for (int k = 0; k < encounter_objects_count; k++)
+            {
+                const int i = encounter_indices[k];
+                memcpy(&dh_x[i * 3], &encounter_x[k * 3], 3 * sizeof(real));
+                memcpy(&dh_v[i * 3], &encounter_v[k * 3], 3 * sizeof(real));
 
-        /* Compute position and velocity vectors */
-        for (int j = 0; j < 3; j++)
-        {
-            jacobi_x[i * 3 + j] = f * x[j] + g * v[j];
-            jacobi_v[i * 3 + j] = df * x[j] + dg * v[j];
+                // The drift result is discarded, so do not warm start from it
+                kepler_s[i] = 0.0;
+            }
         }
-    }
 
-    return SUCCESS;
+        whfast_democratic_heliocentric_jump(system, dh_x, dh_v, 0.5 * dt);
 
-err_stumpff:
-    return return_code;
-}
+        mercurius_acceleration_interaction(
+            a,
+            system,
+            dh_x,
+            dcrit,
+            massive_indices,
+            massive_objects_count,
+            massless_indices,
+            massless_objects_count,
+            acceleration_param
+        );
+        whfast_kick(objects_count, dh_v, a, dt);
 
-IN_FILE void cartesian_to_jacobi(
-    System *restrict system,
-    real *restrict jacobi_x,
-    real *restrict jacobi_v,
-    const real *restrict eta
-)
-{
-    real x_cm[3];
-    real v_cm[3];
-    const int objects_count = system->objects_count;
-    real *restrict x = system->x;
-    real *restrict v = system->v;
-    const real *restrict m = system->m;
+        *(simulation_status->t) = count * dt;
 
-    x_cm[0] = m[0] * x[0];
-    x_cm[1] = m[0] * x[1];
-    x_cm[2] = m[0] * x[2];
+        /* Store solution */
+        if (count % storing_freq == 0)
+        {
+            // Get v_1 from v_1+1/2
+            memcpy(temp_dh_v, dh_v, objects_count * 3 * sizeof(real));
+            whfast_kick(objects_count, temp_dh_v, a, -0.5 * dt);
+            democratic_heliocentric_to_cartesian(system, dh_x, temp_dh_v);
+            return_code = store_solution_step(
+                storing_param,
+                system,
+                simulation_status,
+                solutions
+            );
+            if (return_code != SUCCESS)
+            {
+                goto err_store_solution;
+            }
+        }
 
-    v_cm[0] = m[0] * v[0];
-    v_cm[1] = m[0] * v[1];
-    v_cm[2] = m[0] * v[2];
+        /* Check user interrupt */
+        if (*(settings->is_exit))
+        {
+            return_code = ERROR_USER_INTERRUPT;
+            goto err_user_interrupt;
+        }
 
-    for (int i = 1; i < objects_count; i++)
-    {
-        for (int j = 0; j < 3; j++)
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
         {
-            jacobi_x[i * 3 + j] = x[i * 3 + j] - x_cm[j] / eta[i - 1];
-            jacobi_v[i * 3 + j] = v[i * 3 + j] - v_cm[j] / eta[i - 1];
-        
-            x_cm[j] = x_cm[j] * (1.0 + m[i] / eta[i - 1]) + m[i] * jacobi_x[i * 3 + j];
-            v_cm[j] = v_cm[j] * (1.0 + m[i] / eta[i - 1]) + m[i] * jacobi_v[i * 3 + j];
+            break;
         }
     }
 
-    jacobi_x[0] = x_cm[0] / eta[objects_count - 1];
-    jacobi_x[1] = x_cm[1] / eta[objects_count - 1];
-    jacobi_x[2] = x_cm[2] / eta[objects_count - 1];
-
-    jacobi_v[0] = v_cm[0] / eta[objects_count - 1];
-    jacobi_v[1] = v_cm[1] / eta[objects_count - 1];
-    jacobi_v[2] = v_cm[2] / eta[objects_count - 1];
-}
-
-IN_FILE void jacobi_to_cartesian(
-    System *restrict system,
-    const real *restrict jacobi_x,
-    const real *restrict jacobi_v,
-    const real *restrict eta
-)
-{
-    real x_cm[3];
-    real v_cm[3];
-    const int objects_count = system->objects_count;
-    real *restrict x = system->x;
-    real *restrict v = system->v;
-    const real *restrict m = system->m;
-
-    x_cm[0] = eta[objects_count - 1] * jacobi_x[0];
-    x_cm[1] = eta[objects_count - 1] * jacobi_x[1];
-    x_cm[2] = eta[objects_count - 1] * jacobi_x[2];
-
-    v_cm[0] = eta[objects_count - 1] * jacobi_v[0];
-    v_cm[1] = eta[objects_count - 1] * jacobi_v[1];
-    v_cm[2] = eta[objects_count - 1] * jacobi_v[2];
+    /* Update the system */
+    memcpy(temp_dh_v, dh_v, objects_count * 3 * sizeof(real));
+    whfast_kick(objects_count, temp_dh_v, a, -0.5 * dt);
+    democratic_heliocentric_to_cartesian(system, dh_x, temp_dh_v);
 
-    for (int i = (objects_count - 1); i > 0; i--)
+    /* Save integrator state */
+    if (integrator_state)
     {
-        for (int j = 0; j < 3; j++)
+        return_code = save_integrator_state(
+            integrator_state,
+            integrator_param->integrator,
+            system,
+            objects_count * 8
+        );
+        if (return_code != SUCCESS)
         {
-            x_cm[j] = (x_cm[j] - m[i] * jacobi_x[i * 3 + j]) / eta[i];
-            v_cm[j] = (v_cm[j] - m[i] * jacobi_v[i * 3 + j]) / eta[i];
-
-            x[i * 3 + j] = jacobi_x[i * 3 + j] + x_cm[j];
-            v[i * 3 + j] = jacobi_v[i * 3 + j] + v_cm[j];
-
-            x_cm[j] = eta[i - 1] * x_cm[j];
-            v_cm[j] = eta[i - 1] * v_cm[j];
+            goto err_save_integrator_state;
         }
+        memcpy(integrator_state->aux_, dh_x, objects_count * 3 * sizeof(real));
+        memcpy(&integrator_state->aux_[objects_count * 3], dh_v, objects_count * 3 * sizeof(real));
+        memcpy(&integrator_state->aux_[objects_count * 6], kepler_s, objects_count * sizeof(real));
+        memcpy(&integrator_state->aux_[objects_count * 7], dcrit, objects_count * sizeof(real));
+        memcpy(integrator_state->a_, a, objects_count * 3 * sizeof(real));
+        integrator_state->is_acc_updated_ = true;
     }
-    
-    x[0] = x_cm[0] / m[0];
-    x[1] = x_cm[1] / m[0];
-    x[2] = x_cm[2] / m[0];
 
-    v[0] = v_cm[0] / m[0];
-    v[1] = v_cm[1] / m[0];
-    v[2] = v_cm[2] / m[0];
+    /* Free memory */
+    free(dh_x);
+    free(dh_v);
+    free(temp_dh_v);
+    free(a);
+    free(kepler_gm);
+    free(kepler_s);
+    free(dcrit);
+    free(massive_indices);
+    free(massless_indices);
+    free(drift_x_0);
+    free(drift_v_0);
+    free(encounter_flags);
+    free(encounter_indices);
+    free(encounter_x);
+    free(encounter_v);
+    free(encounter_m);
+    free(encounter_dcrit);
+
+    return SUCCESS;
+
+err_save_integrator_state:
+err_user_interrupt:
+err_store_solution:
+err_encounter:
+err_drift:
+err_memory_alloc:
+    free(encounter_dcrit);
+    free(encounter_m);
+    free(encounter_v);
+    free(encounter_x);
+    free(encounter_indices);
+    free(encounter_flags);
+    free(drift_v_0);
+    free(drift_x_0);
+    free(massless_indices);
+    free(massive_indices);
+    free(dcrit);
+    free(kepler_s);
+    free(kepler_gm);
+    free(a);
+    free(temp_dh_v);
+    free(dh_v);
+    free(dh_x);
+err_unknown_acc_method:
+    return return_code;
 }
 
-IN_FILE int stumpff_functions(
-    real z,
-    real *restrict c0,
-    real *restrict c1,
-    real *restrict c2,
-    real *restrict c3
+WIN32DLL_API int saba(
+    System *system,
+    IntegratorParam *integrator_param,
+    AccelerationParam *acceleration_param,
+    StoringParam *storing_param,
+    Solutions *solutions,
+    SimulationStatus *simulation_status,
+    Settings *settings,
+    SimulationParam *simulation_param
 )
 {
     int return_code;
 
-    if (isinf(z))
+    int stages;
+    real drift_coeffs[SABA_MAX_STAGES];
+    real kick_coeffs[SABA_MAX_STAGES + 1];
+    return_code = get_saba_coefficients(
+        integrator_param->integrator,
+        &stages,
+        drift_coeffs,
+        kick_coeffs
+    );
+    if (return_code != SUCCESS)
     {
-        return_code = ERROR_WHFAST_STUMPFF_Z_INFINITE;
-        goto err_z_inf;
+        goto err_unknown_method;
     }
-    else if (isnan(z))
+
+    IN_FILE int (*whfast_acceleration)(
+        real *restrict a,
+        const System *system,
+        real *restrict jacobi_x,
+        const real *restrict eta,
+        const AccelerationParam *acceleration_param
+    );
+
+    if (strcmp(acceleration_param->method, "pairwise") == 0)
     {
-        return_code = ERROR_WHFAST_STUMPFF_Z_NAN;
-        goto err_z_nan;
+        whfast_acceleration = whfast_acceleration_pairwise;
     }
-
-    /* Reduce the argument */
-    int n = 0;
-    while (fabs(z) > 0.1)
+    else if (strcmp(acceleration_param->method, "massless") == 0)
     {
-        z /= 4.0;
-        n++;
+        whfast_acceleration = whfast_acceleration_massless;
     }
-
-    /* Compute stumpff functions */
+    else
+    {
+        return_code = ERROR_SABA_UNKNOWN_ACCELERATION_METHOD;
+        goto err_unknown_acc_method;
+    }
+
+    const int objects_count = system->objects_count;
+    const real *restrict m = system->m;
+
+    const real dt = integrator_param->dt;
+    const int64 n_steps = simulation_param->n_steps_;
+    const int storing_freq = storing_param->storing_freq;
+
+    const real kepler_tol = integrator_param->whfast_kepler_tol;
+    const int kepler_max_iter = integrator_param->whfast_kepler_max_iter;
+
+    /* Allocate memory for calculation */
+    real *restrict jacobi_x = calloc(objects_count * 3, sizeof(real));
+    real *restrict jacobi_v = malloc(objects_count * 3 * sizeof(real));
+    real *restrict a = calloc(objects_count * 3, sizeof(real));
+    real *restrict eta = malloc(objects_count * sizeof(real));
+    real *restrict kepler_gm = malloc(objects_count * sizeof(real));
+    real *restrict kepler_s = calloc(objects_count, sizeof(real));
+
+    if (
+        !jacobi_x
+        || !jacobi_v
+        || !a
+        || !eta
+        || !kepler_gm
+        || !kepler_s
+    )
+    {
+        return_code = ERROR_SABA_MEMORY_ALLOC;
+        goto err_memory_alloc;
+    }
+
+    /* Initialization */
+    eta[0] = m[0];
+    for (int i = 1; i < objects_count; i++)
+    {
+        eta[i] = eta[i - 1] + m[i];
+    }
+    whfast_compute_gm(system, eta, kepler_gm, false);
+
+    // Flag to indicate whether the acceleration is up to date with jacobi_x
+    bool is_acc_updated = false;
+
+    // The drift step size of the previous drift
+    real previous_drift_dt = dt;
+
+    IntegratorState *integrator_state = simulation_status->integrator_state;
+    if (is_integrator_state_resumable(integrator_state, integrator_param->integrator, system))
+    {
+        memcpy(jacobi_x, integrator_state->aux_, objects_count * 3 * sizeof(real));
+        memcpy(jacobi_v, &integrator_state->aux_[objects_count * 3], objects_count * 3 * sizeof(real));
+        memcpy(kepler_s, &integrator_state->aux_[objects_count * 6], objects_count * sizeof(real));
+        memcpy(a, integrator_state->a_, objects_count * 3 * sizeof(real));
+        is_acc_updated = integrator_state->is_acc_updated_;
+        previous_drift_dt = drift_coeffs[stages - 1] * dt;
+    }
+    else
+    {
+        cartesian_to_jacobi(system, jacobi_x, jacobi_v, eta);
+    }
+
+    /* Main Loop */
+    for (int64 count = 1; count <= n_steps; count++)
+    {
+        for (int k = 0; k <= stages; k++)
+        {
+            /* Kick */
+            if (kick_coeffs[k] != 0.0)
+            {
+                // For SBAB, the first kick reuses the acceleration of the last kick
+                if (!is_acc_updated)
+                {
+                    jacobi_to_cartesian(system, jacobi_x, jacobi_v, eta);
+                    return_code = whfast_acceleration(a, system, jacobi_x, eta, acceleration_param);
+                    if (return_code != SUCCESS)
+                    {
+                        goto err_acc;
+                    }
+                    is_acc_updated = true;
+                }
+                whfast_kick(objects_count, jacobi_v, a, kick_coeffs[k] * dt);
+            }
+
+            if (k == stages)
+            {
+                break;
+            }
+
+            /* Drift */
+            // The universal anomaly scales with the drift step size,
+            // so the warm start from the previous drift is rescaled
+            const real drift_dt = drift_coeffs[k] * dt;
+            for (int i = 1; i < objects_count; i++)
+            {
+                kepler_s[i] *= drift_dt / previous_drift_dt;
+            }
+            previous_drift_dt = drift_dt;
+
+            return_code = whfast_drift(
+                system,
+                jacobi_x,
+                jacobi_v,
+                kepler_gm,
+                drift_dt,
+                kepler_tol,
+                kepler_max_iter,
+                kepler_s,
+                false,
+                0.0,
+                NULL,
+                NULL,
+                settings->verbose
+            );
+            if (return_code != SUCCESS)
+            {
+                goto err_drift;
+            }
+            is_acc_updated = false;
+        }
+
+        *(simulation_status->t) = count * dt;
+
+        /* Store solution */
+        if (count % storing_freq == 0)
+        {
+            jacobi_to_cartesian(system, jacobi_x, jacobi_v, eta);
+            return_code = store_solution_step(
+                storing_param,
+                system,
+                simulation_status,
+                solutions
+            );
+            if (return_code != SUCCESS)
+            {
+                goto err_store_solution;
+            }
+        }
+
+        /* Check user interrupt */
+        if (*(settings->is_exit))
+        {
+            return_code = ERROR_USER_INTERRUPT;
+            goto err_user_interrupt;
+        }
+
+        /* Check stop request from the snapshot callback */
+        if (storing_param->is_callback_stop_)
+        {
+            break;
+        }
+    }
+
+    /* Update the system */
+    jacobi_to_cartesian(system, jacobi_x, jacobi_v, eta);
+
+    /* Save integrator state */
+    if (integrator_state)
+    {
+        return_code = save_integrator_state(
+            integrator_state,
+            integrator_param->integrator,
+            system,
+            objects_count * 7
+        );
+        if (return_code != SUCCESS)
+        {
+            goto err_save_integrator_state;
+        }
+        memcpy(integrator_state->aux_, jacobi_x, objects_count * 3 * sizeof(real));
+        memcpy(&integrator_state->aux_[objects_count * 3], jacobi_v, objects_count * 3 * sizeof(real));
+        memcpy(&integrator_state->aux_[objects_count * 6], kepler_s, objects_count * sizeof(real));
+        memcpy(integrator_state->a_, a, objects_count * 3 * sizeof(real));
+        integrator_state->is_acc_updated_ = is_acc_updated;
+    }
+
+    /* Free memory */
+    free(jacobi_x);
+    free(jacobi_v);
+    free(a);
+    free(eta);
+    free(kepler_gm);
+    free(kepler_s);
+
+    return SUCCESS;
+
+err_save_integrator_state:
+err_user_interrupt:
+err_store_solution:
+err_acc:
+err_drift:
+err_memory_alloc:
+    free(kepler_s);
+    free(kepler_gm);
+    free(eta);
+    free(a);
+    free(jacobi_v);
+    free(jacobi_x);
+err_unknown_acc_method:
+err_unknown_method:
+    return return_code;
+}
+
+IN_FILE void whfast_kick(
+    const int objects_count,
+    real *restrict jacobi_v,
+    const real *restrict a,
+    const real dt
+)
+{
+    for (int i = 0; i < objects_count; i++)
+    {
+        jacobi_v[i * 3 + 0] += a[i * 3 + 0] * dt;
+        jacobi_v[i * 3 + 1] += a[i * 3 + 1] * dt;
+        jacobi_v[i * 3 + 2] += a[i * 3 + 2] * dt;
+    }
+}
+
+IN_FILE int whfast_drift(
+    System *restrict system,
+    real *restrict jacobi_x,
+    real *restrict jacobi_v,
+    const real *restrict kepler_gm,
+    const real dt,
+    const real kepler_tol,
+    const int kepler_max_iter,
+    real *restrict kepler_s,
+    const bool kepler_auto_remove,
+    const real kepler_auto_remove_tol,
+    bool *restrict kepler_failed_bool_array,
+    bool *restrict kepler_failed_flag,
+    const int verbose
+)
+{
+    int return_code = SUCCESS;
+    bool is_any_failed = false;
+
+    const int objects_count = system->objects_count;
+
+    /**
+     * Every object is drifted independently, so the loop
+     * is distributed across threads if OpenMP is enabled.
+     */
+#ifdef _OPENMP
+    #pragma omp parallel for schedule(dynamic, 256) reduction(||: is_any_failed)
+#endif
+    for (int i = 1; i < objects_count; i++)
+    {
+        real gm = kepler_gm[i];
+        real x[3];
+        real v[3];
+        memcpy(x, &jacobi_x[i * 3], 3 * sizeof(real));
+        memcpy(v, &jacobi_v[i * 3], 3 * sizeof(real));
+
+        real x_norm = vec_norm_3d(x);
+        real v_norm = vec_norm_3d(v);
+
+        // Radial velocity
+        real radial_v = vec_dot_3d(x, v) / x_norm; 
+
+        real alpha = 2.0 * gm / x_norm - (v_norm * v_norm);
+
+        /* Solve Kepler's equation with Halley's method */
+        
+        // Initial guess
+        // Warm start from the converged value of the previous step
+        real s = kepler_s[i];
+        if (!(s > 0.0) || !isfinite(s))
+        {
+            s = dt / x_norm;
+        }
+
+        // Solve Kepler's equation
+        real c0 = 0.0;
+        real c1 = 0.0;
+        real c2 = 0.0;
+        real c3 = 0.0;
+        bool is_converged = false;
+        bool is_stumpff_failed = false;
+
+        for (int j = 0; j < kepler_max_iter; j++)
+        {
+            // Compute Stumpff functions
+            int stumpff_return_code = stumpff_functions(alpha * (s * s), &c0, &c1, &c2, &c3);
+            if (stumpff_return_code != SUCCESS)
+            {
+#ifdef _OPENMP
+                #pragma omp critical(whfast_drift_error)
+#endif
+                return_code = stumpff_return_code;
+                is_stumpff_failed = true;
+                break;
+            }
+
+            // Evaluate Kepler's equation and its first two derivatives
+            real F = (
+                x_norm * s * c1
+                + x_norm * radial_v * (s * s) * c2
+                + gm * (s * s * s) * c3
+                - dt
+            );
+            real dF = (
+                x_norm * c0
+                + x_norm * radial_v * s * c1
+                + gm * (s * s) * c2
+            );
+            real ddF = (
+                x_norm * radial_v * c0
+                + (gm - alpha * x_norm) * s * c1
+            );
+
+            // Advance step
+            real denominator = 2.0 * dF * dF - F * ddF;
+            real ds;
+            if (denominator != 0.0)
+            {
+                ds = -2.0 * F * dF / denominator;
+            }
+            else
+            {
+                // Fall back to Newton-Raphson
+                ds = -F / dF;
+            }
+            s += ds;
+
+            // Check convergence
+            if (fabs(ds) < kepler_tol)
+            {
+                is_converged = true;
+                break;
+            }
+        }
+
+        // The Stumpff functions are not set, so the object is
+        // left untouched and the error is returned after the loop
+        if (is_stumpff_failed)
+        {
+            kepler_s[i] = 0.0;
+            continue;
+        }
+
+        // The raidal distance is equal to the derivative of F
+        // real r = dF
+        real r = x_norm * c0 + x_norm * radial_v * s * c1 + gm * (s * s) * c2;
+
+        if (!is_converged)
+        {
+            real error = (
+                x_norm * s * c1
+                + x_norm * radial_v * (s * s) * c2
+                + gm * (s * s * s) * c3
+                - dt
+            ) / r;
+            
+            if (verbose >= 2)
+            {
+                fprintf(stderr, "Warning: Kepler's equation did not converge. "\
+                                "Object index: %d, error = %23.15g\n", i, error);
+            }
+
+            if (kepler_auto_remove && ((fabs(error) > kepler_auto_remove_tol) || isnan(error)))
+            {
+                kepler_failed_bool_array[i] = true;
+                is_any_failed = true;
+            }
+
+            // Do not warm start from an unconverged value
+            kepler_s[i] = 0.0;
+        }
+        else
+        {
+            kepler_s[i] = s;
+        }
+
+        /* Evaluate f and g functions, together with their derivatives */
+        real f = 1.0 - gm * (s * s) * c2 / x_norm;
+        real g = dt - gm * (s * s * s) * c3;
+
+        real df = -gm * s * c1 / (r * x_norm);
+        real dg = 1.0 - gm * (s * s) * c2 / r; 
+
+        /* Compute position and velocity vectors */
+        for (int j = 0; j < 3; j++)
+        {
+            jacobi_x[i * 3 + j] = f * x[j] + g * v[j];
+            jacobi_v[i * 3 + j] = df * x[j] + dg * v[j];
+        }
+    }
+
+    if (is_any_failed)
+    {
+        *kepler_failed_flag = true;
+    }
+
+    return return_code;
+}
+
+IN_FILE void whfast_compute_gm(
+    const System *restrict system,
+    const real *restrict eta,
+    real *restrict kepler_gm,
+    const bool is_democratic_heliocentric
+)
+{
+    const int objects_count = system->objects_count;
+    const real *restrict m = system->m;
+    const real G = system->G;
+
+    kepler_gm[0] = 0.0;
+    if (is_democratic_heliocentric)
+    {
+        for (int i = 1; i < objects_count; i++)
+        {
+            kepler_gm[i] = G * m[0];
+        }
+    }
+    else
+    {
+        for (int i = 1; i < objects_count; i++)
+        {
+            kepler_gm[i] = G * m[0] * eta[i] / eta[i - 1];
+        }
+    }
+}
+
+IN_FILE void cartesian_to_jacobi(
+    System *restrict system,
+    real *restrict jacobi_x,
+    real *restrict jacobi_v,
+    const real *restrict eta
+)
+{
+    real x_cm[3];
+    real v_cm[3];
+    const int objects_count = system->objects_count;
+    real *restrict x = system->x;
+    real *restrict v = system->v;
+    const real *restrict m = system->m;
+
+    x_cm[0] = m[0] * x[0];
+    x_cm[1] = m[0] * x[1];
+    x_cm[2] = m[0] * x[2];
+
+    v_cm[0] = m[0] * v[0];
+    v_cm[1] = m[0] * v[1];
+    v_cm[2] = m[0] * v[2];
+
+    for (int i = 1; i < objects_count; i++)
+    {
+        for (int j = 0; j < 3; j++)
+        {
+            jacobi_x[i * 3 + j] = x[i * 3 + j] - x_cm[j] / eta[i - 1];
+            jacobi_v[i * 3 + j] = v[i * 3 + j] - v_cm[j] / eta[i - 1];
+        
+            x_cm[j] = x_cm[j] * (1.0 + m[i] / eta[i - 1]) + m[i] * jacobi_x[i * 3 + j];
+            v_cm[j] = v_cm[j] * (1.0 + m[i] / eta[i - 1]) + m[i] * jacobi_v[i * 3 + j];
+        }
+    }
+
+    jacobi_x[0] = x_cm[0] / eta[objects_count - 1];
+    jacobi_x[1] = x_cm[1] / eta[objects_count - 1];
+    jacobi_x[2] = x_cm[2] / eta[objects_count - 1];
+
+    jacobi_v[0] = v_cm[0] / eta[objects_count - 1];
+    jacobi_v[1] = v_cm[1] / eta[objects_count - 1];
+    jacobi_v[2] = v_cm[2] / eta[objects_count - 1];
+}
+
+IN_FILE void jacobi_to_cartesian(
+    System *restrict system,
+    const real *restrict jacobi_x,
+    const real *restrict jacobi_v,
+    const real *restrict eta
+)
+{
+    real x_cm[3];
+    real v_cm[3];
+    const int objects_count = system->objects_count;
+    real *restrict x = system->x;
+    real *restrict v = system->v;
+    const real *restrict m = system->m;
+
+    x_cm[0] = eta[objects_count - 1] * jacobi_x[0];
+    x_cm[1] = eta[objects_count - 1] * jacobi_x[1];
+    x_cm[2] = eta[objects_count - 1] * jacobi_x[2];
+
+    v_cm[0] = eta[objects_count - 1] * jacobi_v[0];
+    v_cm[1] = eta[objects_count - 1] * jacobi_v[1];
+    v_cm[2] = eta[objects_count - 1] * jacobi_v[2];
+
+    for (int i = (objects_count - 1); i > 0; i--)
+    {
+        for (int j = 0; j < 3; j++)
+        {
+            x_cm[j] = (x_cm[j] - m[i] * jacobi_x[i * 3 + j]) / eta[i];
+            v_cm[j] = (v_cm[j] - m[i] * jacobi_v[i * 3 + j]) / eta[i];
+
+            x[i * 3 + j] = jacobi_x[i * 3 + j] + x_cm[j];
+            v[i * 3 + j] = jacobi_v[i * 3 + j] + v_cm[j];
+
+            x_cm[j] = eta[i - 1] * x_cm[j];
+            v_cm[j] = eta[i - 1] * v_cm[j];
+        }
+    }
+    
+    x[0] = x_cm[0] / m[0];
+    x[1] = x_cm[1] / m[0];
+    x[2] = x_cm[2] / m[0];
+
+    v[0] = v_cm[0] / m[0];
+    v[1] = v_cm[1] / m[0];
+    v[2] = v_cm[2] / m[0];
+}
+
+IN_FILE void cartesian_to_democratic_heliocentric(
+    System *restrict system,
+    real *restrict dh_x,
+    real *restrict dh_v
+)
+{
+    real x_cm[3] = {0.0, 0.0, 0.0};
+    real v_cm[3] = {0.0, 0.0, 0.0};
+    real total_mass = 0.0;
+    const int objects_count = system->objects_count;
+    const real *restrict x = system->x;
+    const real *restrict v = system->v;
+    const real *restrict m = system->m;
+
+    for (int i = 0; i < objects_count; i++)
+    {
+        total_mass += m[i];
+        for (int j = 0; j < 3; j++)
+        {
+            x_cm[j] += m[i] * x[i * 3 + j];
+            v_cm[j] += m[i] * v[i * 3 + j];
+        }
+    }
+
+    for (int j = 0; j < 3; j++)
+    {
+        x_cm[j] /= total_mass;
+        v_cm[j] /= total_mass;
+    }
+
+    for (int i = 1; i < objects_count; i++)
+    {
+        for (int j = 0; j < 3; j++)
+        {
+            dh_x[i * 3 + j] = x[i * 3 + j] - x[j];
+            dh_v[i * 3 + j] = v[i * 3 + j] - v_cm[j];
+        }
+    }
+
+    memcpy(dh_x, x_cm, 3 * sizeof(real));
+    memcpy(dh_v, v_cm, 3 * sizeof(real));
+}
+
+IN_FILE void democratic_heliocentric_to_cartesian(
+    System *restrict system,
+    const real *restrict dh_x,
+    const real *restrict dh_v
+)
+{
+    real sum_mx[3] = {0.0, 0.0, 0.0};
+    real sum_mv[3] = {0.0, 0.0, 0.0};
+    real total_mass = system->m[0];
+    const int objects_count = system->objects_count;
+    real *restrict x = system->x;
+    real *restrict v = system->v;
+    const real *restrict m = system->m;
+
+    for (int i = 1; i < objects_count; i++)
+    {
+        // Massless objects do not contribute
+        if (m[i] == 0.0)
+        {
+            continue;
+        }
+
+        total_mass += m[i];
+        for (int j = 0; j < 3; j++)
+        {
+            sum_mx[j] += m[i] * dh_x[i * 3 + j];
+            sum_mv[j] += m[i] * dh_v[i * 3 + j];
+        }
+    }
+
+    // Central object
+    real x_0[3];
+    for (int j = 0; j < 3; j++)
+    {
+        x_0[j] = dh_x[j] - sum_mx[j] / total_mass;
+        v[j] = dh_v[j] - sum_mv[j] / m[0];
+    }
+
+#ifdef _OPENMP
+    #pragma omp parallel for
+#endif
+    for (int i = 1; i < objects_count; i++)
+    {
+        for (int j = 0; j < 3; j++)
+        {
+            x[i * 3 + j] = dh_x[i * 3 + j] + x_0[j];
+            v[i * 3 + j] = dh_v[i * 3 + j] + dh_v[j];
+        }
+    }
+
+    memcpy(x, x_0, 3 * sizeof(real));
+}
+
+IN_FILE void whfast_democratic_heliocentric_jump(
+    const System *restrict system,
+    real *restrict dh_x,
+    const real *restrict dh_v,
+    const real dt
+)
+{
+    const int objects_count = system->objects_count;
+    const real *restrict m = system->m;
+
+    real sum_mv[3] = {0.0, 0.0, 0.0};
+    for (int i = 1; i < objects_count; i++)
+    {
+        if (m[i] == 0.0)
+        {
+            continue;
+        }
+
+        sum_mv[0] += m[i] * dh_v[i * 3 + 0];
+        sum_mv[1] += m[i] * dh_v[i * 3 + 1];
+        sum_mv[2] += m[i] * dh_v[i * 3 + 2];
+    }
+
+    real jump[3];
+    jump[0] = dt * sum_mv[0] / m[0];
+    jump[1] = dt * sum_mv[1] / m[0];
+    jump[2] = dt * sum_mv[2] / m[0];
+
+#ifdef _OPENMP
+    #pragma omp parallel for
+#endif
+    for (int i = 1; i < objects_count; i++)
+    {
+        dh_x[i * 3 + 0] += jump[0];
+        dh_x[i * 3 + 1] += jump[1];
+        dh_x[i * 3 + 2] += jump[2];
+    }
+
+    // Center of mass
+    dh_x[0] += dh_v[0] * dt;
+    dh_x[1] += dh_v[1] * dt;
+    dh_x[2] += dh_v[2] * dt;
+}
+
+IN_FILE int stumpff_functions(
+    real z,
+    real *restrict c0,
+    real *restrict c1,
+    real *restrict c2,
+    real *restrict c3
+)
+{
+    int return_code;
+
+    if (isinf(z))
+    {
+        return_code = ERROR_WHFAST_STUMPFF_Z_INFINITE;
+        goto err_z_inf;
+    }
+    else if (isnan(z))
+    {
+        return_code = ERROR_WHFAST_STUMPFF_Z_NAN;
+        goto err_z_nan;
+    }
+
+    /* Reduce the argument */
+    int n = 0;
+    while (fabs(z) > 0.1)
+    {
+        z /= 4.0;
+        n++;
+    }
+
+    /* Compute stumpff functions */
     real temp_c3 = (
         1.0 - z / 20.0 * (1.0 - z / 42.0 * (1.0 - z / 72.0 * (1.0 - z / 110.0 \
         * (1.0 - z / 156.0 * (1.0 - z / 210.0)))))
@@ -673,171 +1888,465 @@ IN_FILE int stumpff_functions(
     real temp_c1 = 1.0 - z * temp_c3;
     real temp_c0 = 1.0 - z * temp_c2;
 
-    /* Half-angle formulae to recover the actual argument */
-    while (n > 0)
-    {
-        temp_c3 = (temp_c2 + temp_c0 * temp_c3) / 4.0;
-        temp_c2 = (temp_c1 * temp_c1) / 2.0;
-        temp_c1 = temp_c0 * temp_c1;
-        temp_c0 = (2.0 * temp_c0 * temp_c0) - 1.0;
-        n--;
-    }
-    *c3 = temp_c3;
-    *c2 = temp_c2;
-    *c1 = temp_c1;
-    *c0 = temp_c0;
+    /* Half-angle formulae to recover the actual argument */
+    while (n > 0)
+    {
+        temp_c3 = (temp_c2 + temp_c0 * temp_c3) / 4.0;
+        temp_c2 = (temp_c1 * temp_c1) / 2.0;
+        temp_c1 = temp_c0 * temp_c1;
+        temp_c0 = (2.0 * temp_c0 * temp_c0) - 1.0;
+        n--;
+    }
+    *c3 = temp_c3;
+    *c2 = temp_c2;
+    *c1 = temp_c1;
+    *c0 = temp_c0;
+
+    return SUCCESS;
+
+err_z_nan:
+err_z_inf:
+    return return_code;
+}
+
+IN_FILE int whfast_acceleration_pairwise(
+    real *restrict a,
+    const System *system,
+    real *restrict jacobi_x,
+    const real *restrict eta,
+    const AccelerationParam *acceleration_param
+)
+{
+    const int objects_count = system->objects_count;
+    const real *restrict x = system->x;
+    const real *restrict m = system->m;
+    const real G = system->G;
+
+    const real softening_length = acceleration_param->softening_length;
+
+    real aux[3];
+    real temp_vec[3];
+    real temp_vec_norm;
+    real temp_vec_norm_cube;
+    real temp_jacobi_norm;
+    real temp_jacobi_norm_cube;
+    real softening_length_cube = softening_length * softening_length * softening_length;
+    for (int i = 1; i < objects_count; i++)
+    {
+        // Calculate x_0i
+        temp_vec[0] = x[i * 3 + 0] - x[0];
+        temp_vec[1] = x[i * 3 + 1] - x[1];
+        temp_vec[2] = x[i * 3 + 2] - x[2];
+
+        temp_vec_norm = vec_norm_3d(temp_vec);
+        temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+        temp_jacobi_norm = vec_norm_3d(&jacobi_x[i * 3]);
+        temp_jacobi_norm_cube = (temp_jacobi_norm * temp_jacobi_norm * temp_jacobi_norm) + softening_length_cube;
+        for (int j = 0; j < 3; j++)
+        {
+            a[i * 3 + j] = G * m[0] * eta[i] / eta[i - 1]
+            * (
+                jacobi_x[i * 3 + j] / temp_jacobi_norm_cube
+                - temp_vec[j] / temp_vec_norm_cube
+            );
+        }
+
+        for (int j = 1; j < i; j++)
+        {
+            // Calculate x_ji
+            temp_vec[0] = x[i * 3 + 0] - x[j * 3 + 0];
+            temp_vec[1] = x[i * 3 + 1] - x[j * 3 + 1];
+            temp_vec[2] = x[i * 3 + 2] - x[j * 3 + 2];
+
+            temp_vec_norm = vec_norm_3d(temp_vec);
+            temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+
+            aux[0] += G * m[j] * temp_vec[0] / temp_vec_norm_cube;
+            aux[1] += G * m[j] * temp_vec[1] / temp_vec_norm_cube;
+            aux[2] += G * m[j] * temp_vec[2] / temp_vec_norm_cube;
+        }
+        a[i * 3 + 0] -= aux[0] * eta[i] / eta[i - 1];
+        a[i * 3 + 1] -= aux[1] * eta[i] / eta[i - 1];
+        a[i * 3 + 2] -= aux[2] * eta[i] / eta[i - 1];
+
+        aux[0] = 0.0;
+        aux[1] = 0.0;
+        aux[2] = 0.0;
+
+        for (int j = i + 1; j < objects_count; j++)
+        {
+            // Calculate x_ij
+            temp_vec[0] = x[j * 3 + 0] - x[i * 3 + 0];
+            temp_vec[1] = x[j * 3 + 1] - x[i * 3 + 1];
+            temp_vec[2] = x[j * 3 + 2] - x[i * 3 + 2];
+
+            temp_vec_norm = vec_norm_3d(temp_vec);
+            temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+
+            aux[0] += G * m[j] * temp_vec[0] / temp_vec_norm_cube;
+            aux[1] += G * m[j] * temp_vec[1] / temp_vec_norm_cube;
+            aux[2] += G * m[j] * temp_vec[2] / temp_vec_norm_cube;
+        }
+        a[i * 3 + 0] += aux[0];
+        a[i * 3 + 1] += aux[1];
+        a[i * 3 + 2] += aux[2];
+
+        aux[0] = 0.0;
+        aux[1] = 0.0;
+        aux[2] = 0.0;
+
+        for (int j = 0; j < i; j++)
+        {
+            for (int k = i + 1; k < objects_count; k++)
+            {
+                // Calculate x_jk
+                temp_vec[0] = x[k * 3 + 0] - x[j * 3 + 0];
+                temp_vec[1] = x[k * 3 + 1] - x[j * 3 + 1];
+                temp_vec[2] = x[k * 3 + 2] - x[j * 3 + 2];
+
+                temp_vec_norm = vec_norm_3d(temp_vec);
+                temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+
+                aux[0] += G * m[j] * m[k] * temp_vec[0] / temp_vec_norm_cube;
+                aux[1] += G * m[j] * m[k] * temp_vec[1] / temp_vec_norm_cube;
+                aux[2] += G * m[j] * m[k] * temp_vec[2] / temp_vec_norm_cube;
+            }
+        }
+        a[i * 3 + 0] -= aux[0] / eta[i - 1];
+        a[i * 3 + 1] -= aux[1] / eta[i - 1];
+        a[i * 3 + 2] -= aux[2] / eta[i - 1];
+
+        aux[0] = 0.0;
+        aux[1] = 0.0;
+        aux[2] = 0.0;
+    }
+
+    return SUCCESS;
+}
+
+IN_FILE int whfast_acceleration_massless(
+    real *restrict a,
+    const System *system,
+    real *restrict jacobi_x,
+    const real *restrict eta,
+    const AccelerationParam *acceleration_param
+)
+{
+    int return_code;
+
+    const int objects_count = system->objects_count;
+    const real *restrict x = system->x;
+    const real *restrict m = system->m;
+    const real G = system->G;
+
+    const real softening_length = acceleration_param->softening_length;
+
+    real aux[3];
+    real temp_vec[3];
+    real temp_vec_norm;
+    real temp_vec_norm_cube;
+    real temp_jacobi_norm;
+    real temp_jacobi_norm_cube;
+    real softening_length_cube = softening_length * softening_length * softening_length;
+
+    /* Find the numbers of massive and massless objects */
+    int massive_objects_count = 0;
+    int massless_objects_count = 0;
+    for (int i = 0; i < objects_count; i++)
+    {
+        if (m[i] != 0.0)
+        {
+            massive_objects_count++;
+        }
+        else
+        {
+            massless_objects_count++;
+        }
+    }
+
+    /* Find the indices of massive and massless objects */
+    int *restrict massive_indices = malloc(massive_objects_count * sizeof(int));
+    int *restrict massless_indices = malloc(massless_objects_count * sizeof(int));
+    massive_objects_count = 0;
+    massless_objects_count = 0;
+
+    if (!massive_indices || !massless_indices)
+    {
+        return_code = ERROR_WHFAST_ACC_MASSLESS_MEMORY_ALLOC;
+        goto err_memory;
+    }
+
+    for (int i = 0; i < objects_count; i++)
+    {
+        if (m[i] != 0.0)
+        {
+            massive_indices[massive_objects_count] = i;
+            massive_objects_count++;
+        }
+        else
+        {
+            massless_indices[massless_objects_count] = i;
+            massless_objects_count++;
+        }
+    }
+
+    /* Acceleration calculation for massive objects */
+    for (int i = 1; i < massive_objects_count; i++)
+    {
+        int idx_i = massive_indices[i];
+
+        // Calculate x_0i
+        temp_vec[0] = x[idx_i * 3 + 0] - x[0];
+        temp_vec[1] = x[idx_i * 3 + 1] - x[1];
+        temp_vec[2] = x[idx_i * 3 + 2] - x[2];
+
+        temp_vec_norm = vec_norm_3d(temp_vec);
+        temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+        temp_jacobi_norm = vec_norm_3d(&jacobi_x[idx_i * 3]);
+        temp_jacobi_norm_cube = (temp_jacobi_norm * temp_jacobi_norm * temp_jacobi_norm) + softening_length_cube;
+        for (int j = 0; j < 3; j++)
+        {
+            a[idx_i * 3 + j] = G * m[0] * eta[idx_i] / eta[idx_i - 1]
+            * (
+                jacobi_x[idx_i * 3 + j] / temp_jacobi_norm_cube
+                - temp_vec[j] / temp_vec_norm_cube
+            );
+        }
+
+        for (int j = 1; j < i; j++)
+        {
+            int idx_j = massive_indices[j];
+
+            // Calculate x_ji
+            temp_vec[0] = x[idx_i * 3 + 0] - x[idx_j * 3 + 0];
+            temp_vec[1] = x[idx_i * 3 + 1] - x[idx_j * 3 + 1];
+            temp_vec[2] = x[idx_i * 3 + 2] - x[idx_j * 3 + 2];
+
+            temp_vec_norm = vec_norm_3d(temp_vec);
+            temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+
+            aux[0] += G * m[idx_j] * temp_vec[0] / temp_vec_norm_cube;
+            aux[1] += G * m[idx_j] * temp_vec[1] / temp_vec_norm_cube;
+            aux[2] += G * m[idx_j] * temp_vec[2] / temp_vec_norm_cube;
+        }
+        a[idx_i * 3 + 0] -= aux[0] * eta[idx_i] / eta[idx_i - 1];
+        a[idx_i * 3 + 1] -= aux[1] * eta[idx_i] / eta[idx_i - 1];
+        a[idx_i * 3 + 2] -= aux[2] * eta[idx_i] / eta[idx_i - 1];
+
+        aux[0] = 0.0;
+        aux[1] = 0.0;
+        aux[2] = 0.0;
+
+        for (int j = i + 1; j < massive_objects_count; j++)
+        {
+            int idx_j = massive_indices[j];
+
+            // Calculate x_ij
+            temp_vec[0] = x[idx_j * 3 + 0] - x[idx_i * 3 + 0];
+            temp_vec[1] = x[idx_j * 3 + 1] - x[idx_i * 3 + 1];
+            temp_vec[2] = x[idx_j * 3 + 2] - x[idx_i * 3 + 2];
+
+            temp_vec_norm = vec_norm_3d(temp_vec);
+            temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+
+            aux[0] += G * m[idx_j] * temp_vec[0] / temp_vec_norm_cube;
+            aux[1] += G * m[idx_j] * temp_vec[1] / temp_vec_norm_cube;
+            aux[2] += G * m[idx_j] * temp_vec[2] / temp_vec_norm_cube;
+        }
+        a[idx_i * 3 + 0] += aux[0];
+        a[idx_i * 3 + 1] += aux[1];
+        a[idx_i * 3 + 2] += aux[2];
+
+        aux[0] = 0.0;
+        aux[1] = 0.0;
+        aux[2] = 0.0;
 
-    return SUCCESS;
+        for (int j = 0; j < i; j++)
+        {
+            int idx_j = massive_indices[j];
 
-err_z_nan:
-err_z_inf:
-    return return_code;
-}
+            for (int k = i + 1; k < massive_objects_count; k++)
+            {
+                int idx_k = massive_indices[k];
 
-IN_FILE int whfast_acceleration_pairwise(
-    real *restrict a,
-    const System *system,
-    real *restrict jacobi_x,
-    const real *restrict eta,
-    const AccelerationParam *acceleration_param
-)
-{
-    const int objects_count = system->objects_count;
-    const real *restrict x = system->x;
-    const real *restrict m = system->m;
-    const real G = system->G;
+                // Calculate x_jk
+                temp_vec[0] = x[idx_k * 3 + 0] - x[idx_j * 3 + 0];
+                temp_vec[1] = x[idx_k * 3 + 1] - x[idx_j * 3 + 1];
+                temp_vec[2] = x[idx_k * 3 + 2] - x[idx_j * 3 + 2];
 
-    const real softening_length = acceleration_param->softening_length;
+                temp_vec_norm = vec_norm_3d(temp_vec);
+                temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
 
-    real aux[3];
-    real temp_vec[3];
-    real temp_vec_norm;
-    real temp_vec_norm_cube;
-    real temp_jacobi_norm;
-    real temp_jacobi_norm_cube;
-    real softening_length_cube = softening_length * softening_length * softening_length;
-    for (int i = 1; i < objects_count; i++)
+                aux[0] += G * m[idx_j] * m[idx_k] * temp_vec[0] / temp_vec_norm_cube;
+                aux[1] += G * m[idx_j] * m[idx_k] * temp_vec[1] / temp_vec_norm_cube;
+                aux[2] += G * m[idx_j] * m[idx_k] * temp_vec[2] / temp_vec_norm_cube;
+            }
+        }
+        a[idx_i * 3 + 0] -= aux[0] / eta[idx_i - 1];
+        a[idx_i * 3 + 1] -= aux[1] / eta[idx_i - 1];
+        a[idx_i * 3 + 2] -= aux[2] / eta[idx_i - 1];
+
+        aux[0] = 0.0;
+        aux[1] = 0.0;
+        aux[2] = 0.0;
+    }
+
+    /* Acceleration calculation for massless objects */
+    for (int i = 0; i < massless_objects_count; i++)
     {
+        int idx_i = massless_indices[i];
+        if (idx_i == 0)
+        {
+            continue;
+        }
+        
         // Calculate x_0i
-        temp_vec[0] = x[i * 3 + 0] - x[0];
-        temp_vec[1] = x[i * 3 + 1] - x[1];
-        temp_vec[2] = x[i * 3 + 2] - x[2];
+        temp_vec[0] = x[idx_i * 3 + 0] - x[0];
+        temp_vec[1] = x[idx_i * 3 + 1] - x[1];
+        temp_vec[2] = x[idx_i * 3 + 2] - x[2];
 
         temp_vec_norm = vec_norm_3d(temp_vec);
         temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
-        temp_jacobi_norm = vec_norm_3d(&jacobi_x[i * 3]);
+        temp_jacobi_norm = vec_norm_3d(&jacobi_x[idx_i * 3]);
         temp_jacobi_norm_cube = (temp_jacobi_norm * temp_jacobi_norm * temp_jacobi_norm) + softening_length_cube;
         for (int j = 0; j < 3; j++)
         {
-            a[i * 3 + j] = G * m[0] * eta[i] / eta[i - 1]
+            a[idx_i * 3 + j] = G * m[0]
             * (
-                jacobi_x[i * 3 + j] / temp_jacobi_norm_cube
+                jacobi_x[idx_i * 3 + j] / temp_jacobi_norm_cube
                 - temp_vec[j] / temp_vec_norm_cube
             );
         }
 
-        for (int j = 1; j < i; j++)
+        for (int j = 1; j < massive_objects_count; j++)
         {
+            int idx_j = massive_indices[j];
+            if (idx_j >= idx_i)
+            {
+                break;
+            }
+
             // Calculate x_ji
-            temp_vec[0] = x[i * 3 + 0] - x[j * 3 + 0];
-            temp_vec[1] = x[i * 3 + 1] - x[j * 3 + 1];
-            temp_vec[2] = x[i * 3 + 2] - x[j * 3 + 2];
+            temp_vec[0] = x[idx_i * 3 + 0] - x[idx_j * 3 + 0];
+            temp_vec[1] = x[idx_i * 3 + 1] - x[idx_j * 3 + 1];
+            temp_vec[2] = x[idx_i * 3 + 2] - x[idx_j * 3 + 2];
 
             temp_vec_norm = vec_norm_3d(temp_vec);
             temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
 
-            aux[0] += G * m[j] * temp_vec[0] / temp_vec_norm_cube;
-            aux[1] += G * m[j] * temp_vec[1] / temp_vec_norm_cube;
-            aux[2] += G * m[j] * temp_vec[2] / temp_vec_norm_cube;
+            aux[0] += G * m[idx_j] * temp_vec[0] / temp_vec_norm_cube;
+            aux[1] += G * m[idx_j] * temp_vec[1] / temp_vec_norm_cube;
+            aux[2] += G * m[idx_j] * temp_vec[2] / temp_vec_norm_cube;
         }
-        a[i * 3 + 0] -= aux[0] * eta[i] / eta[i - 1];
-        a[i * 3 + 1] -= aux[1] * eta[i] / eta[i - 1];
-        a[i * 3 + 2] -= aux[2] * eta[i] / eta[i - 1];
+        a[idx_i * 3 + 0] -= aux[0];
+        a[idx_i * 3 + 1] -= aux[1];
+        a[idx_i * 3 + 2] -= aux[2];
 
         aux[0] = 0.0;
         aux[1] = 0.0;
         aux[2] = 0.0;
 
-        for (int j = i + 1; j < objects_count; j++)
+        for (int j = 1; j < massive_objects_count; j++)
         {
+            int idx_j = massive_indices[j];
+            if (idx_j <= idx_i)
+            {
+                continue;
+            }
+
             // Calculate x_ij
-            temp_vec[0] = x[j * 3 + 0] - x[i * 3 + 0];
-            temp_vec[1] = x[j * 3 + 1] - x[i * 3 + 1];
-            temp_vec[2] = x[j * 3 + 2] - x[i * 3 + 2];
+            temp_vec[0] = x[idx_j * 3 + 0] - x[idx_i * 3 + 0];
+            temp_vec[1] = x[idx_j * 3 + 1] - x[idx_i * 3 + 1];
+            temp_vec[2] = x[idx_j * 3 + 2] - x[idx_i * 3 + 2];
 
             temp_vec_norm = vec_norm_3d(temp_vec);
             temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
 
-            aux[0] += G * m[j] * temp_vec[0] / temp_vec_norm_cube;
-            aux[1] += G * m[j] * temp_vec[1] / temp_vec_norm_cube;
-            aux[2] += G * m[j] * temp_vec[2] / temp_vec_norm_cube;
+            aux[0] += G * m[idx_j] * temp_vec[0] / temp_vec_norm_cube;
+            aux[1] += G * m[idx_j] * temp_vec[1] / temp_vec_norm_cube;
+            aux[2] += G * m[idx_j] * temp_vec[2] / temp_vec_norm_cube;
         }
-        a[i * 3 + 0] += aux[0];
-        a[i * 3 + 1] += aux[1];
-        a[i * 3 + 2] += aux[2];
+        a[idx_i * 3 + 0] += aux[0];
+        a[idx_i * 3 + 1] += aux[1];
+        a[idx_i * 3 + 2] += aux[2];
 
         aux[0] = 0.0;
         aux[1] = 0.0;
         aux[2] = 0.0;
 
-        for (int j = 0; j < i; j++)
+        for (int j = 0; j < massive_objects_count; j++)
         {
-            for (int k = i + 1; k < objects_count; k++)
+            int idx_j = massive_indices[j];
+            if (idx_j >= idx_i)
+            {
+                break;
+            }
+
+            for (int k = j + 1; k < massive_objects_count; k++)
             {
+                int idx_k = massive_indices[k];
+                if (idx_k <= idx_i)
+                {
+                    continue;
+                }
+
                 // Calculate x_jk
-                temp_vec[0] = x[k * 3 + 0] - x[j * 3 + 0];
-                temp_vec[1] = x[k * 3 + 1] - x[j * 3 + 1];
-                temp_vec[2] = x[k * 3 + 2] - x[j * 3 + 2];
+                temp_vec[0] = x[idx_k * 3 + 0] - x[idx_j * 3 + 0];
+                temp_vec[1] = x[idx_k * 3 + 1] - x[idx_j * 3 + 1];
+                temp_vec[2] = x[idx_k * 3 + 2] - x[idx_j * 3 + 2];
 
                 temp_vec_norm = vec_norm_3d(temp_vec);
                 temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
 
-                aux[0] += G * m[j] * m[k] * temp_vec[0] / temp_vec_norm_cube;
-                aux[1] += G * m[j] * m[k] * temp_vec[1] / temp_vec_norm_cube;
-                aux[2] += G * m[j] * m[k] * temp_vec[2] / temp_vec_norm_cube;
+                aux[0] += G * m[idx_j] * m[idx_k] * temp_vec[0] / temp_vec_norm_cube;
+                aux[1] += G * m[idx_j] * m[idx_k] * temp_vec[1] / temp_vec_norm_cube;
+                aux[2] += G * m[idx_j] * m[idx_k] * temp_vec[2] / temp_vec_norm_cube;
             }
         }
-        a[i * 3 + 0] -= aux[0] / eta[i - 1];
-        a[i * 3 + 1] -= aux[1] / eta[i - 1];
-        a[i * 3 + 2] -= aux[2] / eta[i - 1];
+        a[idx_i * 3 + 0] -= aux[0] / eta[idx_i - 1];
+        a[idx_i * 3 + 1] -= aux[1] / eta[idx_i - 1];
+        a[idx_i * 3 + 2] -= aux[2] / eta[idx_i - 1];
 
         aux[0] = 0.0;
         aux[1] = 0.0;
         aux[2] = 0.0;
     }
 
+    free(massive_indices);
+    free(massless_indices);
+
     return SUCCESS;
+
+err_memory:
+    free(massive_indices);
+    free(massless_indices);
+    return return_code;
 }
 
-IN_FILE int whfast_acceleration_massless(
+IN_FILE int whfast_acceleration_democratic_heliocentric(
     real *restrict a,
     const System *system,
-    real *restrict jacobi_x,
+    real *restrict dh_x,
     const real *restrict eta,
     const AccelerationParam *acceleration_param
 )
 {
+    (void) eta;
+
     int return_code;
 
     const int objects_count = system->objects_count;
-    const real *restrict x = system->x;
     const real *restrict m = system->m;
     const real G = system->G;
 
     const real softening_length = acceleration_param->softening_length;
-
-    real aux[3];
-    real temp_vec[3];
-    real temp_vec_norm;
-    real temp_vec_norm_cube;
-    real temp_jacobi_norm;
-    real temp_jacobi_norm_cube;
     real softening_length_cube = softening_length * softening_length * softening_length;
 
     /* Find the numbers of massive and massless objects */
+    // The central object is not included
     int massive_objects_count = 0;
     int massless_objects_count = 0;
-    for (int i = 0; i < objects_count; i++)
+    for (int i = 1; i < objects_count; i++)
     {
         if (m[i] != 0.0)
         {
@@ -857,11 +2366,11 @@ IN_FILE int whfast_acceleration_massless(
 
     if (!massive_indices || !massless_indices)
     {
-        return_code = ERROR_WHFAST_ACC_MASSLESS_MEMORY_ALLOC;
+        return_code = ERROR_WHFAST_ACC_DEMOCRATIC_HELIOCENTRIC_MEMORY_ALLOC;
         goto err_memory;
     }
 
-    for (int i = 0; i < objects_count; i++)
+    for (int i = 1; i < objects_count; i++)
     {
         if (m[i] != 0.0)
         {
@@ -875,235 +2384,415 @@ IN_FILE int whfast_acceleration_massless(
         }
     }
 
-    /* Acceleration calculation for massive objects */
-    for (int i = 1; i < massive_objects_count; i++)
+    a[0] = 0.0;
+    a[1] = 0.0;
+    a[2] = 0.0;
+
+    /* Acceleration calculation for massive objects */
+    for (int i = 0; i < massive_objects_count; i++)
+    {
+        int idx_i = massive_indices[i];
+        a[idx_i * 3 + 0] = 0.0;
+        a[idx_i * 3 + 1] = 0.0;
+        a[idx_i * 3 + 2] = 0.0;
+    }
+
+    real temp_vec[3];
+    real temp_vec_norm;
+    real temp_vec_norm_cube;
+    for (int i = 0; i < massive_objects_count; i++)
+    {
+        int idx_i = massive_indices[i];
+        for (int j = i + 1; j < massive_objects_count; j++)
+        {
+            int idx_j = massive_indices[j];
+
+            // Calculate x_ij
+            temp_vec[0] = dh_x[idx_j * 3 + 0] - dh_x[idx_i * 3 + 0];
+            temp_vec[1] = dh_x[idx_j * 3 + 1] - dh_x[idx_i * 3 + 1];
+            temp_vec[2] = dh_x[idx_j * 3 + 2] - dh_x[idx_i * 3 + 2];
+
+            temp_vec_norm = vec_norm_3d(temp_vec);
+            temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+
+            for (int k = 0; k < 3; k++)
+            {
+                a[idx_i * 3 + k] += G * m[idx_j] * temp_vec[k] / temp_vec_norm_cube;
+                a[idx_j * 3 + k] -= G * m[idx_i] * temp_vec[k] / temp_vec_norm_cube;
+            }
+        }
+    }
+
+    /* Acceleration calculation for massless objects */
+#ifdef _OPENMP
+    #pragma omp parallel for schedule(static)
+#endif
+    for (int i = 0; i < massless_objects_count; i++)
+    {
+        int idx_i = massless_indices[i];
+        real aux[3] = {0.0, 0.0, 0.0};
+        for (int j = 0; j < massive_objects_count; j++)
+        {
+            int idx_j = massive_indices[j];
+
+            // Calculate x_ij
+            real massless_temp_vec[3];
+            massless_temp_vec[0] = dh_x[idx_j * 3 + 0] - dh_x[idx_i * 3 + 0];
+            massless_temp_vec[1] = dh_x[idx_j * 3 + 1] - dh_x[idx_i * 3 + 1];
+            massless_temp_vec[2] = dh_x[idx_j * 3 + 2] - dh_x[idx_i * 3 + 2];
+
+            real norm = vec_norm_3d(massless_temp_vec);
+            real norm_cube = (norm * norm * norm) + softening_length_cube;
+
+            aux[0] += G * m[idx_j] * massless_temp_vec[0] / norm_cube;
+            aux[1] += G * m[idx_j] * massless_temp_vec[1] / norm_cube;
+            aux[2] += G * m[idx_j] * massless_temp_vec[2] / norm_cube;
+        }
+        a[idx_i * 3 + 0] = aux[0];
+        a[idx_i * 3 + 1] = aux[1];
+        a[idx_i * 3 + 2] = aux[2];
+    }
+
+    free(massive_indices);
+    free(massless_indices);
+
+    return SUCCESS;
+
+err_memory:
+    free(massive_indices);
+    free(massless_indices);
+    return return_code;
+}
+
+IN_FILE real mercurius_changeover(const real r, const real dcrit)
+{
+    const real y = (r - 0.1 * dcrit) / (0.9 * dcrit);
+    if (y <= 0.0)
+    {
+        return 0.0;
+    }
+    else if (y >= 1.0)
+    {
+        return 1.0;
+    }
+    else
+    {
+        return (y * y * y) * (10.0 - 15.0 * y + 6.0 * (y * y));
+    }
+}
+
+IN_FILE void mercurius_compute_dcrit(
+    const System *restrict system,
+    const real *restrict dh_x,
+    const real *restrict dh_v,
+    const real dt,
+    real *restrict dcrit
+)
+{
+    const int objects_count = system->objects_count;
+    const real *restrict m = system->m;
+    const real gm = system->G * m[0];
+
+    dcrit[0] = 0.0;
+    for (int i = 1; i < objects_count; i++)
     {
-        int idx_i = massive_indices[i];
+        const real r = vec_norm_3d(&dh_x[i * 3]);
+        const real v_norm = vec_norm_3d(&dh_v[i * 3]);
 
-        // Calculate x_0i
-        temp_vec[0] = x[idx_i * 3 + 0] - x[0];
-        temp_vec[1] = x[idx_i * 3 + 1] - x[1];
-        temp_vec[2] = x[idx_i * 3 + 2] - x[2];
+        // Distance travelled in a fraction of the time step
+        const real v_circular = sqrt(gm / r);
+        dcrit[i] = fmax(0.4 * v_circular * dt, 0.4 * v_norm * dt);
 
-        temp_vec_norm = vec_norm_3d(temp_vec);
-        temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
-        temp_jacobi_norm = vec_norm_3d(&jacobi_x[idx_i * 3]);
-        temp_jacobi_norm_cube = (temp_jacobi_norm * temp_jacobi_norm * temp_jacobi_norm) + softening_length_cube;
-        for (int j = 0; j < 3; j++)
+        // Hill radius
+        if (m[i] != 0.0)
         {
-            a[idx_i * 3 + j] = G * m[0] * eta[idx_i] / eta[idx_i - 1]
-            * (
-                jacobi_x[idx_i * 3 + j] / temp_jacobi_norm_cube
-                - temp_vec[j] / temp_vec_norm_cube
+            const real inverse_a = 2.0 / r - (v_norm * v_norm) / gm;
+            const real a = (inverse_a > 0.0) ? (1.0 / inverse_a) : r;
+            dcrit[i] = fmax(
+                dcrit[i],
+                MERCURIUS_HILL_RADIUS_FACTOR * a * cbrt(m[i] / (3.0 * m[0]))
             );
         }
+    }
+}
 
-        for (int j = 1; j < i; j++)
-        {
-            int idx_j = massive_indices[j];
-
-            // Calculate x_ji
-            temp_vec[0] = x[idx_i * 3 + 0] - x[idx_j * 3 + 0];
-            temp_vec[1] = x[idx_i * 3 + 1] - x[idx_j * 3 + 1];
-            temp_vec[2] = x[idx_i * 3 + 2] - x[idx_j * 3 + 2];
+IN_FILE void mercurius_acceleration_interaction(
+    real *restrict a,
+    const System *system,
+    const real *restrict dh_x,
+    const real *restrict dcrit,
+    const int *restrict massive_indices,
+    const int massive_objects_count,
+    const int *restrict massless_indices,
+    const int massless_objects_count,
+    const AccelerationParam *acceleration_param
+)
+{
+    const real *restrict m = system->m;
+    const real G = system->G;
 
-            temp_vec_norm = vec_norm_3d(temp_vec);
-            temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+    const real softening_length = acceleration_param->softening_length;
+    real softening_length_cube = softening_length * softening_length * softening_length;
 
-            aux[0] += G * m[idx_j] * temp_vec[0] / temp_vec_norm_cube;
-            aux[1] += G * m[idx_j] * temp_vec[1] / temp_vec_norm_cube;
-            aux[2] += G * m[idx_j] * temp_vec[2] / temp_vec_norm_cube;
-        }
-        a[idx_i * 3 + 0] -= aux[0] * eta[idx_i] / eta[idx_i - 1];
-        a[idx_i * 3 + 1] -= aux[1] * eta[idx_i] / eta[idx_i - 1];
-        a[idx_i * 3 + 2] -= aux[2] * eta[idx_i] / eta[idx_i - 1];
+    a[0] = 0.0;
+    a[1] = 0.0;
+    a[2] = 0.0;
 
-        aux[0] = 0.0;
-        aux[1] = 0.0;
-        aux[2] = 0.0;
+    /* Acceleration calculation for massive objects */
+    for (int i = 0; i < massive_objects_count; i++)
+    {
+        int idx_i = massive_indices[i];
+        a[idx_i * 3 + 0] = 0.0;
+        a[idx_i * 3 + 1] = 0.0;
+        a[idx_i * 3 + 2] = 0.0;
+    }
 
+    real temp_vec[3];
+    real temp_vec_norm;
+    real temp_vec_norm_cube;
+    real changeover;
+    for (int i = 0; i < massive_objects_count; i++)
+    {
+        int idx_i = massive_indices[i];
         for (int j = i + 1; j < massive_objects_count; j++)
         {
             int idx_j = massive_indices[j];
 
             // Calculate x_ij
-            temp_vec[0] = x[idx_j * 3 + 0] - x[idx_i * 3 + 0];
-            temp_vec[1] = x[idx_j * 3 + 1] - x[idx_i * 3 + 1];
-            temp_vec[2] = x[idx_j * 3 + 2] - x[idx_i * 3 + 2];
+            temp_vec[0] = dh_x[idx_j * 3 + 0] - dh_x[idx_i * 3 + 0];
+            temp_vec[1] = dh_x[idx_j * 3 + 1] - dh_x[idx_i * 3 + 1];
+            temp_vec[2] = dh_x[idx_j * 3 + 2] - dh_x[idx_i * 3 + 2];
 
             temp_vec_norm = vec_norm_3d(temp_vec);
             temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+            changeover = mercurius_changeover(temp_vec_norm, fmax(dcrit[idx_i], dcrit[idx_j]));
 
-            aux[0] += G * m[idx_j] * temp_vec[0] / temp_vec_norm_cube;
-            aux[1] += G * m[idx_j] * temp_vec[1] / temp_vec_norm_cube;
-            aux[2] += G * m[idx_j] * temp_vec[2] / temp_vec_norm_cube;
-        }
-        a[idx_i * 3 + 0] += aux[0];
-        a[idx_i * 3 + 1] += aux[1];
-        a[idx_i * 3 + 2] += aux[2];
-
-        aux[0] = 0.0;
-        aux[1] = 0.0;
-        aux[2] = 0.0;
-
-        for (int j = 0; j < i; j++)
-        {
-            int idx_j = massive_indices[j];
-
-            for (int k = i + 1; k < massive_objects_count; k++)
+            for (int k = 0; k < 3; k++)
             {
-                int idx_k = massive_indices[k];
-
-                // Calculate x_jk
-                temp_vec[0] = x[idx_k * 3 + 0] - x[idx_j * 3 + 0];
-                temp_vec[1] = x[idx_k * 3 + 1] - x[idx_j * 3 + 1];
-                temp_vec[2] = x[idx_k * 3 + 2] - x[idx_j * 3 + 2];
-
-                temp_vec_norm = vec_norm_3d(temp_vec);
-                temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
-
-                aux[0] += G * m[idx_j] * m[idx_k] * temp_vec[0] / temp_vec_norm_cube;
-                aux[1] += G * m[idx_j] * m[idx_k] * temp_vec[1] / temp_vec_norm_cube;
-                aux[2] += G * m[idx_j] * m[idx_k] * temp_vec[2] / temp_vec_norm_cube;
+                a[idx_i * 3 + k] += changeover * G * m[idx_j] * temp_vec[k] / temp_vec_norm_cube;
+                a[idx_j * 3 + k] -= changeover * G * m[idx_i] * temp_vec[k] / temp_vec_norm_cube;
             }
         }
-        a[idx_i * 3 + 0] -= aux[0] / eta[idx_i - 1];
-        a[idx_i * 3 + 1] -= aux[1] / eta[idx_i - 1];
-        a[idx_i * 3 + 2] -= aux[2] / eta[idx_i - 1];
-
-        aux[0] = 0.0;
-        aux[1] = 0.0;
-        aux[2] = 0.0;
     }
 
     /* Acceleration calculation for massless objects */
+#ifdef _OPENMP
+    #pragma omp parallel for schedule(static)
+#endif
     for (int i = 0; i < massless_objects_count; i++)
     {
         int idx_i = massless_indices[i];
-        if (idx_i == 0)
+        real aux[3] = {0.0, 0.0, 0.0};
+        for (int j = 0; j < massive_objects_count; j++)
         {
-            continue;
-        }
-        
-        // Calculate x_0i
-        temp_vec[0] = x[idx_i * 3 + 0] - x[0];
-        temp_vec[1] = x[idx_i * 3 + 1] - x[1];
-        temp_vec[2] = x[idx_i * 3 + 2] - x[2];
+            int idx_j = massive_indices[j];
 
-        temp_vec_norm = vec_norm_3d(temp_vec);
-        temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
-        temp_jacobi_norm = vec_norm_3d(&jacobi_x[idx_i * 3]);
-        temp_jacobi_norm_cube = (temp_jacobi_norm * temp_jacobi_norm * temp_jacobi_norm) + softening_length_cube;
-        for (int j = 0; j < 3; j++)
-        {
-            a[idx_i * 3 + j] = G * m[0]
-            * (
-                jacobi_x[idx_i * 3 + j] / temp_jacobi_norm_cube
-                - temp_vec[j] / temp_vec_norm_cube
-            );
+            // Calculate x_ij
+            real massless_temp_vec[3];
+            massless_temp_vec[0] = dh_x[idx_j * 3 + 0] - dh_x[idx_i * 3 + 0];
+            massless_temp_vec[1] = dh_x[idx_j * 3 + 1] - dh_x[idx_i * 3 + 1];
+            massless_temp_vec[2] = dh_x[idx_j * 3 + 2] - dh_x[idx_i * 3 + 2];
+
+            real norm = vec_norm_3d(massless_temp_vec);
+            real norm_cube = (norm * norm * norm) + softening_length_cube;
+            real massless_changeover = mercurius_changeover(norm, fmax(dcrit[idx_i], dcrit[idx_j]));
+
+            aux[0] += massless_changeover * G * m[idx_j] * massless_temp_vec[0] / norm_cube;
+            aux[1] += massless_changeover * G * m[idx_j] * massless_temp_vec[1] / norm_cube;
+            aux[2] += massless_changeover * G * m[idx_j] * massless_temp_vec[2] / norm_cube;
         }
+        a[idx_i * 3 + 0] = aux[0];
+        a[idx_i * 3 + 1] = aux[1];
+        a[idx_i * 3 + 2] = aux[2];
+    }
+}
 
-        for (int j = 1; j < massive_objects_count; j++)
+IN_FILE bool mercurius_find_encounters(
+    const real *restrict x_0,
+    const real *restrict x_1,
+    const real *restrict dcrit,
+    const int *restrict massive_indices,
+    const int massive_objects_count,
+    const int *restrict massless_indices,
+    const int massless_objects_count,
+    bool *restrict encounter_flags
+)
+{
+    bool is_encounter = false;
+    for (int i = 0; i < massive_objects_count; i++)
+    {
+        const int idx_i = massive_indices[i];
+
+        // Massive-massive pairs
+        for (int j = i + 1; j < massive_objects_count; j++)
         {
-            int idx_j = massive_indices[j];
-            if (idx_j >= idx_i)
+            const int idx_j = massive_indices[j];
+            real d_0[3];
+            real d_1[3];
+            for (int k = 0; k < 3; k++)
             {
-                break;
+                d_0[k] = x_0[idx_j * 3 + k] - x_0[idx_i * 3 + k];
+                d_1[k] = x_1[idx_j * 3 + k] - x_1[idx_i * 3 + k];
             }
 
-            // Calculate x_ji
-            temp_vec[0] = x[idx_i * 3 + 0] - x[idx_j * 3 + 0];
-            temp_vec[1] = x[idx_i * 3 + 1] - x[idx_j * 3 + 1];
-            temp_vec[2] = x[idx_i * 3 + 2] - x[idx_j * 3 + 2];
-
-            temp_vec_norm = vec_norm_3d(temp_vec);
-            temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+            // Minimum distance along the linear path from d_0 to d_1
+            real delta[3] = {d_1[0] - d_0[0], d_1[1] - d_0[1], d_1[2] - d_0[2]};
+            real delta_norm_sq = vec_dot_3d(delta, delta);
+            real s = (delta_norm_sq > 0.0) ? (-vec_dot_3d(d_0, delta) / delta_norm_sq) : 0.0;
+            s = fmin(fmax(s, 0.0), 1.0);
+            real r_min[3] = {d_0[0] + s * delta[0], d_0[1] + s * delta[1], d_0[2] + s * delta[2]};
 
-            aux[0] += G * m[idx_j] * temp_vec[0] / temp_vec_norm_cube;
-            aux[1] += G * m[idx_j] * temp_vec[1] / temp_vec_norm_cube;
-            aux[2] += G * m[idx_j] * temp_vec[2] / temp_vec_norm_cube;
+            if (vec_norm_3d(r_min) < fmax(dcrit[idx_i], dcrit[idx_j]))
+            {
+                encounter_flags[idx_i] = true;
+                encounter_flags[idx_j] = true;
+                is_encounter = true;
+            }
         }
-        a[idx_i * 3 + 0] -= aux[0];
-        a[idx_i * 3 + 1] -= aux[1];
-        a[idx_i * 3 + 2] -= aux[2];
-
-        aux[0] = 0.0;
-        aux[1] = 0.0;
-        aux[2] = 0.0;
 
-        for (int j = 1; j < massive_objects_count; j++)
+        // Massive-massless pairs
+        for (int j = 0; j < massless_objects_count; j++)
         {
-            int idx_j = massive_indices[j];
-            if (idx_j <= idx_i)
+            const int idx_j = massless_indices[j];
+            real d_0[3];
+            real d_1[3];
+            for (int k = 0; k < 3; k++)
             {
-                continue;
+                d_0[k] = x_0[idx_j * 3 + k] - x_0[idx_i * 3 + k];
+                d_1[k] = x_1[idx_j * 3 + k] - x_1[idx_i * 3 + k];
             }
 
-            // Calculate x_ij
-            temp_vec[0] = x[idx_j * 3 + 0] - x[idx_i * 3 + 0];
-            temp_vec[1] = x[idx_j * 3 + 1] - x[idx_i * 3 + 1];
-            temp_vec[2] = x[idx_j * 3 + 2] - x[idx_i * 3 + 2];
-
-            temp_vec_norm = vec_norm_3d(temp_vec);
-            temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+            real delta[3] = {d_1[0] - d_0[0], d_1[1] - d_0[1], d_1[2] - d_0[2]};
+            real delta_norm_sq = vec_dot_3d(delta, delta);
+            real s = (delta_norm_sq > 0.0) ? (-vec_dot_3d(d_0, delta) / delta_norm_sq) : 0.0;
+            s = fmin(fmax(s, 0.0), 1.0);
+            real r_min[3] = {d_0[0] + s * delta[0], d_0[1] + s * delta[1], d_0[2] + s * delta[2]};
 
-            aux[0] += G * m[idx_j] * temp_vec[0] / temp_vec_norm_cube;
-            aux[1] += G * m[idx_j] * temp_vec[1] / temp_vec_norm_cube;
-            aux[2] += G * m[idx_j] * temp_vec[2] / temp_vec_norm_cube;
+            if (vec_norm_3d(r_min) < fmax(dcrit[idx_i], dcrit[idx_j]))
+            {
+                encounter_flags[idx_i] = true;
+                encounter_flags[idx_j] = true;
+                is_encounter = true;
+            }
         }
-        a[idx_i * 3 + 0] += aux[0];
-        a[idx_i * 3 + 1] += aux[1];
-        a[idx_i * 3 + 2] += aux[2];
+    }
 
-        aux[0] = 0.0;
-        aux[1] = 0.0;
-        aux[2] = 0.0;
+    return is_encounter;
+}
 
-        for (int j = 0; j < massive_objects_count; j++)
+IN_FILE int mercurius_acceleration_encounter(
+    real *restrict a,
+    const System *restrict system,
+    void *acceleration_data
+)
+{
+    const MercuriusEncounterData *data = (const MercuriusEncounterData *) acceleration_data;
+    const int objects_count = system->objects_count;
+    const real *restrict x = system->x;
+    const real *restrict m = system->m;
+    const real G = system->G;
+    const real central_gm = data->central_gm;
+    const real *restrict dcrit = data->dcrit;
+    const real softening_length = data->softening_length;
+    real softening_length_cube = softening_length * softening_length * softening_length;
+
+    real temp_vec[3];
+    real temp_vec_norm;
+    real temp_vec_norm_cube;
+
+    /* Gravity from the central object */
+    for (int i = 0; i < objects_count; i++)
+    {
+        temp_vec_norm = vec_norm_3d(&x[i * 3]);
+        temp_vec_norm_cube = temp_vec_norm * temp_vec_norm * temp_vec_norm;
+        a[i * 3 + 0] = -central_gm * x[i * 3 + 0] / temp_vec_norm_cube;
+        a[i * 3 + 1] = -central_gm * x[i * 3 + 1] / temp_vec_norm_cube;
+        a[i * 3 + 2] = -central_gm * x[i * 3 + 2] / temp_vec_norm_cube;
+    }
+
+    /* Interaction not included in the interaction step */
+    for (int i = 0; i < objects_count; i++)
+    {
+        for (int j = i + 1; j < objects_count; j++)
         {
-            int idx_j = massive_indices[j];
-            if (idx_j >= idx_i)
+            if (m[i] == 0.0 && m[j] == 0.0)
             {
-                break;
+                continue;
             }
 
-            for (int k = j + 1; k < massive_objects_count; k++)
-            {
-                int idx_k = massive_indices[k];
-                if (idx_k <= idx_i)
-                {
-                    continue;
-                }
-
-                // Calculate x_jk
-                temp_vec[0] = x[idx_k * 3 + 0] - x[idx_j * 3 + 0];
-                temp_vec[1] = x[idx_k * 3 + 1] - x[idx_j * 3 + 1];
-                temp_vec[2] = x[idx_k * 3 + 2] - x[idx_j * 3 + 2];
+            temp_vec[0] = x[j * 3 + 0] - x[i * 3 + 0];
+            temp_vec[1] = x[j * 3 + 1] - x[i * 3 + 1];
+            temp_vec[2] = x[j * 3 + 2] - x[i * 3 + 2];
 
-                temp_vec_norm = vec_norm_3d(temp_vec);
-                temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+            temp_vec_norm = vec_norm_3d(temp_vec);
+            temp_vec_norm_cube = (temp_vec_norm * temp_vec_norm * temp_vec_norm) + softening_length_cube;
+            real factor = (
+                (1.0 - mercurius_changeover(temp_vec_norm, fmax(dcrit[i], dcrit[j])))
+                * G / temp_vec_norm_cube
+            );
 
-                aux[0] += G * m[idx_j] * m[idx_k] * temp_vec[0] / temp_vec_norm_cube;
-                aux[1] += G * m[idx_j] * m[idx_k] * temp_vec[1] / temp_vec_norm_cube;
-                aux[2] += G * m[idx_j] * m[idx_k] * temp_vec[2] / temp_vec_norm_cube;
+            for (int k = 0; k < 3; k++)
+            {
+                a[i * 3 + k] += factor * m[j] * temp_vec[k];
+                a[j * 3 + k] -= factor * m[i] * temp_vec[k];
             }
         }
-        a[idx_i * 3 + 0] -= aux[0] / eta[idx_i - 1];
-        a[idx_i * 3 + 1] -= aux[1] / eta[idx_i - 1];
-        a[idx_i * 3 + 2] -= aux[2] / eta[idx_i - 1];
-
-        aux[0] = 0.0;
-        aux[1] = 0.0;
-        aux[2] = 0.0;
     }
 
-    free(massive_indices);
-    free(massless_indices);
-
     return SUCCESS;
+}
 
-err_memory:
-    free(massive_indices);
-    free(massless_indices);
-    return return_code;
+IN_FILE int get_saba_coefficients(
+    const char *integrator,
+    int *restrict stages,
+    real *restrict drift_coeffs,
+    real *restrict kick_coeffs
+)
+{
+    if (strcmp(integrator, "saba4") == 0)
+    {
+        // Drifts between the nodes of the 4-point Gauss-Legendre quadrature
+        const real sqrt_30 = sqrt(30.0);
+        const real sqrt_plus = sqrt(525.0 + 70.0 * sqrt_30);
+        const real sqrt_minus = sqrt(525.0 - 70.0 * sqrt_30);
+
+        *stages = 5;
+        drift_coeffs[0] = 0.5 - sqrt_plus / 70.0;
+        drift_coeffs[1] = (sqrt_plus - sqrt_minus) / 70.0;
+        drift_coeffs[2] = sqrt_minus / 35.0;
+        drift_coeffs[3] = drift_coeffs[1];
+        drift_coeffs[4] = drift_coeffs[0];
+
+        kick_coeffs[0] = 0.0;
+        kick_coeffs[1] = 0.25 - sqrt_30 / 72.0;
+        kick_coeffs[2] = 0.25 + sqrt_30 / 72.0;
+        kick_coeffs[3] = kick_coeffs[2];
+        kick_coeffs[4] = kick_coeffs[1];
+        kick_coeffs[5] = 0.0;
+
+        return SUCCESS;
+    }
+    else if (strcmp(integrator, "sbab4") == 0)
+    {
+        // Drifts between the nodes of the 5-point Gauss-Lobatto quadrature
+        const real sqrt_21 = sqrt(21.0);
+
+        *stages = 4;
+        drift_coeffs[0] = 0.5 - sqrt_21 / 14.0;
+        drift_coeffs[1] = sqrt_21 / 14.0;
+        drift_coeffs[2] = drift_coeffs[1];
+        drift_coeffs[3] = drift_coeffs[0];
+
+        kick_coeffs[0] = 1.0 / 20.0;
+        kick_coeffs[1] = 49.0 / 180.0;
+        kick_coeffs[2] = 16.0 / 45.0;
+        kick_coeffs[3] = kick_coeffs[1];
+        kick_coeffs[4] = kick_coeffs[0];
+
+        return SUCCESS;
+    }
+    else
+    {
+        return ERROR_UNKNOWN_SABA_METHOD;
+    }
 }
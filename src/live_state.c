@@ -0,0 +1,137 @@
+/**
+ * \file live_state.c
+ * \author Ching Yin Ng
+ * \brief Function definitions for publishing the live state of the
+ *        simulation to a shared memory segment
+ */
+
+#include <stdint.h>
+#include <string.h>
+
+#include "error.h"
+#include "gravity_sim.h"
+#include "live_state.h"
+
+/* Memory ordering of the seqlock */
+#if defined(__GNUC__) || defined(__clang__)
+#define LIVE_STATE_STORE_RELAXED(ptr, value) __atomic_store_n((ptr), (value), __ATOMIC_RELAXED)
+#define LIVE_STATE_STORE_RELEASE(ptr, value) __atomic_store_n((ptr), (value), __ATOMIC_RELEASE)
+#define LIVE_STATE_FENCE_RELEASE() __atomic_thread_fence(__ATOMIC_RELEASE)
+#define LIVE_STATE_LOAD_RELAXED(ptr) __atomic_load_n((ptr), __ATOMIC_RELAXED)
+#define LIVE_STATE_LOAD_ACQUIRE(ptr) __atomic_load_n((ptr), __ATOMIC_ACQUIRE)
+#define LIVE_STATE_FENCE_ACQUIRE() __atomic_thread_fence(__ATOMIC_ACQUIRE)
+#else
+// Best effort without atomic builtins
+#define LIVE_STATE_STORE_RELAXED(ptr, value) (*(volatile uint64_t *) (ptr) = (value))
+#define LIVE_STATE_STORE_RELEASE(ptr, value) (*(volatile uint64_t *) (ptr) = (value))
+#define LIVE_STATE_FENCE_RELEASE() ((void) 0)
+#define LIVE_STATE_LOAD_RELAXED(ptr) (*(const volatile uint64_t *) (ptr))
+#define LIVE_STATE_LOAD_ACQUIRE(ptr) (*(const volatile uint64_t *) (ptr))
+#define LIVE_STATE_FENCE_ACQUIRE() ((void) 0)
+#endif
+
+WIN32DLL_API int setup_live_state(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+)
+{
+    storing_param->live_state_count_ = 0;
+    if (!storing_param->live_state)
+    {
+        return SUCCESS;
+    }
+
+    const char *header = storing_param->live_state;
+    if (memcmp(header, LIVE_STATE_MAGIC, 8) != 0)
+    {
+        return ERROR_LIVE_STATE_INVALID_HEADER;
+    }
+
+    int32_t capacity;
+    memcpy(&capacity, &header[16], sizeof(int32_t));
+    if (system->objects_count > capacity)
+    {
+        return ERROR_LIVE_STATE_CAPACITY_EXCEEDED;
+    }
+
+    return SUCCESS;
+}
+
+WIN32DLL_API void publish_live_state(
+    const StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status
+)
+{
+    char *header = storing_param->live_state;
+    uint64_t *sequence = (uint64_t *) &header[8];
+    int32_t capacity;
+    memcpy(&capacity, &header[16], sizeof(int32_t));
+
+    // The integrator thread is the only writer
+    const uint64_t old_sequence = *sequence;
+    LIVE_STATE_STORE_RELAXED(sequence, old_sequence + 1);
+    LIVE_STATE_FENCE_RELEASE();
+
+    const int32_t objects_count = system->objects_count;
+    const double t_dt[2] = {*(simulation_status->t), simulation_status->dt};
+    memcpy(&header[20], &objects_count, sizeof(int32_t));
+    memcpy(&header[24], t_dt, sizeof(t_dt));
+    memcpy(
+        &header[LIVE_STATE_HEADER_SIZE],
+        system->x,
+        objects_count * 3 * sizeof(double)
+    );
+    memcpy(
+        &header[LIVE_STATE_HEADER_SIZE + (int64) capacity * 3 * sizeof(double)],
+        system->v,
+        objects_count * 3 * sizeof(double)
+    );
+
+    LIVE_STATE_STORE_RELEASE(sequence, old_sequence + 2);
+}
+
+WIN32DLL_API bool read_live_state(
+    const void *live_state,
+    void *snapshot,
+    uint64_t *sequence
+)
+{
+    const char *header = live_state;
+    char *snapshot_bytes = snapshot;
+    const uint64_t *live_sequence = (const uint64_t *) &header[8];
+
+    const uint64_t begin = LIVE_STATE_LOAD_ACQUIRE(live_sequence);
+    if (begin % 2 != 0)
+    {
+        return false;
+    }
+
+    int32_t capacity;
+    int32_t objects_count;
+    memcpy(snapshot_bytes, header, LIVE_STATE_HEADER_SIZE);
+    memcpy(&capacity, &snapshot_bytes[16], sizeof(int32_t));
+    memcpy(&objects_count, &snapshot_bytes[20], sizeof(int32_t));
+    if (objects_count < 0 || objects_count > capacity)
+    {
+        // Torn read of the header, the sequence number must have changed
+        objects_count = 0;
+    }
+    memcpy(
+        &snapshot_bytes[LIVE_STATE_HEADER_SIZE],
+        &header[LIVE_STATE_HEADER_SIZE],
+        objects_count * 3 * sizeof(double)
+    );
+    memcpy(
+        &snapshot_bytes[LIVE_STATE_HEADER_SIZE + (int64) capacity * 3 * sizeof(double)],
+        &header[LIVE_STATE_HEADER_SIZE + (int64) capacity * 3 * sizeof(double)],
+        objects_count * 3 * sizeof(double)
+    );
+
+    // The copies above must complete before the sequence number is read again
+    LIVE_STATE_FENCE_ACQUIRE();
+    const uint64_t end = LIVE_STATE_LOAD_RELAXED(live_sequence);
+
+    *sequence = begin;
+    return begin == end;
+}
@@ -0,0 +1,89 @@
+/**
+ * \file live_state.h
+ * \author Ching Yin Ng
+ * \brief Function prototypes for publishing the live state of the
+ *        simulation to a shared memory segment
+ *
+ * The segment is created by the caller (e.g. multiprocessing.shared_memory
+ * in Python) with the following layout in native byte order:
+ *
+ *   Offset                Content
+ *   0                     Magic "GSIMLIV\0"
+ *   8                     uint64 sequence number
+ *   16                    int32 capacity, i.e. maximum number of objects
+ *   20                    int32 objects_count
+ *   24                    double t
+ *   32                    double dt
+ *   40                    int64 process ID of the creator, used to
+ *                         detect segments left by terminated processes
+ *   48                    Reserved up to LIVE_STATE_HEADER_SIZE
+ *   64                    x, capacity * 3 doubles
+ *   64 + capacity * 24    v, capacity * 3 doubles
+ *
+ * The magic, capacity and process ID are filled in by the caller. The
+ * live state is protected by a seqlock: the sequence number is odd while
+ * the state is being written and is incremented to an even number
+ * afterwards. A reader copies the state with read_live_state() and
+ * retries if the sequence number was odd or changed during the copy, so
+ * neither side waits for the other. The acquire and release orderings
+ * make it correct on weakly ordered CPUs (e.g. arm64) as well.
+ */
+
+#ifndef LIVE_STATE_H
+#define LIVE_STATE_H
+
+#include "gravity_sim.h"
+
+#define LIVE_STATE_MAGIC "GSIMLIV\0"
+#define LIVE_STATE_HEADER_SIZE 64
+
+/**
+ * \brief Check the live state segment and reset the publish counter
+ *
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ *
+ * \retval SUCCESS If successful or the live state is not enabled
+ * \retval ERROR_LIVE_STATE_INVALID_HEADER If the magic does not match
+ * \retval ERROR_LIVE_STATE_CAPACITY_EXCEEDED If the segment is too small
+ *                                            for the system
+ */
+int setup_live_state(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+);
+
+/**
+ * \brief Publish the current x, v, t and dt to the live state segment
+ *
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ * \param simulation_status Pointer to the simulation status
+ */
+void publish_live_state(
+    const StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status
+);
+
+/**
+ * \brief Copy the live state segment to a snapshot buffer, to be
+ *        called by the readers
+ *
+ * Only the header and the first objects_count positions and velocities
+ * are copied, at the same offsets as in the segment.
+ *
+ * \param live_state Pointer to the live state segment
+ * \param snapshot Pointer to a buffer with the same size as the segment
+ * \param sequence Pointer to the sequence number of the snapshot
+ *
+ * \return true if the snapshot is consistent, or false if the state was
+ *         being written, in which case the reader should retry
+ */
+bool read_live_state(
+    const void *live_state,
+    void *snapshot,
+    uint64_t *sequence
+);
+
+#endif
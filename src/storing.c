@@ -1,12 +1,170 @@
+#include <math.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
 
 #include "error.h"
+#include "flush_writer.h"
 #include "gravity_sim.h"
+#include "live_state.h"
 #include "storing.h"
+#include "storing_mmap.h"
 #include "utils.h"
 
+#define CSV_VALUE_MAX_SIZE 32
+#define STORING_CONVERT_CHUNK_SIZE 4096
+
+/**
+ * \brief Write a value with "%.17g" format to the flush writer
+ * 
+ * \param flush_writer Pointer to the flush writer
+ * \param separator Separator before the value
+ * \param value Value to be written
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_FLUSH_WRITER_WRITE If the writer failed to write to the file
+ */
+IN_FILE int write_csv_value(
+    FlushWriter *restrict flush_writer,
+    const char *restrict separator,
+    const double value
+);
+
+/**
+ * \brief Check whether any object checked by the distance trigger has
+ *        moved more than the relative distance threshold since the
+ *        last stored solution step
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ * 
+ * \return true if the threshold is exceeded, false otherwise
+ */
+IN_FILE bool is_distance_threshold_exceeded(
+    const StoringParam *restrict storing_param,
+    const System *restrict system
+);
+
+/**
+ * \brief Copy the current positions to the last stored positions
+ *        of the distance trigger, indexed by the initial system
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ */
+IN_FILE void set_last_stored_x(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+);
+
+/**
+ * \brief Get the slot of an object in the arrays of the system
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param index Index of the object in the initial system
+ * 
+ * \return Slot of the object, or -1 if the object is removed
+ */
+IN_FILE int get_object_slot(
+    const StoringParam *restrict storing_param,
+    const int index
+);
+
+/**
+ * \brief Get a value of the stored objects, i.e. component k % 3
+ *        of the (k / 3)-th stored object
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param values Array of values of all objects, i.e. system->x or system->v
+ * \param k Index of the value
+ * 
+ * \return Value, or nan if the object is removed
+ */
+IN_FILE double get_stored_value(
+    const StoringParam *restrict storing_param,
+    const real *restrict values,
+    const int64 k
+);
+
+/**
+ * \brief Get the number of solutions to extend the buffer to
+ * 
+ * The buffer grows geometrically by at least SOL_BUFFER_MIN_GROWTH_FACTOR,
+ * or to the estimated final size extrapolated from the number of
+ * solutions stored so far, whichever is larger. Each extension is
+ * capped at SOL_BUFFER_MAX_EXTEND_SIZE bytes.
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param sol_size Number of solutions stored so far
+ * \param t Current time
+ * \param tf Final time
+ * 
+ * \return Number of solutions to extend the buffer to
+ */
+IN_FILE int64 get_extended_sol_size(
+    const StoringParam *restrict storing_param,
+    const int64 sol_size,
+    const real t,
+    const real tf
+);
+
+/**
+ * \brief Write values of the stored objects to the flush writer
+ * 
+ * Removed objects are written as nan.
+ * 
+ * \param flush_writer Pointer to the flush writer
+ * \param storing_param Pointer to the storing parameters
+ * \param values Array of values of all objects, e.g. system->x
+ * \param dim Number of values per object, at most 3, e.g. 3 for system->x
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_FLUSH_WRITER_WRITE If the writer failed to write to the file
+ */
+IN_FILE int write_stored_objects(
+    FlushWriter *restrict flush_writer,
+    const StoringParam *restrict storing_param,
+    const real *restrict values,
+    const int dim
+);
+
+/**
+ * \brief Write the positions or velocities of the stored objects to the
+ *        flush writer, converted to the storing dtype (float32 or quantized16)
+ * 
+ * For quantized16, the minimum and scale of the values (float64) are written
+ * first, followed by the values as uint16, i.e. value = min + q * scale.
+ * Removed objects are written as nan, or FLUSH_BINARY_QUANTIZED16_NAN
+ * for quantized16.
+ * 
+ * \param flush_writer Pointer to the flush writer
+ * \param storing_param Pointer to the storing parameters
+ * \param values Array of values of all objects, i.e. system->x or system->v
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_FLUSH_WRITER_WRITE If the writer failed to write to the file
+ */
+IN_FILE int write_converted_field(
+    FlushWriter *restrict flush_writer,
+    const StoringParam *restrict storing_param,
+    const real *restrict values
+);
+
+/**
+ * \brief Reverse the order of solutions in [begin, end) in-place
+ * 
+ * \param solutions Pointer to the solutions
+ * \param row_size Size of each row of sol_state in bytes
+ * \param begin Index of the first solution
+ * \param end Index after the last solution
+ */
+IN_FILE void reverse_solutions(
+    Solutions *restrict solutions,
+    const int64 row_size,
+    int64 begin,
+    int64 end
+);
+
 WIN32DLL_API int get_storing_method_flag(
     const char *restrict storing_method,
     uint *restrict storing_method_flag
@@ -22,6 +180,21 @@ WIN32DLL_API int get_storing_method_flag(
         *storing_method_flag = STORING_METHOD_FLUSH;
         return SUCCESS;
     }
+    else if (strcmp(storing_method, "flush_binary") == 0)
+    {
+        *storing_method_flag = STORING_METHOD_FLUSH_BINARY;
+        return SUCCESS;
+    }
+    else if (strcmp(storing_method, "memmap") == 0)
+    {
+        *storing_method_flag = STORING_METHOD_MEMMAP;
+        return SUCCESS;
+    }
+    else if (strcmp(storing_method, "ring") == 0)
+    {
+        *storing_method_flag = STORING_METHOD_RING;
+        return SUCCESS;
+    }
     else if (strcmp(storing_method, "disabled") == 0)
     {
         *storing_method_flag = STORING_METHOD_DISABLED;
@@ -35,17 +208,23 @@ WIN32DLL_API int get_storing_method_flag(
 
 WIN32DLL_API int allocate_solutions_memory(
     Solutions *restrict solutions,
-    StoringParam *restrict storing_param,
-    int objects_count
+    StoringParam *restrict storing_param
 )
 {
     solutions->sol_state = NULL;
     solutions->sol_time = NULL;
     solutions->sol_dt = NULL;
     
-    solutions->sol_state = malloc(storing_param->max_sol_size_ * objects_count * 6 * sizeof(double));
-    solutions->sol_time = malloc(storing_param->max_sol_size_ * sizeof(double));
-    solutions->sol_dt = malloc(storing_param->max_sol_size_ * sizeof(double));
+    // The ring buffer is never extended
+    int64 size = storing_param->max_sol_size_;
+    if (storing_param->storing_method_flag_ == STORING_METHOD_RING)
+    {
+        size = storing_param->ring_capacity;
+    }
+
+    solutions->sol_state = malloc(size * storing_param->state_size_);
+    solutions->sol_time = malloc(size * sizeof(double));
+    solutions->sol_dt = malloc(size * sizeof(double));
     if (!solutions->sol_state || !solutions->sol_time || !solutions->sol_dt)
     {
         return ERROR_SOL_OUTPUT_MEMORY_ALLOC;
@@ -54,15 +233,256 @@ WIN32DLL_API int allocate_solutions_memory(
     return SUCCESS;
 }
 
+WIN32DLL_API int setup_stored_state(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+)
+{
+    // The binary files are little-endian, but written in native byte order
+    if (
+        storing_param->storing_method_flag_ == STORING_METHOD_FLUSH_BINARY
+        || storing_param->storing_method_flag_ == STORING_METHOD_MEMMAP
+    )
+    {
+        const uint16_t byte_order_mark = 1;
+        if (*((const uint8_t *) &byte_order_mark) != 1)
+        {
+            return ERROR_STORING_BIG_ENDIAN_NOT_SUPPORTED;
+        }
+    }
+
+    if (storing_param->stored_indices)
+    {
+        for (int i = 0; i < storing_param->stored_objects_count; i++)
+        {
+            if (
+                storing_param->stored_indices[i] < 0
+                || storing_param->stored_indices[i] >= system->objects_count
+            )
+            {
+                return ERROR_STORED_INDEX_OUT_OF_RANGE;
+            }
+        }
+    }
+
+    storing_param->initial_objects_count_ = system->objects_count;
+    storing_param->object_slots_ = NULL;
+    storing_param->state_length_ = (int64) get_stored_objects_count(storing_param) * 3;
+    if (storing_param->store_velocity)
+    {
+        storing_param->state_length_ *= 2;
+    }
+
+    /* Storing dtype */
+    if (strcmp(storing_param->storing_dtype, "float64") == 0)
+    {
+        storing_param->storing_dtype_flag_ = STORING_DTYPE_FLOAT64;
+        storing_param->state_size_ = storing_param->state_length_ * sizeof(double);
+    }
+    else if (strcmp(storing_param->storing_dtype, "float32") == 0)
+    {
+        // The csv file is written in text
+        if (storing_param->storing_method_flag_ == STORING_METHOD_FLUSH)
+        {
+            return ERROR_STORING_DTYPE_NOT_SUPPORTED;
+        }
+        storing_param->storing_dtype_flag_ = STORING_DTYPE_FLOAT32;
+        storing_param->state_size_ = storing_param->state_length_ * sizeof(float);
+    }
+    else if (strcmp(storing_param->storing_dtype, "quantized16") == 0)
+    {
+        // Quantization needs a scale for each snapshot, which is
+        // only supported by the binary flush file
+        if (
+            storing_param->storing_method_flag_ != STORING_METHOD_FLUSH_BINARY
+            && storing_param->storing_method_flag_ != STORING_METHOD_DISABLED
+        )
+        {
+            return ERROR_STORING_DTYPE_NOT_SUPPORTED;
+        }
+        storing_param->storing_dtype_flag_ = STORING_DTYPE_QUANTIZED16;
+        storing_param->state_size_ = storing_param->state_length_ * sizeof(uint16_t);
+    }
+    else
+    {
+        return ERROR_UNKNOWN_STORING_DTYPE;
+    }
+
+    return SUCCESS;
+}
+
+WIN32DLL_API int update_object_slots(
+    StoringParam *restrict storing_param,
+    const bool *restrict is_removed
+)
+{
+    const int initial_objects_count = storing_param->initial_objects_count_;
+    if (!storing_param->object_slots_)
+    {
+        storing_param->object_slots_ = malloc(initial_objects_count * sizeof(int));
+        if (!storing_param->object_slots_)
+        {
+            return ERROR_OBJECT_SLOTS_MEMORY_ALLOC;
+        }
+        for (int i = 0; i < initial_objects_count; i++)
+        {
+            storing_param->object_slots_[i] = i;
+        }
+    }
+
+    // The slots are increasing with the index, so the number of
+    // removed objects before each slot is counted in a single pass
+    int *restrict object_slots = storing_param->object_slots_;
+    int removed_count = 0;
+    int slot = 0;
+    for (int i = 0; i < initial_objects_count; i++)
+    {
+        const int old_slot = object_slots[i];
+        if (old_slot < 0)
+        {
+            continue;
+        }
+        for (; slot < old_slot; slot++)
+        {
+            if (is_removed[slot])
+            {
+                removed_count++;
+            }
+        }
+        object_slots[i] = is_removed[old_slot] ? -1 : old_slot - removed_count;
+    }
+
+    return SUCCESS;
+}
+
+WIN32DLL_API void free_object_slots(StoringParam *restrict storing_param)
+{
+    free(storing_param->object_slots_);
+    storing_param->object_slots_ = NULL;
+}
+
+WIN32DLL_API int get_stored_objects_count(
+    const StoringParam *restrict storing_param
+)
+{
+    if (storing_param->stored_indices)
+    {
+        return storing_param->stored_objects_count;
+    }
+    return storing_param->initial_objects_count_;
+}
+
+WIN32DLL_API int copy_stored_state(
+    const StoringParam *restrict storing_param,
+    const System *restrict system,
+    void *restrict state_buffer
+)
+{
+    const int stored_objects_count = get_stored_objects_count(storing_param);
+    const int64 length = (int64) stored_objects_count * 3;
+
+    if (storing_param->storing_dtype_flag_ == STORING_DTYPE_FLOAT32)
+    {
+        float *restrict state = state_buffer;
+        for (int64 k = 0; k < length; k++)
+        {
+            state[k] = (float) get_stored_value(storing_param, system->x, k);
+            if (storing_param->store_velocity)
+            {
+                state[length + k] = (float) get_stored_value(storing_param, system->v, k);
+            }
+        }
+        return SUCCESS;
+    }
+    else if (storing_param->storing_dtype_flag_ != STORING_DTYPE_FLOAT64)
+    {
+        return ERROR_STORING_DTYPE_NOT_SUPPORTED;
+    }
+
+    double *restrict state = state_buffer;
+    if (!storing_param->stored_indices && !storing_param->object_slots_)
+    {
+        memcpy(state, system->x, length * sizeof(double));
+        if (storing_param->store_velocity)
+        {
+            memcpy(&state[length], system->v, length * sizeof(double));
+        }
+        return SUCCESS;
+    }
+
+    for (int64 k = 0; k < length; k++)
+    {
+        state[k] = get_stored_value(storing_param, system->x, k);
+        if (storing_param->store_velocity)
+        {
+            state[length + k] = get_stored_value(storing_param, system->v, k);
+        }
+    }
+
+    return SUCCESS;
+}
+
+WIN32DLL_API int get_flush_binary_layout_version(
+    const StoringParam *restrict storing_param
+)
+{
+    int layout_version;
+    if (storing_param->store_velocity)
+    {
+        layout_version = storing_param->flush_energy
+            ? FLUSH_BINARY_LAYOUT_VERSION_WITH_ENERGY
+            : FLUSH_BINARY_LAYOUT_VERSION;
+    }
+    else
+    {
+        layout_version = storing_param->flush_energy
+            ? FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY_WITH_ENERGY
+            : FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY;
+    }
+
+    if (storing_param->storing_dtype_flag_ == STORING_DTYPE_FLOAT32)
+    {
+        layout_version |= FLUSH_BINARY_LAYOUT_FLOAT32;
+    }
+    else if (storing_param->storing_dtype_flag_ == STORING_DTYPE_QUANTIZED16)
+    {
+        layout_version |= FLUSH_BINARY_LAYOUT_QUANTIZED16;
+    }
+
+    return layout_version;
+}
+
 WIN32DLL_API int open_flush_file(
     StoringParam *restrict storing_param
 )
 {
-    storing_param->flush_file_ = fopen(storing_param->flush_path, "a");
+    if (storing_param->storing_method_flag_ == STORING_METHOD_FLUSH_BINARY)
+    {
+        storing_param->flush_file_ = fopen(storing_param->flush_path, "ab");
+    }
+    else
+    {
+        storing_param->flush_file_ = fopen(storing_param->flush_path, "a");
+    }
     if (!(storing_param->flush_file_))
     {
         return ERROR_FLUSH_FILE_OPEN;
     }
+
+    int return_code = flush_writer_create(
+        &(storing_param->flush_writer_),
+        storing_param->flush_file_
+    );
+    if (return_code != SUCCESS)
+    {
+        fclose(storing_param->flush_file_);
+        storing_param->flush_file_ = NULL;
+        return return_code;
+    }
+
+    // Header is written with the first binary record
+    storing_param->flush_objects_count_ = 0;
+
     return SUCCESS;
 }
 
@@ -70,7 +490,10 @@ WIN32DLL_API int close_flush_file(
     StoringParam *restrict storing_param
 )
 {
-    if (storing_param->storing_method_flag_ != STORING_METHOD_FLUSH)
+    if (
+        storing_param->storing_method_flag_ != STORING_METHOD_FLUSH
+        && storing_param->storing_method_flag_ != STORING_METHOD_FLUSH_BINARY
+    )
     {
         return ERROR_FLUSH_FILE_CLOSE_NOT_FLUSH_METHOD;
     }
@@ -80,7 +503,24 @@ WIN32DLL_API int close_flush_file(
         return ERROR_FLUSH_FILE_CLOSE_IS_NULL;
     }
 
-    if (fclose(storing_param->flush_file_) != 0)
+    int return_code = SUCCESS;
+    if (storing_param->flush_writer_)
+    {
+        return_code = flush_writer_close(
+            storing_param->flush_writer_,
+            &(storing_param->flush_max_queue_depth_),
+            &(storing_param->flush_stall_count_)
+        );
+        storing_param->flush_writer_ = NULL;
+    }
+
+    int fclose_return = fclose(storing_param->flush_file_);
+    storing_param->flush_file_ = NULL;
+    if (return_code != SUCCESS)
+    {
+        return return_code;
+    }
+    if (fclose_return != 0)
     {
         return ERROR_FLUSH_FILE_CLOSE;
     }
@@ -88,41 +528,67 @@ WIN32DLL_API int close_flush_file(
 }
 
 WIN32DLL_API int flush_solution_step_to_csv_file(
-    FILE *restrict file,
+    const StoringParam *restrict storing_param,
     const System *restrict system,
     const SimulationStatus *restrict simulation_status,
     Solutions *restrict solutions
 )
 {
-    double energy;
     int return_code;
-    int objects_count = system->objects_count;
-    real *restrict x = system->x;
-    real *restrict v = system->v;
+    FlushWriter *restrict flush_writer = storing_param->flush_writer_;
+    const int64 length = (int64) get_stored_objects_count(storing_param) * 3;
+
+    double energy = NAN;
+    if (storing_param->flush_energy)
+    {
+        return_code = compute_energy_step(system, &energy);
+        if (return_code != SUCCESS)
+        {
+            goto error;
+        }
+    }
 
-    return_code = compute_energy_step(system, &energy);
+    return_code = write_csv_value(flush_writer, "", *(simulation_status->t));
     if (return_code != SUCCESS)
     {
         goto error;
     }
-
-    fprintf(file, "%.17g", *(simulation_status->t));
-    fprintf(file, ",%.17g", simulation_status->dt);
-    fprintf(file, ",%.17g", energy);
-    for (int i = 0; i < objects_count; i++)
+    return_code = write_csv_value(flush_writer, ",", simulation_status->dt);
+    if (return_code != SUCCESS)
     {
-        fprintf(file, ",%.17g", x[i * 3 + 0]);
-        fprintf(file, ",%.17g", x[i * 3 + 1]);
-        fprintf(file, ",%.17g", x[i * 3 + 2]);
+        goto error;
     }
-    for (int i = 0; i < objects_count; i++)
+    return_code = write_csv_value(flush_writer, ",", energy);
+    if (return_code != SUCCESS)
+    {
+        goto error;
+    }
+    for (int64 k = 0; k < length; k++)
+    {
+        return_code = write_csv_value(flush_writer, ",", get_stored_value(storing_param, system->x, k));
+        if (return_code != SUCCESS)
+        {
+            goto error;
+        }
+    }
+    for (int64 k = 0; storing_param->store_velocity && k < length; k++)
+    {
+        return_code = write_csv_value(flush_writer, ",", get_stored_value(storing_param, system->v, k));
+        if (return_code != SUCCESS)
+        {
+            goto error;
+        }
+    }
+    return_code = flush_writer_write(flush_writer, "\n", 1);
+    if (return_code != SUCCESS)
     {
-        fprintf(file, ",%.17g", v[i * 3 + 0]);
-        fprintf(file, ",%.17g", v[i * 3 + 1]);
-        fprintf(file, ",%.17g", v[i * 3 + 2]);
+        goto error;
+    }
+    return_code = flush_writer_flush_if_due(flush_writer);
+    if (return_code != SUCCESS)
+    {
+        goto error;
     }
-    fprintf(file, "\n");
-    fflush(file);
 
     /* Update solution size */
     *(solutions->sol_size_) += 1;
@@ -133,28 +599,111 @@ error:
     return return_code;
 }
 
+WIN32DLL_API int flush_solution_step_to_binary_file(
+    StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status,
+    Solutions *restrict solutions
+)
+{
+    int return_code;
+    FlushWriter *restrict flush_writer = storing_param->flush_writer_;
+    const int stored_objects_count = get_stored_objects_count(storing_param);
+
+    /* Write header for new file */
+    if (storing_param->flush_objects_count_ != stored_objects_count)
+    {
+        const int32_t header_int[2] = {
+            get_flush_binary_layout_version(storing_param),
+            stored_objects_count
+        };
+        const double G = system->G;
+        if (
+            (return_code = flush_writer_write(flush_writer, FLUSH_BINARY_MAGIC, 8)) != SUCCESS
+            || (return_code = flush_writer_write(flush_writer, header_int, sizeof(header_int))) != SUCCESS
+            || (return_code = flush_writer_write(flush_writer, &G, sizeof(double))) != SUCCESS
+            || (return_code = write_stored_objects(flush_writer, storing_param, system->m, 1)) != SUCCESS
+        )
+        {
+            return return_code;
+        }
+        storing_param->flush_objects_count_ = stored_objects_count;
+    }
+
+    /* Write record */
+    double record_prefix[3] = {*(simulation_status->t), simulation_status->dt, 0.0};
+    size_t record_prefix_size = 2;
+    if (storing_param->flush_energy)
+    {
+        return_code = compute_energy_step(system, &record_prefix[2]);
+        if (return_code != SUCCESS)
+        {
+            return return_code;
+        }
+        record_prefix_size = 3;
+    }
+    return_code = flush_writer_write(flush_writer, record_prefix, record_prefix_size * sizeof(double));
+    if (return_code != SUCCESS)
+    {
+        return return_code;
+    }
+    if (storing_param->storing_dtype_flag_ == STORING_DTYPE_FLOAT64)
+    {
+        if (
+            (return_code = write_stored_objects(flush_writer, storing_param, system->x, 3)) != SUCCESS
+            || (
+                storing_param->store_velocity
+                && (return_code = write_stored_objects(flush_writer, storing_param, system->v, 3)) != SUCCESS
+            )
+        )
+        {
+            return return_code;
+        }
+    }
+    else
+    {
+        if (
+            (return_code = write_converted_field(flush_writer, storing_param, system->x)) != SUCCESS
+            || (
+                storing_param->store_velocity
+                && (return_code = write_converted_field(flush_writer, storing_param, system->v)) != SUCCESS
+            )
+        )
+        {
+            return return_code;
+        }
+    }
+    return_code = flush_writer_flush_if_due(flush_writer);
+    if (return_code != SUCCESS)
+    {
+        return return_code;
+    }
+
+    /* Update solution size */
+    *(solutions->sol_size_) += 1;
+
+    return SUCCESS;
+}
+
 WIN32DLL_API int store_solution_step_to_memory(
+    const StoringParam *restrict storing_param,
     const System *restrict system,
     const SimulationStatus *restrict simulation_status,
     Solutions *restrict solutions
 )
 {
-    const int objects_count = system->objects_count;
-    real *restrict x = system->x;
-    real *restrict v = system->v;
     int64 sol_size = *(solutions->sol_size_);
 
     /* Store solution */
-    memcpy(
-        &solutions->sol_state[sol_size * objects_count * 6],
-        x,
-        objects_count * 3 * sizeof(double)
-    );
-    memcpy(
-        &solutions->sol_state[sol_size * objects_count * 6 + objects_count * 3],
-        v,
-        objects_count * 3 * sizeof(double)
+    int return_code = copy_stored_state(
+        storing_param,
+        system,
+        (char *) solutions->sol_state + sol_size * storing_param->state_size_
     );
+    if (return_code != SUCCESS)
+    {
+        return return_code;
+    }
     solutions->sol_time[sol_size] = *(simulation_status->t);
     solutions->sol_dt[sol_size] = simulation_status->dt;
 
@@ -164,6 +713,142 @@ WIN32DLL_API int store_solution_step_to_memory(
     return SUCCESS;
 }
 
+WIN32DLL_API int store_solution_step_to_ring(
+    const StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status,
+    Solutions *restrict solutions
+)
+{
+    // Overwrite the oldest solution once the buffer is full
+    int64 index = *(solutions->sol_size_) % storing_param->ring_capacity;
+
+    /* Store solution */
+    int return_code = copy_stored_state(
+        storing_param,
+        system,
+        (char *) solutions->sol_state + index * storing_param->state_size_
+    );
+    if (return_code != SUCCESS)
+    {
+        return return_code;
+    }
+    solutions->sol_time[index] = *(simulation_status->t);
+    solutions->sol_dt[index] = simulation_status->dt;
+
+    /* Update solution size */
+    *(solutions->sol_size_) += 1;
+
+    return SUCCESS;
+}
+
+WIN32DLL_API void finalize_ring_solutions(
+    Solutions *restrict solutions,
+    StoringParam *restrict storing_param
+)
+{
+    const int64 ring_capacity = storing_param->ring_capacity;
+    const int64 sol_size = *(solutions->sol_size_);
+
+    if (sol_size > ring_capacity)
+    {
+        // Rotate the oldest solution to the front in-place
+        const int64 oldest = sol_size % ring_capacity;
+        if (oldest > 0)
+        {
+            reverse_solutions(solutions, storing_param->state_size_, 0, oldest);
+            reverse_solutions(solutions, storing_param->state_size_, oldest, ring_capacity);
+            reverse_solutions(solutions, storing_param->state_size_, 0, ring_capacity);
+        }
+        *(solutions->sol_size_) = ring_capacity;
+    }
+    storing_param->max_sol_size_ = ring_capacity;
+}
+
+WIN32DLL_API int setup_distance_trigger(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+)
+{
+    storing_param->last_stored_x_ = NULL;
+    storing_param->is_last_stored_x_set_ = false;
+    storing_param->is_last_step_skipped_ = false;
+    if (storing_param->distance_threshold <= 0.0)
+    {
+        return SUCCESS;
+    }
+
+    if (storing_param->distance_indices)
+    {
+        for (int i = 0; i < storing_param->distance_objects_count; i++)
+        {
+            if (
+                storing_param->distance_indices[i] < 0
+                || storing_param->distance_indices[i] >= system->objects_count
+            )
+            {
+                return ERROR_DISTANCE_INDEX_OUT_OF_RANGE;
+            }
+        }
+    }
+
+    storing_param->last_stored_x_ = malloc(system->objects_count * 3 * sizeof(real));
+    if (!storing_param->last_stored_x_)
+    {
+        return ERROR_DISTANCE_TRIGGER_MEMORY_ALLOC;
+    }
+
+    return SUCCESS;
+}
+
+WIN32DLL_API void free_distance_trigger(StoringParam *restrict storing_param)
+{
+    free(storing_param->last_stored_x_);
+    storing_param->last_stored_x_ = NULL;
+}
+
+IN_FILE bool is_distance_threshold_exceeded(
+    const StoringParam *restrict storing_param,
+    const System *restrict system
+)
+{
+    const real *restrict x = system->x;
+    const real *restrict last_x = storing_param->last_stored_x_;
+    const real threshold_squared = storing_param->distance_threshold * storing_param->distance_threshold;
+    const int objects_count = (
+        storing_param->distance_indices
+        ? storing_param->distance_objects_count
+        : storing_param->initial_objects_count_
+    );
+
+    for (int i = 0; i < objects_count; i++)
+    {
+        const int index = storing_param->distance_indices ? storing_param->distance_indices[i] : i;
+        const int slot = get_object_slot(storing_param, index);
+        if (slot < 0)
+        {
+            continue;
+        }
+
+        real displacement_squared = 0.0;
+        real distance_squared = 0.0;
+        for (int j = 0; j < 3; j++)
+        {
+            const real displacement = x[slot * 3 + j] - last_x[index * 3 + j];
+            displacement_squared += displacement * displacement;
+            distance_squared += last_x[index * 3 + j] * last_x[index * 3 + j];
+        }
+
+        // Compare squared distances to avoid sqrt
+        if (displacement_squared > threshold_squared * distance_squared)
+        {
+            return true;
+        }
+    }
+
+    return false;
+}
+
 WIN32DLL_API int store_solution_step(
     StoringParam *restrict storing_param,
     const System *restrict system,
@@ -171,12 +856,46 @@ WIN32DLL_API int store_solution_step(
     Solutions *restrict solutions
 )
 {
+    // Dense output may store several solutions in the last step
+    // after the snapshot callback requested to stop
+    if (storing_param->is_callback_stop_)
+    {
+        return SUCCESS;
+    }
+
+    /* Live state, published before the distance trigger skips the step */
+    if (storing_param->live_state)
+    {
+        if (storing_param->live_state_count_ % storing_param->live_state_freq == 0)
+        {
+            publish_live_state(storing_param, system, simulation_status);
+        }
+        storing_param->live_state_count_++;
+    }
+
+    /* Distance trigger */
+    if (storing_param->last_stored_x_)
+    {
+        if (
+            storing_param->is_last_stored_x_set_
+            && !is_distance_threshold_exceeded(storing_param, system)
+        )
+        {
+            storing_param->is_last_step_skipped_ = true;
+            return SUCCESS;
+        }
+        set_last_stored_x(storing_param, system);
+        storing_param->is_last_stored_x_set_ = true;
+        storing_param->is_last_step_skipped_ = false;
+    }
+
     int return_code;
     if (storing_param->storing_method_flag_ == STORING_METHOD_DEFAULT)
     {
         if ((*(solutions->sol_size_) + 1) <= storing_param->max_sol_size_)
         {
             return_code = store_solution_step_to_memory(
+                storing_param,
                 system,
                 simulation_status,
                 solutions
@@ -190,12 +909,46 @@ WIN32DLL_API int store_solution_step(
     else if (storing_param->storing_method_flag_ == STORING_METHOD_FLUSH)
     {
         return_code = flush_solution_step_to_csv_file(
-            storing_param->flush_file_,
+            storing_param,
+            system,
+            simulation_status,
+            solutions
+        );
+    }
+    else if (storing_param->storing_method_flag_ == STORING_METHOD_FLUSH_BINARY)
+    {
+        return_code = flush_solution_step_to_binary_file(
+            storing_param,
             system,
             simulation_status,
             solutions
         );
     }
+    else if (storing_param->storing_method_flag_ == STORING_METHOD_RING)
+    {
+        return_code = store_solution_step_to_ring(
+            storing_param,
+            system,
+            simulation_status,
+            solutions
+        );
+    }
+    else if (storing_param->storing_method_flag_ == STORING_METHOD_MEMMAP)
+    {
+        if ((*(solutions->sol_size_) + 1) <= storing_param->max_sol_size_)
+        {
+            return_code = store_solution_step_to_mmap(
+                storing_param,
+                system,
+                simulation_status,
+                solutions
+            );
+        }
+        else
+        {   
+            return_code = ERROR_SOL_SIZE_EXCEED_MEMORY_ALLOC;
+        }
+    }
     else if (storing_param->storing_method_flag_ == STORING_METHOD_DISABLED)
     {
         return_code = SUCCESS;
@@ -205,25 +958,102 @@ WIN32DLL_API int store_solution_step(
         return_code = ERROR_STORE_SOLUTION_STEP_UNKNOWN_METHOD;
     }
 
+    if (return_code == SUCCESS && storing_param->snapshot_callback)
+    {
+        if (storing_param->snapshot_callback(
+            *(simulation_status->t),
+            simulation_status->dt,
+            system->x,
+            system->v,
+            system->objects_count
+        ) != 0)
+        {
+            storing_param->is_callback_stop_ = true;
+        }
+    }
+
     return return_code;
 }
 
+WIN32DLL_API int store_final_solution_step(
+    StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status,
+    Solutions *restrict solutions,
+    const real tf
+)
+{
+    if (!storing_param->is_last_step_skipped_ || storing_param->is_callback_stop_)
+    {
+        return SUCCESS;
+    }
+
+    if (
+        (
+            storing_param->storing_method_flag_ == STORING_METHOD_DEFAULT
+            || storing_param->storing_method_flag_ == STORING_METHOD_MEMMAP
+        )
+        && (*(solutions->sol_size_) + 1) > storing_param->max_sol_size_
+    )
+    {
+        int return_code = extend_sol_memory_buffer(
+            solutions,
+            storing_param,
+            *(simulation_status->t),
+            tf
+        );
+        if (return_code != SUCCESS)
+        {
+            return return_code;
+        }
+    }
+
+    // Store regardless of the distance threshold
+    storing_param->is_last_stored_x_set_ = false;
+    return store_solution_step(
+        storing_param,
+        system,
+        simulation_status,
+        solutions
+    );
+}
+
 WIN32DLL_API int extend_sol_memory_buffer(
     Solutions *restrict solutions,
     StoringParam *restrict storing_param,
-    const int objects_count
+    const real t,
+    const real tf
 )
 {
     int return_code;
 
-    int64 buffer_size = storing_param->max_sol_size_ * 2;
+    int64 buffer_size = get_extended_sol_size(
+        storing_param,
+        *(solutions->sol_size_),
+        t,
+        tf
+    );
+
+    if (storing_param->storing_method_flag_ == STORING_METHOD_MEMMAP)
+    {
+        return extend_mmap_solutions(storing_param, buffer_size);
+    }
+
+    // Solutions are only kept in a growing buffer for the default
+    // storing method, and the ring buffer overwrites old solutions
+    if (storing_param->storing_method_flag_ != STORING_METHOD_DEFAULT)
+    {
+        storing_param->max_sol_size_ = buffer_size;
+        return SUCCESS;
+    }
+
     double *restrict temp_sol_state = NULL;
     double *restrict temp_sol_time = NULL;
     double *restrict temp_sol_dt = NULL;
 
     temp_sol_state = realloc(
         solutions->sol_state,
-        buffer_size * objects_count * 6 * sizeof(double)
+        buffer_size * storing_param->state_size_
     );
     temp_sol_time = realloc(
         solutions->sol_time,
@@ -253,3 +1083,290 @@ error_memory:
     free(temp_sol_dt);
     return return_code;
 }
+
+WIN32DLL_API void shrink_sol_memory_buffer(
+    Solutions *restrict solutions,
+    StoringParam *restrict storing_param
+)
+{
+    const int64 sol_size = *(solutions->sol_size_);
+    if (
+        (
+            storing_param->storing_method_flag_ != STORING_METHOD_DEFAULT
+            && storing_param->storing_method_flag_ != STORING_METHOD_RING
+        )
+        || sol_size <= 0
+        || sol_size >= storing_param->max_sol_size_
+    )
+    {
+        return;
+    }
+
+    // Shrinking should not fail, but the larger buffers are
+    // still valid if it does
+    double *temp_sol_state = realloc(
+        solutions->sol_state,
+        sol_size * storing_param->state_size_
+    );
+    if (temp_sol_state)
+    {
+        solutions->sol_state = temp_sol_state;
+    }
+    double *temp_sol_time = realloc(solutions->sol_time, sol_size * sizeof(double));
+    if (temp_sol_time)
+    {
+        solutions->sol_time = temp_sol_time;
+    }
+    double *temp_sol_dt = realloc(solutions->sol_dt, sol_size * sizeof(double));
+    if (temp_sol_dt)
+    {
+        solutions->sol_dt = temp_sol_dt;
+    }
+}
+
+IN_FILE int write_csv_value(
+    FlushWriter *restrict flush_writer,
+    const char *restrict separator,
+    const double value
+)
+{
+    char *space;
+    int return_code = flush_writer_get_space(flush_writer, CSV_VALUE_MAX_SIZE, &space);
+    if (return_code != SUCCESS)
+    {
+        return return_code;
+    }
+    int length = snprintf(space, CSV_VALUE_MAX_SIZE, "%s%.17g", separator, value);
+    flush_writer_commit(flush_writer, length);
+
+    return SUCCESS;
+}
+
+IN_FILE int64 get_extended_sol_size(
+    const StoringParam *restrict storing_param,
+    const int64 sol_size,
+    const real t,
+    const real tf
+)
+{
+    const int64 max_sol_size = storing_param->max_sol_size_;
+
+    /* Geometric growth */
+    int64 new_size = (int64) (max_sol_size * SOL_BUFFER_MIN_GROWTH_FACTOR);
+
+    /* Estimate the final size with the storing rate so far */
+    if (t > 0.0 && tf > t)
+    {
+        const int64 estimated_size = (int64) (
+            sol_size * (tf / t) * SOL_BUFFER_ESTIMATE_MARGIN
+        );
+        if (estimated_size > new_size)
+        {
+            new_size = estimated_size;
+        }
+    }
+
+    /* Cap the size of each extension */
+    const int64 record_size = storing_param->state_size_ + 2 * (int64) sizeof(double);
+    const int64 max_extend_size = SOL_BUFFER_MAX_EXTEND_SIZE / record_size;
+    if (new_size - max_sol_size > max_extend_size)
+    {
+        new_size = max_sol_size + max_extend_size;
+    }
+
+    if (new_size <= max_sol_size)
+    {
+        new_size = max_sol_size + 1;
+    }
+
+    return new_size;
+}
+
+IN_FILE void set_last_stored_x(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+)
+{
+    if (!storing_param->object_slots_)
+    {
+        memcpy(
+            storing_param->last_stored_x_,
+            system->x,
+            system->objects_count * 3 * sizeof(real)
+        );
+        return;
+    }
+
+    for (int i = 0; i < storing_param->initial_objects_count_; i++)
+    {
+        const int slot = storing_param->object_slots_[i];
+        if (slot >= 0)
+        {
+            memcpy(&(storing_param->last_stored_x_[i * 3]), &(system->x[slot * 3]), 3 * sizeof(real));
+        }
+    }
+}
+
+IN_FILE int get_object_slot(
+    const StoringParam *restrict storing_param,
+    const int index
+)
+{
+    return storing_param->object_slots_ ? storing_param->object_slots_[index] : index;
+}
+
+IN_FILE double get_stored_value(
+    const StoringParam *restrict storing_param,
+    const real *restrict values,
+    const int64 k
+)
+{
+    const int i = (int) (k / 3);
+    const int slot = get_object_slot(
+        storing_param,
+        storing_param->stored_indices ? storing_param->stored_indices[i] : i
+    );
+    return (slot >= 0) ? values[slot * 3 + k % 3] : NAN;
+}
+
+IN_FILE int write_stored_objects(
+    FlushWriter *restrict flush_writer,
+    const StoringParam *restrict storing_param,
+    const real *restrict values,
+    const int dim
+)
+{
+    const int stored_objects_count = get_stored_objects_count(storing_param);
+    const int *restrict stored_indices = storing_param->stored_indices;
+    if (!stored_indices && !storing_param->object_slots_)
+    {
+        return flush_writer_write(flush_writer, values, stored_objects_count * dim * sizeof(double));
+    }
+
+    const double nan_values[3] = {NAN, NAN, NAN};
+    for (int i = 0; i < stored_objects_count; i++)
+    {
+        const int slot = get_object_slot(storing_param, stored_indices ? stored_indices[i] : i);
+        int return_code = flush_writer_write(
+            flush_writer,
+            (slot >= 0) ? &values[slot * dim] : nan_values,
+            dim * sizeof(double)
+        );
+        if (return_code != SUCCESS)
+        {
+            return return_code;
+        }
+    }
+
+    return SUCCESS;
+}
+
+IN_FILE int write_converted_field(
+    FlushWriter *restrict flush_writer,
+    const StoringParam *restrict storing_param,
+    const real *restrict values
+)
+{
+    int return_code;
+    const int64 length = (int64) get_stored_objects_count(storing_param) * 3;
+    const bool is_quantized = (storing_param->storing_dtype_flag_ == STORING_DTYPE_QUANTIZED16);
+
+    /* Bounding box of the values for quantization, ignoring nan */
+    double quantization[2] = {0.0, 0.0};    // min, scale
+    if (is_quantized)
+    {
+        double min = INFINITY;
+        double max = -INFINITY;
+        for (int64 k = 0; k < length; k++)
+        {
+            const double value = get_stored_value(storing_param, values, k);
+            min = fmin(min, value);
+            max = fmax(max, value);
+        }
+        if (min <= max)
+        {
+            // The largest q is reserved for nan
+            quantization[0] = min;
+            quantization[1] = (max - min) / (FLUSH_BINARY_QUANTIZED16_NAN - 1);
+        }
+
+        return_code = flush_writer_write(flush_writer, quantization, sizeof(quantization));
+        if (return_code != SUCCESS)
+        {
+            return return_code;
+        }
+    }
+
+    /* Convert and write in chunks */
+    union
+    {
+        float f32[STORING_CONVERT_CHUNK_SIZE];
+        uint16_t q16[STORING_CONVERT_CHUNK_SIZE];
+    } chunk;
+    for (int64 begin = 0; begin < length; begin += STORING_CONVERT_CHUNK_SIZE)
+    {
+        const int64 chunk_length = (length - begin < STORING_CONVERT_CHUNK_SIZE)
+            ? length - begin
+            : STORING_CONVERT_CHUNK_SIZE;
+        for (int64 k = 0; k < chunk_length; k++)
+        {
+            const double value = get_stored_value(storing_param, values, begin + k);
+            if (!is_quantized)
+            {
+                chunk.f32[k] = (float) value;
+            }
+            else if (isnan(value))
+            {
+                chunk.q16[k] = FLUSH_BINARY_QUANTIZED16_NAN;
+            }
+            else
+            {
+                chunk.q16[k] = (quantization[1] > 0.0)
+                    ? (uint16_t) ((value - quantization[0]) / quantization[1] + 0.5)
+                    : 0;
+            }
+        }
+
+        return_code = flush_writer_write(
+            flush_writer,
+            &chunk,
+            chunk_length * (is_quantized ? sizeof(uint16_t) : sizeof(float))
+        );
+        if (return_code != SUCCESS)
+        {
+            return return_code;
+        }
+    }
+
+    return SUCCESS;
+}
+
+IN_FILE void reverse_solutions(
+    Solutions *restrict solutions,
+    const int64 row_size,
+    int64 begin,
+    int64 end
+)
+{
+    char *restrict sol_state = (char *) solutions->sol_state;
+    char temp_byte;
+    double temp;
+
+    for (int64 i = begin, j = end - 1; i < j; i++, j--)
+    {
+        for (int64 k = 0; k < row_size; k++)
+        {
+            temp_byte = sol_state[i * row_size + k];
+            sol_state[i * row_size + k] = sol_state[j * row_size + k];
+            sol_state[j * row_size + k] = temp_byte;
+        }
+
+        temp = solutions->sol_time[i];
+        solutions->sol_time[i] = solutions->sol_time[j];
+        solutions->sol_time[j] = temp;
+
+        temp = solutions->sol_dt[i];
+        solutions->sol_dt[i] = solutions->sol_dt[j];
+        solutions->sol_dt[j] = temp;
+    }
+}
@@ -10,6 +10,53 @@
 #define STORING_METHOD_DEFAULT 1
 #define STORING_METHOD_FLUSH 2
 #define STORING_METHOD_DISABLED 3
+#define STORING_METHOD_FLUSH_BINARY 4
+#define STORING_METHOD_MEMMAP 5
+#define STORING_METHOD_RING 6
+
+#define STORING_DTYPE_FLOAT64 1
+#define STORING_DTYPE_FLOAT32 2
+#define STORING_DTYPE_QUANTIZED16 3
+
+/**
+ * Binary flush file layout (little-endian, which is checked by
+ * setup_stored_state() as the values are written in native byte order):
+ * 
+ * Header: magic (8 bytes), layout version (int32), objects_count N (int32),
+ *         G (float64), m (N float64)
+ * Record: t, dt, x (3N), v (3N), all float64 for layout version 1, or
+ *         t, dt, energy, x (3N), v (3N) for layout version 2, which is
+ *         used if flush_energy is set. Layout versions 3 and 4 are the
+ *         same as 1 and 2 without v, which are used if store_velocity
+ *         is not set.
+ * 
+ * N and m are of the stored objects only if stored_indices is set.
+ * Objects removed during the simulation are kept in the layout with
+ * nan values, so N does not change within a run.
+ * 
+ * The storing dtype of x and v is flagged in the higher bits of the
+ * layout version. With FLUSH_BINARY_LAYOUT_FLOAT32, x and v are float32.
+ * With FLUSH_BINARY_LAYOUT_QUANTIZED16, x and v are each preceded by
+ * their minimum and scale (float64), and stored as uint16 q, such that
+ * the value is min + q * scale. q = FLUSH_BINARY_QUANTIZED16_NAN is
+ * reserved for nan, e.g. removed objects.
+ * 
+ * A new header is written every time the file is opened, so a file
+ * may contain several segments.
+ * 
+ * With FLUSH_BINARY_LAYOUT_RECORDS_COUNT, which is set by the memmap
+ * storing method, the number of committed records (int64) follows G
+ * in the header, and the records after them are ignored.
+ */
+#define FLUSH_BINARY_MAGIC "GSIMBIN\0"
+#define FLUSH_BINARY_LAYOUT_VERSION 1
+#define FLUSH_BINARY_LAYOUT_VERSION_WITH_ENERGY 2
+#define FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY 3
+#define FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY_WITH_ENERGY 4
+#define FLUSH_BINARY_LAYOUT_FLOAT32 0x100
+#define FLUSH_BINARY_LAYOUT_QUANTIZED16 0x200
+#define FLUSH_BINARY_LAYOUT_RECORDS_COUNT 0x400
+#define FLUSH_BINARY_QUANTIZED16_NAN UINT16_MAX
 
 /**
  * \brief Return storing method flag based on the input string
@@ -29,12 +76,125 @@ int get_storing_method_flag(
  * 
  * \param solutions Pointer to the solutions
  * \param storing_param Pointer to the storing parameters
- * \param objects_count Number of objects in the system
  */
 int allocate_solutions_memory(
     Solutions *restrict solutions,
+    StoringParam *restrict storing_param
+);
+
+/**
+ * \brief Check the stored indices and compute the length of the
+ *        stored state, i.e. x (3M) followed by v (3M) if store_velocity
+ *        is set, where M is the number of stored objects
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_STORED_INDEX_OUT_OF_RANGE If a stored index is out of range
+ * \retval ERROR_UNKNOWN_STORING_DTYPE If the storing dtype is not recognized
+ * \retval ERROR_STORING_DTYPE_NOT_SUPPORTED If the storing dtype is not
+ *                                           supported by the storing method
+ * \retval ERROR_STORING_BIG_ENDIAN_NOT_SUPPORTED If the storing method writes
+ *                                                a binary file on a big-endian platform
+ */
+int setup_stored_state(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+);
+
+/**
+ * \brief Check the distance indices and allocate the last stored
+ *        positions if distance_threshold is positive
+ * 
+ * The distance indices and the last stored positions refer to the
+ * objects in the initial system, which are looked up by their slots
+ * after objects are removed.
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_DISTANCE_INDEX_OUT_OF_RANGE If a distance index is out of range
+ * \retval ERROR_DISTANCE_TRIGGER_MEMORY_ALLOC If failed to allocate memory
+ */
+int setup_distance_trigger(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+);
+
+/**
+ * \brief Free the last stored positions of the distance trigger
+ * 
+ * \param storing_param Pointer to the storing parameters
+ */
+void free_distance_trigger(StoringParam *restrict storing_param);
+
+/**
+ * \brief Update the slots of the objects after some objects are
+ *        removed and the arrays of the system are compacted
+ * 
+ * The stored objects are looked up by their index in the initial
+ * system, so that the layout of the stored state is unchanged and
+ * the removed objects are stored as nan.
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param is_removed Flags of the removed objects, indexed by the
+ *                   slots before removal
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_OBJECT_SLOTS_MEMORY_ALLOC If failed to allocate memory
+ */
+int update_object_slots(
     StoringParam *restrict storing_param,
-    int objects_count
+    const bool *restrict is_removed
+);
+
+/**
+ * \brief Free the slots of the objects
+ * 
+ * \param storing_param Pointer to the storing parameters
+ */
+void free_object_slots(StoringParam *restrict storing_param);
+
+/**
+ * \brief Get the number of stored objects, which is fixed at
+ *        setup_stored_state() even if objects are removed
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * 
+ * \return Number of stored objects
+ */
+int get_stored_objects_count(
+    const StoringParam *restrict storing_param
+);
+
+/**
+ * \brief Copy the stored state of the system, converted to the
+ *        storing dtype (float64 or float32)
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ * \param state_buffer Buffer of state_size_ bytes to store the state
+ * 
+ * \retval SUCCESS If successful
+ * \retval ERROR_STORING_DTYPE_NOT_SUPPORTED If the storing dtype is quantized16
+ */
+int copy_stored_state(
+    const StoringParam *restrict storing_param,
+    const System *restrict system,
+    void *restrict state_buffer
+);
+
+/**
+ * \brief Get the binary flush layout version for the stored fields
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * 
+ * \return Layout version
+ */
+int get_flush_binary_layout_version(
+    const StoringParam *restrict storing_param
 );
 
 /**
@@ -66,7 +226,10 @@ int close_flush_file(
 /**
  * \brief Flush solution step to CSV file
  * 
- * \param file Pointer to the file to store the solution
+ * The energy column is filled with nan unless flush_energy is set,
+ * as computing the total energy takes O(N^2) time.
+ * 
+ * \param storing_param Pointer to the storing parameters
  * \param system Pointer to the gravitational system
  * \param simulation_status Pointer to the simulation status
  * \param solutions Pointer to the solutions
@@ -75,7 +238,25 @@ int close_flush_file(
  * \retval error code If there is any error
  */
 int flush_solution_step_to_csv_file(
-    FILE *restrict file,
+    const StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status,
+    Solutions *restrict solutions
+);
+
+/**
+ * \brief Flush solution step to binary file
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ * \param simulation_status Pointer to the simulation status
+ * \param solutions Pointer to the solutions
+ * 
+ * \retval SUCCESS If the solution is flushed successfully
+ * \retval error code If there is any error
+ */
+int flush_solution_step_to_binary_file(
+    StoringParam *restrict storing_param,
     const System *restrict system,
     const SimulationStatus *restrict simulation_status,
     Solutions *restrict solutions
@@ -84,20 +265,67 @@ int flush_solution_step_to_csv_file(
 /**
  * \brief Store solution step to memory
  * 
+ * \param storing_param Pointer to the storing parameters
  * \param system Pointer to the gravitational system
  * \param simulation_status Pointer to the simulation status
  * \param solutions Pointer to the solutions
  * 
  * \retval SUCCESS If the solution is stored successfully
+ * \retval ERROR_STORED_INDEX_OUT_OF_RANGE If a stored index is out of range
  */
 int store_solution_step_to_memory(
+    const StoringParam *restrict storing_param,
     const System *restrict system,
     const SimulationStatus *restrict simulation_status,
     Solutions *restrict solutions
 );
 
 /**
- * \brief Store solution step based on the storing parameters
+ * \brief Store solution step to the ring buffer, overwriting
+ *        the oldest solution if the buffer is full
+ * 
+ * sol_size_ counts all stored solutions, so the solution is stored
+ * at index sol_size_ % ring_capacity.
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ * \param simulation_status Pointer to the simulation status
+ * \param solutions Pointer to the solutions
+ * 
+ * \retval SUCCESS If the solution is stored successfully
+ */
+int store_solution_step_to_ring(
+    const StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status,
+    Solutions *restrict solutions
+);
+
+/**
+ * \brief Reorder the ring buffer chronologically and set sol_size_
+ *        to the number of solutions kept
+ * 
+ * \param solutions Pointer to the solutions
+ * \param storing_param Pointer to the storing parameters
+ */
+void finalize_ring_solutions(
+    Solutions *restrict solutions,
+    StoringParam *restrict storing_param
+);
+
+/**
+ * \brief Store solution step based on the storing parameters, then
+ *        invoke the snapshot callback if any. A non-zero return value
+ *        of the callback sets is_callback_stop_, and the integrators
+ *        stop at the end of the current step.
+ * 
+ * If distance_threshold is positive, the step is skipped unless one
+ * of the checked objects has moved more than distance_threshold times
+ * its distance from the origin since the last stored step. Removed
+ * objects are not checked.
+ * 
+ * If the live state is enabled, it is published every live_state_freq
+ * calls, including the calls skipped by the distance threshold.
  * 
  * \param storing_param Pointer to the storing parameters
  * \param system Pointer to the gravitational system
@@ -114,12 +342,38 @@ int store_solution_step(
     Solutions *restrict solutions
 );
 
+/**
+ * \brief Store the final state if the last solution step is skipped
+ *        by the distance trigger, so that the results always end at
+ *        the end of the simulation
+ * 
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ * \param simulation_status Pointer to the simulation status
+ * \param solutions Pointer to the solutions
+ * \param tf Final time
+ * 
+ * \retval SUCCESS If the solution is stored successfully or not skipped
+ * \retval error code If there is any error
+ */
+int store_final_solution_step(
+    StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status,
+    Solutions *restrict solutions,
+    const real tf
+);
+
 /**
  * \brief Extend memory buffer for solution output
  * 
+ * The buffer grows geometrically, or to the final size estimated
+ * from the number of solutions stored up to time t.
+ * 
  * \param solutions Pointer to the solutions
  * \param storing_param Pointer to the storing parameters
- * \param objects_count Number of objects in the system
+ * \param t Current time
+ * \param tf Final time
  * 
  * \retval SUCCESS If the memory buffer is extended successfully
  * \retval ERROR_SOL_OUTPUT_EXTEND_MEMORY_REALLOC If the memory reallocation failed
@@ -127,7 +381,19 @@ int store_solution_step(
 int extend_sol_memory_buffer(
     Solutions *restrict solutions,
     StoringParam *restrict storing_param,
-    const int objects_count
+    const real t,
+    const real tf
+);
+
+/**
+ * \brief Shrink memory buffer for solution output to the stored solutions
+ * 
+ * \param solutions Pointer to the solutions
+ * \param storing_param Pointer to the storing parameters
+ */
+void shrink_sol_memory_buffer(
+    Solutions *restrict solutions,
+    StoringParam *restrict storing_param
 );
 
 #endif
\ No newline at end of file
@@ -0,0 +1,317 @@
+/**
+ * \file storing_mmap.c
+ * \author Ching Yin Ng
+ * \brief Function definitions for storing solutions in a memory-mapped file
+ */
+
+#ifdef USE_MMAP
+#define _POSIX_C_SOURCE 200809L
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <unistd.h>
+#endif
+#include <stdint.h>
+#include <stdio.h>
+#include <string.h>
+
+#include "error.h"
+#include "gravity_sim.h"
+#include "storing.h"
+#include "storing_mmap.h"
+
+/**
+ * \brief Size of each record in bytes, i.e. t, dt and the stored state
+ *
+ * \param storing_param Pointer to the storing parameters
+ */
+#define MMAP_RECORD_SIZE(storing_param) \
+    (2 * (int64) sizeof(double) + (storing_param)->state_size_)
+
+/* Offset of the number of committed records in the header */
+#define MMAP_RECORDS_COUNT_OFFSET 24
+
+/* Order the number of committed records after the record itself */
+#if defined(__GNUC__) || defined(__clang__)
+#define MMAP_STORE_RELEASE(ptr, value) __atomic_store_n((ptr), (value), __ATOMIC_RELEASE)
+#else
+#define MMAP_STORE_RELEASE(ptr, value) (*(volatile int64 *) (ptr) = (value))
+#endif
+
+#ifdef USE_MMAP
+/**
+ * \brief Resize the file and map it to memory
+ *
+ * \param storing_param Pointer to the storing parameters
+ * \param max_sol_size Number of records of this simulation
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_MMAP_FILE_RESIZE If failed to resize the file
+ * \retval ERROR_MMAP_MAP If failed to map the file to memory
+ */
+IN_FILE int map_file(StoringParam *restrict storing_param, int64 max_sol_size);
+
+/**
+ * \brief Get the size of the mapped file
+ *
+ * \param storing_param Pointer to the storing parameters
+ * \param sol_size Number of records of this simulation
+ *
+ * \return Size of the header and the records in bytes
+ */
+IN_FILE int64 get_mmap_file_size(const StoringParam *restrict storing_param, int64 sol_size);
+
+/**
+ * \brief Check the header of an existing file and get the number of
+ *        committed records, so that new records are appended
+ *
+ * \param storing_param Pointer to the storing parameters
+ * \param header Expected header up to the number of records
+ * \param file_size Size of the existing file
+ *
+ * \retval SUCCESS If the header matches
+ * \retval ERROR_MMAP_FILE_INCOMPATIBLE If the header does not match
+ */
+IN_FILE int read_mmap_records_offset(
+    StoringParam *restrict storing_param,
+    const char *restrict header,
+    int64 file_size
+);
+#endif
+
+WIN32DLL_API int open_mmap_solutions(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+)
+{
+#ifdef USE_MMAP
+    const int stored_objects_count = get_stored_objects_count(storing_param);
+
+    storing_param->mmap_data_ = NULL;
+    storing_param->mmap_records_offset_ = 0;
+
+    // The file is never truncated, as it may contain the records of the
+    // last simulation, which may still be mapped by its results
+    storing_param->mmap_fd_ = open(
+        storing_param->flush_path,
+        O_RDWR | O_CREAT,
+        0644
+    );
+    if (storing_param->mmap_fd_ < 0)
+    {
+        return ERROR_MMAP_FILE_OPEN;
+    }
+
+    /* Header, same as the binary flush file without energy */
+    int32_t header_int[2] = {
+        storing_param->store_velocity
+            ? FLUSH_BINARY_LAYOUT_VERSION
+            : FLUSH_BINARY_LAYOUT_VERSION_POSITION_ONLY,
+        stored_objects_count
+    };
+    header_int[0] |= FLUSH_BINARY_LAYOUT_RECORDS_COUNT;
+    if (storing_param->storing_dtype_flag_ == STORING_DTYPE_FLOAT32)
+    {
+        header_int[0] |= FLUSH_BINARY_LAYOUT_FLOAT32;
+    }
+    const double G = system->G;
+    char header[MMAP_RECORDS_COUNT_OFFSET];
+    memcpy(header, FLUSH_BINARY_MAGIC, 8);
+    memcpy(&header[8], header_int, sizeof(header_int));
+    memcpy(&header[16], &G, sizeof(double));
+    storing_param->mmap_header_size_ = MMAP_RECORDS_COUNT_OFFSET + sizeof(int64) + (int64) stored_objects_count * sizeof(double);
+
+    /* Append to an existing file */
+    const off_t file_size = lseek(storing_param->mmap_fd_, 0, SEEK_END);
+    int return_code = SUCCESS;
+    if (file_size < 0)
+    {
+        return_code = ERROR_MMAP_FILE_OPEN;
+    }
+    else if (file_size > 0)
+    {
+        return_code = read_mmap_records_offset(storing_param, header, file_size);
+    }
+    if (return_code == SUCCESS)
+    {
+        return_code = map_file(storing_param, storing_param->max_sol_size_);
+    }
+    if (return_code != SUCCESS)
+    {
+        close(storing_param->mmap_fd_);
+        storing_param->mmap_fd_ = -1;
+        return return_code;
+    }
+
+    if (file_size == 0)
+    {
+        char *mapped_header = storing_param->mmap_data_;
+        const int64 records_count = 0;
+        memcpy(mapped_header, header, MMAP_RECORDS_COUNT_OFFSET);
+        memcpy(&mapped_header[MMAP_RECORDS_COUNT_OFFSET], &records_count, sizeof(int64));
+        double *header_m = (double *) &mapped_header[MMAP_RECORDS_COUNT_OFFSET + sizeof(int64)];
+        for (int i = 0; i < stored_objects_count; i++)
+        {
+            header_m[i] = system->m[storing_param->stored_indices ? storing_param->stored_indices[i] : i];
+        }
+    }
+
+    return SUCCESS;
+#else
+    (void) storing_param;
+    (void) system;
+    return ERROR_MMAP_NOT_SUPPORTED;
+#endif
+}
+
+WIN32DLL_API int extend_mmap_solutions(
+    StoringParam *restrict storing_param,
+    int64 max_sol_size
+)
+{
+#ifdef USE_MMAP
+    munmap(storing_param->mmap_data_, get_mmap_file_size(storing_param, storing_param->max_sol_size_));
+    storing_param->mmap_data_ = NULL;
+
+    int return_code = map_file(storing_param, max_sol_size);
+    if (return_code != SUCCESS)
+    {
+        return return_code;
+    }
+    storing_param->max_sol_size_ = max_sol_size;
+
+    return SUCCESS;
+#else
+    (void) storing_param;
+    (void) max_sol_size;
+    return ERROR_MMAP_NOT_SUPPORTED;
+#endif
+}
+
+WIN32DLL_API int store_solution_step_to_mmap(
+    const StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status,
+    Solutions *restrict solutions
+)
+{
+    const int64 records_count = storing_param->mmap_records_offset_ + *(solutions->sol_size_);
+    char *restrict record = (
+        (char *) storing_param->mmap_data_
+        + storing_param->mmap_header_size_
+        + records_count * MMAP_RECORD_SIZE(storing_param)
+    );
+
+    /* Store solution */
+    // Records are not 8-byte aligned for float32 with odd length
+    const double record_prefix[2] = {*(simulation_status->t), simulation_status->dt};
+    memcpy(record, record_prefix, sizeof(record_prefix));
+    int return_code = copy_stored_state(storing_param, system, &record[sizeof(record_prefix)]);
+    if (return_code != SUCCESS)
+    {
+        return return_code;
+    }
+
+    /* Commit the record, so that it is kept if the process is terminated */
+    int64 *committed_count = (int64 *) ((char *) storing_param->mmap_data_ + MMAP_RECORDS_COUNT_OFFSET);
+    MMAP_STORE_RELEASE(committed_count, records_count + 1);
+
+    /* Update solution size */
+    *(solutions->sol_size_) += 1;
+
+    return SUCCESS;
+}
+
+WIN32DLL_API int close_mmap_solutions(
+    StoringParam *restrict storing_param,
+    int64 sol_size
+)
+{
+#ifdef USE_MMAP
+    int return_code = SUCCESS;
+
+    if (storing_param->mmap_data_)
+    {
+        munmap(storing_param->mmap_data_, get_mmap_file_size(storing_param, storing_param->max_sol_size_));
+        storing_param->mmap_data_ = NULL;
+    }
+
+    // Shrink to the stored records
+    if (ftruncate(storing_param->mmap_fd_, get_mmap_file_size(storing_param, sol_size)) != 0)
+    {
+        return_code = ERROR_MMAP_FILE_RESIZE;
+    }
+    if (close(storing_param->mmap_fd_) != 0 && return_code == SUCCESS)
+    {
+        return_code = ERROR_MMAP_FILE_CLOSE;
+    }
+    storing_param->mmap_fd_ = -1;
+
+    return return_code;
+#else
+    (void) storing_param;
+    (void) sol_size;
+    return ERROR_MMAP_NOT_SUPPORTED;
+#endif
+}
+
+#ifdef USE_MMAP
+IN_FILE int map_file(StoringParam *restrict storing_param, int64 max_sol_size)
+{
+    const int64 size = get_mmap_file_size(storing_param, max_sol_size);
+    if (ftruncate(storing_param->mmap_fd_, size) != 0)
+    {
+        return ERROR_MMAP_FILE_RESIZE;
+    }
+
+    void *data = mmap(NULL, size, PROT_READ | PROT_WRITE, MAP_SHARED, storing_param->mmap_fd_, 0);
+    if (data == MAP_FAILED)
+    {
+        return ERROR_MMAP_MAP;
+    }
+    storing_param->mmap_data_ = data;
+
+    return SUCCESS;
+}
+
+IN_FILE int64 get_mmap_file_size(const StoringParam *restrict storing_param, int64 sol_size)
+{
+    return (
+        storing_param->mmap_header_size_
+        + (storing_param->mmap_records_offset_ + sol_size) * MMAP_RECORD_SIZE(storing_param)
+    );
+}
+
+IN_FILE int read_mmap_records_offset(
+    StoringParam *restrict storing_param,
+    const char *restrict header,
+    int64 file_size
+)
+{
+    if (file_size < storing_param->mmap_header_size_)
+    {
+        return ERROR_MMAP_FILE_INCOMPATIBLE;
+    }
+
+    // Only the layout and the number of objects must match
+    char existing_header[MMAP_RECORDS_COUNT_OFFSET];
+    int64 records_count;
+    if (
+        pread(storing_param->mmap_fd_, existing_header, sizeof(existing_header), 0) != (ssize_t) sizeof(existing_header)
+        || pread(storing_param->mmap_fd_, &records_count, sizeof(int64), MMAP_RECORDS_COUNT_OFFSET) != (ssize_t) sizeof(int64)
+        || memcmp(existing_header, header, 16) != 0
+    )
+    {
+        return ERROR_MMAP_FILE_INCOMPATIBLE;
+    }
+
+    // Uncommitted records at the end are overwritten
+    const int64 max_records_count = (file_size - storing_param->mmap_header_size_) / MMAP_RECORD_SIZE(storing_param);
+    if (records_count < 0 || records_count > max_records_count)
+    {
+        return ERROR_MMAP_FILE_INCOMPATIBLE;
+    }
+    storing_param->mmap_records_offset_ = records_count;
+
+    return SUCCESS;
+}
+#endif
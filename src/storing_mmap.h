@@ -0,0 +1,94 @@
+/**
+ * \file storing_mmap.h
+ * \author Ching Yin Ng
+ * \brief Function prototypes for storing solutions in a memory-mapped file
+ *
+ * The file has the same layout as the binary flush file (see storing.h)
+ * with a single header including the number of committed records
+ * (FLUSH_BINARY_LAYOUT_RECORDS_COUNT), followed by max_sol_size_
+ * preallocated records. The integrator writes the records directly to
+ * the mapped memory and commits each of them in the header, and the file
+ * is truncated to the stored records when it is closed. If the process
+ * is terminated before that, the records that are not yet committed are
+ * left at the end of the file and ignored by the readers.
+ *
+ * If the file already exists, e.g. when the simulation is resumed, the
+ * records are appended after the committed records. A file with another
+ * layout is never overwritten.
+ *
+ * Memory mapping requires POSIX (compiled with USE_MMAP).
+ */
+
+#ifndef STORING_MMAP_H
+#define STORING_MMAP_H
+
+#include "gravity_sim.h"
+
+/**
+ * \brief Create or open the file at flush_path and map max_sol_size_
+ *        new records to memory
+ *
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_MMAP_NOT_SUPPORTED If compiled without USE_MMAP
+ * \retval ERROR_MMAP_FILE_OPEN If failed to create the file
+ * \retval ERROR_MMAP_FILE_INCOMPATIBLE If the existing file has another layout
+ * \retval ERROR_MMAP_FILE_RESIZE If failed to resize the file
+ * \retval ERROR_MMAP_MAP If failed to map the file to memory
+ */
+int open_mmap_solutions(
+    StoringParam *restrict storing_param,
+    const System *restrict system
+);
+
+/**
+ * \brief Extend the number of records in the mapped file
+ *
+ * \param storing_param Pointer to the storing parameters
+ * \param max_sol_size New number of records
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_MMAP_FILE_RESIZE If failed to resize the file
+ * \retval ERROR_MMAP_MAP If failed to map the file to memory
+ */
+int extend_mmap_solutions(
+    StoringParam *restrict storing_param,
+    int64 max_sol_size
+);
+
+/**
+ * \brief Store solution step to the mapped file
+ *
+ * \param storing_param Pointer to the storing parameters
+ * \param system Pointer to the gravitational system
+ * \param simulation_status Pointer to the simulation status
+ * \param solutions Pointer to the solutions
+ *
+ * \retval SUCCESS If the solution is stored successfully
+ * \retval ERROR_STORED_INDEX_OUT_OF_RANGE If a stored index is out of range
+ */
+int store_solution_step_to_mmap(
+    const StoringParam *restrict storing_param,
+    const System *restrict system,
+    const SimulationStatus *restrict simulation_status,
+    Solutions *restrict solutions
+);
+
+/**
+ * \brief Unmap the file and truncate it to the stored records
+ *
+ * \param storing_param Pointer to the storing parameters
+ * \param sol_size Number of records stored by this simulation
+ *
+ * \retval SUCCESS If successful
+ * \retval ERROR_MMAP_FILE_RESIZE If failed to truncate the file
+ * \retval ERROR_MMAP_FILE_CLOSE If failed to close the file
+ */
+int close_mmap_solutions(
+    StoringParam *restrict storing_param,
+    int64 sol_size
+);
+
+#endif